@@ -0,0 +1,303 @@
+"""
+Asynchroner Message Worker
+
+Verarbeitet Nachrichten mit asyncio statt mit wenigen blockierenden Threads. Die
+Weiterleitung an die Kunden-Endpunkte läuft über einen asynchronen HTTP-Client
+(aiohttp), sodass hunderte Anfragen gleichzeitig unterwegs sein können. Pro
+Endpunkt begrenzt ein Semaphor die Anzahl paralleler Anfragen, damit ein
+einzelner Kunde nicht mit Anfragen überflutet wird.
+
+Prüfung, Transformation und Auswertung der Antwort sind identisch mit dem
+Thread-Worker (_prepare_job/_finish_job). Blockierende Aufrufe (Redis, MongoDB,
+Template-Engine) laufen in einem Thread-Pool. Ist aiohttp nicht installiert,
+wird auch der HTTP-Versand im Thread-Pool ausgeführt.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+
+from api.message_worker import MessageWorker
+from utils.circuit_breaker import EndpointUnavailableError
+
+# aiohttp ist optional; ohne aiohttp wird requests im Thread-Pool verwendet
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+logger = logging.getLogger('message-worker')
+
+# Antwort eines Endpunkts mit denselben Attributen, die _finish_job von requests.Response nutzt
+ForwardResponse = namedtuple('ForwardResponse', ['status_code', 'text'])
+
+
+class AsyncMessageWorker(MessageWorker):
+    """
+    Worker, der Nachrichten in einer asyncio-Event-Loop verarbeitet
+    """
+
+    def __init__(self, poll_interval: float = 0.5, block_timeout: Optional[float] = None, batch_size: int = 50,
+                 maintenance_interval: float = 30.0, max_concurrency: int = 200, endpoint_concurrency: int = 20,
+                 drain_timeout: float = 25.0):
+        """
+        Initialisiere den asynchronen Message Worker
+
+        Args:
+            poll_interval: Zeit zwischen Queue-Abfragen in Sekunden (nur ohne blockierendes Abholen)
+            block_timeout: Wartezeit für blockierendes Abholen in Sekunden (None = Standardwert der Queue)
+            batch_size: Maximale Anzahl an Nachrichten pro Queue-Zugriff
+            maintenance_interval: Zeit zwischen zwei Wartungsläufen in Sekunden
+            max_concurrency: Maximale Anzahl gleichzeitig verarbeiteter Nachrichten
+            endpoint_concurrency: Maximale Anzahl gleichzeitiger Anfragen pro Endpunkt
+            drain_timeout: Frist in Sekunden, in der laufende Nachrichten beim Herunterfahren abgeschlossen werden
+        """
+        super().__init__(num_threads=1, poll_interval=poll_interval, block_timeout=block_timeout,
+                         batch_size=batch_size, maintenance_interval=maintenance_interval,
+                         drain_timeout=drain_timeout)
+        self.max_concurrency = max(1, max_concurrency)
+        self.endpoint_concurrency = max(1, endpoint_concurrency)
+        self.tasks = set()
+        self.endpoint_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        # Das Semaphor lässt Anfragen warten; das Bulkhead soll innerhalb des Prozesses nichts abweisen
+        self.message_forwarder.endpoint_max_concurrency = self.endpoint_concurrency
+
+        # Ohne aiohttp blockiert jede Anfrage einen Thread des Pools
+        pool_size = min(32, self.max_concurrency) if AIOHTTP_AVAILABLE else self.max_concurrency + 4
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='async-worker')
+
+        if not AIOHTTP_AVAILABLE:
+            logger.warning("aiohttp nicht installiert - HTTP-Weiterleitung läuft im Thread-Pool")
+        logger.info(f"Asynchroner Message Worker initialisiert: max. {self.max_concurrency} gleichzeitig, "
+                    f"{self.endpoint_concurrency} pro Endpunkt")
+
+    def _start_processing(self):
+        """
+        Starte die Event-Loop des Workers in einem eigenen Thread (nach dem Aufwärmen)
+        """
+        thread = threading.Thread(target=lambda: asyncio.run(self._run()))
+        thread.daemon = True
+        thread.start()
+        self.threads.append(thread)
+
+        self._start_maintenance_thread()
+
+        logger.info(f"Asynchroner Message Worker gestartet (max. {self.max_concurrency} gleichzeitig)")
+
+    async def _run(self):
+        """
+        Hauptschleife: holt Nachrichten, solange Kapazität frei ist, und startet je Nachricht einen Task
+        """
+        loop = asyncio.get_running_loop()
+        consumer_id = f"{self.consumer_prefix}:async"
+
+        try:
+            await loop.run_in_executor(self.executor, self.queue.recover_inflight_messages, consumer_id)
+        except Exception as e:
+            logger.error(f"Fehler beim Wiederherstellen der Inflight-Nachrichten für {consumer_id}: {str(e)}")
+
+        session = None
+        if AIOHTTP_AVAILABLE:
+            session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_concurrency, ssl=False))
+
+        try:
+            while self.running and not self.draining:
+                free = self.max_concurrency - len(self.tasks)
+                if free <= 0:
+                    await asyncio.wait(self.tasks, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                try:
+                    jobs = await loop.run_in_executor(
+                        self.executor, self.queue.get_next_messages,
+                        min(self.batch_size, free), self.block_timeout, consumer_id
+                    )
+                except Exception as e:
+                    logger.error(f"Fehler beim Abholen von Nachrichten: {str(e)}")
+                    await asyncio.sleep(1)
+                    continue
+
+                if not jobs:
+                    if not self.block_timeout:
+                        await asyncio.sleep(self.poll_interval)
+                    continue
+
+                if self.draining:
+                    # Während des Drain abgeholt: sofort an andere Worker übergeben
+                    await loop.run_in_executor(self.executor, self._hand_off, [job['id'] for job in jobs])
+                    break
+
+                self._track_jobs(jobs)
+                for job in jobs:
+                    task = asyncio.create_task(self._handle_job(job, session))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+
+            # Laufende Weiterleitungen bis zur Drain-Frist abschließen lassen; danach
+            # übergibt der Drain die übrigen Nachrichten an andere Worker
+            if self.tasks:
+                timeout = max(0.0, self.drain_state['deadline'] - time.time()) if self.drain_state else 5.0
+                await asyncio.wait(self.tasks, timeout=timeout)
+        finally:
+            if session:
+                await session.close()
+
+        logger.info("Event-Loop des asynchronen Workers beendet")
+
+    async def _handle_job(self, job: Dict[str, Any], session):
+        """
+        Verarbeitet eine Nachricht und meldet das Ergebnis an die Queue
+        """
+        loop = asyncio.get_running_loop()
+        logger.info(f"Verarbeite Nachricht: {job['id']}")
+
+        status, payload = await self._execute_job_async(job, session)
+
+        # Nach Ablauf der Drain-Frist übergebene Nachrichten gehören inzwischen einem anderen Worker
+        if not self._untrack_jobs([job['id']]):
+            logger.warning(f"Ergebnis für übergebene Nachricht {job['id']} verworfen")
+            return
+
+        try:
+            if status == 'completed':
+                await loop.run_in_executor(self.executor, self.queue.mark_as_completed, job['id'], payload)
+            elif status == 'deferred':
+                exhausted = await loop.run_in_executor(self.executor, self.queue.defer_jobs, [(job['id'], payload)])
+                # Nach max_deferrals Zurückstellungen zählt die Nachricht als Fehlversuch
+                if exhausted:
+                    status, payload = 'failed', exhausted[0][1]
+            else:
+                await loop.run_in_executor(self.executor, self.queue.mark_as_failed, job['id'], payload)
+        except Exception as e:
+            logger.error(f"Fehler beim Aktualisieren der Queue für Nachricht {job['id']}: {str(e)}")
+
+        if self.result_sink and status != 'deferred':
+            self.result_sink.record(job, status, payload)
+
+    async def _execute_job_async(self, job: Dict[str, Any], session) -> Tuple[str, Any]:
+        """
+        Asynchrones Gegenstück zu _execute_job mit derselben Auswertung
+
+        Returns:
+            ('completed', Ergebnis), ('failed', Fehlermeldung) oder ('deferred', Wartezeit in Sekunden)
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            status, context, resolved = await loop.run_in_executor(self.executor, self._prepare_forward, job)
+            if status == 'failed':
+                return status, context
+
+            response = None
+            if resolved:
+                endpoint_name, endpoint = resolved
+                async with self._endpoint_semaphore(endpoint_name):
+                    response = await self._send(session, context['transformed_message'], endpoint_name, endpoint)
+
+            return await loop.run_in_executor(self.executor, self._finish_job, job, context, response)
+
+        except EndpointUnavailableError as e:
+            logger.warning(f"Nachricht {job['id']} zurückgestellt: {str(e)}")
+            return 'deferred', e.retry_after
+
+        except Exception as e:
+            logger.error(f"Fehler bei der Verarbeitung von Nachricht {job['id']}: {str(e)}")
+            return 'failed', str(e)
+
+    def _prepare_forward(self, job: Dict[str, Any]) -> Tuple[str, Any, Optional[Tuple[str, Dict[str, Any]]]]:
+        """
+        Prüft und transformiert eine Nachricht und ermittelt den Endpunkt (blockierend, im Thread-Pool)
+
+        Returns:
+            (Status, Kontext oder Fehlermeldung, (Endpunkt-Name, Endpunkt) oder None bei blockierter Weiterleitung)
+        """
+        status, context = self._prepare_job(job)
+        if status == 'failed':
+            return status, context, None
+
+        resolved = self.message_forwarder.resolve_endpoint(context['transformed_message'], 'auto', context['gateway_id'])
+        return status, context, resolved
+
+    def _endpoint_semaphore(self, endpoint_name: str) -> asyncio.Semaphore:
+        """
+        Gibt das Semaphor eines Endpunkts zurück (wird beim ersten Zugriff angelegt)
+        """
+        semaphore = self.endpoint_semaphores.get(endpoint_name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.endpoint_concurrency)
+            self.endpoint_semaphores[endpoint_name] = semaphore
+        return semaphore
+
+    async def _send(self, session, message: Dict[str, Any], endpoint_name: str, endpoint: Dict[str, Any]):
+        """
+        Sendet eine Nachricht an einen Endpunkt
+
+        Returns:
+            Antwort mit status_code und text oder None bei Verbindungsfehler/Timeout
+        """
+        if session is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, self.message_forwarder.send_to_endpoint, message, endpoint_name, endpoint
+            )
+
+        # Circuit Breaker und Bulkhead wie beim synchronen Versand
+        self.message_forwarder.acquire_endpoint(endpoint_name)
+        response = None
+        try:
+            response = await self._post(session, message, endpoint_name, endpoint)
+            return response
+        finally:
+            self.message_forwarder.release_endpoint(endpoint_name, response)
+
+    async def _post(self, session, message: Dict[str, Any], endpoint_name: str, endpoint: Dict[str, Any]):
+        """
+        Führt die HTTP-Anfrage über aiohttp aus
+
+        Returns:
+            Antwort mit status_code und text oder None bei Verbindungsfehler/Timeout
+        """
+        auth = endpoint.get('auth')
+        try:
+            async with session.post(
+                endpoint['url'],
+                json=message,
+                headers=endpoint.get('headers', {}),
+                auth=aiohttp.BasicAuth(*auth) if auth else None,
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                text = await response.text()
+
+            logger.info(f"Nachricht an '{endpoint_name}' weitergeleitet, Status: {response.status}")
+            return ForwardResponse(response.status, text)
+
+        except Exception as e:
+            logger.error(f"Fehler bei der Weiterleitung an '{endpoint_name}': {str(e)}")
+            return None
+
+    def stop(self):
+        """
+        Stoppe den Worker und den Thread-Pool
+        """
+        super().stop()
+        self.executor.shutdown(wait=False)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Gibt den Status des Workers inklusive Auslastung zurück
+        """
+        status = super().get_status()
+        status.update({
+            'mode': 'async',
+            'http_client': 'aiohttp' if AIOHTTP_AVAILABLE else 'requests (Thread-Pool)',
+            'max_concurrency': self.max_concurrency,
+            'endpoint_concurrency': self.endpoint_concurrency,
+            'in_flight': len(self.tasks)
+        })
+        return status
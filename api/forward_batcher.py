@@ -0,0 +1,230 @@
+"""
+Sammelt weitergeleitete evAlarm-Events zu gemeinsamen Anfragen
+
+Status- und Telemetrie-Nachrichten desselben Endpunkts und Namespaces werden
+bis zu max_events Events oder max_wait Sekunden gesammelt und als ein Request
+mit mehreren Einträgen im 'events'-Array gesendet. Das Ergebnis der Anfrage
+wird auf jede beteiligte Nachricht zurückgeführt. Lehnt der Endpunkt einen
+Sammel-Request mit einem 4xx-Fehler ab, werden die Events einzeln gesendet,
+damit nur die fehlerhafte Nachricht fehlschlägt.
+
+Nachrichten aus den Lanes 'critical' und 'high' (Alarme) sowie Panic-Templates
+werden nie gesammelt und ohne Verzögerung gesendet.
+"""
+
+import time
+import uuid
+import logging
+import threading
+from typing import Dict, Any, List, Tuple, Callable, Optional
+
+from utils.circuit_breaker import EndpointUnavailableError
+
+logger = logging.getLogger('message-worker')
+
+# Lanes, deren Nachrichten gesammelt werden dürfen
+BATCH_LANES = ('normal', 'bulk')
+
+
+class ForwardBatcher:
+    """
+    Sammelt Events je Endpunkt und Namespace und sendet sie gemeinsam
+    """
+
+    def __init__(self, forwarder, finish: Callable, report: Callable, max_events: int = 20, max_wait: float = 0.05):
+        """
+        Initialisiere den Batcher
+
+        Args:
+            forwarder: MessageForwarder (send_to_endpoint)
+            finish: Wertet die Antwort für eine Nachricht aus: finish(job, context, response) -> (Status, Ergebnis)
+            report: Meldet Ergebnisse an die Queue: report([(job, Status, Ergebnis), ...])
+            max_events: Maximale Anzahl Events pro Anfrage
+            max_wait: Maximale Wartezeit eines Events im Batch in Sekunden
+        """
+        self.forwarder = forwarder
+        self.finish = finish
+        self.report = report
+        self.max_events = max(1, max_events)
+        self.max_wait = max_wait
+
+        self.buffers: Dict[Tuple[str, Tuple[str, ...]], Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.running = False
+        self.flush_thread: Optional[threading.Thread] = None
+
+        self.batches_sent = 0
+        self.events_sent = 0
+        self.split_batches = 0
+
+    @staticmethod
+    def accepts(job: Dict[str, Any]) -> bool:
+        """
+        Prüft, ob eine Nachricht gesammelt werden darf (keine Alarme)
+        """
+        return job.get('priority', 'normal') in BATCH_LANES and 'panic' not in str(job.get('template', ''))
+
+    @staticmethod
+    def _batch_key(endpoint_name: str, message: Any) -> Optional[Tuple[str, Tuple[str, ...]]]:
+        """
+        Bestimmt den Schlüssel des Batches; None, wenn die Nachricht nicht nur aus einem 'events'-Array besteht
+        """
+        if not isinstance(message, dict) or set(message) != {'events'} or not isinstance(message['events'], list):
+            return None
+        namespaces = tuple(sorted({str(event.get('namespace', '')) for event in message['events'] if isinstance(event, dict)}))
+        return endpoint_name, namespaces
+
+    def start(self):
+        """
+        Startet den Thread, der abgelaufene Batches sendet
+        """
+        self.running = True
+        self.flush_thread = threading.Thread(target=self._flush_loop)
+        self.flush_thread.daemon = True
+        self.flush_thread.start()
+
+    def stop(self):
+        """
+        Sendet alle gesammelten Events und beendet den Flush-Thread
+        """
+        with self.lock:
+            self.running = False
+            self.wakeup.notify()
+        if self.flush_thread:
+            self.flush_thread.join(timeout=15.0)
+        self.flush_all()
+
+    def submit(self, job: Dict[str, Any], context: Dict[str, Any], endpoint_name: str, endpoint: Dict[str, Any]) -> bool:
+        """
+        Nimmt eine transformierte Nachricht in den Batch ihres Endpunkts auf
+
+        Ist der Batch voll, wird er im aufrufenden Thread gesendet.
+
+        Returns:
+            False, wenn die Nachricht nicht gesammelt werden kann und direkt gesendet werden muss
+        """
+        key = self._batch_key(endpoint_name, context['transformed_message'])
+        if key is None:
+            return False
+
+        full = None
+        with self.lock:
+            buffer = self.buffers.get(key)
+            if buffer is None:
+                buffer = {'endpoint': endpoint, 'entries': [], 'deadline': time.monotonic() + self.max_wait}
+                self.buffers[key] = buffer
+                self.wakeup.notify()
+            buffer['entries'].append((job, context))
+            buffer['event_count'] = buffer.get('event_count', 0) + len(context['transformed_message']['events'])
+            if buffer['event_count'] >= self.max_events:
+                full = self.buffers.pop(key)
+
+        if full:
+            self._send(key[0], full['endpoint'], full['entries'])
+        return True
+
+    def _flush_loop(self):
+        """
+        Sendet Batches, deren Wartezeit abgelaufen ist
+        """
+        while True:
+            with self.lock:
+                if not self.running:
+                    return
+                now = time.monotonic()
+                due = [key for key, buffer in self.buffers.items() if buffer['deadline'] <= now]
+                expired = [(key, self.buffers.pop(key)) for key in due]
+                if not expired:
+                    deadlines = [buffer['deadline'] for buffer in self.buffers.values()]
+                    self.wakeup.wait(timeout=max(0.0, min(deadlines) - now) if deadlines else None)
+                    continue
+
+            for key, buffer in expired:
+                try:
+                    self._send(key[0], buffer['endpoint'], buffer['entries'])
+                except Exception as e:
+                    # Der Flush-Thread darf nie enden, sonst bleiben alle weiteren Batches liegen
+                    logger.error(f"Unerwarteter Fehler beim Senden eines Batches an '{key[0]}': {str(e)}")
+
+    def flush_all(self):
+        """
+        Sendet alle gesammelten Events sofort
+        """
+        with self.lock:
+            pending = list(self.buffers.items())
+            self.buffers.clear()
+        for key, buffer in pending:
+            self._send(key[0], buffer['endpoint'], buffer['entries'])
+
+    def _send(self, endpoint_name: str, endpoint: Dict[str, Any], entries: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """
+        Sendet einen Batch und meldet das Ergebnis je Nachricht
+        """
+        batch_id = str(uuid.uuid4())
+        payload = {'events': [event for _, context in entries for event in context['transformed_message']['events']]}
+
+        try:
+            response = self.forwarder.send_to_endpoint(payload, endpoint_name, endpoint)
+        except EndpointUnavailableError as e:
+            logger.warning(f"Batch {batch_id} mit {len(entries)} Nachrichten zurückgestellt: {str(e)}")
+            self._report(batch_id, [(job, 'deferred', e.retry_after) for job, _ in entries])
+            return
+        except Exception as e:
+            logger.error(f"Fehler beim Senden von Batch {batch_id}: {str(e)}")
+            self._report(batch_id, [(job, 'failed', str(e)) for job, _ in entries])
+            return
+
+        with self.lock:
+            self.batches_sent += 1
+            self.events_sent += len(payload['events'])
+
+        # Ein 4xx-Fehler kann an einem einzelnen Event liegen: dann einzeln senden
+        if response is not None and 400 <= response.status_code < 500 and response.status_code != 429 and len(entries) > 1:
+            logger.warning(f"Batch {batch_id} abgelehnt (HTTP {response.status_code}), sende {len(entries)} Nachrichten einzeln")
+            with self.lock:
+                self.split_batches += 1
+            for entry in entries:
+                self._send(endpoint_name, endpoint, [entry])
+            return
+
+        try:
+            results = []
+            for job, context in entries:
+                status, result = self.finish(job, context, response)
+                if status == 'completed' and isinstance(result, dict):
+                    result['batch'] = {'id': batch_id, 'size': len(entries)}
+                results.append((job, status, result))
+        except Exception as e:
+            logger.error(f"Fehler beim Auswerten der Antwort auf Batch {batch_id}: {str(e)}")
+            results = [(job, 'failed', str(e)) for job, _ in entries]
+        else:
+            logger.info(f"Batch {batch_id} mit {len(entries)} Nachrichten an '{endpoint_name}' gesendet")
+        self._report(batch_id, results)
+
+    def _report(self, batch_id: str, results: List[Tuple[Dict[str, Any], str, Any]]):
+        """
+        Meldet die Ergebnisse eines Batches, ohne Fehler an den Aufrufer weiterzugeben
+
+        Schlägt das Melden fehl (z.B. Redis nicht erreichbar), bleiben die Nachrichten
+        in Bearbeitung und werden nach Ablauf des Timeouts wieder eingereiht.
+        """
+        try:
+            self.report(results)
+        except Exception as e:
+            logger.error(f"Fehler beim Melden der Ergebnisse von Batch {batch_id}: {str(e)}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Gibt Konfiguration und Zähler des Batchers zurück
+        """
+        with self.lock:
+            buffered = sum(len(buffer['entries']) for buffer in self.buffers.values())
+        return {
+            'max_events': self.max_events,
+            'max_wait_ms': int(self.max_wait * 1000),
+            'buffered': buffered,
+            'batches_sent': self.batches_sent,
+            'events_sent': self.events_sent,
+            'split_batches': self.split_batches
+        }
@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import re
 import logging
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
@@ -22,11 +23,14 @@ from utils.api_handlers import (
 
 # Importiere die Template-Engine und den Message-Forwarder
 from utils.template_engine import TemplateEngine, MessageForwarder
+from utils.template_store import get_template_store
 from utils.template_utils import select_template
+from utils.device_registry import get_message_priority
 
 # Importiere die Message Queue und den Worker
 from api.message_queue import init_message_queue, get_message_queue
 from api.message_worker import init_worker, get_worker, app as worker_app
+from api.result_sink import query_results
 
 # Importiere die Datenmodelle
 from api.models import initialize_db, Customer, Gateway, Device, register_device_from_message
@@ -75,6 +79,14 @@ PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 template_engine = TemplateEngine(os.path.join(PROJECT_DIR, 'templates'))
 message_forwarder = MessageForwarder()
 message_forwarder.template_engine = template_engine  # Verbinde MessageForwarder mit TemplateEngine
+# Mit TEMPLATE_STORE=redis teilen sich alle Processor- und Worker-Prozesse die Templates über Redis
+try:
+    template_store = get_template_store()
+    if template_store is not None:
+        template_engine.attach_store(template_store)
+except Exception as e:
+    logger.error(f"Template-Store nicht erreichbar, verwende lokale Template-Dateien: {str(e)}")
+template_engine.start_watching()  # Geänderte Template-Dateien nachladen (TEMPLATE_WATCH_INTERVAL, nicht mit Store)
 
 # Initialisiere Redis Message Queue
 queue = init_message_queue(
@@ -89,7 +101,23 @@ queue = init_message_queue(
 worker = init_worker(
     num_threads=int(os.environ.get('WORKER_THREADS', 2)),
     poll_interval=float(os.environ.get('WORKER_POLL_INTERVAL', 0.5)),
-    auto_start=True
+    auto_start=True,
+    block_timeout=float(os.environ['WORKER_BLOCK_TIMEOUT']) if 'WORKER_BLOCK_TIMEOUT' in os.environ else None,
+    batch_size=int(os.environ.get('WORKER_BATCH_SIZE', 1)),
+    maintenance_interval=float(os.environ.get('WORKER_MAINTENANCE_INTERVAL', 30)),
+    mode=os.environ.get('WORKER_MODE', 'threads'),
+    max_concurrency=int(os.environ.get('WORKER_MAX_CONCURRENCY', 200)),
+    endpoint_concurrency=int(os.environ.get('WORKER_ENDPOINT_CONCURRENCY', 20)),
+    min_threads=int(os.environ['WORKER_MIN_THREADS']) if 'WORKER_MIN_THREADS' in os.environ else None,
+    max_threads=int(os.environ['WORKER_MAX_THREADS']) if 'WORKER_MAX_THREADS' in os.environ else None,
+    autoscale_interval=float(os.environ.get('WORKER_AUTOSCALE_INTERVAL', 10)),
+    target_drain_time=float(os.environ.get('WORKER_TARGET_DRAIN_TIME', 5)),
+    forward_batch_size=int(os.environ.get('WORKER_FORWARD_BATCH_SIZE', 0)),
+    forward_batch_wait=float(os.environ.get('WORKER_FORWARD_BATCH_WAIT_MS', 50)) / 1000,
+    drain_timeout=float(os.environ.get('WORKER_DRAIN_TIMEOUT', 25)),
+    transform_threads=int(os.environ.get('WORKER_TRANSFORM_THREADS', 2)),
+    prefetch=int(os.environ.get('WORKER_PREFETCH', 20)),
+    forward_buffer=int(os.environ.get('WORKER_FORWARD_BUFFER', 8))
 )
 
 # Initialisiere Datenbank-Verbindung für Message Processor
@@ -415,16 +443,22 @@ def process_message():
         logger.info("Globaler Test-Modus ist aktiv - Nachricht wird nicht weitergeleitet")
     
     if forward_message:
+        # Priorität aus der Device Registry: Alarme überholen Statusmeldungen in der Queue
+        priority = get_message_priority(message) if isinstance(message, dict) else 'normal'
+        
         # Füge die Nachricht in die Queue ein (asynchrone Verarbeitung)
         message_id = queue.enqueue_message(
             message=message,
             template_name=template_name,
             endpoint_name='auto',  # Verwende 'auto' statt 'evalarm' für dynamische Endpunktauswahl
             customer_config=customer_config,
-            gateway_id=gateway_id
+            gateway_id=gateway_id,
+            priority=priority,
+            # Explizite Idempotenz vom Gateway, sonst leitet die Queue den Schlüssel aus dem Inhalt ab
+            idempotency_key=request.headers.get('Idempotency-Key')
         )
         
-        logger.info(f"Nachricht in Queue eingefügt: ID {message_id}, Template {template_name}, Kunde {customer_config['name']}")
+        logger.info(f"Nachricht in Queue eingefügt: ID {message_id}, Template {template_name}, Kunde {customer_config['name']}, Priorität {priority}")
         
         # Erstelle Antwort mit Message-ID
         return success_response({
@@ -476,18 +510,13 @@ def list_all_messages():
     messages = []
     try:
         # Hole die letzten Ergebnisse aus der Ergebnis-Liste
-        results_json = queue.redis_client.lrange(queue.results_list, 0, 99)
-        completed_msgs = [json.loads(result) for result in results_json if result]
+        completed_msgs = queue.get_recent_results(100)
         
-        # Hole fehlgeschlagene Nachrichten
-        failed_messages = queue.get_failed_messages()
+        # Hole die neuesten fehlgeschlagenen Nachrichten
+        failed_messages = queue.get_failed_messages_page(limit=100)['messages']
         
         # Hole Nachrichten in Verarbeitung
-        processing_messages = []
-        processing_queue = queue.redis_client.hgetall(queue.processing_queue)
-        for job_json in processing_queue.values():
-            if job_json:
-                processing_messages.append(json.loads(job_json))
+        processing_messages = queue.get_processing_messages()
         
         # Kombiniere und formatiere alle Nachrichten
         for msg in completed_msgs + failed_messages + processing_messages:
@@ -579,13 +608,56 @@ def get_queue_status():
 @api_error_handler
 def get_failed_messages():
     """
-    Endpunkt zum Abfragen fehlgeschlagener Nachrichten
+    Endpunkt zum seitenweisen Abfragen fehlgeschlagener Nachrichten
+    
+    Query-Parameter:
+        cursor: next_cursor der vorherigen Seite
+        limit: Seitengröße (Standard: 50, maximal 500)
+        gateway_id: Nur Nachrichten dieses Gateways
+        error_class: Nur Nachrichten dieser Fehlerklasse (z.B. timeout, http_5xx, validation)
     """
-    # Hole alle fehlgeschlagenen Nachrichten
-    failed_messages = queue.get_failed_messages()
+    try:
+        page = queue.get_failed_messages_page(
+            cursor=request.args.get('cursor'),
+            limit=int(request.args.get('limit', 50)),
+            gateway_id=request.args.get('gateway_id'),
+            error_class=request.args.get('error_class')
+        )
+    except ValueError as e:
+        return validation_error_response({"cursor": str(e)})
+    
+    logger.info(f"{len(page['messages'])} von {page['total']} fehlgeschlagenen Nachrichten abgefragt")
+    return success_response(page)
+
+@app.route(get_route('messages', 'history'), methods=['GET'])
+@api_error_handler
+def get_message_history():
+    """
+    Endpunkt zum seitenweisen Abfragen gespeicherter Verarbeitungsergebnisse (neueste zuerst)
+    
+    Query-Parameter:
+        cursor: next_cursor der vorherigen Seite
+        limit: Seitengröße (Standard: 50, maximal 500)
+        gateway_id: Nur Ergebnisse dieses Gateways
+        customer: Nur Ergebnisse dieses Kunden (Name)
+        status: Nur Ergebnisse mit diesem Status (completed, failed)
+        since, until: Zeitraum als Unix-Zeitstempel oder ISO 8601 (until exklusiv)
+    """
+    try:
+        page = query_results(
+            gateway_id=request.args.get('gateway_id'),
+            customer=request.args.get('customer'),
+            status=request.args.get('status'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            cursor=request.args.get('cursor'),
+            limit=int(request.args.get('limit', 50))
+        )
+    except ValueError as e:
+        return validation_error_response({"query": str(e)})
     
-    logger.info(f"{len(failed_messages)} fehlgeschlagene Nachrichten gefunden")
-    return success_response(failed_messages)
+    logger.info(f"{len(page['results'])} Verarbeitungsergebnisse abgefragt")
+    return success_response(page)
 
 @app.route(get_route('messages', 'retry'), methods=['POST'])
 @api_error_handler
@@ -678,6 +750,39 @@ def reload_templates():
         'templates': template_names
     }, 'Templates wurden neu geladen')
 
+@app.route(get_route('templates', 'save'), methods=['PUT'])
+@api_error_handler
+def save_template(template_id):
+    """
+    Endpunkt zum Speichern eines Templates
+    
+    Body: {"template": {...}, "version": <erwartete Version, optional>}
+    Mit "version" wird nur gespeichert, wenn das Template seitdem nicht geändert wurde (sonst 409).
+    """
+    data = request.json or {}
+    
+    validation_errors = {}
+    if not re.fullmatch(r'[A-Za-z0-9_.-]+', template_id) or template_id.startswith('.'):
+        validation_errors['template_id'] = 'Template-ID darf nur Buchstaben, Ziffern, "_", "-" und "." enthalten'
+    if not isinstance(data.get('template'), dict):
+        validation_errors['template'] = 'Template-Daten (Objekt) sind erforderlich'
+    elif not isinstance(data['template'].get('transform', {}), (dict, list)):
+        validation_errors['template'] = 'transform muss ein Objekt oder eine Liste sein'
+    if data.get('version') is not None and not isinstance(data['version'], int):
+        validation_errors['version'] = 'Version muss eine Zahl sein'
+    if validation_errors:
+        return validation_error_response(validation_errors)
+    
+    version = template_engine.save_template(template_id, data['template'], data.get('version'))
+    if version is None:
+        return error_response(f'Template "{template_id}" wurde zwischenzeitlich geändert', 409, 'version_conflict')
+    
+    logger.info(f"Template {template_id} gespeichert (Version {version})")
+    return success_response({
+        'id': template_id,
+        'version': version
+    }, 'Template wurde gespeichert')
+
 @app.route(get_route('templates', 'test'), methods=['POST'])
 @api_error_handler
 def test_transform():
@@ -741,12 +846,15 @@ def list_processor_endpoints():
         {'path': get_route('messages', 'detail'), 'method': 'GET', 'description': 'Nachrichtenstatus abrufen'},
         {'path': get_route('messages', 'queue_status'), 'method': 'GET', 'description': 'Queue-Status abrufen'},
         {'path': get_route('messages', 'failed'), 'method': 'GET', 'description': 'Fehlgeschlagene Nachrichten abrufen'},
+        {'path': get_route('messages', 'history'), 'method': 'GET', 'description': 'Verarbeitungsergebnisse abrufen'},
         {'path': get_route('messages', 'retry'), 'method': 'POST', 'description': 'Nachricht erneut verarbeiten'},
         {'path': get_route('messages', 'clear'), 'method': 'POST', 'description': 'Alle Queues löschen'},
         {'path': get_route('system', 'health'), 'method': 'GET', 'description': 'Systemstatus abrufen'},
+        {'path': get_route('system', 'ready'), 'method': 'GET', 'description': 'Readiness-Probe (Caches aufgewärmt, kein Drain)'},
         {'path': get_route('templates', 'list'), 'method': 'GET', 'description': 'Templates auflisten'},
         {'path': get_route('system', 'endpoints'), 'method': 'GET', 'description': 'Verfügbare Endpunkte auflisten'},
         {'path': get_route('templates', 'reload'), 'method': 'POST', 'description': 'Templates neu laden'},
+        {'path': get_route('templates', 'save'), 'method': 'PUT', 'description': 'Template speichern'},
         {'path': get_route('templates', 'test'), 'method': 'POST', 'description': 'Template-Transformation testen'},
         {'path': get_route('system', 'logs'), 'method': 'GET', 'description': 'System-Logs abrufen'},
         {'path': '/api/endpoints', 'method': 'GET', 'description': 'API-Endpunkte auflisten'}
@@ -785,28 +893,25 @@ def get_forwarding_status():
     
     try:
         # Hole die letzten Ergebnisse
-        results_json = queue.redis_client.lrange(queue.results_list, 0, 99)
-        results = [json.loads(result) for result in results_json if result]
+        results = queue.get_recent_results(100)
         
-        # Hole fehlgeschlagene Nachrichten
-        failed_messages = queue.get_failed_messages()
+        # Hole die neuesten fehlgeschlagenen Nachrichten
+        failed_messages = queue.get_failed_messages_page(limit=100)['messages']
         
         # Hole aktuelle Verarbeitungsqueue
-        processing_messages = []
-        processing_queue = queue.redis_client.hgetall(queue.processing_queue)
-        for job_json in processing_queue.values():
-            if job_json:
-                processing_messages.append(json.loads(job_json))
+        processing_messages = queue.get_processing_messages()
         
         # Hole Queue-Statistiken
-        stats = queue.redis_client.hgetall(queue.stats_key) or {}
+        queue_status = queue.get_queue_status()
+        stats = queue_status['stats'] or {}
         
         # Zähle nach Status
         forwarding_status = {
-            "pending": queue.redis_client.llen(queue.main_queue),
+            "pending": queue_status['pending_count'],
+            "retrying": queue_status['delayed_count'],
             "processing": len(processing_messages),
             "completed": int(stats.get('total_processed', 0)),
-            "failed": len(failed_messages),
+            "failed": queue_status['failed_count'],
             "details": {
                 "pending": [],
                 "processing": processing_messages,
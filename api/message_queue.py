@@ -1,10 +1,20 @@
 import json
+import hashlib
 import logging
+import random
 import redis
 import time
 import uuid
 import os
-from typing import Dict, Any, Union, List, Optional
+from typing import Dict, Any, Union, List, Optional, Tuple
+
+# orjson ist optional und beschleunigt das Kodieren der Jobs deutlich
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
 
 # Konfiguriere Logging
 logging.basicConfig(
@@ -13,12 +23,403 @@ logging.basicConfig(
 )
 logger = logging.getLogger('message-queue')
 
+if not ORJSON_AVAILABLE:
+    logger.info("orjson nicht installiert, Jobs werden mit dem json-Modul kodiert")
+
+# Obergrenzen der Latenz-Buckets in Sekunden (letzter Bucket: alles darüber)
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+# Prioritäts-Lanes in Abholreihenfolge; 'normal' ist die bisherige Haupt-Queue
+PRIORITY_LANES = ['critical', 'high', 'normal', 'bulk']
+
+# Prioritäten aus der Device Registry, die keiner Lane direkt entsprechen
+PRIORITY_ALIASES = {'low': 'bulk'}
+
+# Fehlerklassen für fehlgeschlagene Nachrichten: (Klasse, Textmerkmale der Fehlermeldung), erste Übereinstimmung gewinnt
+ERROR_CLASSES = [
+    ('security', ['SICHERHEITSWARNUNG', 'Weiterleitung blockiert']),
+    ('invalid_job', ['Keine Gateway-ID']),
+    ('transformation', ['Fehler bei der Transformation']),
+    ('validation', ['Ungültiges Datenformat', 'HTTP 422']),
+    ('http_5xx', ['HTTP 5']),
+    ('http_4xx', ['HTTP 4']),
+    ('timeout', ['Timeout', 'timed out']),
+    ('connection', ['Verbindungsfehler', 'Connection']),
+    ('endpoint_unavailable', ['Zurückstellungen überschritten']),
+]
+
+# Gewichte für die gewichtete Abholung (relativer Anteil je Lane)
+DEFAULT_LANE_WEIGHTS = {'critical': 8, 'high': 4, 'normal': 2, 'bulk': 1}
+
+# Verbraucht je abgeholter Nachricht ein Token der Notify-Liste (abzüglich bereits per BLPOP entnommener),
+# damit wartende Consumer nicht für längst abgeholte Nachrichten geweckt werden
+CONSUME_TOKENS_FUNCTION = """
+local function consume_tokens(notify, jobs, taken)
+    local surplus = jobs - taken
+    if surplus > 0 then
+        redis.call('LTRIM', notify, surplus, -1)
+    end
+end
+"""
+
+# Holt bis zu ARGV[1] Nachrichten aus den Lanes KEYS[4..] (in dieser Reihenfolge) in die Inflight-Liste KEYS[2]
+# KEYS[1]: Notify-Liste, KEYS[3]: Inflight-Register; ARGV[2]: Anzahl bereits per BLPOP entnommener Tokens,
+# ARGV[3]: Zeitpunkt des Abrufs
+POP_LANES_SCRIPT = CONSUME_TOKENS_FUNCTION + """
+local jobs = {}
+local count = tonumber(ARGV[1])
+local inflight = KEYS[2]
+for i = 4, #KEYS do
+    while #jobs < count do
+        local job = redis.call('LMOVE', KEYS[i], inflight, 'LEFT', 'LEFT')
+        if not job then break end
+        table.insert(jobs, job)
+    end
+    if #jobs >= count then break end
+end
+consume_tokens(KEYS[1], #jobs, tonumber(ARGV[2]))
+if #jobs > 0 then
+    redis.call('ZADD', KEYS[3], ARGV[3], inflight)
+end
+return jobs
+"""
+
+# Verschiebt fällige Wiederholungen atomar aus dem Delayed-Set (KEYS[1]) ans Ende ihrer Lane
+# KEYS[2]: Notify-Liste, KEYS[3..]: Lanes; ARGV[1]: Zeitpunkt, ARGV[2]: Limit, ARGV[3..]: Lane-Namen
+PROMOTE_DUE_JOBS_SCRIPT = """
+local lanes = {}
+for i = 3, #KEYS do
+    lanes[ARGV[i]] = KEYS[i]
+end
+local jobs = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(jobs) do
+    redis.call('ZREM', KEYS[1], job)
+    local ok, decoded = pcall(cjson.decode, job)
+    local target = lanes['normal']
+    if ok and type(decoded['priority']) == 'string' and lanes[decoded['priority']] then
+        target = lanes[decoded['priority']]
+    end
+    redis.call('RPUSH', target, job)
+    redis.call('LPUSH', KEYS[2], '1')
+end
+if #jobs > 0 then
+    redis.call('LTRIM', KEYS[2], 0, 999)
+end
+return #jobs
+"""
+
+# Fair Scheduling: Jede Lane hat je Tenant eine eigene Liste (<Lane>:tenant:<Tenant>), eine Ringliste
+# der Tenants mit wartenden Nachrichten (<Lane>:tenants) und die Defizite der Tenants (<Lane>:deficit).
+# Ein Tenant steht genau dann im Ring, wenn seine Liste nicht leer ist. Die Skripte leiten diese
+# Schlüssel aus dem Lane-Schlüssel ab und setzen daher eine einzelne Redis-Instanz voraus (kein Cluster).
+
+# Reiht Nachrichten eines Tenants ein (Lane, Notify-Liste, Tenant, 'LPUSH' (neu) oder 'RPUSH' (Wiederholung),
+# Nachrichten ab Index first in jobs); gemeinsamer Teil von FAIR_PUSH_SCRIPT und OWNED_JOBS_SCRIPT
+FAIR_PUSH_FUNCTION = """
+local function fair_push(lane, notify, tenant, mode, jobs, first)
+    local queue = lane .. ':tenant:' .. tenant
+    if redis.call('LLEN', queue) == 0 then
+        redis.call('RPUSH', lane .. ':tenants', tenant)
+    end
+    for i = first, #jobs do
+        redis.call(mode, queue, jobs[i])
+        redis.call('LPUSH', notify, '1')
+    end
+    redis.call('LTRIM', notify, 0, 999)
+    return #jobs - first + 1
+end
+"""
+
+# Reiht Nachrichten eines Tenants ein. KEYS[1]: Lane, KEYS[2]: Notify-Liste
+# ARGV[1]: Tenant, ARGV[2]: 'LPUSH' (neu) oder 'RPUSH' (Wiederholung), ARGV[3..]: Nachrichten
+FAIR_PUSH_SCRIPT = FAIR_PUSH_FUNCTION + """
+return fair_push(KEYS[1], KEYS[2], ARGV[1], ARGV[2], ARGV, 3)
+"""
+
+# Schließt Nachrichten aus der Verarbeitung ab (Ergebnis, Fehlversuch, Zurückstellen, Übergabe), aber nur,
+# wenn sie noch unverändert im Processing-Hash (KEYS[1]) stehen. Damit gewinnt bei einem Wettlauf zwischen
+# Worker und Reaper genau einer; der andere lässt die Nachricht unverändert.
+# ARGV je Nachricht: Job-ID, Job wie abgeholt, Anzahl Befehle, je Befehl: Anzahl Argumente, Argumente.
+# Der Pseudo-Befehl FAIRPUSH (Lane, Notify-Liste, Tenant, Modus, Nachrichten...) ruft fair_push auf.
+# Rückgabe: IDs der abgeschlossenen Nachrichten
+OWNED_JOBS_SCRIPT = FAIR_PUSH_FUNCTION + """
+local handled = {}
+local i = 1
+while i <= #ARGV do
+    local job_id = ARGV[i]
+    local owned = redis.call('HGET', KEYS[1], job_id) == ARGV[i + 1]
+    local commands = tonumber(ARGV[i + 2])
+    i = i + 3
+    for c = 1, commands do
+        local n = tonumber(ARGV[i])
+        if owned then
+            local command = {}
+            for a = 1, n do
+                command[a] = ARGV[i + a]
+            end
+            if command[1] == 'FAIRPUSH' then
+                fair_push(command[2], command[3], command[4], command[5], command, 6)
+            else
+                redis.call(unpack(command))
+            end
+        end
+        i = i + n + 1
+    end
+    if owned then
+        table.insert(handled, job_id)
+    end
+end
+return handled
+"""
+
+# Entfernt Einträge des Processing-Index (KEYS[2]), deren Nachricht nicht mehr im Processing-Hash (KEYS[1]) steht
+# ARGV: Job-IDs
+REMOVE_STALE_INDEX_SCRIPT = """
+local removed = 0
+for _, job_id in ipairs(ARGV) do
+    if redis.call('HEXISTS', KEYS[1], job_id) == 0 then
+        removed = removed + redis.call('ZREM', KEYS[2], job_id)
+    end
+end
+return removed
+"""
+
+# Holt bis zu ARGV[1] Nachrichten per Deficit Round Robin über die Tenants jeder Lane (Lanes in KEYS-Reihenfolge)
+# KEYS[1]: Aktive Nachrichten je Tenant (Hash), KEYS[2]: Inflight-Liste, KEYS[3]: Notify-Liste,
+# KEYS[4]: Inflight-Register, KEYS[5..]: Lanes
+# ARGV[2]: Obergrenze gleichzeitig aktiver Nachrichten je Tenant (0 = unbegrenzt), ARGV[3]: Quantum je Runde,
+# ARGV[4]: Anzahl bereits per BLPOP entnommener Tokens, ARGV[5]: Zeitpunkt des Abrufs
+# Nachrichten ohne Tenant liegen direkt in der Lane und werden nach den Tenants der Lane abgeholt.
+FAIR_POP_SCRIPT = CONSUME_TOKENS_FUNCTION + """
+local jobs = {}
+local count = tonumber(ARGV[1])
+local cap = tonumber(ARGV[2])
+local quantum = tonumber(ARGV[3])
+local active_key = KEYS[1]
+local inflight = KEYS[2]
+for i = 5, #KEYS do
+    local lane = KEYS[i]
+    local ring = lane .. ':tenants'
+    local deficits = lane .. ':deficit'
+    local remaining = redis.call('LLEN', ring)
+    local blocked = 0
+    while #jobs < count and remaining > 0 and blocked < remaining do
+        local tenant = redis.call('LINDEX', ring, 0)
+        local queue = lane .. ':tenant:' .. tenant
+        local active = math.max(0, tonumber(redis.call('HGET', active_key, tenant) or '0'))
+        local deficit = tonumber(redis.call('HGET', deficits, tenant) or '0')
+        if deficit < 1 then
+            deficit = deficit + quantum
+        end
+        local popped = 0
+        while deficit >= 1 and #jobs < count and (cap <= 0 or active < cap) do
+            local job = redis.call('LMOVE', queue, inflight, 'LEFT', 'LEFT')
+            if not job then break end
+            table.insert(jobs, job)
+            deficit = deficit - 1
+            active = active + 1
+            popped = popped + 1
+        end
+        if popped > 0 then
+            redis.call('HINCRBY', active_key, tenant, popped)
+            blocked = 0
+        end
+        if redis.call('LLEN', queue) == 0 then
+            redis.call('LPOP', ring)
+            redis.call('HDEL', deficits, tenant)
+            remaining = remaining - 1
+        else
+            redis.call('HSET', deficits, tenant, deficit)
+            -- Mit Restguthaben bleibt der Tenant vorne und ist beim nächsten Abruf wieder an der Reihe
+            if deficit < 1 or #jobs < count then
+                redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+                if popped == 0 then
+                    blocked = blocked + 1
+                end
+            end
+        end
+    end
+    while #jobs < count do
+        local job = redis.call('LMOVE', lane, inflight, 'LEFT', 'LEFT')
+        if not job then break end
+        local ok, decoded = pcall(cjson.decode, job)
+        if ok and type(decoded['tenant']) == 'string' then
+            redis.call('HINCRBY', active_key, decoded['tenant'], 1)
+        end
+        table.insert(jobs, job)
+    end
+    if #jobs >= count then break end
+end
+consume_tokens(KEYS[3], #jobs, tonumber(ARGV[4]))
+if #jobs > 0 then
+    redis.call('ZADD', KEYS[4], ARGV[5], inflight)
+end
+return jobs
+"""
+
+# Übernimmt Inflight-Listen, deren Consumer seit ARGV[1] nichts mehr abgeholt hat (abgestürzte Container)
+# KEYS[1]: Inflight-Register; ARGV[2]: Limit, ARGV[3]: Suffix für den neuen Namen, ARGV[4]: Zeitpunkt
+# Jede Liste wird umbenannt, damit sie nur ein Aufrufer zurückstellt, und bleibt unter dem neuen
+# Namen registriert, bis sie leer ist (stirbt der Aufrufer, übernimmt sie später ein anderer).
+# Rückgabe: neue Namen der übernommenen Listen
+CLAIM_ABANDONED_INFLIGHT_SCRIPT = """
+local claimed = {}
+local keys = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, key in ipairs(keys) do
+    redis.call('ZREM', KEYS[1], key)
+    if redis.call('EXISTS', key) == 1 then
+        local target = key .. ARGV[3]
+        redis.call('RENAME', key, target)
+        redis.call('ZADD', KEYS[1], ARGV[4], target)
+        table.insert(claimed, target)
+    end
+end
+return claimed
+"""
+
+# Wie PROMOTE_DUE_JOBS_SCRIPT, aber in die Liste des Tenants der Nachricht (Nachrichten ohne Tenant direkt in die Lane)
+FAIR_PROMOTE_DUE_JOBS_SCRIPT = """
+local lanes = {}
+for i = 3, #KEYS do
+    lanes[ARGV[i]] = KEYS[i]
+end
+local jobs = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(jobs) do
+    redis.call('ZREM', KEYS[1], job)
+    local ok, decoded = pcall(cjson.decode, job)
+    local target = lanes['normal']
+    if ok and type(decoded['priority']) == 'string' and lanes[decoded['priority']] then
+        target = lanes[decoded['priority']]
+    end
+    if ok and type(decoded['tenant']) == 'string' then
+        local queue = target .. ':tenant:' .. decoded['tenant']
+        if redis.call('LLEN', queue) == 0 then
+            redis.call('RPUSH', target .. ':tenants', decoded['tenant'])
+        end
+        target = queue
+    end
+    redis.call('RPUSH', target, job)
+    redis.call('LPUSH', KEYS[2], '1')
+end
+if #jobs > 0 then
+    redis.call('LTRIM', KEYS[2], 0, 999)
+end
+return #jobs
+"""
+
+# Wie PROMOTE_DUE_JOBS_SCRIPT, aber mit XADD in einen Stream (ARGV[3]: ungefähre Maximallänge)
+STREAM_PROMOTE_DUE_JOBS_SCRIPT = """
+local jobs = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(jobs) do
+    redis.call('ZREM', KEYS[1], job)
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'job', job)
+end
+return #jobs
+"""
+
+class OwnedJobCommands:
+    """
+    Sammelt die Befehle zum Abschließen von Nachrichten für OWNED_JOBS_SCRIPT
+    
+    Stellt die Pipeline-Methoden bereit, die die Hilfsfunktionen der Queue verwenden
+    (_release_job, _push_jobs, _store_result, ...). Die Befehle einer Nachricht werden
+    nur ausgeführt, wenn sie beim Ausführen noch unverändert in der Verarbeitung steht.
+    """
+    
+    def __init__(self, script, processing_queue: str):
+        self.script = script
+        self.processing_queue = processing_queue
+        self.jobs: List[Tuple[str, str, List[List[Any]]]] = []
+        self.commands: List[List[Any]] = []
+    
+    def job(self, job_id: str, job_json: str) -> 'OwnedJobCommands':
+        """
+        Beginnt die Befehle für eine Nachricht (job_json: Inhalt des Processing-Hashs beim Lesen)
+        """
+        self.commands = []
+        self.jobs.append((job_id, job_json, self.commands))
+        return self
+    
+    def _add(self, *args) -> None:
+        self.commands.append(list(args))
+    
+    def hdel(self, name, *keys):
+        self._add('HDEL', name, *keys)
+    
+    def hset(self, name, key, value):
+        self._add('HSET', name, key, value)
+    
+    def hincrby(self, name, key, amount=1):
+        self._add('HINCRBY', name, key, amount)
+    
+    def hincrbyfloat(self, name, key, amount=1.0):
+        self._add('HINCRBYFLOAT', name, key, repr(float(amount)))
+    
+    def zadd(self, name, mapping):
+        args = []
+        for member, score in mapping.items():
+            args.extend([repr(float(score)), member])
+        self._add('ZADD', name, *args)
+    
+    def zrem(self, name, *values):
+        self._add('ZREM', name, *values)
+    
+    def lpush(self, name, *values):
+        self._add('LPUSH', name, *values)
+    
+    def rpush(self, name, *values):
+        self._add('RPUSH', name, *values)
+    
+    def ltrim(self, name, start, end):
+        self._add('LTRIM', name, start, end)
+    
+    def xadd(self, name, fields, maxlen=None, approximate=True):
+        args = ['XADD', name]
+        if maxlen is not None:
+            args.extend(['MAXLEN', '~' if approximate else '=', maxlen])
+        args.append('*')
+        for field, value in fields.items():
+            args.extend([field, value])
+        self._add(*args)
+    
+    def xack(self, name, group, *ids):
+        self._add('XACK', name, group, *ids)
+    
+    def fair_push(self, lane_key: str, notify_key: str, tenant: str, mode: str, job_jsons: List[str]) -> None:
+        self._add('FAIRPUSH', lane_key, notify_key, tenant, mode, *job_jsons)
+    
+    def execute(self) -> List[str]:
+        """
+        Führt die Befehle aus
+        
+        Returns:
+            IDs der Nachrichten, die noch in der Verarbeitung standen und abgeschlossen wurden
+        """
+        if not self.jobs:
+            return []
+        args: List[Any] = []
+        for job_id, job_json, commands in self.jobs:
+            args.extend([job_id, job_json, len(commands)])
+            for command in commands:
+                args.append(len(command))
+                args.extend(command)
+        return self.script(keys=[self.processing_queue], args=args)
+
+
 class RedisMessageQueue:
     """
     Redis-basierte Message Queue für das IoT Gateway
     """
     
-    def __init__(self, host='localhost', port=6379, db=0, password=None, prefix='iot_gateway'):
+    # Lua-Skript zum Verschieben fälliger Wiederholungen (Schlüssel und Argumente: _promote_keys/_promote_args)
+    promote_script = PROMOTE_DUE_JOBS_SCRIPT
+    
+    def __init__(self, host='localhost', port=6379, db=0, password=None, prefix='iot_gateway',
+                 block_timeout: float = 0, visibility_timeout: float = 300.0, max_attempts: int = 3,
+                 retry_base_delay: float = 2.0, retry_max_delay: float = 300.0, lane_mode: str = 'strict',
+                 lane_weights: Optional[Dict[str, int]] = None, codec: str = 'json',
+                 config_by_reference: bool = True, dedup_window: int = 300, fair_scheduling: bool = False,
+                 tenant_concurrency: int = 0, tenant_quantum: int = 1, max_deferrals: int = 100):
         """
         Initialisiere die Redis-Verbindung
         
@@ -28,6 +429,21 @@ class RedisMessageQueue:
             db: Redis DB Index
             password: Redis Passwort (optional)
             prefix: Präfix für Redis-Schlüssel
+            block_timeout: Standard-Wartezeit in Sekunden für blockierendes Abholen (0 = nicht blockierend)
+            visibility_timeout: Sekunden, nach denen eine Nachricht in Bearbeitung als verwaist gilt
+            max_attempts: Maximale Anzahl an Verarbeitungsversuchen, danach landet die Nachricht in der Failed-Queue
+            retry_base_delay: Wartezeit vor dem ersten Wiederholungsversuch in Sekunden (verdoppelt sich je Versuch)
+            retry_max_delay: Obergrenze der Wartezeit zwischen zwei Versuchen in Sekunden
+            lane_mode: 'strict' (höhere Lanes immer zuerst) oder 'weighted' (Reihenfolge zufällig nach lane_weights)
+            lane_weights: Gewichte je Lane für lane_mode='weighted'
+            codec: Kodierung der Jobs: 'json' (kompaktes JSON) oder 'orjson' (schneller, falls installiert)
+            config_by_reference: Kundenkonfiguration nur einmal ablegen und in Jobs per Hash referenzieren
+            dedup_window: Sekunden, in denen doppelte Nachrichten eines Gateways verworfen werden (0 = aus)
+            fair_scheduling: Innerhalb einer Lane per Deficit Round Robin zwischen Tenants (Kunden) abwechseln
+            tenant_concurrency: Maximale Anzahl gleichzeitig verarbeiteter Nachrichten je Tenant (0 = unbegrenzt)
+            tenant_quantum: Anzahl Nachrichten, die ein Tenant pro Runde abholen darf
+            max_deferrals: Maximale Anzahl an Zurückstellungen (defer_jobs), danach zählt jede weitere
+                           als Fehlversuch (0 = unbegrenzt)
         """
         self.redis_client = redis.Redis(
             host=host,
@@ -38,10 +454,60 @@ class RedisMessageQueue:
         )
         self.prefix = prefix
         self.main_queue = f"{prefix}:queue:messages"
+        self.lane_keys = {lane: self._lane_key(lane) for lane in PRIORITY_LANES}
+        # Ein Eintrag je eingereihter Nachricht, damit Worker blockierend auf alle Lanes warten können
+        self.notify_key = f"{prefix}:queue:notify"
         self.processing_queue = f"{prefix}:queue:processing"
+        # Sorted Set mit Job-ID -> Startzeitpunkt der Verarbeitung, damit der Reaper nicht den ganzen Hash lesen muss
+        self.processing_index = f"{prefix}:queue:processing:index"
+        # Pro Consumer eine eigene Liste für Nachrichten "unterwegs" zwischen Queue und Processing-Hash
+        self.inflight_prefix = f"{prefix}:queue:inflight"
+        # Sorted Set mit Inflight-Liste -> letzter Abruf, damit Listen abgestürzter Consumer gefunden werden
+        self.inflight_registry = f"{prefix}:queue:inflight_consumers"
         self.failed_queue = f"{prefix}:queue:failed"
+        # Zeitlich sortierte Indizes der Failed-Queue (Score = failed_at), global und je Gateway/Fehlerklasse
+        self.failed_index = f"{prefix}:queue:failed:index"
+        # Sorted Set mit fehlgeschlagenen Nachrichten -> Zeitpunkt des nächsten Versuchs
+        self.delayed_queue = f"{prefix}:queue:delayed"
         self.results_list = f"{prefix}:results"
         self.stats_key = f"{prefix}:stats"
+        self.latency_key = f"{prefix}:stats:latency"
+        # Kundenkonfigurationen, adressiert über den Hash ihres Inhalts
+        self.config_key = f"{prefix}:configs"
+        # Idempotenz-Schlüssel je Gateway, verfallen nach dedup_window Sekunden
+        self.dedup_prefix = f"{prefix}:dedup"
+        # Anzahl abgeholter, noch nicht abgeschlossener Nachrichten je Tenant (nur Fair Scheduling)
+        self.tenant_active_key = f"{prefix}:queue:tenants:active"
+        # Heartbeats der Worker-Prozesse (Prozess-ID -> letzter Status)
+        self.worker_health_key = f"{prefix}:workers:health"
+        self.block_timeout = block_timeout
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.max_deferrals = max_deferrals
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        if codec == 'orjson' and not ORJSON_AVAILABLE:
+            logger.warning("Codec 'orjson' angefordert, aber orjson ist nicht installiert - verwende 'json'")
+            codec = 'json'
+        self.codec = codec
+        self.config_by_reference = config_by_reference
+        self.dedup_window = dedup_window
+        self._config_cache: Dict[str, Dict[str, Any]] = {}
+        self.lane_mode = lane_mode
+        self.lane_weights = {**DEFAULT_LANE_WEIGHTS, **(lane_weights or {})}
+        self.fair_scheduling = fair_scheduling
+        self.tenant_concurrency = max(0, tenant_concurrency)
+        self.tenant_quantum = max(1, tenant_quantum)
+        if fair_scheduling:
+            self._promote_script = self.redis_client.register_script(FAIR_PROMOTE_DUE_JOBS_SCRIPT)
+            self._pop_lanes_script = self.redis_client.register_script(FAIR_POP_SCRIPT)
+        else:
+            self._promote_script = self.redis_client.register_script(self.promote_script)
+            self._pop_lanes_script = self.redis_client.register_script(POP_LANES_SCRIPT)
+        self._fair_push_script = self.redis_client.register_script(FAIR_PUSH_SCRIPT)
+        self._owned_jobs_script = self.redis_client.register_script(OWNED_JOBS_SCRIPT)
+        self._claim_abandoned_script = self.redis_client.register_script(CLAIM_ABANDONED_INFLIGHT_SCRIPT)
+        self._remove_stale_index_script = self.redis_client.register_script(REMOVE_STALE_INDEX_SCRIPT)
         
         # Initialisiere Stats, falls nicht vorhanden
         if not self.redis_client.exists(self.stats_key):
@@ -52,24 +518,181 @@ class RedisMessageQueue:
                 'processing_time_avg': 0
             })
         
+        self._backfill_processing_index()
+        self._backfill_failed_index()
+        
         logger.info(f"Redis Message Queue initialisiert: {host}:{port}, DB: {db}")
     
-    def enqueue_message(self, message: Dict[str, Any], template_name: str, endpoint_name: str, customer_config: Dict[str, Any] = None, gateway_id: str = None) -> str:
+    def _backfill_processing_index(self) -> None:
+        """
+        Nimmt Nachrichten in den Processing-Index auf, die ohne Index registriert wurden
+        
+        Betrifft nur Nachrichten aus einer Version ohne Index; danach ist der Index leer
+        genau dann, wenn auch der Processing-Hash leer ist.
+        """
+        if self.redis_client.zcard(self.processing_index) or not self.redis_client.hlen(self.processing_queue):
+            return
+        
+        index = {}
+        for job_id, job_json in self.redis_client.hscan_iter(self.processing_queue):
+            try:
+                index[job_id] = float(self._decode(job_json).get('processing_started') or 0)
+            except (ValueError, TypeError):
+                index[job_id] = 0
+        if index:
+            self.redis_client.zadd(self.processing_index, index)
+            logger.info(f"Processing-Index mit {len(index)} Nachrichten aufgebaut")
+    
+    def _encode(self, data: Dict[str, Any]) -> str:
+        """
+        Kodiert einen Job für Redis (kompakt, ohne Leerzeichen)
+        """
+        if self.codec == 'orjson':
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        return json.dumps(data, separators=(',', ':'))
+    
+    def _decode(self, data: str) -> Dict[str, Any]:
+        """
+        Dekodiert einen Job aus Redis (beide Codecs erzeugen JSON)
+        """
+        if self.codec == 'orjson':
+            return orjson.loads(data)
+        return json.loads(data)
+    
+    @staticmethod
+    def config_reference(customer_config: Dict[str, Any]) -> str:
+        """
+        Berechnet die Referenz einer Kundenkonfiguration aus ihrem Inhalt
+        
+        Geänderte Konfigurationen erhalten automatisch eine neue Referenz, bereits
+        eingereihte Jobs verwenden weiterhin die Version zum Zeitpunkt des Einreihens.
+        """
+        canonical = json.dumps(customer_config, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+    
+    def _resolve_customer_configs(self, jobs: List[Dict[str, Any]]) -> None:
+        """
+        Ersetzt Konfigurations-Referenzen der Jobs durch die Konfiguration selbst
+        
+        Konfigurationen sind über ihren Inhalt adressiert und ändern sich daher nie;
+        der Cache im Worker muss nicht invalidiert werden. Fehlende Einträge werden
+        mit einem einzigen HMGET nachgeladen.
+        """
+        missing = {job['customer_config_ref'] for job in jobs
+                   if job.get('customer_config_ref') and 'customer_config' not in job} - set(self._config_cache)
+        if missing:
+            missing = list(missing)
+            if len(self._config_cache) > 1000:
+                self._config_cache.clear()
+            for ref, config_json in zip(missing, self.redis_client.hmget(self.config_key, missing)):
+                if config_json:
+                    self._config_cache[ref] = json.loads(config_json)
+                else:
+                    logger.error(f"Kundenkonfiguration {ref} nicht gefunden")
+        
+        for job in jobs:
+            ref = job.get('customer_config_ref')
+            if ref and 'customer_config' not in job and ref in self._config_cache:
+                job['customer_config'] = self._config_cache[ref]
+    
+    @staticmethod
+    def normalize_priority(priority: Optional[str]) -> str:
+        """
+        Ordnet eine Priorität (z.B. aus der Device Registry) einer Lane zu
+        
+        Args:
+            priority: Priorität, z.B. 'critical', 'high', 'normal', 'low' oder 'bulk'
+        
+        Returns:
+            Name der Lane (unbekannte Prioritäten landen in 'normal')
+        """
+        priority = PRIORITY_ALIASES.get(priority, priority)
+        return priority if priority in PRIORITY_LANES else 'normal'
+    
+    def _lane_key(self, lane: str) -> str:
+        """
+        Gibt den Schlüssel einer Lane zurück ('normal' ist die bisherige Haupt-Queue)
+        """
+        return self.main_queue if lane == 'normal' else f"{self.main_queue}:{lane}"
+    
+    def _backfill_failed_index(self) -> None:
+        """
+        Baut die Indizes der Failed-Queue für Einträge auf, die ohne Index gespeichert wurden
+        """
+        if self.redis_client.zcard(self.failed_index) or not self.redis_client.hlen(self.failed_queue):
+            return
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        indexed = 0
+        for job_id, job_json in self.redis_client.hscan_iter(self.failed_queue, count=500):
+            try:
+                job = self._decode(job_json)
+            except ValueError:
+                continue
+            job.setdefault('error_class', self.classify_error(job.get('error')))
+            self._index_failed_job(pipe, job)
+            indexed += 1
+        pipe.execute()
+        logger.info(f"Index der Failed-Queue mit {indexed} Nachrichten aufgebaut")
+    
+    def _dedup_key(self, message: Dict[str, Any], gateway_id: Optional[str], idempotency_key: Optional[str]) -> Optional[str]:
+        """
+        Bestimmt den Redis-Schlüssel für die Duplikaterkennung einer Nachricht
+        
+        Ohne expliziten Idempotenz-Schlüssel wird er aus dem Inhalt abgeleitet, aber
+        nur, wenn die Nachricht einen Zeitstempel ('ts') trägt. Zwei inhaltsgleiche
+        Nachrichten ohne Zeitstempel (z.B. zweimal derselbe Alarm) sind nicht
+        zwingend Duplikate und werden daher nicht verworfen.
+        
+        Returns:
+            Der Schlüssel oder None, wenn keine Duplikaterkennung erfolgt
+        """
+        if self.dedup_window <= 0:
+            return None
+        
+        if idempotency_key:
+            digest = hashlib.sha256(str(idempotency_key).encode('utf-8')).hexdigest()
+        elif isinstance(message, dict) and message.get('ts') is not None:
+            canonical = json.dumps(message, sort_keys=True, separators=(',', ':'), default=str)
+            digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        else:
+            return None
+        
+        return f"{self.dedup_prefix}:{gateway_id or '-'}:{digest}"
+    
+    def enqueue_message(self, message: Dict[str, Any], template_name: str, endpoint_name: str, customer_config: Dict[str, Any] = None, gateway_id: str = None,
+                        priority: str = 'normal', idempotency_key: Optional[str] = None, tenant: Optional[str] = None) -> str:
         """
         Füge eine Nachricht in die Queue ein
         
+        Wurde innerhalb von dedup_window Sekunden bereits eine Nachricht mit demselben
+        Idempotenz-Schlüssel vom selben Gateway eingereiht, wird die neue Nachricht
+        verworfen und die Message-ID der ersten zurückgegeben.
+        
         Args:
             message: Die zu verarbeitende Nachricht
             template_name: Name des zu verwendenden Templates
             endpoint_name: Name des Ziel-Endpunkts
             customer_config: Optionale Kundenkonfiguration
             gateway_id: Gateway-ID
+            priority: Priorität der Nachricht ('critical', 'high', 'normal', 'low'/'bulk')
+            idempotency_key: Optionaler Idempotenz-Schlüssel (None = aus Gateway, Inhalt und 'ts' ableiten)
+            tenant: Tenant für das Fair Scheduling (None = customer_id der Kundenkonfiguration, sonst Gateway-ID)
         
         Returns:
-            Die Message-ID
+            Die Message-ID (bei Duplikaten die der ursprünglichen Nachricht)
         """
         # Generiere eine eindeutige Message-ID
         message_id = str(uuid.uuid4())
+        lane = self.normalize_priority(priority)
+        
+        # Duplikaterkennung: Nur die erste Nachricht setzt den Schlüssel
+        dedup_key = self._dedup_key(message, gateway_id, idempotency_key)
+        if dedup_key and not self.redis_client.set(dedup_key, message_id, nx=True, ex=self.dedup_window):
+            original_id = self.redis_client.get(dedup_key) or message_id
+            self.redis_client.hincrby(self.stats_key, 'total_deduplicated', 1)
+            logger.info(f"Doppelte Nachricht von Gateway {gateway_id} verworfen, Original: {original_id}")
+            return original_id
         
         # Erstelle Job-Daten
         job_data = {
@@ -77,55 +700,346 @@ class RedisMessageQueue:
             'message': message,
             'template': template_name,
             'endpoint': endpoint_name,
+            'priority': lane,
             'created_at': int(time.time()),
+            'queued_at': time.time(),
             'status': 'pending'
         }
         
-        # Füge Kundenkonfiguration hinzu, wenn vorhanden
-        if customer_config:
+        # Füge Kundenkonfiguration hinzu, wenn vorhanden (als Referenz oder vollständig)
+        config_ref = None
+        if customer_config and self.config_by_reference:
+            config_ref = self.config_reference(customer_config)
+            job_data['customer_config_ref'] = config_ref
+        elif customer_config:
             job_data['customer_config'] = customer_config
         
         # Füge Gateway-ID hinzu, wenn vorhanden
         if gateway_id:
             job_data['gateway_id'] = gateway_id
         
-        # Konvertiere in JSON
-        job_json = json.dumps(job_data)
+        # Tenant für das Fair Scheduling: Kunde, ersatzweise Gateway
+        tenant = tenant or (customer_config or {}).get('customer_id') or gateway_id
+        if tenant:
+            job_data['tenant'] = str(tenant)
         
-        # Füge in die Haupt-Queue ein
-        self.redis_client.lpush(self.main_queue, job_json)
+        # Konvertiere in JSON
+        job_json = self._encode(job_data)
         
-        # Aktualisiere Statistiken
-        self.redis_client.hincrby(self.stats_key, 'total_enqueued', 1)
+        # Füge in die Lane ein und aktualisiere Statistiken
+        pipe = self.redis_client.pipeline(transaction=True)
+        if config_ref:
+            pipe.hsetnx(self.config_key, config_ref, json.dumps(customer_config, default=str))
+        self._push_jobs(pipe, [job_json], lane=lane, tenant=job_data.get('tenant'))
+        pipe.hincrby(self.stats_key, 'total_enqueued', 1)
+        try:
+            pipe.execute()
+        except redis.exceptions.RedisError:
+            # Ohne eingereihte Nachricht darf der Schlüssel spätere Zustellungen nicht blockieren
+            if dedup_key:
+                self.redis_client.delete(dedup_key)
+            raise
         
-        logger.info(f"Nachricht {message_id} in Queue eingefügt")
+        logger.info(f"Nachricht {message_id} in Queue eingefügt (Lane {lane})")
         return message_id
     
-    def get_next_message(self) -> Optional[Dict[str, Any]]:
+    def get_next_message(self, block_timeout: Optional[float] = None, consumer_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Hole die nächste zu verarbeitende Nachricht aus der Queue
         
+        Die Nachricht wird atomar in die Inflight-Liste des Consumers verschoben
+        und erst danach im Processing-Hash registriert. Stirbt der Worker
+        dazwischen, bleibt die Nachricht in der Inflight-Liste erhalten und wird beim
+        nächsten Start über recover_inflight_messages() zurückgestellt, bzw. von
+        recover_abandoned_inflight(), wenn der Consumer nicht wiederkommt.
+        
+        Args:
+            block_timeout: Maximale Wartezeit in Sekunden, falls die Queue leer ist
+                           (None = Standardwert der Queue, 0 = nicht blockieren)
+            consumer_id: Eindeutige Kennung des abholenden Workers
+        
         Returns:
             Die nächste Nachricht oder None, wenn die Queue leer ist
         """
-        # Verschiebe eine Nachricht von der Haupt-Queue in die Verarbeitungs-Queue
-        # und gib sie zurück (atomic operation)
-        job_json = self.redis_client.lpop(self.main_queue)
+        jobs = self.get_next_messages(1, block_timeout=block_timeout, consumer_id=consumer_id)
+        return jobs[0] if jobs else None
+    
+    def get_next_messages(self, count: int, block_timeout: Optional[float] = None, consumer_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Hole bis zu count Nachrichten mit möglichst wenigen Redis-Roundtrips
         
-        if not job_json:
-            return None
+        Ein Lua-Skript verschiebt die Nachrichten atomar aus den Prioritäts-Lanes in die
+        Inflight-Liste; bei lane_mode='strict' immer aus der höchsten nicht leeren Lane.
+        Ist keine Nachricht vorhanden, wartet der Aufruf blockierend auf die Notify-Liste
+        und versucht es danach erneut.
+        
+        Args:
+            count: Maximale Anzahl an Nachrichten
+            block_timeout: Maximale Wartezeit in Sekunden, falls die Queue leer ist
+                           (None = Standardwert der Queue, 0 = nicht blockieren)
+            consumer_id: Eindeutige Kennung des abholenden Workers
+        
+        Returns:
+            Liste der abgeholten Nachrichten (leer, wenn die Queue leer ist)
+        """
+        if count <= 0:
+            return []
+        
+        if block_timeout is None:
+            block_timeout = self.block_timeout
+        
+        inflight_key = self._inflight_key(consumer_id)
+        job_jsons = self._pop_lanes(count, inflight_key)
+        
+        if not job_jsons and block_timeout and block_timeout > 0:
+            if not self.redis_client.blpop([self.notify_key], timeout=block_timeout):
+                return []
+            job_jsons = self._pop_lanes(count, inflight_key, tokens_taken=1)
+        
+        if not job_jsons:
+            return []
+        
+        jobs = self._claim_jobs(job_jsons, inflight_key)
+        
+        logger.debug(f"{len(jobs)} Nachrichten aus Queue geholt: {[job['id'] for job in jobs]}")
+        return jobs
+    
+    def _pop_lanes(self, count: int, inflight_key: str, tokens_taken: int = 0) -> List[str]:
+        """
+        Verschiebt bis zu count Nachrichten aus den Lanes in die Inflight-Liste
+        
+        Das Skript verbraucht dabei je Nachricht ein Token der Notify-Liste; tokens_taken
+        ist die Anzahl der vorher per BLPOP entnommenen Tokens.
+        """
+        lane_keys = [self.lane_keys[lane] for lane in self._lane_order()]
+        if self.fair_scheduling:
+            return self._pop_lanes_script(
+                keys=[self.tenant_active_key, inflight_key, self.notify_key, self.inflight_registry] + lane_keys,
+                args=[count, self.tenant_concurrency, self.tenant_quantum, tokens_taken, time.time()]
+            )
+        return self._pop_lanes_script(keys=[self.notify_key, inflight_key, self.inflight_registry] + lane_keys,
+                                      args=[count, tokens_taken, time.time()])
+    
+    def _lane_order(self) -> List[str]:
+        """
+        Bestimmt die Reihenfolge, in der die Lanes abgefragt werden
+        
+        Bei lane_mode='weighted' wird die Reihenfolge pro Abruf zufällig gemäß den
+        Gewichten gezogen, damit auch niedrige Lanes bei Dauerlast nicht verhungern.
+        """
+        if self.lane_mode != 'weighted':
+            return PRIORITY_LANES
+        
+        remaining = list(PRIORITY_LANES)
+        order = []
+        while remaining:
+            lane = random.choices(remaining, weights=[self.lane_weights.get(l, 1) for l in remaining])[0]
+            order.append(lane)
+            remaining.remove(lane)
+        return order
+    
+    def _inflight_key(self, consumer_id: Optional[str] = None) -> str:
+        """
+        Gibt den Schlüssel der Inflight-Liste eines Consumers zurück
+        """
+        return f"{self.inflight_prefix}:{consumer_id or 'default'}"
+    
+    def _claim_jobs(self, job_jsons: List[str], inflight_key: str) -> List[Dict[str, Any]]:
+        """
+        Markiert abgeholte Nachrichten als "in Bearbeitung"
+        
+        Speichert die Nachrichten unverändert im Processing-Hash und entfernt sie in
+        derselben Transaktion aus der Inflight-Liste. Der Startzeitpunkt steht im
+        Processing-Index, daher muss der Job nicht neu kodiert werden.
+        
+        Args:
+            job_jsons: Die Nachrichten, wie sie aus der Queue geholt wurden
+            inflight_key: Inflight-Liste, in der die Nachrichten liegen
+        
+        Returns:
+            Die Nachrichten als Dictionaries
+        """
+        jobs = []
+        processing = {}
+        started = time.time()
+        
+        for job_json in job_jsons:
+            job = self._decode(job_json)
+            processing[job['id']] = job_json
+            
+            # Markiere die Nachricht als "in Bearbeitung"
+            job['status'] = 'processing'
+            job['processing_started'] = started
+            jobs.append(job)
+        
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset(self.processing_queue, mapping=processing)
+        pipe.zadd(self.processing_index, {job_id: started for job_id in processing})
+        self._record_wait_times(pipe, jobs, started)
+        for job_json in job_jsons:
+            pipe.lrem(inflight_key, 1, job_json)
+        pipe.execute()
+        
+        self._resolve_customer_configs(jobs)
+        return jobs
+    
+    def _record_wait_times(self, pipe, jobs: List[Dict[str, Any]], started: float) -> None:
+        """
+        Erfasst die Wartezeit in der Queue je Lane (Teil einer Pipeline)
+        
+        Als Beginn der Wartezeit gilt der Zeitpunkt, ab dem die Nachricht abholbar war:
+        bei Wiederholungen der geplante Versuch, sonst das Einreihen.
+        """
+        wait_sums: Dict[str, float] = {}
+        wait_counts: Dict[str, int] = {}
+        for job in jobs:
+            lane = job.get('priority', 'normal')
+            queued_since = job.get('next_attempt_at') or job.get('queued_at') or job.get('created_at') or started
+            wait_sums[lane] = wait_sums.get(lane, 0.0) + max(0.0, started - queued_since)
+            wait_counts[lane] = wait_counts.get(lane, 0) + 1
+        
+        for lane, wait_sum in wait_sums.items():
+            pipe.hincrbyfloat(self.stats_key, f'wait_time_sum:{lane}', wait_sum)
+            pipe.hincrby(self.stats_key, f'wait_time_count:{lane}', wait_counts[lane])
+    
+    def recover_inflight_messages(self, consumer_id: Optional[str] = None) -> int:
+        """
+        Stellt Nachrichten aus der Inflight-Liste eines Consumers zurück in ihre Lane
+        
+        Wird beim Start eines Workers aufgerufen, um Nachrichten zu retten, die ein
+        abgestürzter Vorgänger zwar abgeholt, aber noch nicht registriert hatte.
+        
+        Args:
+            consumer_id: Kennung des Consumers
+        
+        Returns:
+            Anzahl der zurückgestellten Nachrichten
+        """
+        return self._recover_inflight(self._inflight_key(consumer_id))
+    
+    def recover_abandoned_inflight(self, max_idle: Optional[float] = None, limit: int = 100) -> int:
+        """
+        Stellt Nachrichten aus Inflight-Listen fremder, nicht mehr aktiver Consumer zurück
+        
+        recover_inflight_messages() hilft nur, wenn ein Worker mit derselben Consumer-ID
+        neu startet. Ein nach einem Absturz neu erzeugter Container hat aber einen neuen
+        Hostnamen und damit neue Consumer-IDs. Jeder Abruf vermerkt seine Inflight-Liste
+        im Inflight-Register; Listen, aus denen seit max_idle Sekunden nichts mehr
+        abgeholt wurde, gelten als verwaist.
+        
+        Args:
+            max_idle: Sekunden ohne Abruf, ab denen eine Liste verwaist ist (None = Visibility-Timeout)
+            limit: Maximale Anzahl an Listen pro Aufruf
+        
+        Returns:
+            Anzahl der zurückgestellten Nachrichten
+        """
+        if max_idle is None:
+            max_idle = self.visibility_timeout
+        
+        now = time.time()
+        claimed_keys = self._claim_abandoned_script(
+            keys=[self.inflight_registry],
+            args=[now - max_idle, limit, f":abandoned:{uuid.uuid4().hex}", now]
+        )
+        
+        recovered = 0
+        for inflight_key in claimed_keys:
+            recovered += self._recover_inflight(inflight_key)
+            self.redis_client.zrem(self.inflight_registry, inflight_key)
+        return recovered
+    
+    def _recover_inflight(self, inflight_key: str) -> int:
+        """
+        Stellt alle Nachrichten einer Inflight-Liste zurück in ihre Lane
+        """
+        recovered = 0
+        
+        if self.fair_scheduling:
+            return self._recover_inflight_fair(inflight_key)
+        
+        # Die Inflight-Liste gehört nur diesem Consumer (bzw. dem Aufrufer, der sie übernommen hat),
+        # daher ist das Element am Ende zwischen LINDEX und LMOVE stabil
+        while True:
+            job_json = self.redis_client.lindex(inflight_key, -1)
+            if job_json is None:
+                break
+            try:
+                lane = self.normalize_priority(self._decode(job_json).get('priority'))
+            except ValueError:
+                lane = 'normal'
+            if not self.redis_client.lmove(inflight_key, self.lane_keys[lane], 'RIGHT', 'LEFT'):
+                break
+            recovered += 1
+        
+        if recovered:
+            logger.warning(f"{recovered} Nachrichten aus {inflight_key} zurück in die Queue gestellt")
+        return recovered
+    
+    def _recover_inflight_fair(self, inflight_key: str) -> int:
+        """
+        Stellt Nachrichten aus einer Inflight-Liste zurück in die Listen ihrer Tenants (Fair Scheduling)
+        
+        Jede Nachricht wird in derselben Transaktion aus der Inflight-Liste entfernt,
+        in die Liste ihres Tenants gestellt und vom Zähler aktiver Nachrichten abgezogen.
+        """
+        recovered = 0
+        while True:
+            job_json = self.redis_client.lindex(inflight_key, -1)
+            if job_json is None:
+                break
+            try:
+                job = self._decode(job_json)
+            except ValueError:
+                job = {}
             
-        job = json.loads(job_json)
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.rpop(inflight_key)
+            self._requeue_job(pipe, job_json, lane=self.normalize_priority(job.get('priority')), tenant=job.get('tenant'))
+            if job.get('tenant'):
+                pipe.hincrby(self.tenant_active_key, job['tenant'], -1)
+            pipe.execute()
+            recovered += 1
+        
+        if recovered:
+            logger.warning(f"{recovered} Nachrichten aus {inflight_key} zurück in die Queue gestellt")
+        return recovered
+    
+    def reap_expired_jobs(self, visibility_timeout: Optional[float] = None, limit: int = 100) -> int:
+        """
+        Behandelt Nachrichten, die länger als visibility_timeout in Bearbeitung sind, als fehlgeschlagen
         
-        # Markiere die Nachricht als "in Bearbeitung"
-        job['status'] = 'processing'
-        job['processing_started'] = time.time()
+        Solche Nachrichten stammen von abgestürzten oder hart gestoppten Workern. Sie werden
+        wie ein Fehlversuch gezählt, also erneut eingereiht oder nach dem letzten Versuch
+        in die Failed-Queue verschoben. Der Index-Eintrag wird im selben Lua-Skript entfernt
+        (OWNED_JOBS_SCRIPT), so dass ein Abbruch des Reapers keine Nachricht ohne Index-Eintrag
+        hinterlässt. Laufen mehrere Reaper parallel oder schließt der Worker die Nachricht
+        gleichzeitig ab, gilt nur das zuerst geschriebene Ergebnis.
         
-        # Speichere die Nachricht in der Verarbeitungs-Queue
-        self.redis_client.hset(self.processing_queue, job['id'], json.dumps(job))
+        Args:
+            visibility_timeout: Maximale Bearbeitungszeit in Sekunden (None = Standardwert der Queue)
+            limit: Maximale Anzahl an Nachrichten pro Aufruf
+        
+        Returns:
+            Anzahl der zurückgeholten Nachrichten
+        """
+        if visibility_timeout is None:
+            visibility_timeout = self.visibility_timeout
         
-        logger.debug(f"Nachricht aus Queue geholt: {job['id']}")
-        return job
+        cutoff = time.time() - visibility_timeout
+        expired_ids = self.redis_client.zrangebyscore(self.processing_index, '-inf', cutoff, start=0, num=limit)
+        if not expired_ids:
+            return 0
+        
+        error = f"Visibility-Timeout von {visibility_timeout} Sekunden überschritten"
+        reclaimed = self.mark_many_failed([(job_id, error) for job_id in expired_ids])
+        # Index-Einträge ohne Nachricht im Processing-Hash würden sonst bei jedem Aufruf erneut gelesen
+        self._remove_stale_index_script(keys=[self.processing_queue, self.processing_index], args=expired_ids)
+        
+        if reclaimed:
+            self.redis_client.hincrby(self.stats_key, 'total_reclaimed', reclaimed)
+            logger.warning(f"{reclaimed} verwaiste Nachrichten aus der Verarbeitung zurückgeholt")
+        return reclaimed
     
     def mark_as_completed(self, job_id: str, result: Dict[str, Any]) -> None:
         """
@@ -135,43 +1049,131 @@ class RedisMessageQueue:
             job_id: Die ID der Nachricht
             result: Das Ergebnis der Verarbeitung
         """
-        # Hole die Nachricht aus der Verarbeitungs-Queue
-        job_json = self.redis_client.hget(self.processing_queue, job_id)
+        self.mark_many_completed([(job_id, result)])
+    
+    def mark_many_completed(self, results: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Markiere mehrere Nachrichten als erfolgreich verarbeitet
         
-        if not job_json:
-            logger.warning(f"Nachricht nicht in der Verarbeitungs-Queue gefunden: {job_id}")
+        Liest alle Nachrichten mit einem Roundtrip und schreibt Ergebnisse und
+        Statistiken atomar mit einem Lua-Skript (OWNED_JOBS_SCRIPT). Nachrichten,
+        die inzwischen der Reaper übernommen hat, bleiben dabei unverändert. Die
+        Statistiken werden serverseitig inkrementiert (Summe, Anzahl,
+        Latenz-Histogramm), damit parallele Worker sich nicht gegenseitig überschreiben.
+        
+        Args:
+            results: Liste von (Job-ID, Ergebnis)-Tupeln
+        """
+        if not results:
             return
+        
+        # Hole die Nachrichten und ihre Startzeitpunkte aus der Verarbeitung
+        job_ids = [job_id for job_id, _ in results]
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hmget(self.processing_queue, job_ids)
+        pipe.zmscore(self.processing_index, job_ids)
+        job_jsons, started_times = pipe.execute()
+        
+        now = time.time()
+        processing_times = {}
+        owned = self._owned_job_commands()
+        
+        for (job_id, result), job_json, started in zip(results, job_jsons, started_times):
+            if not job_json:
+                logger.warning(f"Nachricht nicht in der Verarbeitungs-Queue gefunden: {job_id}")
+                continue
+            
+            job = self._decode(job_json)
+            pipe = owned.job(job_id, job_json)
             
-        job = json.loads(job_json)
+            # Berechne die Verarbeitungszeit
+            if started is None:
+                started = job.get('processing_started', now)
+            job['processing_started'] = started
+            processing_time = now - started
+            
+            # Aktualisiere die Nachricht
+            job['status'] = 'completed'
+            job['completed_at'] = now
+            job['processing_time'] = processing_time
+            job['result'] = result
+            
+            # Speichere das Ergebnis in der Ergebnisliste und entferne die Nachricht aus der Verarbeitungs-Queue
+            self._store_result(pipe, self._encode(job))
+            self._release_job(pipe, job)
+            
+            # Statistiken je Nachricht, da erst das Skript entscheidet, welche Nachrichten abgeschlossen werden
+            pipe.hincrby(self.stats_key, 'total_processed', 1)
+            pipe.hincrby(self.stats_key, 'processing_time_count', 1)
+            pipe.hincrbyfloat(self.stats_key, 'processing_time_sum', processing_time)
+            pipe.hincrby(self.latency_key, self._latency_bucket(processing_time), 1)
+            processing_times[job_id] = processing_time
+        
+        handled = set(owned.execute())
+        for job_id, processing_time in processing_times.items():
+            if job_id in handled:
+                logger.info(f"Nachricht erfolgreich verarbeitet: {job_id}, Zeit: {processing_time:.2f}s")
+            else:
+                logger.warning(f"Nachricht wurde inzwischen anderweitig abgeschlossen, Ergebnis verworfen: {job_id}")
+    
+    @staticmethod
+    def _latency_bucket(processing_time: float) -> str:
+        """
+        Gibt den Histogramm-Bucket für eine Verarbeitungszeit zurück
+        """
+        for upper_bound in LATENCY_BUCKETS:
+            if processing_time <= upper_bound:
+                return f"le_{upper_bound}"
+        return "le_inf"
+    
+    def get_latency_stats(self) -> Dict[str, Any]:
+        """
+        Gibt das Latenz-Histogramm und daraus geschätzte Perzentile zurück
         
-        # Berechne die Verarbeitungszeit
-        processing_time = time.time() - job.get('processing_started', time.time())
+        Die Perzentile werden innerhalb eines Buckets linear interpoliert. Liegt ein
+        Perzentil im offenen letzten Bucket, wird dessen Untergrenze zurückgegeben.
         
-        # Aktualisiere die Nachricht
-        job['status'] = 'completed'
-        job['completed_at'] = time.time()
-        job['processing_time'] = processing_time
-        job['result'] = result
+        Returns:
+            Dictionary mit 'count', 'buckets' und 'p50'/'p95'/'p99' in Sekunden
+        """
+        raw = self.redis_client.hgetall(self.latency_key)
         
-        # Speichere das Ergebnis in der Ergebnisliste (begrenzt auf 100 Einträge)
-        self.redis_client.lpush(self.results_list, json.dumps(job))
-        self.redis_client.ltrim(self.results_list, 0, 99)  # Behalte nur die letzten 100 Ergebnisse
+        bounds = LATENCY_BUCKETS + [float('inf')]
+        names = [f"le_{bound}" for bound in LATENCY_BUCKETS] + ['le_inf']
+        counts = [int(raw.get(name, 0)) for name in names]
+        total = sum(counts)
         
-        # Entferne die Nachricht aus der Verarbeitungs-Queue
-        self.redis_client.hdel(self.processing_queue, job_id)
+        latency = {
+            'count': total,
+            'buckets': dict(zip(names, counts))
+        }
+        
+        for name, quantile in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            latency[name] = self._estimate_quantile(bounds, counts, total, quantile)
         
-        # Aktualisiere Statistiken
-        self.redis_client.hincrby(self.stats_key, 'total_processed', 1)
+        return latency
+    
+    @staticmethod
+    def _estimate_quantile(bounds: List[float], counts: List[int], total: int, quantile: float) -> Optional[float]:
+        """
+        Schätzt ein Perzentil aus Histogramm-Buckets
+        """
+        if total == 0:
+            return None
         
-        # Aktualisiere durchschnittliche Verarbeitungszeit
-        current_avg = float(self.redis_client.hget(self.stats_key, 'processing_time_avg') or 0)
-        processed_count = int(self.redis_client.hget(self.stats_key, 'total_processed') or 1)
+        rank = quantile * total
+        cumulative = 0
+        lower_bound = 0.0
         
-        # Gewichteter Durchschnitt
-        new_avg = ((current_avg * (processed_count - 1)) + processing_time) / processed_count
-        self.redis_client.hset(self.stats_key, 'processing_time_avg', new_avg)
+        for upper_bound, count in zip(bounds, counts):
+            if count and cumulative + count >= rank:
+                if upper_bound == float('inf'):
+                    return lower_bound
+                return lower_bound + (upper_bound - lower_bound) * ((rank - cumulative) / count)
+            cumulative += count
+            lower_bound = upper_bound
         
-        logger.info(f"Nachricht erfolgreich verarbeitet: {job_id}, Zeit: {processing_time:.2f}s")
+        return lower_bound
     
     def mark_as_failed(self, job_id: str, error: str) -> None:
         """
@@ -181,33 +1183,438 @@ class RedisMessageQueue:
             job_id: Die ID der Nachricht
             error: Die Fehlermeldung
         """
-        # Hole die Nachricht aus der Verarbeitungs-Queue
-        job_json = self.redis_client.hget(self.processing_queue, job_id)
+        self.mark_many_failed([(job_id, error)])
+    
+    def mark_many_failed(self, failures: List[Tuple[str, str]]) -> int:
+        """
+        Markiere mehrere Nachrichten als fehlgeschlagen
         
-        if not job_json:
-            logger.warning(f"Nachricht nicht in der Verarbeitungs-Queue gefunden: {job_id}")
-            return
+        Nachrichten mit weniger als max_attempts Versuchen werden mit exponentiell
+        wachsender Wartezeit für einen erneuten Versuch vorgemerkt, alle anderen
+        landen in der Failed-Queue. Alle Änderungen laufen atomar in einem Lua-Skript,
+        das nur Nachrichten behandelt, die noch unverändert in der Verarbeitung stehen.
+        
+        Args:
+            failures: Liste von (Job-ID, Fehlermeldung)-Tupeln
+        
+        Returns:
+            Anzahl der Nachrichten, die in der Verarbeitung gefunden und behandelt wurden
+        """
+        return len(self._fail_jobs(failures))
+    
+    def _fail_jobs(self, failures: List[Tuple[str, str]]) -> List[str]:
+        """
+        Wie mark_many_failed(), gibt aber die IDs der behandelten Nachrichten zurück
+        """
+        if not failures:
+            return []
+        
+        # Hole die Nachrichten aus der Verarbeitungs-Queue
+        job_jsons = self.redis_client.hmget(self.processing_queue, [job_id for job_id, _ in failures])
+        
+        now = time.time()
+        outcomes = {}
+        owned = self._owned_job_commands()
+        
+        for (job_id, error), job_json in zip(failures, job_jsons):
+            if not job_json:
+                logger.warning(f"Nachricht nicht in der Verarbeitungs-Queue gefunden: {job_id}")
+                continue
+            
+            job = self._decode(job_json)
+            pipe = owned.job(job_id, job_json)
+            
+            # Aktualisiere die Nachricht
+            job['status'] = 'failed'
+            job['failed_at'] = now
+            job['error'] = error
+            job['retry_count'] = job.get('retry_count', 0) + 1
+            
+            self._release_job(pipe, job)
             
-        job = json.loads(job_json)
+            # Verschiebe die Nachricht in die Failed-Queue, falls die maximale Anzahl
+            # an Versuchen erreicht ist
+            if job['retry_count'] >= self.max_attempts:
+                job['error_class'] = self.classify_error(error)
+                pipe.hset(self.failed_queue, job_id, self._encode(job))
+                self._index_failed_job(pipe, job)
+                pipe.hincrby(self.stats_key, 'total_failed', 1)
+                outcomes[job_id] = (logging.ERROR, f"Nachricht endgültig fehlgeschlagen: {job_id}, Fehler: {error}")
+            else:
+                # Ansonsten: Erneuter Versuch nach Ablauf der Backoff-Zeit
+                job['next_attempt_at'] = now + self._retry_delay(job['retry_count'])
+                pipe.zadd(self.delayed_queue, {self._encode(job): job['next_attempt_at']})
+                outcomes[job_id] = (logging.WARNING,
+                                    f"Nachricht fehlgeschlagen, wird erneut versucht: {job_id}, Versuch: {job['retry_count']}, "
+                                    f"in {job['next_attempt_at'] - now:.1f}s, Fehler: {error}")
         
-        # Aktualisiere die Nachricht
-        job['status'] = 'failed'
-        job['failed_at'] = time.time()
-        job['error'] = error
-        job['retry_count'] = job.get('retry_count', 0) + 1
-        
-        # Verschiebe die Nachricht in die Failed-Queue, falls die maximale Anzahl
-        # an Wiederholungen erreicht ist (hier: 3)
-        if job['retry_count'] >= 3:
-            self.redis_client.hset(self.failed_queue, job_id, json.dumps(job))
-            self.redis_client.hdel(self.processing_queue, job_id)
-            self.redis_client.hincrby(self.stats_key, 'total_failed', 1)
-            logger.error(f"Nachricht endgültig fehlgeschlagen: {job_id}, Fehler: {error}")
-        else:
-            # Ansonsten: Zurück in die Haupt-Queue für einen erneuten Versuch
-            self.redis_client.hdel(self.processing_queue, job_id)
-            self.redis_client.rpush(self.main_queue, json.dumps(job))
-            logger.warning(f"Nachricht fehlgeschlagen, wird erneut versucht: {job_id}, Versuch: {job['retry_count']}, Fehler: {error}")
+        handled = owned.execute()
+        for job_id, (level, message) in outcomes.items():
+            if job_id in handled:
+                logger.log(level, message)
+            else:
+                logger.warning(f"Nachricht wurde inzwischen anderweitig abgeschlossen, Fehler verworfen: {job_id}")
+        return handled
+    
+    def defer_jobs(self, deferrals: List[Tuple[str, float]]) -> List[Tuple[str, str]]:
+        """
+        Stellt Nachrichten zurück, ohne einen Fehlversuch zu zählen
+        
+        Für Nachrichten, deren Endpunkt gerade nicht erreichbar ist (z.B. offener
+        Circuit Breaker). Die Nachricht wird nach der Wartezeit wie eine fällige
+        Wiederholung wieder eingereiht; ein Zufallsanteil von bis zu 20 % verteilt
+        gleichzeitig zurückgestellte Nachrichten.
+        
+        Nachrichten, die bereits max_deferrals Mal zurückgestellt wurden, werden stattdessen
+        als Fehlversuch behandelt (mark_many_failed), damit sie bei einem dauerhaft
+        ausgefallenen Endpunkt nach max_attempts Versuchen in der Failed-Queue landen.
+        
+        Args:
+            deferrals: Liste von (Job-ID, Wartezeit in Sekunden)-Tupeln
+        
+        Returns:
+            (Job-ID, Fehlermeldung) der Nachrichten, die statt zurückgestellt als
+            fehlgeschlagen behandelt wurden (für die Ergebnis-Historie)
+        """
+        if not deferrals:
+            return []
+        
+        job_jsons = self.redis_client.hmget(self.processing_queue, [job_id for job_id, _ in deferrals])
+        
+        now = time.time()
+        owned = self._owned_job_commands()
+        exhausted = []
+        
+        for (job_id, delay), job_json in zip(deferrals, job_jsons):
+            if not job_json:
+                logger.warning(f"Nachricht nicht in der Verarbeitungs-Queue gefunden: {job_id}")
+                continue
+            
+            job = self._decode(job_json)
+            if self.max_deferrals and job.get('deferred_count', 0) >= self.max_deferrals:
+                exhausted.append((job_id, f"Endpunkt nicht erreichbar, {job['deferred_count']} Zurückstellungen überschritten"))
+                continue
+            job['status'] = 'deferred'
+            job['deferred_count'] = job.get('deferred_count', 0) + 1
+            job['next_attempt_at'] = now + delay * random.uniform(1.0, 1.2)
+            
+            pipe = owned.job(job_id, job_json)
+            self._release_job(pipe, job)
+            pipe.zadd(self.delayed_queue, {self._encode(job): job['next_attempt_at']})
+            pipe.hincrby(self.stats_key, 'total_deferred', 1)
+        
+        owned.execute()
+        failed = self._fail_jobs(exhausted)
+        return [(job_id, error) for job_id, error in exhausted if job_id in failed]
+
+    def hand_off_jobs(self, job_ids: List[str]) -> int:
+        """
+        Gibt Nachrichten aus der Verarbeitung an andere Worker zurück
+
+        Für Worker, die sich beim Herunterfahren leeren (Drain): Die Nachrichten werden
+        ohne Fehlversuch und ohne Wartezeit vorne in ihre Lane gestellt, sodass ein
+        anderer Worker sie als Nächstes abholt.
+
+        Args:
+            job_ids: IDs der zurückzugebenden Nachrichten
+
+        Returns:
+            Anzahl der zurückgegebenen Nachrichten
+        """
+        if not job_ids:
+            return 0
+
+        job_jsons = self.redis_client.hmget(self.processing_queue, job_ids)
+
+        owned = self._owned_job_commands()
+
+        for job_id, job_json in zip(job_ids, job_jsons):
+            if not job_json:
+                logger.warning(f"Nachricht nicht in der Verarbeitungs-Queue gefunden: {job_id}")
+                continue
+
+            job = self._decode(job_json)
+            job['status'] = 'queued'
+
+            pipe = owned.job(job_id, job_json)
+            self._release_job(pipe, job)
+            self._push_jobs(pipe, [self._encode(job)], lane=self.normalize_priority(job.get('priority')),
+                            tenant=job.get('tenant'))
+            pipe.hincrby(self.stats_key, 'total_handed_off', 1)
+
+        handed_off = len(owned.execute())
+
+        if handed_off:
+            logger.info(f"{handed_off} Nachrichten an andere Worker übergeben")
+        return handed_off
+
+    def _retry_delay(self, retry_count: int) -> float:
+        """
+        Berechnet die Wartezeit vor dem nächsten Versuch
+        
+        Exponentielles Backoff mit Jitter: Die Hälfte der Wartezeit ist fest, die andere
+        Hälfte zufällig, damit nach einem Ausfall nicht alle Wiederholungen gleichzeitig starten.
+        
+        Args:
+            retry_count: Anzahl der bisherigen Fehlversuche (ab 1)
+        
+        Returns:
+            Wartezeit in Sekunden
+        """
+        delay = min(self.retry_max_delay, self.retry_base_delay * (2 ** (retry_count - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+    
+    def promote_due_jobs(self, limit: int = 500) -> int:
+        """
+        Verschiebt alle fälligen Wiederholungsversuche in die Haupt-Queue
+        
+        Läuft atomar als Lua-Skript, sodass mehrere Worker-Prozesse gleichzeitig
+        verschieben können, ohne Nachrichten doppelt einzureihen.
+        
+        Args:
+            limit: Maximale Anzahl an Nachrichten pro Aufruf
+        
+        Returns:
+            Anzahl der verschobenen Nachrichten
+        """
+        promoted = self._promote_script(keys=self._promote_keys(), args=self._promote_args(limit))
+        if promoted:
+            logger.info(f"{promoted} fällige Wiederholungsversuche in die Queue verschoben")
+        return promoted
+    
+    def _promote_keys(self) -> List[str]:
+        """
+        Gibt die Schlüssel für das Verschiebe-Skript zurück
+        """
+        return [self.delayed_queue, self.notify_key] + [self.lane_keys[lane] for lane in PRIORITY_LANES]
+    
+    def _promote_args(self, limit: int) -> List[Any]:
+        """
+        Gibt die Argumente für das Verschiebe-Skript zurück
+        """
+        return [time.time(), limit] + PRIORITY_LANES
+    
+    def _notify(self, pipe, count: int) -> None:
+        """
+        Weckt bis zu count blockierend wartende Consumer (Teil einer Pipeline)
+        """
+        pipe.lpush(self.notify_key, *(['1'] * count))
+        pipe.ltrim(self.notify_key, 0, 999)
+    
+    def _push_jobs(self, pipe, job_jsons: List[str], lane: str = 'normal', tenant: Optional[str] = None) -> None:
+        """
+        Reiht neue Nachrichten in einer Lane ein (Teil einer Pipeline)
+        """
+        if self.fair_scheduling and tenant:
+            self._fair_push(pipe, lane, tenant, 'LPUSH', job_jsons)
+            return
+        pipe.lpush(self.lane_keys[lane], *job_jsons)
+        self._notify(pipe, len(job_jsons))
+    
+    def _requeue_job(self, pipe, job_json: str, lane: str = 'normal', tenant: Optional[str] = None) -> None:
+        """
+        Stellt eine Nachricht für einen erneuten Versuch ans Ende ihrer Lane (Teil einer Pipeline)
+        """
+        if self.fair_scheduling and tenant:
+            self._fair_push(pipe, lane, tenant, 'RPUSH', [job_json])
+            return
+        pipe.rpush(self.lane_keys[lane], job_json)
+        self._notify(pipe, 1)
+    
+    def _fair_push(self, pipe, lane: str, tenant: str, mode: str, job_jsons: List[str]) -> None:
+        """
+        Reiht Nachrichten in die Liste ihres Tenants ein (Teil einer Pipeline oder von OwnedJobCommands)
+        """
+        if isinstance(pipe, OwnedJobCommands):
+            pipe.fair_push(self.lane_keys[lane], self.notify_key, tenant, mode, job_jsons)
+            return
+        self._fair_push_script(keys=[self.lane_keys[lane], self.notify_key], args=[tenant, mode] + job_jsons,
+                               client=pipe)
+    
+    def _owned_job_commands(self) -> OwnedJobCommands:
+        """
+        Erzeugt einen Sammler für Befehle, die nur für noch in der Verarbeitung stehende Nachrichten ausgeführt werden
+        """
+        return OwnedJobCommands(self._owned_jobs_script, self.processing_queue)
+    
+    def _release_job(self, pipe, job: Dict[str, Any]) -> None:
+        """
+        Entfernt eine abgeschlossene Nachricht aus der Verarbeitung (Teil einer Pipeline)
+        """
+        pipe.hdel(self.processing_queue, job['id'])
+        pipe.zrem(self.processing_index, job['id'])
+        if self.fair_scheduling and job.get('tenant'):
+            pipe.hincrby(self.tenant_active_key, job['tenant'], -1)
+    
+    def _store_result(self, pipe, job_json: str) -> None:
+        """
+        Speichert ein Verarbeitungsergebnis in der Ergebnisliste (Teil einer Pipeline)
+        """
+        pipe.lpush(self.results_list, job_json)
+        pipe.ltrim(self.results_list, 0, 99)  # Behalte nur die letzten 100 Ergebnisse
+    
+    def _lane_depths(self) -> Dict[str, int]:
+        """
+        Gibt die Anzahl der wartenden Nachrichten je Lane zurück
+        """
+        if self.fair_scheduling:
+            return {lane: sum(depths.values()) for lane, depths in self._tenant_depths().items()}
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for lane in PRIORITY_LANES:
+            pipe.llen(self.lane_keys[lane])
+        return dict(zip(PRIORITY_LANES, pipe.execute()))
+    
+    def _tenant_depths(self) -> Dict[str, Dict[str, int]]:
+        """
+        Gibt je Lane die Anzahl wartender Nachrichten je Tenant zurück ('' = Nachrichten ohne Tenant)
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        for lane in PRIORITY_LANES:
+            pipe.lrange(f"{self.lane_keys[lane]}:tenants", 0, -1)
+        rings = dict(zip(PRIORITY_LANES, pipe.execute()))
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for lane in PRIORITY_LANES:
+            pipe.llen(self.lane_keys[lane])
+            for tenant in rings[lane]:
+                pipe.llen(f"{self.lane_keys[lane]}:tenant:{tenant}")
+        lengths = iter(pipe.execute())
+        
+        depths = {}
+        for lane in PRIORITY_LANES:
+            depths[lane] = {'': next(lengths)}
+            for tenant in rings[lane]:
+                depths[lane][tenant] = next(lengths)
+        return depths
+    
+    def get_tenant_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Gibt wartende und aktive Nachrichten je Tenant zurück (nur Fair Scheduling)
+        
+        Returns:
+            Ein Dictionary Tenant -> {'pending', 'active', 'lanes'}
+        """
+        tenants: Dict[str, Dict[str, Any]] = {}
+        for lane, depths in self._tenant_depths().items():
+            for tenant, depth in depths.items():
+                if not tenant or not depth:
+                    continue
+                entry = tenants.setdefault(tenant, {'pending': 0, 'active': 0, 'lanes': {}})
+                entry['pending'] += depth
+                entry['lanes'][lane] = depth
+        
+        for tenant, active in self.redis_client.hgetall(self.tenant_active_key).items():
+            if int(active) > 0:
+                tenants.setdefault(tenant, {'pending': 0, 'active': 0, 'lanes': {}})['active'] = int(active)
+        return tenants
+    
+    def get_lane_stats(self, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Gibt Tiefe und durchschnittliche Wartezeit je Lane zurück
+        
+        Args:
+            stats: Bereits gelesener Statistik-Hash (optional, spart einen Roundtrip)
+        
+        Returns:
+            Ein Dictionary mit einem Eintrag je Lane
+        """
+        if stats is None:
+            stats = self.redis_client.hgetall(self.stats_key)
+        
+        lanes = {}
+        for lane, depth in self._lane_depths().items():
+            count = int(float(stats.get(f'wait_time_count:{lane}', 0)))
+            wait_sum = float(stats.get(f'wait_time_sum:{lane}', 0))
+            lanes[lane] = {
+                'depth': depth,
+                'dequeued': count,
+                'wait_time_avg': wait_sum / count if count else 0
+            }
+        return lanes
+    
+    def report_worker_health(self, worker_id: str, status: Dict[str, Any]) -> None:
+        """
+        Speichert den aktuellen Status eines Worker-Prozesses (Heartbeat)
+        
+        Args:
+            worker_id: Eindeutige ID des Prozesses
+            status: Status-Informationen des Prozesses
+        """
+        entry = dict(status, worker_id=worker_id, reported_at=time.time())
+        self.redis_client.hset(self.worker_health_key, worker_id, json.dumps(entry))
+    
+    def remove_worker_health(self, worker_id: str) -> None:
+        """
+        Entfernt den Heartbeat eines beendeten Worker-Prozesses
+        """
+        self.redis_client.hdel(self.worker_health_key, worker_id)
+    
+    def get_worker_health(self, max_age: float = 30.0) -> List[Dict[str, Any]]:
+        """
+        Gibt die letzten Heartbeats aller Worker-Prozesse zurück
+        
+        Einträge, die älter als max_age Sekunden sind, werden als 'stale' markiert.
+        Einträge, die älter als das Zehnfache sind, stammen von Prozessen, die es
+        nicht mehr gibt, und werden entfernt.
+        
+        Args:
+            max_age: Maximales Alter eines Heartbeats in Sekunden
+        
+        Returns:
+            Liste der Prozess-Status, sortiert nach worker_id
+        """
+        now = time.time()
+        processes = []
+        expired = []
+        for worker_id, entry_json in self.redis_client.hgetall(self.worker_health_key).items():
+            try:
+                entry = json.loads(entry_json)
+            except ValueError:
+                expired.append(worker_id)
+                continue
+            entry['age'] = round(now - entry.get('reported_at', 0), 3)
+            if entry['age'] > max_age * 10:
+                expired.append(worker_id)
+                continue
+            entry['stale'] = entry['age'] > max_age
+            processes.append(entry)
+        if expired:
+            self.redis_client.hdel(self.worker_health_key, *expired)
+        return sorted(processes, key=lambda entry: entry['worker_id'])
+    
+    def get_recent_results(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Gibt die zuletzt abgeschlossenen Nachrichten zurück (neueste zuerst)
+        
+        Args:
+            limit: Maximale Anzahl an Ergebnissen
+        
+        Returns:
+            Liste der abgeschlossenen Nachrichten
+        """
+        results_json = self.redis_client.lrange(self.results_list, 0, limit - 1)
+        return [self._decode(result) for result in results_json if result]
+    
+    def get_processing_messages(self) -> List[Dict[str, Any]]:
+        """
+        Gibt alle Nachrichten zurück, die gerade verarbeitet werden
+        
+        Returns:
+            Liste der Nachrichten in Bearbeitung
+        """
+        processing = self.redis_client.hgetall(self.processing_queue)
+        started_times = dict(self.redis_client.zrange(self.processing_index, 0, -1, withscores=True))
+        
+        jobs = []
+        for job_id, job_json in processing.items():
+            if not job_json:
+                continue
+            job = self._decode(job_json)
+            job['status'] = 'processing'
+            job.setdefault('processing_started', started_times.get(job_id))
+            jobs.append(job)
+        return jobs
     
     def retry_failed_message(self, job_id: str) -> bool:
         """
@@ -226,18 +1633,20 @@ class RedisMessageQueue:
             logger.warning(f"Nachricht nicht in der Failed-Queue gefunden: {job_id}")
             return False
             
-        job = json.loads(job_json)
+        job = self._decode(job_json)
         
         # Aktualisiere die Nachricht
         job['status'] = 'pending'
         job['retry_count'] = 0  # Zurücksetzen für einen Neustart
         
-        # Verschiebe die Nachricht zurück in die Haupt-Queue
-        self.redis_client.hdel(self.failed_queue, job_id)
-        self.redis_client.rpush(self.main_queue, json.dumps(job))
-        
-        # Aktualisiere Statistiken
-        self.redis_client.hincrby(self.stats_key, 'total_failed', -1)
+        # Verschiebe die Nachricht zurück in ihre Lane und aktualisiere Statistiken
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hdel(self.failed_queue, job_id)
+        self._unindex_failed_job(pipe, job)
+        self._requeue_job(pipe, self._encode(job), lane=self.normalize_priority(job.get('priority')),
+                          tenant=job.get('tenant'))
+        pipe.hincrby(self.stats_key, 'total_failed', -1)
+        pipe.execute()
         
         logger.info(f"Fehlgeschlagene Nachricht wird erneut versucht: {job_id}")
         return True
@@ -249,58 +1658,229 @@ class RedisMessageQueue:
         Returns:
             Ein Dictionary mit Informationen über den Queue-Status
         """
-        pending_count = self.redis_client.llen(self.main_queue)
+        delayed_count = self.redis_client.zcard(self.delayed_queue)
         processing_count = self.redis_client.hlen(self.processing_queue)
-        failed_count = self.redis_client.hlen(self.failed_queue)
+        failed_count = self.get_failed_count()
         
         # Hole Statistiken
         stats = self.redis_client.hgetall(self.stats_key)
+        lanes = self.get_lane_stats(stats)
+        pending_count = sum(lane['depth'] for lane in lanes.values())
         
         # Konvertiere String-Werte in Zahlen
         for key in stats:
             try:
                 stats[key] = float(stats[key])
-                if key != 'processing_time_avg':  # Durchschnittszeit bleibt Float
+                if key not in ('processing_time_avg', 'processing_time_sum') and not key.startswith('wait_time_sum:'):  # Zeiten bleiben Float
                     stats[key] = int(stats[key])
             except (ValueError, TypeError):
                 pass
         
-        return {
+        # Durchschnitt aus serverseitig geführter Summe und Anzahl ableiten
+        if stats.get('processing_time_count'):
+            stats['processing_time_avg'] = stats.get('processing_time_sum', 0) / stats['processing_time_count']
+        
+        status = {
             'pending_count': pending_count,
+            'delayed_count': delayed_count,
             'processing_count': processing_count,
             'failed_count': failed_count,
-            'stats': stats
+            'lanes': lanes,
+            'stats': stats,
+            'latency': self.get_latency_stats()
         }
+        if self.fair_scheduling:
+            status['tenants'] = self.get_tenant_stats()
+        return status
     
     def get_failed_messages(self) -> List[Dict[str, Any]]:
         """
         Gibt alle fehlgeschlagenen Nachrichten zurück
         
+        Für Dashboards und Status-Endpunkte get_failed_messages_page() verwenden.
+        
         Returns:
             Eine Liste mit allen fehlgeschlagenen Nachrichten
         """
-        failed_jobs = []
+        return [self._decode(job_json) for _, job_json in self.redis_client.hscan_iter(self.failed_queue, count=500)
+                if job_json]
+    
+    def get_failed_count(self) -> int:
+        """
+        Gibt die Anzahl der fehlgeschlagenen Nachrichten zurück
+        """
+        return self.redis_client.hlen(self.failed_queue)
+    
+    @staticmethod
+    def classify_error(error: Optional[str]) -> str:
+        """
+        Ordnet eine Fehlermeldung einer Fehlerklasse zu
         
-        # Hole alle Schlüssel aus der Failed-Queue
-        failed_ids = self.redis_client.hkeys(self.failed_queue)
+        Args:
+            error: Die Fehlermeldung
         
-        # Hole für jeden Schlüssel die Nachricht
-        for job_id in failed_ids:
-            job_json = self.redis_client.hget(self.failed_queue, job_id)
-            if job_json:
-                failed_jobs.append(json.loads(job_json))
+        Returns:
+            Name der Fehlerklasse (siehe ERROR_CLASSES) oder 'other'
+        """
+        if not error:
+            return 'other'
+        for error_class, markers in ERROR_CLASSES:
+            if any(marker in error for marker in markers):
+                return error_class
+        return 'other'
+    
+    def _failed_index_keys(self, job: Dict[str, Any]) -> List[str]:
+        """
+        Gibt alle Indizes zurück, in denen eine fehlgeschlagene Nachricht geführt wird
+        """
+        keys = [self.failed_index, f"{self.failed_index}:error:{job.get('error_class', 'other')}"]
+        if job.get('gateway_id'):
+            keys.append(f"{self.failed_index}:gateway:{job['gateway_id']}")
+        return keys
+    
+    def _index_failed_job(self, pipe, job: Dict[str, Any]) -> None:
+        """
+        Nimmt eine fehlgeschlagene Nachricht in die Indizes auf (Teil einer Pipeline)
+        """
+        for key in self._failed_index_keys(job):
+            pipe.zadd(key, {job['id']: job.get('failed_at', 0)})
+    
+    def _unindex_failed_job(self, pipe, job: Dict[str, Any]) -> None:
+        """
+        Entfernt eine fehlgeschlagene Nachricht aus den Indizes (Teil einer Pipeline)
+        """
+        for key in self._failed_index_keys(job):
+            pipe.zrem(key, job['id'])
+    
+    def get_failed_messages_page(self, cursor: Optional[str] = None, limit: int = 50, gateway_id: Optional[str] = None,
+                                 error_class: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Gibt eine Seite fehlgeschlagener Nachrichten zurück (neueste zuerst)
+        
+        Die Seite wird über den zeitlich sortierten Index bestimmt und mit einem
+        HMGET geladen, der Aufwand hängt also von der Seitengröße ab und nicht von
+        der Anzahl fehlgeschlagener Nachrichten.
+        
+        Args:
+            cursor: next_cursor der vorherigen Seite (None = erste Seite)
+            limit: Maximale Anzahl an Nachrichten
+            gateway_id: Nur Nachrichten dieses Gateways
+            error_class: Nur Nachrichten dieser Fehlerklasse
+        
+        Returns:
+            Dictionary mit 'messages', 'next_cursor' (None auf der letzten Seite) und 'total'
+        """
+        limit = max(1, min(limit, 500))
+        
+        if gateway_id:
+            index_key = f"{self.failed_index}:gateway:{gateway_id}"
+        elif error_class:
+            index_key = f"{self.failed_index}:error:{error_class}"
+        else:
+            index_key = self.failed_index
+        # Bei beiden Filtern wird der Gateway-Index gelesen und nach Fehlerklasse gefiltert
+        filter_class = error_class if gateway_id else None
+        
+        messages = []
+        stale_ids = []
+        position = self._parse_failed_cursor(cursor)
+        next_cursor = None
+        
+        while len(messages) < limit:
+            entries = self._failed_index_after(index_key, position, limit - len(messages) + 1)
+            if not entries:
+                next_cursor = None
+                break
+            
+            has_more = len(entries) > limit - len(messages)
+            entries = entries[:limit - len(messages)]
+            job_jsons = self.redis_client.hmget(self.failed_queue, [job_id for job_id, _ in entries])
+            
+            for (job_id, score), job_json in zip(entries, job_jsons):
+                if not job_json:
+                    stale_ids.append(job_id)
+                    continue
+                job = self._decode(job_json)
+                if filter_class and job.get('error_class', 'other') != filter_class:
+                    continue
+                messages.append(job)
+            
+            position = entries[-1][::-1]
+            if not has_more:
+                next_cursor = None
+                break
+            next_cursor = f"{position[0]!r}:{position[1]}"
+        
+        # Indexeinträge ohne Nachricht (z.B. nach manuellem Löschen) aufräumen
+        if stale_ids:
+            self.redis_client.zrem(index_key, *stale_ids)
+        
+        return {
+            'messages': messages,
+            'next_cursor': next_cursor,
+            'total': self.redis_client.zcard(index_key)
+        }
+    
+    @staticmethod
+    def _parse_failed_cursor(cursor: Optional[str]) -> Optional[Tuple[float, str]]:
+        """
+        Zerlegt einen Cursor der Form '<failed_at>:<job_id>'
+        """
+        if not cursor:
+            return None
+        try:
+            score, job_id = cursor.split(':', 1)
+            return float(score), job_id
+        except ValueError:
+            raise ValueError(f"Ungültiger Cursor: {cursor}")
+    
+    def _failed_index_after(self, index_key: str, position: Optional[Tuple[float, str]], count: int) -> List[Tuple[str, float]]:
+        """
+        Liest bis zu count Indexeinträge, die in absteigender Reihenfolge nach position liegen
         
-        return failed_jobs
+        Einträge mit gleichem Zeitstempel (z.B. aus einem Batch) sind nach Job-ID
+        absteigend sortiert; ihr Anteil wird gesondert gelesen, damit beim Blättern
+        keine Nachricht übersprungen oder doppelt geliefert wird.
+        """
+        if position is None:
+            return self.redis_client.zrevrangebyscore(index_key, '+inf', '-inf', start=0, num=count, withscores=True)
+        
+        score, last_id = position
+        ties = [(job_id, tie_score) for job_id, tie_score in
+                self.redis_client.zrevrangebyscore(index_key, score, score, withscores=True) if job_id < last_id]
+        entries = ties[:count]
+        if len(entries) < count:
+            entries += self.redis_client.zrevrangebyscore(index_key, f"({score!r}", '-inf', start=0,
+                                                          num=count - len(entries), withscores=True)
+        return entries
     
     def clear_all_queues(self) -> None:
         """
         Löscht alle Queues (nur für Tests und Resets)
         """
-        self.redis_client.delete(self.main_queue)
+        self.redis_client.delete(*self.lane_keys.values())
+        tenant_keys = [key for lane_key in self.lane_keys.values()
+                       for key in self.redis_client.scan_iter(match=f"{lane_key}:tenant*")]
+        tenant_keys += [f"{lane_key}:deficit" for lane_key in self.lane_keys.values()]
+        self.redis_client.delete(self.tenant_active_key, *tenant_keys)
+        self.redis_client.delete(self.notify_key)
         self.redis_client.delete(self.processing_queue)
+        self.redis_client.delete(self.processing_index)
+        self.redis_client.delete(self.inflight_registry)
         self.redis_client.delete(self.failed_queue)
+        failed_index_keys = list(self.redis_client.scan_iter(match=f"{self.failed_index}*"))
+        if failed_index_keys:
+            self.redis_client.delete(*failed_index_keys)
+        self.redis_client.delete(self.delayed_queue)
         self.redis_client.delete(self.results_list)
         self.redis_client.delete(self.stats_key)
+        self.redis_client.delete(self.latency_key)
+        self.redis_client.delete(self.config_key)
+        self.redis_client.delete(self.worker_health_key)
+        dedup_keys = list(self.redis_client.scan_iter(match=f"{self.dedup_prefix}:*"))
+        if dedup_keys:
+            self.redis_client.delete(*dedup_keys)
+        self._config_cache.clear()
         
         # Initialisiere Stats neu
         self.redis_client.hset(self.stats_key, mapping={
@@ -313,16 +1893,338 @@ class RedisMessageQueue:
         logger.warning("Alle Queues wurden gelöscht!")
 
 
+class RedisStreamMessageQueue(RedisMessageQueue):
+    """
+    Message Queue auf Basis von Redis Streams mit Consumer Groups
+    
+    Bietet dieselbe Schnittstelle wie RedisMessageQueue, verteilt die Nachrichten
+    aber über XREADGROUP an beliebig viele Worker-Prozesse oder Hosts. Jede
+    Nachricht wird genau einem Consumer zugestellt und erst mit XACK quittiert.
+    Nachrichten, die länger als reclaim_idle Sekunden unquittiert bei einem
+    Consumer liegen (z.B. nach einem Absturz), übernimmt ein anderer Consumer per
+    XAUTOCLAIM. Haupt- und Ergebnis-Stream werden per MAXLEN begrenzt.
+    """
+    
+    promote_script = STREAM_PROMOTE_DUE_JOBS_SCRIPT
+    
+    def __init__(self, host='localhost', port=6379, db=0, password=None, prefix='iot_gateway',
+                 block_timeout: float = 0, visibility_timeout: float = 300.0, max_attempts: int = 3,
+                 retry_base_delay: float = 2.0, retry_max_delay: float = 300.0, lane_mode: str = 'strict',
+                 lane_weights: Optional[Dict[str, int]] = None, codec: str = 'json',
+                 config_by_reference: bool = True, dedup_window: int = 300, group: str = 'workers', reclaim_idle: float = 60.0,
+                 maxlen: int = 100000, results_maxlen: int = 10000, fair_scheduling: bool = False,
+                 tenant_concurrency: int = 0, tenant_quantum: int = 1, max_deferrals: int = 100):
+        """
+        Initialisiere die Redis-Verbindung und die Consumer Group
+        
+        Args:
+            host: Redis Host
+            port: Redis Port
+            db: Redis DB Index
+            password: Redis Passwort (optional)
+            prefix: Präfix für Redis-Schlüssel
+            block_timeout: Standard-Wartezeit in Sekunden für blockierendes Abholen (0 = nicht blockierend)
+            visibility_timeout: Sekunden, nach denen eine Nachricht in Bearbeitung als verwaist gilt
+            max_attempts: Maximale Anzahl an Verarbeitungsversuchen
+            retry_base_delay: Wartezeit vor dem ersten Wiederholungsversuch in Sekunden
+            retry_max_delay: Obergrenze der Wartezeit zwischen zwei Versuchen in Sekunden
+            lane_mode: Wird ignoriert, der Stream kennt keine Prioritäts-Lanes
+            lane_weights: Wird ignoriert, der Stream kennt keine Prioritäts-Lanes
+            codec: Kodierung der Jobs ('json' oder 'orjson')
+            config_by_reference: Kundenkonfiguration per Referenz statt vollständig im Job
+            dedup_window: Sekunden, in denen doppelte Nachrichten eines Gateways verworfen werden
+            group: Name der Consumer Group
+            reclaim_idle: Sekunden, nach denen unquittierte Nachrichten neu zugestellt werden
+            maxlen: Ungefähre Maximallänge des Nachrichten-Streams
+            results_maxlen: Ungefähre Maximallänge des Ergebnis-Streams
+            fair_scheduling: Wird nicht unterstützt, der Stream stellt in Eingangsreihenfolge zu
+            tenant_concurrency: Wird ignoriert
+            tenant_quantum: Wird ignoriert
+            max_deferrals: Maximale Anzahl an Zurückstellungen, danach zählt jede weitere als Fehlversuch
+        """
+        if fair_scheduling:
+            logger.warning("Fair Scheduling wird vom Stream-Backend nicht unterstützt und ist deaktiviert")
+        super().__init__(host, port, db, password, prefix, block_timeout=block_timeout,
+                         visibility_timeout=visibility_timeout, max_attempts=max_attempts,
+                         retry_base_delay=retry_base_delay, retry_max_delay=retry_max_delay,
+                         lane_mode=lane_mode, lane_weights=lane_weights, codec=codec,
+                         config_by_reference=config_by_reference, dedup_window=dedup_window,
+                         max_deferrals=max_deferrals)
+        self.stream_key = f"{prefix}:stream:messages"
+        self.results_stream = f"{prefix}:stream:results"
+        self.group = group
+        self.reclaim_idle = reclaim_idle
+        self.maxlen = maxlen
+        self.results_maxlen = results_maxlen
+        
+        # XAUTOCLAIM nicht bei jedem Abruf, sondern höchstens alle reclaim_interval Sekunden
+        self.reclaim_interval = max(1.0, reclaim_idle / 2)
+        self._last_reclaim = 0.0
+        self._reclaim_cursor = '0-0'
+        
+        self._ensure_group()
+        logger.info(f"Redis Stream Queue initialisiert: Stream {self.stream_key}, Gruppe {group}")
+    
+    def _ensure_group(self) -> None:
+        """
+        Legt Stream und Consumer Group an, falls sie noch nicht existieren
+        """
+        try:
+            self.redis_client.xgroup_create(self.stream_key, self.group, id='0', mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+    
+    def _push_jobs(self, pipe, job_jsons: List[str], lane: str = 'normal', tenant: Optional[str] = None) -> None:
+        # Alle Lanes teilen sich einen Stream; die Priorität bleibt nur im Job vermerkt
+        for job_json in job_jsons:
+            pipe.xadd(self.stream_key, {'job': job_json}, maxlen=self.maxlen, approximate=True)
+    
+    def _requeue_job(self, pipe, job_json: str, lane: str = 'normal', tenant: Optional[str] = None) -> None:
+        # Ein Stream kennt kein "vorne" und "hinten": neue Zustellung als neuer Eintrag
+        self._push_jobs(pipe, [job_json], lane=lane)
+    
+    def _release_job(self, pipe, job: Dict[str, Any]) -> None:
+        super()._release_job(pipe, job)
+        if job.get('stream_id'):
+            pipe.xack(self.stream_key, self.group, job['stream_id'])
+    
+    def _promote_keys(self) -> List[str]:
+        return [self.delayed_queue, self.stream_key]
+    
+    def _promote_args(self, limit: int) -> List[Any]:
+        return [time.time(), limit, self.maxlen]
+    
+    def _store_result(self, pipe, job_json: str) -> None:
+        pipe.xadd(self.results_stream, {'job': job_json}, maxlen=self.results_maxlen, approximate=True)
+    
+    def _lane_depths(self) -> Dict[str, int]:
+        for group in self.redis_client.xinfo_groups(self.stream_key):
+            if group.get('name') == self.group:
+                # 'lag' gibt es ab Redis 7; ältere Versionen liefern nur die Stream-Länge als Obergrenze
+                lag = group.get('lag')
+                return {'normal': int(lag) if lag is not None else self.redis_client.xlen(self.stream_key)}
+        return {'normal': 0}
+    
+    def get_next_messages(self, count: int, block_timeout: Optional[float] = None, consumer_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Hole bis zu count Nachrichten über die Consumer Group
+        
+        Übernimmt zuerst verwaiste Nachrichten anderer Consumer (XAUTOCLAIM) und
+        liest danach neue Nachrichten (XREADGROUP).
+        
+        Args:
+            count: Maximale Anzahl an Nachrichten
+            block_timeout: Maximale Wartezeit in Sekunden, falls keine Nachricht vorliegt
+                           (None = Standardwert der Queue, 0 = nicht blockieren)
+            consumer_id: Name des Consumers innerhalb der Gruppe
+        
+        Returns:
+            Liste der abgeholten Nachrichten (leer, wenn keine vorliegen)
+        """
+        if count <= 0:
+            return []
+        
+        if block_timeout is None:
+            block_timeout = self.block_timeout
+        
+        consumer = consumer_id or 'default'
+        entries = self._reclaim_idle_entries(consumer, count)
+        
+        remaining = count - len(entries)
+        if remaining > 0:
+            block_ms = int(block_timeout * 1000) if block_timeout and block_timeout > 0 and not entries else None
+            response = self.redis_client.xreadgroup(
+                self.group, consumer, {self.stream_key: '>'}, count=remaining, block=block_ms
+            )
+            for _, stream_entries in response or []:
+                entries.extend(stream_entries)
+        
+        if not entries:
+            return []
+        
+        jobs = self._claim_entries(entries)
+        
+        logger.debug(f"{len(jobs)} Nachrichten aus Stream geholt: {[job['id'] for job in jobs]}")
+        return jobs
+    
+    def _reclaim_idle_entries(self, consumer: str, count: int) -> List[Tuple[str, Dict[str, str]]]:
+        """
+        Übernimmt Nachrichten, die zu lange unquittiert bei anderen Consumern liegen
+        
+        Args:
+            consumer: Name des übernehmenden Consumers
+            count: Maximale Anzahl an Nachrichten
+        
+        Returns:
+            Liste von (Stream-ID, Felder)-Tupeln
+        """
+        now = time.time()
+        if now - self._last_reclaim < self.reclaim_interval:
+            return []
+        self._last_reclaim = now
+        
+        response = self.redis_client.xautoclaim(
+            self.stream_key, self.group, consumer,
+            min_idle_time=int(self.reclaim_idle * 1000),
+            start_id=self._reclaim_cursor,
+            count=count
+        )
+        self._reclaim_cursor = response[0]
+        claimed = [(entry_id, fields) for entry_id, fields in response[1] if fields]
+        
+        # Einträge, die per MAXLEN bereits entfernt wurden, können nur noch quittiert werden
+        deleted_ids = list(response[2]) if len(response) > 2 else []
+        deleted_ids += [entry_id for entry_id, fields in response[1] if not fields]
+        if deleted_ids:
+            self.redis_client.xack(self.stream_key, self.group, *deleted_ids)
+            logger.warning(f"{len(deleted_ids)} verwaiste Stream-Einträge ohne Daten quittiert")
+        
+        if claimed:
+            logger.warning(f"{len(claimed)} verwaiste Nachrichten von anderen Consumern übernommen")
+            self.redis_client.hincrby(self.stats_key, 'total_reclaimed', len(claimed))
+        return claimed
+    
+    def _claim_entries(self, entries: List[Tuple[str, Dict[str, str]]]) -> List[Dict[str, Any]]:
+        """
+        Registriert zugestellte Stream-Einträge im Processing-Hash
+        
+        Args:
+            entries: Liste von (Stream-ID, Felder)-Tupeln
+        
+        Returns:
+            Die Nachrichten als Dictionaries
+        """
+        jobs = []
+        processing = {}
+        started = time.time()
+        
+        for entry_id, fields in entries:
+            job = self._decode(fields['job'])
+            job['status'] = 'processing'
+            job['processing_started'] = started
+            job['stream_id'] = entry_id
+            
+            processing[job['id']] = self._encode(job)
+            jobs.append(job)
+        
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset(self.processing_queue, mapping=processing)
+        pipe.zadd(self.processing_index, {job_id: started for job_id in processing})
+        self._record_wait_times(pipe, jobs, started)
+        pipe.execute()
+        
+        self._resolve_customer_configs(jobs)
+        return jobs
+    
+    def recover_inflight_messages(self, consumer_id: Optional[str] = None) -> int:
+        """
+        Streams benötigen keine Inflight-Listen: Nicht quittierte Nachrichten bleiben
+        in der Pending Entries List der Gruppe und werden per XAUTOCLAIM übernommen.
+        """
+        return 0
+    
+    def recover_abandoned_inflight(self, max_idle: Optional[float] = None, limit: int = 100) -> int:
+        """
+        Verwaiste Nachrichten anderer Consumer übernimmt get_next_messages() per XAUTOCLAIM
+        """
+        return 0
+    
+    def get_recent_results(self, limit: int = 100) -> List[Dict[str, Any]]:
+        entries = self.redis_client.xrevrange(self.results_stream, count=limit)
+        return [self._decode(fields['job']) for _, fields in entries if fields.get('job')]
+    
+    def get_queue_status(self) -> Dict[str, Any]:
+        """
+        Gibt den Status der Queue inklusive Consumer-Group-Informationen zurück
+        
+        Returns:
+            Ein Dictionary mit Informationen über den Queue-Status
+        """
+        status = super().get_queue_status()
+        
+        group_info = {}
+        for group in self.redis_client.xinfo_groups(self.stream_key):
+            if group.get('name') == self.group:
+                group_info = group
+                break
+        
+        status['stream'] = {
+            'length': self.redis_client.xlen(self.stream_key),
+            'group': self.group,
+            'consumers': group_info.get('consumers', 0),
+            'unacknowledged': group_info.get('pending', 0),
+            'results_length': self.redis_client.xlen(self.results_stream)
+        }
+        return status
+    
+    def clear_all_queues(self) -> None:
+        """
+        Löscht alle Queues und Streams (nur für Tests und Resets)
+        """
+        self.redis_client.delete(self.stream_key)
+        self.redis_client.delete(self.results_stream)
+        super().clear_all_queues()
+        self._ensure_group()
+
+
 # Singleton-Instanz für die Anwendung
 message_queue = None
 
-def init_message_queue(host='localhost', port=6379, db=0, password=None, prefix='iot_gateway'):
+def _parse_lane_weights(value: str) -> Dict[str, int]:
+    """
+    Liest Lane-Gewichte im Format 'critical=8,high=4,normal=2,bulk=1'
+    """
+    weights = {}
+    for item in value.split(','):
+        if '=' in item:
+            lane, weight = item.split('=', 1)
+            weights[lane.strip()] = int(weight)
+    return weights
+
+def init_message_queue(host='localhost', port=6379, db=0, password=None, prefix='iot_gateway', block_timeout=None,
+                       backend=None):
     """
     Initialisiere die Message Queue als Singleton
+    
+    Args:
+        backend: 'list' (Standard) oder 'stream' für Redis Streams mit Consumer Groups
     """
     global message_queue
     if message_queue is None:
-        message_queue = RedisMessageQueue(host, port, db, password, prefix)
+        if block_timeout is None:
+            block_timeout = float(os.environ.get('REDIS_BLOCK_TIMEOUT', 1.0))
+        queue_options = {
+            'visibility_timeout': float(os.environ.get('QUEUE_VISIBILITY_TIMEOUT', 300)),
+            'max_attempts': int(os.environ.get('QUEUE_MAX_ATTEMPTS', 3)),
+            'max_deferrals': int(os.environ.get('QUEUE_MAX_DEFERRALS', 100)),
+            'retry_base_delay': float(os.environ.get('QUEUE_RETRY_BASE_DELAY', 2.0)),
+            'retry_max_delay': float(os.environ.get('QUEUE_RETRY_MAX_DELAY', 300)),
+            'lane_mode': os.environ.get('QUEUE_LANE_MODE', 'strict'),
+            'lane_weights': _parse_lane_weights(os.environ.get('QUEUE_LANE_WEIGHTS', '')),
+            'codec': os.environ.get('QUEUE_JOB_CODEC', 'json'),
+            'config_by_reference': os.environ.get('QUEUE_CONFIG_BY_REFERENCE', 'true').lower() == 'true',
+            'dedup_window': int(os.environ.get('QUEUE_DEDUP_WINDOW', 300)),
+            'fair_scheduling': os.environ.get('QUEUE_FAIR_SCHEDULING', 'false').lower() == 'true',
+            'tenant_concurrency': int(os.environ.get('QUEUE_TENANT_CONCURRENCY', 0)),
+            'tenant_quantum': int(os.environ.get('QUEUE_TENANT_QUANTUM', 1))
+        }
+        if backend is None:
+            backend = os.environ.get('QUEUE_BACKEND', 'list')
+        
+        if backend == 'stream':
+            message_queue = RedisStreamMessageQueue(
+                host, port, db, password, prefix,
+                block_timeout=block_timeout,
+                group=os.environ.get('REDIS_STREAM_GROUP', 'workers'),
+                reclaim_idle=float(os.environ.get('REDIS_STREAM_RECLAIM_IDLE', 60)),
+                maxlen=int(os.environ.get('REDIS_STREAM_MAXLEN', 100000)),
+                results_maxlen=int(os.environ.get('REDIS_STREAM_RESULTS_MAXLEN', 10000)),
+                **queue_options
+            )
+        else:
+            message_queue = RedisMessageQueue(host, port, db, password, prefix, block_timeout=block_timeout,
+                                              **queue_options)
     return message_queue
 
 def get_message_queue():
@@ -339,4 +2241,4 @@ def get_message_queue():
         prefix = os.environ.get('REDIS_PREFIX', 'iot_gateway')
         
         message_queue = init_message_queue(host, port, db, password, prefix)
-    return message_queue 
\ No newline at end of file
+    return message_queue
@@ -5,10 +5,12 @@ import time
 import signal
 import logging
 import threading
+import socket
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, jsonify, request, Blueprint
 from flask_cors import CORS
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import redis
 
@@ -18,7 +20,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Füge den utils-Ordner zum Pfad hinzu, damit wir message_forwarder.py importieren können
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from api.message_queue import get_message_queue
+from api.worker_autoscaler import WorkerAutoscaler
+from api.forward_batcher import ForwardBatcher
+from api.result_sink import get_result_sink
 from utils.template_engine import TemplateEngine, MessageForwarder
+from utils.template_store import get_template_store
+from utils.circuit_breaker import EndpointUnavailableError
 from utils.api_config import get_route, API_VERSION
 from utils.api_handlers import (
     success_response, error_response, 
@@ -29,7 +36,7 @@ from utils.api_handlers import (
 from utils.auth_middleware import require_auth
 
 # Importiere Models
-from api.models import TemplateGroup
+from api.models import TemplateGroup, initialize_db
 
 # Konfiguriere Logging
 logging.basicConfig(
@@ -52,19 +59,66 @@ class MessageWorker:
     Worker zum Verarbeiten von Nachrichten aus der Redis-Queue
     """
     
-    def __init__(self, num_threads: int = 2, poll_interval: float = 0.5):
+    def __init__(self, num_threads: int = 2, poll_interval: float = 0.5, block_timeout: Optional[float] = None,
+                 batch_size: int = 1, maintenance_interval: float = 30.0, min_threads: Optional[int] = None,
+                 max_threads: Optional[int] = None, autoscale_interval: float = 10.0, target_drain_time: float = 5.0,
+                 forward_batch_size: int = 0, forward_batch_wait: float = 0.05, drain_timeout: float = 25.0):
         """
         Initialisiere den Message Worker
         
         Args:
             num_threads: Anzahl der Worker-Threads
-            poll_interval: Zeit zwischen Queue-Abfragen in Sekunden
+            poll_interval: Zeit zwischen Queue-Abfragen in Sekunden (nur ohne blockierendes Abholen)
+            block_timeout: Wartezeit für blockierendes Abholen in Sekunden
+                           (None = Standardwert der Queue, 0 = Polling mit poll_interval)
+            batch_size: Maximale Anzahl an Nachrichten, die ein Thread pro Queue-Zugriff abholt
+            maintenance_interval: Zeit zwischen zwei Wartungsläufen (z.B. Reaper) in Sekunden
+            min_threads: Minimale Anzahl an Threads für das Autoscaling (None = num_threads)
+            max_threads: Maximale Anzahl an Threads für das Autoscaling (None = num_threads)
+            autoscale_interval: Zeit zwischen zwei Autoscaling-Entscheidungen in Sekunden
+            target_drain_time: Zeit in Sekunden, in der wartende Nachrichten abgearbeitet sein sollen
+            forward_batch_size: Maximale Anzahl Events pro gesammelter Weiterleitung (0 oder 1 = nicht sammeln)
+            forward_batch_wait: Maximale Wartezeit eines Events vor der gesammelten Weiterleitung in Sekunden
+            drain_timeout: Frist in Sekunden, in der laufende Nachrichten beim Herunterfahren abgeschlossen werden
         """
+        self.created_at = time.time()
         self.queue = get_message_queue()
-        self.num_threads = num_threads
+        self.min_threads = min_threads or num_threads
+        self.max_threads = max(self.min_threads, max_threads or num_threads)
+        self.num_threads = max(self.min_threads, min(self.max_threads, num_threads))
         self.poll_interval = poll_interval
+        self.batch_size = max(1, batch_size)
+        self.block_timeout = block_timeout if block_timeout is not None else self.queue.block_timeout
+        self.consumer_prefix = os.environ.get('WORKER_CONSUMER_ID', socket.gethostname())
+        self.maintenance_interval = maintenance_interval
         self.running = False
         self.threads: List[threading.Thread] = []
+        # Pro Thread-Index ein Event, mit dem der Autoscaler einzelne Threads beendet
+        self.thread_stops: Dict[int, threading.Event] = {}
+        self.threads_by_index: Dict[int, threading.Thread] = {}
+        # Beendete Threads, die ihren Batch noch abarbeiten; ihr Index (und ihre Inflight-Liste) bleibt so lange belegt
+        self.retiring_threads: Dict[int, threading.Thread] = {}
+        self.maintenance_thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.reclaimed_jobs = 0
+        self.promoted_jobs = 0
+        
+        # Abgeholte, noch nicht an die Queue gemeldete Nachrichten (Job-ID -> Startzeit)
+        self.in_flight: Dict[str, float] = {}
+        self.in_flight_lock = threading.Lock()
+        
+        # Drain: keine neuen Nachrichten abholen, laufende abschließen oder übergeben
+        self.drain_timeout = drain_timeout
+        self.draining = False
+        self.drain_state: Optional[Dict[str, Any]] = None
+        self.drain_lock = threading.Lock()
+        self.drain_thread: Optional[threading.Thread] = None
+        
+        # Autoscaling nur, wenn zwischen min_threads und max_threads Spielraum besteht
+        self.autoscale_interval = autoscale_interval
+        self.autoscaler = None
+        if self.max_threads > self.min_threads:
+            self.autoscaler = WorkerAutoscaler(self.min_threads, self.max_threads, target_drain_time=target_drain_time)
         
         # Projektverzeichnis
         PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -78,11 +132,25 @@ class MessageWorker:
             except Exception as e:
                 logger.error(f"Fehler beim Erstellen des Templates-Verzeichnisses: {str(e)}")
         
-        # Initialisiere Template-Engine und Message-Forwarder
-        self.template_engine = TemplateEngine(templates_dir)
-        self.message_forwarder = MessageForwarder()
+        # Initialisiere Template-Engine und Message-Forwarder (Templates und Endpunkte lädt warm_up())
+        self.template_engine = TemplateEngine(templates_dir, preload=False)
+        self.message_forwarder = MessageForwarder(preload=False)
         self.message_forwarder.template_engine = self.template_engine  # Verbinde MessageForwarder mit TemplateEngine
         
+        # Zustand des Aufwärmens: 'pending', 'warming', 'ready' oder 'degraded' (ein Schritt fehlgeschlagen)
+        self.startup: Dict[str, Any] = {'state': 'pending', 'steps': {}}
+        self.startup_lock = threading.Lock()
+        self.startup_thread: Optional[threading.Thread] = None
+        
+        # Status-Events pro Endpunkt sammeln (Alarme werden immer sofort gesendet)
+        self.forward_batcher = None
+        if forward_batch_size > 1:
+            self.forward_batcher = ForwardBatcher(self.message_forwarder, self._finish_job, self._report_results,
+                                                  max_events=forward_batch_size, max_wait=forward_batch_wait)
+        
+        # Ergebnisse für Audits und Dashboards in der MongoDB ablegen (RESULT_SINK_ENABLED)
+        self.result_sink = get_result_sink()
+        
         # Signal Handler für graceful shutdown
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
@@ -96,22 +164,39 @@ class MessageWorker:
         logger.info(f"Signal {signum} empfangen, Worker wird gestoppt...")
         self.stop()
     
-    def _worker_thread(self):
+    def _worker_thread(self, consumer_id: str, retire_event: Optional[threading.Event] = None):
         """
         Worker-Thread zum Verarbeiten von Nachrichten
+        
+        Args:
+            consumer_id: Stabile Kennung des Threads für die Inflight-Liste der Queue
+            retire_event: Wird gesetzt, wenn der Autoscaler diesen Thread beenden möchte
         """
+        retire_event = retire_event or threading.Event()
         thread_id = threading.get_ident()
-        logger.info(f"Worker-Thread {thread_id} gestartet")
+        logger.info(f"Worker-Thread {thread_id} gestartet (Consumer {consumer_id})")
         
-        while self.running:
+        # Nachrichten eines abgestürzten Vorgängers mit derselben Consumer-ID retten
+        try:
+            self.queue.recover_inflight_messages(consumer_id)
+        except Exception as e:
+            logger.error(f"Fehler beim Wiederherstellen der Inflight-Nachrichten für {consumer_id}: {str(e)}")
+        
+        while self.running and not self.draining and not retire_event.is_set():
             try:
-                # Hole nächste Nachricht aus der Queue
-                job = self.queue.get_next_message()
+                # Hole die nächsten Nachrichten aus der Queue (blockiert bis zu block_timeout Sekunden)
+                jobs = self.queue.get_next_messages(
+                    self.batch_size,
+                    block_timeout=self.block_timeout,
+                    consumer_id=consumer_id
+                )
                 
-                if job:
-                    logger.info(f"Verarbeite Nachricht: {job['id']}")
-                    self._process_message(job)
-                else:
+                if jobs and self.draining:
+                    # Während des Drain abgeholt: sofort an andere Worker übergeben
+                    self._hand_off([job['id'] for job in jobs])
+                elif jobs:
+                    self._process_batch(jobs)
+                elif not self.block_timeout:
                     # Keine Nachrichten in der Queue, warte kurz
                     time.sleep(self.poll_interval)
             
@@ -121,6 +206,222 @@ class MessageWorker:
         
         logger.info(f"Worker-Thread {thread_id} beendet")
     
+    def _maintenance_loop(self):
+        """
+        Wartungs-Thread: verschiebt fällige Wiederholungsversuche in die Queue (jede Sekunde)
+        und holt in größeren Abständen verwaiste Nachrichten zurück
+        """
+        logger.info(f"Wartungs-Thread gestartet (Intervall {self.maintenance_interval}s)")
+        last_reap = time.time()
+        last_autoscale = time.time()
+        
+        while not self.stop_event.wait(1.0):
+            try:
+                self.promoted_jobs += self.queue.promote_due_jobs()
+                
+                if time.time() - last_reap >= self.maintenance_interval:
+                    last_reap = time.time()
+                    self.reclaimed_jobs += self.queue.reap_expired_jobs()
+                    self.reclaimed_jobs += self.queue.recover_abandoned_inflight()
+                    
+                    # Beim Start fehlgeschlagene Schritte des Aufwärmens wiederholen
+                    if self.startup['state'] == 'degraded':
+                        failed_steps = [name for name, step in self.startup['steps'].items() if not step['ok']]
+                        self.warm_up(failed_steps)
+                
+                if self.autoscaler and not self.draining and time.time() - last_autoscale >= self.autoscale_interval:
+                    last_autoscale = time.time()
+                    self._autoscale()
+            except Exception as e:
+                logger.error(f"Fehler im Wartungs-Thread: {str(e)}")
+        
+        logger.info("Wartungs-Thread beendet")
+    
+    def _autoscale(self):
+        """
+        Passt die Anzahl der Worker-Threads an Queue-Tiefe und Verarbeitungszeit an
+        """
+        pending = self.queue.get_queue_status()['pending_count']
+        target = self.autoscaler.evaluate(pending, self.num_threads)
+        if target != self.num_threads:
+            logger.info(f"Autoscaling: {self.num_threads} -> {target} Threads ({pending} wartende Nachrichten)")
+            self._scale_to(target)
+    
+    def _start_thread(self, index: int):
+        """
+        Startet den Worker-Thread mit dem angegebenen Index
+        """
+        consumer_id = f"{self.consumer_prefix}:{index}"
+        retire_event = threading.Event()
+        thread = threading.Thread(target=self._worker_thread, args=(consumer_id, retire_event))
+        thread.daemon = True
+        thread.start()
+        self.threads.append(thread)
+        self.threads_by_index[index] = thread
+        self.thread_stops[index] = retire_event
+    
+    def _scale_to(self, target: int):
+        """
+        Startet oder beendet Worker-Threads, bis target Threads aktiv sind
+        
+        Neue Threads erhalten den kleinsten freien Index, beendet werden die Threads
+        mit den höchsten Indizes. So bleibt die Menge der Consumer-IDs (und ihrer
+        Inflight-Listen) klein. Ein beendeter Thread arbeitet seinen Batch noch ab;
+        bis er endet, wird sein Index nicht neu vergeben, sonst würde der neue Thread
+        beim Start die laufenden Nachrichten aus derselben Inflight-Liste zurückstellen.
+        """
+        self.threads = [thread for thread in self.threads if thread.is_alive()]
+        self.retiring_threads = {index: thread for index, thread in self.retiring_threads.items() if thread.is_alive()}
+        
+        while len(self.thread_stops) < target:
+            index = 0
+            while index in self.thread_stops or index in self.retiring_threads:
+                index += 1
+            self._start_thread(index)
+        
+        while len(self.thread_stops) > target:
+            index = max(self.thread_stops)
+            self.thread_stops.pop(index).set()
+            self.retiring_threads[index] = self.threads_by_index.pop(index)
+        
+        self.num_threads = target
+    
+    def _track_jobs(self, jobs: List[Dict[str, Any]]):
+        """
+        Merkt abgeholte Nachrichten vor, bis ihr Ergebnis an die Queue gemeldet ist
+        """
+        started = time.time()
+        with self.in_flight_lock:
+            for job in jobs:
+                self.in_flight[job['id']] = started
+    
+    def _untrack_jobs(self, job_ids: List[str]) -> set:
+        """
+        Entfernt Nachrichten aus der Vormerkung
+        
+        Returns:
+            Die IDs, die noch vorgemerkt waren
+        """
+        with self.in_flight_lock:
+            return {job_id for job_id in job_ids if self.in_flight.pop(job_id, None) is not None}
+    
+    def _hand_off(self, job_ids: List[str]) -> int:
+        """
+        Gibt Nachrichten ohne Fehlversuch an andere Worker zurück
+        """
+        if not job_ids:
+            return 0
+        self._untrack_jobs(job_ids)
+        try:
+            handed_off = self.queue.hand_off_jobs(job_ids)
+        except Exception as e:
+            # Die Nachrichten bleiben in der Verarbeitung und werden vom Reaper zurückgeholt
+            logger.error(f"Fehler beim Übergeben von {len(job_ids)} Nachrichten: {str(e)}")
+            return 0
+        with self.drain_lock:
+            if self.drain_state is not None:
+                self.drain_state['handed_off'] += handed_off
+        return handed_off
+    
+    def drain(self, timeout: Optional[float] = None, wait: bool = True) -> Dict[str, Any]:
+        """
+        Leert den Worker vor dem Herunterfahren
+        
+        Es werden keine neuen Nachrichten mehr abgeholt. Laufende Nachrichten werden
+        bis zur Frist abgeschlossen, noch nicht begonnene und nach Ablauf der Frist
+        noch laufende Nachrichten an andere Worker übergeben. Ein zweiter Aufruf
+        startet keinen neuen Drain, sondern wartet auf den laufenden.
+        
+        Args:
+            timeout: Frist in Sekunden (None = drain_timeout)
+            wait: Bis zum Ende des Drain warten?
+        
+        Returns:
+            Fortschritt des Drain (siehe get_drain_status())
+        """
+        with self.drain_lock:
+            if self.drain_state is None:
+                timeout = self.drain_timeout if timeout is None else timeout
+                now = time.time()
+                self.draining = True
+                self.drain_state = {
+                    'state': 'draining',
+                    'started_at': now,
+                    'deadline': now + timeout,
+                    'finished_at': None,
+                    'handed_off': 0
+                }
+                logger.info(f"Drain gestartet: {len(self.in_flight)} laufende Nachrichten, Frist {timeout}s")
+                self.drain_thread = threading.Thread(target=self._drain)
+                self.drain_thread.daemon = True
+                self.drain_thread.start()
+        
+        if wait and self.drain_thread:
+            self.drain_thread.join()
+        return self.get_drain_status()
+    
+    def _drain(self):
+        """
+        Ablauf des Drain (eigener Thread)
+        """
+        deadline = self.drain_state['deadline']
+        
+        # Ein laufendes Aufwärmen abwarten, damit danach keine Threads mehr starten
+        if self.startup_thread:
+            self.startup_thread.join(timeout=max(0.0, deadline - time.time()))
+        
+        # Worker-Threads beenden ihren aktuellen Batch und holen nichts mehr ab
+        for thread in list(self.threads):
+            thread.join(timeout=max(0.0, deadline - time.time()))
+        
+        # Gesammelte Events noch senden
+        if self.forward_batcher:
+            self.forward_batcher.stop()
+        
+        # Was bis zur Frist nicht fertig wurde, übernehmen andere Worker
+        with self.in_flight_lock:
+            remaining = list(self.in_flight)
+        if remaining:
+            logger.warning(f"Drain-Frist abgelaufen, übergebe {len(remaining)} laufende Nachrichten")
+            self._hand_off(remaining)
+        
+        self.template_engine.stop_watching()
+        
+        # Gepufferte Ergebnisse noch in die MongoDB schreiben
+        if self.result_sink:
+            self.result_sink.stop()
+        
+        with self.drain_lock:
+            self.drain_state['state'] = 'drained'
+            self.drain_state['finished_at'] = time.time()
+            handed_off = self.drain_state['handed_off']
+        logger.info(f"Drain abgeschlossen ({handed_off} Nachrichten übergeben)")
+    
+    def get_drain_status(self) -> Dict[str, Any]:
+        """
+        Gibt den Fortschritt des Drain zurück
+        
+        Returns:
+            Dictionary mit 'state' ('running', 'draining' oder 'drained'), laufenden
+            Nachrichten und - während/nach dem Drain - Zeitpunkten und übergebenen Nachrichten
+        """
+        with self.in_flight_lock:
+            in_flight = len(self.in_flight)
+        with self.drain_lock:
+            if self.drain_state is None:
+                return {'state': 'running', 'in_flight': in_flight}
+            status = dict(self.drain_state, in_flight=in_flight)
+        if status['state'] == 'draining':
+            status['remaining_seconds'] = max(0.0, status['deadline'] - time.time())
+        return status
+    
+    def _record_processing_time(self, started: float):
+        """
+        Meldet die Verarbeitungszeit einer Nachricht an den Autoscaler
+        """
+        if self.autoscaler:
+            self.autoscaler.record_processing_time(time.time() - started)
+    
     def _process_message(self, job: Dict[str, Any]):
         """
         Verarbeite eine Nachricht aus der Queue
@@ -128,106 +429,252 @@ class MessageWorker:
         Args:
             job: Die zu verarbeitende Nachricht mit Metadaten
         """
+        self._track_jobs([job])
+        started = time.time()
+        status, payload = self._execute_job(job)
+        self._record_processing_time(started)
+        
+        if status != 'batched':
+            self._report_results([(job, status, payload)])
+    
+    def _process_batch(self, jobs: List[Dict[str, Any]]):
+        """
+        Verarbeite mehrere Nachrichten und melde die Ergebnisse gesammelt an die Queue
+        
+        Args:
+            jobs: Die zu verarbeitenden Nachrichten mit Metadaten
+        """
+        self._track_jobs(jobs)
+        results = []
+        not_started = []
+        for index, job in enumerate(jobs):
+            if self.draining:
+                # Noch nicht begonnene Nachrichten übernehmen andere Worker
+                not_started = [pending['id'] for pending in jobs[index:]]
+                break
+            logger.info(f"Verarbeite Nachricht: {job['id']}")
+            started = time.time()
+            status, payload = self._execute_job(job)
+            self._record_processing_time(started)
+            # Gesammelte Nachrichten meldet der ForwardBatcher nach dem Versand
+            if status != 'batched':
+                results.append((job, status, payload))
+        
+        self._report_results(results)
+        self._hand_off(not_started)
+    
+    def _report_results(self, results: List[Tuple[Dict[str, Any], str, Any]]):
+        """
+        Meldet die Ergebnisse mehrerer Nachrichten gesammelt an die Queue
+        
+        Args:
+            results: Liste von (Job, Status, Ergebnis) mit Status 'completed', 'deferred' oder 'failed'
+        """
+        completed = []
+        failed = []
+        deferred = []
+        
+        # Nach Ablauf der Drain-Frist übergebene Nachrichten gehören inzwischen einem anderen Worker
+        tracked = self._untrack_jobs([job['id'] for job, _, _ in results])
+        
+        for job, status, payload in results:
+            if job['id'] not in tracked:
+                logger.warning(f"Ergebnis für übergebene Nachricht {job['id']} verworfen")
+                continue
+            if status == 'completed':
+                completed.append((job['id'], payload))
+            elif status == 'deferred':
+                deferred.append((job['id'], payload))
+            else:
+                failed.append((job['id'], payload))
+        
+        self.queue.mark_many_completed(completed)
+        self.queue.mark_many_failed(failed)
+        # Nach max_deferrals Zurückstellungen zählt die Nachricht als Fehlversuch
+        exhausted = dict(self.queue.defer_jobs(deferred))
+        
+        if self.result_sink:
+            records = []
+            for job, status, payload in results:
+                if job['id'] not in tracked:
+                    continue
+                if status != 'deferred':
+                    records.append((job, status, payload))
+                elif job['id'] in exhausted:
+                    records.append((job, 'failed', exhausted[job['id']]))
+            self.result_sink.record_many(records)
+    
+    def _execute_job(self, job: Dict[str, Any]) -> Tuple[str, Any]:
+        """
+        Führt Transformation und Weiterleitung einer Nachricht aus, ohne die Queue zu aktualisieren
+        
+        Args:
+            job: Die zu verarbeitende Nachricht mit Metadaten
+        
+        Returns:
+            ('completed', Ergebnis) bei Erfolg, ('failed', Fehlermeldung),
+            ('deferred', Wartezeit in Sekunden), wenn der Endpunkt gerade nicht erreichbar ist, oder
+            ('batched', None), wenn die Nachricht gesammelt gesendet und später gemeldet wird
+        """
         try:
-            message = job['message']
-            template_name = job['template']
-            customer_config = job.get('customer_config')
-            
-            # Gateway-ID aus der Job-Daten extrahieren
-            gateway_id = job.get('gateway_id')
-            if not gateway_id:
-                error_msg = "Keine Gateway-ID in den Job-Daten gefunden"
-                logger.error(error_msg)
-                self.queue.mark_as_failed(job['id'], error_msg)
-                return
-            
-            # Sicherheitscheck: Prüfe, ob ein Kundenkontext vorhanden ist
-            if not customer_config:
-                error_msg = "SICHERHEITSWARNUNG: Nachricht von nicht zugeordnetem Gateway - Weiterleitung blockiert"
-                logger.error(f"{error_msg} - Gateway-ID: {gateway_id}")
-                self.queue.mark_as_failed(job['id'], error_msg)
-                # Speichere die blockierte Nachricht für spätere Überprüfung
-                try:
-                    import os
-                    import json
-                    from datetime import datetime
-                    
-                    security_log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'security_logs')
-                    os.makedirs(security_log_dir, exist_ok=True)
-                    
-                    log_file = os.path.join(security_log_dir, f"blocked_message_{datetime.now().strftime('%Y%m%d-%H%M%S')}_{job['id']}.json")
-                    with open(log_file, 'w') as f:
-                        json.dump({
-                            'timestamp': datetime.now().isoformat(),
-                            'gateway_id': gateway_id,
-                            'message': message,
-                            'reason': 'Gateway ist keinem Kunden zugeordnet'
-                        }, f, indent=2)
-                    
-                    logger.info(f"Blockierte Nachricht in {log_file} protokolliert")
-                except Exception as e:
-                    logger.error(f"Fehler beim Protokollieren der blockierten Nachricht: {str(e)}")
-                return
-            
-            # Transformiere Nachricht mit dem Template und Kundenkonfiguration
-            transformed_message = self.template_engine.transform_message(
-                message, 
-                template_name,
-                customer_config=customer_config,
-                gateway_id=gateway_id
-            )
-            
-            if not transformed_message:
-                error_msg = f'Fehler bei der Transformation mit Template "{template_name}"'
-                logger.error(error_msg)
-                self.queue.mark_as_failed(job['id'], error_msg)
-                return
+            status, context = self._prepare_job(job)
+            if status == 'failed':
+                return status, context
             
-            # Leite transformierte Nachricht weiter
-            response = self.message_forwarder.forward_message(
-                transformed_message,
-                'auto',  # 'evalarm' durch 'auto' ersetzt für automatische Endpunktauswahl
-                gateway_uuid=gateway_id
+            # Ermittle den Endpunkt ('auto' für automatische Endpunktauswahl anhand des Gateways)
+            resolved = self.message_forwarder.resolve_endpoint(
+                context['transformed_message'],
+                'auto',
+                gateway_uuid=context['gateway_id']
             )
-            
-            if not response:
-                # Differenzierte Fehlermeldung je nach Ursache
-                if not self.message_forwarder.get_customer_by_gateway(gateway_id):
-                    error_msg = f'Weiterleitung blockiert: Gateway {gateway_id} ist keinem Kunden zugeordnet'
-                else:
-                    error_msg = 'Fehler bei der Weiterleitung an evAlarm API: Verbindungsfehler oder Timeout'
-                logger.error(error_msg)
-                self.queue.mark_as_failed(job['id'], error_msg)
-                return
-            elif response.status_code == 422:
-                # Spezialbehandlung für 422 - Unprocessable Entity
-                error_msg = f'Fehler bei der Weiterleitung an evAlarm API: Ungültiges Datenformat - {response.text}'
-                logger.error(error_msg)
-                self.queue.mark_as_failed(job['id'], error_msg)
-                return
-            elif response.status_code >= 400:
-                error_msg = f'Fehler bei der Weiterleitung an evAlarm API: HTTP {response.status_code} - {response.text}'
-                logger.error(error_msg)
-                self.queue.mark_as_failed(job['id'], error_msg)
-                return
-            
-            # Erstelle Ergebnis
-            result = {
-                'original_message': message,
-                'transformed_message': transformed_message,
-                'customer': customer_config['name'],
-                'response_status': response.status_code,
-                'response_text': response.text,
-                'template_used': template_name
-            }
-            
-            # Markiere als erfolgreich
-            self.queue.mark_as_completed(job['id'], result)
-            logger.info(f"Nachricht erfolgreich verarbeitet und weitergeleitet: {job['id']}")
+            return self._forward_job(job, context, resolved)
+        
+        except EndpointUnavailableError as e:
+            # Kein Fehlversuch: Die Nachricht wartet, bis der Endpunkt wieder Anfragen annimmt
+            logger.warning(f"Nachricht {job['id']} zurückgestellt: {str(e)}")
+            return 'deferred', e.retry_after
             
         except Exception as e:
             logger.error(f"Fehler bei der Verarbeitung von Nachricht {job['id']}: {str(e)}")
-            self.queue.mark_as_failed(job['id'], str(e))
+            return 'failed', str(e)
+    
+    def _forward_job(self, job: Dict[str, Any], context: Dict[str, Any], resolved) -> Tuple[str, Any]:
+        """
+        Sendet eine transformierte Nachricht an ihren Endpunkt oder übergibt sie dem ForwardBatcher
+        
+        Args:
+            job: Die zu verarbeitende Nachricht mit Metadaten
+            context: Kontext aus _prepare_job()
+            resolved: (Endpunkt-Name, Endpunkt) aus resolve_endpoint() oder None, wenn die Weiterleitung blockiert ist
+        
+        Returns:
+            Wie _execute_job()
+        
+        Raises:
+            EndpointUnavailableError: Circuit des Endpunkts offen oder zu viele laufende Anfragen
+        """
+        if not resolved:
+            return self._finish_job(job, context, None)
+        
+        endpoint_name, endpoint = resolved
+        if self.forward_batcher and self.forward_batcher.accepts(job) and \
+                self.forward_batcher.submit(job, context, endpoint_name, endpoint):
+            return 'batched', None
+        
+        # Leite transformierte Nachricht weiter
+        response = self.message_forwarder.send_to_endpoint(context['transformed_message'], endpoint_name, endpoint)
+        
+        return self._finish_job(job, context, response)
+    
+    def _prepare_job(self, job: Dict[str, Any]) -> Tuple[str, Any]:
+        """
+        Prüft eine Nachricht und transformiert sie für die Weiterleitung
+        
+        Args:
+            job: Die zu verarbeitende Nachricht mit Metadaten
+        
+        Returns:
+            ('ready', Kontext für die Weiterleitung) oder ('failed', Fehlermeldung)
+        """
+        message = job['message']
+        template_name = job['template']
+        customer_config = job.get('customer_config')
+        
+        # Gateway-ID aus der Job-Daten extrahieren
+        gateway_id = job.get('gateway_id')
+        if not gateway_id:
+            error_msg = "Keine Gateway-ID in den Job-Daten gefunden"
+            logger.error(error_msg)
+            return 'failed', error_msg
+        
+        # Sicherheitscheck: Prüfe, ob ein Kundenkontext vorhanden ist
+        if not customer_config:
+            error_msg = "SICHERHEITSWARNUNG: Nachricht von nicht zugeordnetem Gateway - Weiterleitung blockiert"
+            logger.error(f"{error_msg} - Gateway-ID: {gateway_id}")
+            # Speichere die blockierte Nachricht für spätere Überprüfung
+            try:
+                security_log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'security_logs')
+                os.makedirs(security_log_dir, exist_ok=True)
+                
+                log_file = os.path.join(security_log_dir, f"blocked_message_{datetime.now().strftime('%Y%m%d-%H%M%S')}_{job['id']}.json")
+                with open(log_file, 'w') as f:
+                    json.dump({
+                        'timestamp': datetime.now().isoformat(),
+                        'gateway_id': gateway_id,
+                        'message': message,
+                        'reason': 'Gateway ist keinem Kunden zugeordnet'
+                    }, f, indent=2)
+                
+                logger.info(f"Blockierte Nachricht in {log_file} protokolliert")
+            except Exception as e:
+                logger.error(f"Fehler beim Protokollieren der blockierten Nachricht: {str(e)}")
+            return 'failed', error_msg
+        
+        # Transformiere Nachricht mit dem Template und Kundenkonfiguration
+        transformed_message = self.template_engine.transform_message(
+            message, 
+            template_name,
+            customer_config=customer_config,
+            gateway_id=gateway_id
+        )
+        
+        if not transformed_message:
+            error_msg = f'Fehler bei der Transformation mit Template "{template_name}"'
+            logger.error(error_msg)
+            return 'failed', error_msg
+        
+        return 'ready', {
+            'message': message,
+            'template_name': template_name,
+            'customer_config': customer_config,
+            'gateway_id': gateway_id,
+            'transformed_message': transformed_message
+        }
+    
+    def _finish_job(self, job: Dict[str, Any], context: Dict[str, Any], response) -> Tuple[str, Any]:
+        """
+        Wertet die Antwort der Weiterleitung aus
+        
+        Args:
+            job: Die verarbeitete Nachricht mit Metadaten
+            context: Kontext aus _prepare_job()
+            response: Antwort des Endpunkts (mit status_code und text) oder None, wenn nichts gesendet wurde
+        
+        Returns:
+            ('completed', Ergebnis) bei Erfolg oder ('failed', Fehlermeldung)
+        """
+        gateway_id = context['gateway_id']
+        
+        if response is None:
+            # Differenzierte Fehlermeldung je nach Ursache
+            if not self.message_forwarder.get_customer_by_gateway(gateway_id):
+                error_msg = f'Weiterleitung blockiert: Gateway {gateway_id} ist keinem Kunden zugeordnet'
+            else:
+                error_msg = 'Fehler bei der Weiterleitung an evAlarm API: Verbindungsfehler oder Timeout'
+            logger.error(error_msg)
+            return 'failed', error_msg
+        elif response.status_code == 422:
+            # Spezialbehandlung für 422 - Unprocessable Entity
+            error_msg = f'Fehler bei der Weiterleitung an evAlarm API: Ungültiges Datenformat - {response.text}'
+            logger.error(error_msg)
+            return 'failed', error_msg
+        elif response.status_code >= 400:
+            error_msg = f'Fehler bei der Weiterleitung an evAlarm API: HTTP {response.status_code} - {response.text}'
+            logger.error(error_msg)
+            return 'failed', error_msg
+        
+        # Erstelle Ergebnis
+        result = {
+            'original_message': context['message'],
+            'transformed_message': context['transformed_message'],
+            'customer': context['customer_config']['name'],
+            'response_status': response.status_code,
+            'response_text': response.text,
+            'template_used': context['template_name']
+        }
+        
+        logger.info(f"Nachricht erfolgreich verarbeitet und weitergeleitet: {job['id']}")
+        return 'completed', result
     
     def start(self):
         """
@@ -238,16 +685,138 @@ class MessageWorker:
             return
         
         self.running = True
+        self.draining = False
+        self.drain_state = None
+        
+        if self.result_sink:
+            self.result_sink.start()
+        
+        # Aufwärmen im Hintergrund, damit die API (Readiness-Probe) sofort antwortet
+        self.startup_thread = threading.Thread(target=self._startup)
+        self.startup_thread.daemon = True
+        self.startup_thread.start()
+    
+    def _startup(self):
+        """
+        Wärmt die Caches auf und startet danach die Verarbeitung
+        
+        Die Verarbeitung startet auch, wenn ein Schritt fehlschlägt; der Wartungs-Thread
+        wiederholt fehlgeschlagene Schritte, bis der Worker bereit ist.
+        """
+        if self.startup['state'] != 'ready':
+            self.warm_up()
+        if self.running and not self.draining:
+            # Geänderte Template-Dateien im laufenden Betrieb nachladen
+            self.template_engine.start_watching()
+            self._start_processing()
+    
+    def _start_processing(self):
+        """
+        Startet Worker-Threads, Wartungs-Thread und ForwardBatcher
+        """
+        for index in range(self.num_threads):
+            self._start_thread(index)
+        
+        self._start_maintenance_thread()
         
-        # Starte Worker-Threads
-        for _ in range(self.num_threads):
-            thread = threading.Thread(target=self._worker_thread)
-            thread.daemon = True
-            thread.start()
-            self.threads.append(thread)
+        if self.forward_batcher:
+            self.forward_batcher.start()
         
         logger.info(f"Message Worker gestartet mit {self.num_threads} Threads")
     
+    def _warm_up_steps(self) -> Dict[str, Any]:
+        """
+        Gibt die Schritte des Aufwärmens zurück (Name -> Funktion)
+        """
+        return {
+            'templates': self._warm_up_templates,
+            'endpoints': self._warm_up_endpoints,
+            'mongodb': initialize_db,
+            'redis': self.queue.redis_client.ping
+        }
+    
+    def _warm_up_templates(self):
+        """
+        Lädt alle Templates in den Cache der Template-Engine (mit TEMPLATE_STORE=redis aus dem gemeinsamen Store)
+        """
+        store = get_template_store()
+        if store is not None:
+            self.template_engine.attach_store(store)
+        else:
+            self.template_engine.reload_templates()
+    
+    def _warm_up_endpoints(self):
+        """
+        Lädt die Kunden-Endpunkte aus der Datenbank
+        """
+        if not self.message_forwarder.load_endpoints():
+            raise RuntimeError("Kunden-Endpunkte konnten nicht geladen werden")
+    
+    def warm_up(self, steps: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Führt die Schritte des Aufwärmens parallel aus und misst ihre Dauer
+        
+        Args:
+            steps: Namen der auszuführenden Schritte (None = alle)
+        
+        Returns:
+            Zustand des Aufwärmens (siehe get_startup_status())
+        """
+        available = self._warm_up_steps()
+        names = steps or list(available)
+        
+        with self.startup_lock:
+            self.startup['state'] = 'warming'
+        
+        def run_step(name):
+            started = time.time()
+            try:
+                available[name]()
+                return {'ok': True, 'seconds': round(time.time() - started, 3)}
+            except Exception as e:
+                logger.error(f"Aufwärmen '{name}' fehlgeschlagen: {str(e)}")
+                return {'ok': False, 'seconds': round(time.time() - started, 3), 'error': str(e)}
+        
+        with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix='warm-up') as pool:
+            results = dict(zip(names, pool.map(run_step, names)))
+        
+        with self.startup_lock:
+            self.startup['steps'].update(results)
+            ready = all(step['ok'] for step in self.startup['steps'].values())
+            self.startup['state'] = 'ready' if ready else 'degraded'
+            if ready and 'ready_after' not in self.startup:
+                self.startup['ready_after'] = round(time.time() - self.created_at, 3)
+        
+        durations = ', '.join(f"{name} {result['seconds']}s" for name, result in results.items())
+        logger.info(f"Aufwärmen abgeschlossen: {self.startup['state']} ({durations})")
+        return self.get_startup_status()
+    
+    def get_startup_status(self) -> Dict[str, Any]:
+        """
+        Gibt den Zustand des Aufwärmens zurück
+        
+        Returns:
+            Dictionary mit 'state', 'steps' (je Schritt 'ok', 'seconds' und ggf. 'error')
+            und 'ready_after' (Sekunden vom Anlegen des Workers bis zur Bereitschaft)
+        """
+        with self.startup_lock:
+            return dict(self.startup, steps=dict(self.startup['steps']))
+    
+    def is_ready(self) -> bool:
+        """
+        Bereit, sobald die Caches aufgewärmt sind und der Worker Nachrichten abholt
+        """
+        return self.running and self.startup['state'] == 'ready' and not self.draining
+    
+    def _start_maintenance_thread(self):
+        """
+        Starte den Wartungs-Thread (Wiederholungen verschieben, verwaiste Nachrichten zurückholen)
+        """
+        self.stop_event.clear()
+        self.maintenance_thread = threading.Thread(target=self._maintenance_loop)
+        self.maintenance_thread.daemon = True
+        self.maintenance_thread.start()
+    
     def stop(self):
         """
         Stoppe den Message Worker
@@ -256,13 +825,23 @@ class MessageWorker:
             logger.warning("Worker läuft nicht")
             return
         
+        # Laufende Nachrichten abschließen oder übergeben, bevor die Threads enden
+        self.drain(wait=True)
+        
         self.running = False
+        self.stop_event.set()
         
         # Warte auf Beendigung aller Threads
         for thread in self.threads:
             thread.join(timeout=5.0)
+        if self.maintenance_thread:
+            self.maintenance_thread.join(timeout=5.0)
         
         self.threads = []
+        self.thread_stops = {}
+        self.threads_by_index = {}
+        self.retiring_threads = {}
+        self.maintenance_thread = None
         logger.info("Message Worker gestoppt")
     
     def get_status(self) -> Dict[str, Any]:
@@ -275,7 +854,20 @@ class MessageWorker:
         return {
             'running': self.running,
             'num_threads': self.num_threads,
+            'min_threads': self.min_threads,
+            'max_threads': self.max_threads,
+            'autoscaler': self.autoscaler.get_status() if self.autoscaler else None,
+            'endpoints': self.message_forwarder.get_endpoint_health(),
+            'forward_batching': self.forward_batcher.get_status() if self.forward_batcher else None,
+            'result_sink': self.result_sink.get_status() if self.result_sink else None,
+            'template_version': self.template_engine.version,
+            'drain': self.get_drain_status(),
+            'startup': self.get_startup_status(),
+            'block_timeout': self.block_timeout,
+            'batch_size': self.batch_size,
             'active_threads': len([t for t in self.threads if t.is_alive()]),
+            'reclaimed_jobs': self.reclaimed_jobs,
+            'promoted_jobs': self.promoted_jobs,
             'queue_status': self.queue.get_queue_status()
         }
 
@@ -303,11 +895,10 @@ def get_message_status():
     queue = worker_instance.queue
     
     # Hole die letzten Ergebnisse
-    results_json = queue.redis_client.lrange(queue.results_list, 0, 99)
-    results = [json.loads(result) for result in results_json]
+    results = queue.get_recent_results(100)
     
-    # Hole fehlgeschlagene Nachrichten
-    failed_messages = queue.get_failed_messages()
+    # Hole die neuesten fehlgeschlagenen Nachrichten
+    failed_messages = queue.get_failed_messages_page(limit=100)['messages']
     
     # Kombiniere alle Statusnachrichten
     all_statuses = results + failed_messages
@@ -343,26 +934,23 @@ def get_forwarding_status():
     queue = worker_instance.queue
     
     # Hole die letzten Ergebnisse
-    results_json = queue.redis_client.lrange(queue.results_list, 0, 99)
-    results = [json.loads(result) for result in results_json]
+    results = queue.get_recent_results(100)
     
-    # Hole fehlgeschlagene Nachrichten
-    failed_messages = queue.get_failed_messages()
+    # Hole die neuesten fehlgeschlagenen Nachrichten
+    failed_messages = queue.get_failed_messages_page(limit=100)['messages']
     
     # Hole aktuelle Verarbeitungsqueue
-    processing_ids = queue.redis_client.hkeys(queue.processing_queue)
-    processing_messages = []
-    for job_id in processing_ids:
-        job_json = queue.redis_client.hget(queue.processing_queue, job_id)
-        if job_json:
-            processing_messages.append(json.loads(job_json))
+    processing_messages = queue.get_processing_messages()
+    
+    queue_status = queue.get_queue_status()
     
     # Zähle nach Status
     forwarding_status = {
-        "pending": queue.redis_client.llen(queue.main_queue),
+        "pending": queue_status['pending_count'],
+        "retrying": queue_status['delayed_count'],
         "processing": len(processing_messages),
         "completed": len([msg for msg in results if msg.get('status') == 'completed']),
-        "failed": len(failed_messages),
+        "failed": queue_status['failed_count'],
         "details": {
             "pending": [],
             "processing": processing_messages,
@@ -404,14 +992,68 @@ def health_check():
     status = worker_instance.get_status()
     health_status = "healthy" if status['running'] else "unhealthy"
     
+    # Heartbeats aller Worker-Prozesse (z.B. vom Supervisor gestartet)
+    processes = worker_instance.queue.get_worker_health()
+    if health_status == "healthy" and any(process['stale'] for process in processes):
+        health_status = "degraded"
+    
+    # Der Drain wird nur gemeldet: /system/health dient als Liveness-Check des Containers,
+    # keine Arbeit mehr anzunehmen meldet /system/ready mit 503
     logger.info(f"Health-Check durchgeführt: {health_status}")
     return success_response({
         "service": "worker",
         "version": API_VERSION,
         "health_status": health_status,
-        "worker_status": status
+        "drain_state": status['drain']['state'],
+        "worker_status": status,
+        "processes": processes
     })
 
+@app.route(get_route('system', 'drain'), methods=['GET', 'POST'])
+@api_error_handler
+def drain_worker():
+    """
+    Startet den Drain des Workers (POST) oder gibt dessen Fortschritt zurück (GET)
+    
+    Für Pre-Stop-Hooks der Container-Orchestrierung (siehe api/prestop.sh). Nur von
+    localhost aus erlaubt. Optionaler JSON-Body: {"timeout": Sekunden}
+    """
+    error = check_worker_initialized()
+    if error:
+        return error
+    
+    if request.method == 'GET':
+        return success_response(worker_instance.get_drain_status())
+    
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return forbidden_response()
+    
+    data = request.get_json(silent=True) or {}
+    timeout = data.get('timeout')
+    if timeout is not None and (not isinstance(timeout, (int, float)) or timeout < 0):
+        return validation_error_response({'timeout': 'Muss eine Zahl >= 0 sein'})
+    
+    drain_status = worker_instance.drain(timeout=timeout, wait=False)
+    logger.info(f"Drain über API angefordert: {drain_status['state']}")
+    return success_response(drain_status, 'Drain gestartet', status_code=202)
+
+@app.route(get_route('system', 'ready'), methods=['GET'])
+@api_error_handler
+def readiness_check():
+    """
+    Readiness-Probe: 200, sobald Templates, Endpunkte, MongoDB und Redis aufgewärmt sind, sonst 503 (auch während des Drain)
+    """
+    error = check_worker_initialized()
+    if error:
+        return error
+    
+    ready = worker_instance.is_ready()
+    return success_response({
+        'ready': ready,
+        'startup': worker_instance.get_startup_status(),
+        'drain': worker_instance.get_drain_status()
+    }, status_code=200 if ready else 503)
+
 @app.route(get_route('system', 'iot_status'), methods=['GET'])
 @api_error_handler
 def iot_system_status():
@@ -447,6 +1089,7 @@ def iot_system_status():
     try:
         if worker_instance.template_engine:
             template_status["loaded"] = len(worker_instance.template_engine.templates)
+            template_status["version"] = worker_instance.template_engine.version
             template_status["directory"] = worker_instance.template_engine.templates_dir
             template_status["exists"] = os.path.exists(worker_instance.template_engine.templates_dir)
     except Exception as e:
@@ -706,6 +1349,9 @@ def list_worker_endpoints():
         {'path': get_route('system', 'health'), 'method': 'GET', 'description': 'Systemstatus abrufen'},
         {'path': get_route('system', 'iot_status'), 'method': 'GET', 'description': 'IoT-Systemstatus abrufen'},
         {'path': get_route('system', 'endpoints'), 'method': 'GET', 'description': 'Verfügbare Endpunkte auflisten'},
+        {'path': get_route('system', 'ready'), 'method': 'GET', 'description': 'Readiness-Probe (Caches aufgewärmt)'},
+        {'path': get_route('system', 'drain'), 'method': 'POST', 'description': 'Worker vor dem Herunterfahren leeren'},
+        {'path': get_route('system', 'drain'), 'method': 'GET', 'description': 'Fortschritt des Drain abrufen'},
         {'path': get_route('templates', 'list'), 'method': 'GET', 'description': 'Templates auflisten'},
         {'path': get_route('templates', 'detail'), 'method': 'GET', 'description': 'Template-Details abrufen'},
         {'path': get_route('templates', 'delete'), 'method': 'DELETE', 'description': 'Template löschen'},
@@ -922,13 +1568,21 @@ def delete_template_group(id):
 @app.route(get_route('messages', 'failed'), methods=['GET'])
 @require_auth
 def get_failed_messages():
-    """Gibt fehlgeschlagene Nachrichten zurück"""
+    """Gibt fehlgeschlagene Nachrichten seitenweise zurück (Query: cursor, limit, gateway_id, error_class)"""
+    error = check_worker_initialized()
+    if error:
+        return error
+    
     try:
-        # In der Zukunft würden wir fehlgeschlagene Nachrichten aus einer DB oder Queue holen
-        # Für jetzt geben wir eine leere Liste zurück
+        page = worker_instance.queue.get_failed_messages_page(
+            cursor=request.args.get('cursor'),
+            limit=int(request.args.get('limit', 50)),
+            gateway_id=request.args.get('gateway_id'),
+            error_class=request.args.get('error_class')
+        )
         return jsonify({
             'status': 'success',
-            'data': []
+            'data': page
         })
     except Exception as e:
         logger.error(f"Fehler beim Abrufen fehlgeschlagener Nachrichten: {e}")
@@ -939,10 +1593,18 @@ def get_failed_messages():
 
 # ==================== TEMPLATE LERNSYSTEM API ENDPUNKTE ====================
 
-from utils.template_learning import TemplateLearningEngine
+# Singleton-Instanz für die Learning Engine (beim ersten Aufruf angelegt, numpy-Import ist teuer)
+learning_engine = None
 
-# Singleton-Instanz für die Learning Engine
-learning_engine = TemplateLearningEngine()
+def get_learning_engine():
+    """
+    Hole die Learning Engine und lege sie beim ersten Aufruf an
+    """
+    global learning_engine
+    if learning_engine is None:
+        from utils.template_learning import TemplateLearningEngine
+        learning_engine = TemplateLearningEngine()
+    return learning_engine
 
 # Liste aller Lernsessions
 @app.route(get_route('learning', 'list'), methods=['GET'])
@@ -950,7 +1612,7 @@ learning_engine = TemplateLearningEngine()
 def list_learning_sessions():
     """Liste aller Lernsessions"""
     try:
-        sessions = learning_engine.get_learning_status()
+        sessions = get_learning_engine().get_learning_status()
         return jsonify({
             'status': 'success',
             'data': sessions
@@ -978,7 +1640,7 @@ def start_learning():
                 'error': {'message': 'Gateway-ID ist erforderlich'}
             }), 400
         
-        result = learning_engine.start_learning(gateway_id, duration_hours)
+        result = get_learning_engine().start_learning(gateway_id, duration_hours)
         
         if result['status'] == 'error':
             return jsonify({
@@ -1003,7 +1665,7 @@ def start_learning():
 def stop_learning(gateway_id):
     """Stoppt den Lernmodus für ein Gateway"""
     try:
-        result = learning_engine.stop_learning(gateway_id)
+        result = get_learning_engine().stop_learning(gateway_id)
         
         if result['status'] == 'error':
             return jsonify({
@@ -1028,7 +1690,7 @@ def stop_learning(gateway_id):
 def get_learning_status(gateway_id):
     """Gibt den Status der Lernsession für ein Gateway zurück"""
     try:
-        sessions = learning_engine.get_learning_status(gateway_id)
+        sessions = get_learning_engine().get_learning_status(gateway_id)
         
         if not sessions:
             return jsonify({
@@ -1053,7 +1715,7 @@ def get_learning_status(gateway_id):
 def get_message_patterns(gateway_id):
     """Gibt die erkannten Nachrichtenmuster zurück"""
     try:
-        patterns = learning_engine.analyze_patterns(gateway_id)
+        patterns = get_learning_engine().analyze_patterns(gateway_id)
         
         return jsonify({
             'status': 'success',
@@ -1072,7 +1734,7 @@ def get_message_patterns(gateway_id):
 def generate_templates_from_learning(gateway_id):
     """Generiert Templates basierend auf gelernten Mustern"""
     try:
-        templates = learning_engine.generate_templates(gateway_id)
+        templates = get_learning_engine().generate_templates(gateway_id)
         
         if not templates:
             return jsonify({
@@ -1094,7 +1756,13 @@ def generate_templates_from_learning(gateway_id):
 # Singleton-Instanz für die Anwendung
 worker_instance = None
 
-def init_worker(num_threads: int = 2, poll_interval: float = 0.5, auto_start: bool = True):
+def init_worker(num_threads: int = 2, poll_interval: float = 0.5, auto_start: bool = True,
+                block_timeout: Optional[float] = None, batch_size: int = 1, maintenance_interval: float = 30.0,
+                mode: str = 'threads', max_concurrency: int = 200, endpoint_concurrency: int = 20,
+                min_threads: Optional[int] = None, max_threads: Optional[int] = None,
+                autoscale_interval: float = 10.0, target_drain_time: float = 5.0,
+                forward_batch_size: int = 0, forward_batch_wait: float = 0.05, drain_timeout: float = 25.0,
+                transform_threads: int = 2, prefetch: int = 20, forward_buffer: int = 8):
     """
     Initialisiere den Message Worker als Singleton
     
@@ -1102,13 +1770,53 @@ def init_worker(num_threads: int = 2, poll_interval: float = 0.5, auto_start: bo
         num_threads: Anzahl der Worker-Threads
         poll_interval: Zeit zwischen Queue-Abfragen in Sekunden
         auto_start: Automatisch starten?
+        block_timeout: Wartezeit für blockierendes Abholen in Sekunden (None = Standardwert der Queue)
+        batch_size: Maximale Anzahl an Nachrichten pro Queue-Zugriff
+        maintenance_interval: Zeit zwischen zwei Wartungsläufen in Sekunden
+        mode: 'threads' (Worker-Threads), 'async' (asyncio mit HTTP-Verbindungspool) oder
+              'pipeline' (Stufen fetch/transform/forward mit begrenzten Puffern)
+        max_concurrency: Maximale Anzahl gleichzeitig verarbeiteter Nachrichten (nur 'async')
+        endpoint_concurrency: Maximale Anzahl gleichzeitiger Anfragen pro Endpunkt (nur 'async')
+        min_threads: Minimale Anzahl an Threads für das Autoscaling (None = num_threads)
+        max_threads: Maximale Anzahl an Threads für das Autoscaling (None = num_threads)
+        autoscale_interval: Zeit zwischen zwei Autoscaling-Entscheidungen in Sekunden
+        target_drain_time: Zeit in Sekunden, in der wartende Nachrichten abgearbeitet sein sollen
+        forward_batch_size: Maximale Anzahl Events pro gesammelter Weiterleitung (0 oder 1 = nicht sammeln, nicht 'async')
+        forward_batch_wait: Maximale Wartezeit eines Events vor der gesammelten Weiterleitung in Sekunden
+        drain_timeout: Frist in Sekunden, in der laufende Nachrichten beim Herunterfahren abgeschlossen werden
+        transform_threads: Anzahl der Threads der transform-Stufe (nur 'pipeline')
+        prefetch: Größe des Puffers zwischen fetch und transform (nur 'pipeline')
+        forward_buffer: Größe des Puffers zwischen transform und forward (nur 'pipeline')
     
     Returns:
         Die Worker-Instanz
     """
     global worker_instance
     if worker_instance is None:
-        worker_instance = MessageWorker(num_threads, poll_interval)
+        if mode == 'async':
+            from api.async_worker import AsyncMessageWorker
+            worker_instance = AsyncMessageWorker(poll_interval, block_timeout=block_timeout, batch_size=batch_size,
+                                                 maintenance_interval=maintenance_interval,
+                                                 max_concurrency=max_concurrency,
+                                                 endpoint_concurrency=endpoint_concurrency,
+                                                 drain_timeout=drain_timeout)
+        elif mode == 'pipeline':
+            from api.pipeline_worker import PipelineMessageWorker
+            worker_instance = PipelineMessageWorker(num_threads, poll_interval, block_timeout=block_timeout,
+                                                    batch_size=batch_size, maintenance_interval=maintenance_interval,
+                                                    transform_threads=transform_threads, prefetch=prefetch,
+                                                    forward_buffer=forward_buffer,
+                                                    forward_batch_size=forward_batch_size,
+                                                    forward_batch_wait=forward_batch_wait,
+                                                    drain_timeout=drain_timeout)
+        else:
+            worker_instance = MessageWorker(num_threads, poll_interval, block_timeout=block_timeout, batch_size=batch_size,
+                                            maintenance_interval=maintenance_interval, min_threads=min_threads,
+                                            max_threads=max_threads, autoscale_interval=autoscale_interval,
+                                            target_drain_time=target_drain_time,
+                                            forward_batch_size=forward_batch_size,
+                                            forward_batch_wait=forward_batch_wait,
+                                            drain_timeout=drain_timeout)
         if auto_start:
             worker_instance.start()
     return worker_instance
@@ -1159,7 +1867,26 @@ if __name__ == '__main__':
     logger.info("Message Worker wird als eigenständiger Prozess gestartet...")
     
     # Worker mit 2 Threads starten
-    worker = init_worker(num_threads=2, poll_interval=0.5)
+    worker = init_worker(
+        num_threads=int(os.environ.get('WORKER_THREADS', 2)),
+        poll_interval=float(os.environ.get('WORKER_POLL_INTERVAL', 0.5)),
+        block_timeout=float(os.environ['WORKER_BLOCK_TIMEOUT']) if 'WORKER_BLOCK_TIMEOUT' in os.environ else None,
+        batch_size=int(os.environ.get('WORKER_BATCH_SIZE', 1)),
+        maintenance_interval=float(os.environ.get('WORKER_MAINTENANCE_INTERVAL', 30)),
+        mode=os.environ.get('WORKER_MODE', 'threads'),
+        max_concurrency=int(os.environ.get('WORKER_MAX_CONCURRENCY', 200)),
+        endpoint_concurrency=int(os.environ.get('WORKER_ENDPOINT_CONCURRENCY', 20)),
+        min_threads=int(os.environ['WORKER_MIN_THREADS']) if 'WORKER_MIN_THREADS' in os.environ else None,
+        max_threads=int(os.environ['WORKER_MAX_THREADS']) if 'WORKER_MAX_THREADS' in os.environ else None,
+        autoscale_interval=float(os.environ.get('WORKER_AUTOSCALE_INTERVAL', 10)),
+        target_drain_time=float(os.environ.get('WORKER_TARGET_DRAIN_TIME', 5)),
+        forward_batch_size=int(os.environ.get('WORKER_FORWARD_BATCH_SIZE', 0)),
+        forward_batch_wait=float(os.environ.get('WORKER_FORWARD_BATCH_WAIT_MS', 50)) / 1000,
+        drain_timeout=float(os.environ.get('WORKER_DRAIN_TIMEOUT', 25)),
+        transform_threads=int(os.environ.get('WORKER_TRANSFORM_THREADS', 2)),
+        prefetch=int(os.environ.get('WORKER_PREFETCH', 20)),
+        forward_buffer=int(os.environ.get('WORKER_FORWARD_BUFFER', 8))
+    )
     
     # Starte Flask-App in einem separaten Thread
     flask_port = int(os.environ.get('WORKER_API_PORT', 8083))
@@ -5,6 +5,7 @@ Datenmodelle für das evAlarm-IoT Gateway Management System
 from datetime import datetime, timezone
 import os  # Für Umgebungsvariablen
 import logging
+import threading
 from pymongo import MongoClient
 from bson.objectid import ObjectId
 import sys
@@ -19,14 +20,60 @@ logger = logging.getLogger(__name__)
 
 # MongoDB-Verbindung
 mongo_client = None
-db = None
+_database = None
+_indexes_created = False
+_connect_lock = threading.Lock()
+
+
+class _LazyDatabase:
+    """
+    Platzhalter für die MongoDB-Datenbank
+
+    Baut die Verbindung erst beim ersten Zugriff auf. So kostet der Import dieses
+    Moduls keine Netzwerkzugriffe; Ping und Indizes übernimmt initialize_db()
+    (z.B. beim Aufwärmen des Workers).
+    """
+
+    def _get(self):
+        _ensure_client()
+        return _database
+
+    def __getitem__(self, name):
+        return self._get()[name]
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+db = _LazyDatabase()
+
+def connect_db(connection_string=None, db_name=None):
+    """Legt den MongoDB-Client an, ohne auf den Server zu warten (die Verbindung entsteht im Hintergrund)"""
+    global mongo_client, _database
+    
+    # Umgebungsvariablen verwenden, falls parameter nicht angegeben wurden
+    if connection_string is None:
+        connection_string = os.environ.get('MONGODB_URI', 'mongodb://mongo:27017/')
+    
+    if db_name is None:
+        db_name = os.environ.get('MONGODB_DB', 'evalarm_iot')
+    
+    logger.info(f"Verbinde mit MongoDB: {connection_string}, DB: {db_name}")
+    mongo_client = MongoClient(connection_string, serverSelectionTimeoutMS=5000)
+    _database = mongo_client[db_name]
+
+def _ensure_client():
+    """Legt den MongoDB-Client an, falls noch keiner besteht (threadsicher)"""
+    with _connect_lock:
+        if _database is None:
+            connect_db()
 
 def initialize_db(connection_string=None, db_name=None):
     """Initialisiert die Verbindung zur MongoDB"""
-    global mongo_client, db
+    global mongo_client, _database, _indexes_created
     
     # Wenn die Verbindung bereits besteht, nichts tun
-    if mongo_client is not None and db is not None:
+    if mongo_client is not None and _database is not None and _indexes_created:
         try:
             # Teste die bestehende Verbindung
             mongo_client.admin.command('ping')
@@ -36,41 +83,29 @@ def initialize_db(connection_string=None, db_name=None):
             logger.warning(f"Bestehende MongoDB-Verbindung fehlgeschlagen: {str(e)}")
             # Bei Verbindungsfehler weitermachen und neu verbinden
             mongo_client = None
-            db = None
+            _database = None
+            _indexes_created = False
     
     try:
-        # Umgebungsvariablen verwenden, falls parameter nicht angegeben wurden
-        if connection_string is None:
-            connection_string = os.environ.get('MONGODB_URI', 'mongodb://mongo:27017/')
-        
-        if db_name is None:
-            db_name = os.environ.get('MONGODB_DB', 'evalarm_iot')
-        
-        logger.info(f"Verbinde mit MongoDB: {connection_string}, DB: {db_name}")
-        mongo_client = MongoClient(connection_string, serverSelectionTimeoutMS=5000)
+        if connection_string is not None or db_name is not None:
+            connect_db(connection_string, db_name)
+        else:
+            _ensure_client()
         
         # Teste die Verbindung
         mongo_client.admin.command('ping')
         
-        db = mongo_client[db_name]
-        
         # Indizes für schnellere Abfragen erstellen
-        db.customers.create_index("name", unique=True)
-        db.gateways.create_index("uuid", unique=True)
-        db.devices.create_index([("gateway_uuid", 1), ("device_id", 1)], unique=True)
+        _database.customers.create_index("name", unique=True)
+        _database.gateways.create_index("uuid", unique=True)
+        _database.devices.create_index([("gateway_uuid", 1), ("device_id", 1)], unique=True)
+        _indexes_created = True
         
-        logger.info(f"MongoDB-Verbindung erfolgreich hergestellt, Datenbank: {db_name}")
+        logger.info(f"MongoDB-Verbindung erfolgreich hergestellt, Datenbank: {_database.name}")
     except Exception as e:
         logger.error(f"Fehler beim Verbinden mit MongoDB: {str(e)}")
         raise
 
-# Initialisiere die Datenbank direkt beim Laden dieses Moduls
-try:
-    initialize_db()
-    logger.info("Datenbankverbindung beim Laden des Moduls erfolgreich initialisiert")
-except Exception as e:
-    logger.error(f"Fehler beim Initialisieren der Datenbankverbindung beim Laden des Moduls: {str(e)}")
-
 # Kunden-Modell
 class Customer:
     """Repräsentiert einen Kunden im System"""
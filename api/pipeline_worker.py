@@ -0,0 +1,341 @@
+"""
+Message Worker mit Pipeline-Stufen
+
+Statt jeden Job in einem Thread von der Queue bis zum Endpunkt zu bearbeiten,
+arbeitet dieser Worker in drei Stufen, die über begrenzte Puffer verbunden sind:
+
+    fetch  ->  [Puffer prefetch]  ->  transform  ->  [Puffer forward_buffer]  ->  forward
+
+- fetch holt Nachrichten im Voraus, damit die Redis-Latenz nicht in jeder
+  Weiterleitung steckt,
+- transform prüft und transformiert die Nachricht und ermittelt den Endpunkt,
+- forward sendet an den Endpunkt und meldet das Ergebnis an die Queue.
+
+Die Puffer sind begrenzt: Ist forward ausgelastet, füllt sich der Forward-Puffer,
+transform wartet, der Prefetch-Puffer füllt sich und fetch holt nichts mehr ab.
+So bleiben nie mehr als prefetch + forward_buffer Nachrichten abgeholt, aber noch
+nicht gesendet. Jede Stufe zählt Pufferfüllung, Durchsatz und die Zeit, die sie
+auf Platz in der nächsten Stufe gewartet hat.
+"""
+
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Callable
+
+from api.message_worker import MessageWorker
+from utils.circuit_breaker import EndpointUnavailableError
+
+logger = logging.getLogger('message-worker')
+
+
+class PipelineStage:
+    """
+    Eine Stufe der Pipeline mit begrenztem Eingangspuffer und Zählern
+    """
+
+    def __init__(self, name: str, capacity: int, workers: int, throughput_window: float = 10.0):
+        """
+        Args:
+            name: Name der Stufe
+            capacity: Größe des Eingangspuffers (0 = kein Puffer, z.B. für fetch)
+            workers: Anzahl der Threads der Stufe
+            throughput_window: Zeitfenster für den Durchsatz in Sekunden
+        """
+        self.name = name
+        self.capacity = capacity
+        self.workers = workers
+        self.buffer: queue.Queue = queue.Queue(maxsize=capacity) if capacity > 0 else None
+        self.throughput_window = throughput_window
+
+        self.processed = 0
+        self.busy = 0
+        self.blocked_seconds = 0.0
+        self._completions = deque()
+        self._lock = threading.Lock()
+
+    def free_slots(self) -> int:
+        """
+        Freie Plätze im Eingangspuffer
+        """
+        return self.capacity - self.buffer.qsize()
+
+    def put(self, item: Any, should_stop: Callable[[], bool], upstream: Optional['PipelineStage'] = None) -> bool:
+        """
+        Legt ein Element in den Eingangspuffer und wartet, solange er voll ist (Backpressure)
+
+        Args:
+            item: Das Element
+            should_stop: Liefert True, wenn nicht länger gewartet werden soll
+            upstream: Stufe, deren Wartezeit gezählt wird
+
+        Returns:
+            False, wenn vor dem Einreihen abgebrochen wurde
+        """
+        started = time.monotonic()
+        try:
+            while True:
+                try:
+                    self.buffer.put(item, timeout=0.2)
+                    return True
+                except queue.Full:
+                    if should_stop():
+                        return False
+        finally:
+            if upstream:
+                upstream.add_blocked(time.monotonic() - started)
+
+    def get(self, timeout: float = 0.2) -> Any:
+        """
+        Holt ein Element aus dem Eingangspuffer
+
+        Raises:
+            queue.Empty: Kein Element innerhalb von timeout
+        """
+        return self.buffer.get(timeout=timeout)
+
+    def drain_buffer(self) -> List[Any]:
+        """
+        Entnimmt alle Elemente des Eingangspuffers, ohne zu warten
+        """
+        items = []
+        while True:
+            try:
+                items.append(self.buffer.get_nowait())
+            except queue.Empty:
+                return items
+
+    def started(self) -> None:
+        with self._lock:
+            self.busy += 1
+
+    def finished(self, count: int = 1) -> None:
+        """
+        Meldet count bearbeitete Elemente
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.busy = max(0, self.busy - 1)
+            self.processed += count
+            self._completions.append((now, count))
+            self._prune(now)
+
+    def add_blocked(self, seconds: float) -> None:
+        with self._lock:
+            self.blocked_seconds += seconds
+
+    def _prune(self, now: float) -> None:
+        """
+        Entfernt Abschlüsse außerhalb des Zeitfensters (Lock muss gehalten werden)
+        """
+        while self._completions and now - self._completions[0][0] > self.throughput_window:
+            self._completions.popleft()
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Gibt Pufferfüllung, Auslastung und Durchsatz der Stufe zurück
+        """
+        with self._lock:
+            self._prune(time.monotonic())
+            throughput = sum(count for _, count in self._completions) / self.throughput_window
+            return {
+                'workers': self.workers,
+                'busy': self.busy,
+                'depth': self.buffer.qsize() if self.buffer else None,
+                'capacity': self.capacity or None,
+                'processed': self.processed,
+                'throughput_per_second': round(throughput, 2),
+                'blocked_seconds': round(self.blocked_seconds, 3)
+            }
+
+
+class PipelineMessageWorker(MessageWorker):
+    """
+    Worker, der Nachrichten in den Stufen fetch, transform und forward verarbeitet
+    """
+
+    def __init__(self, num_threads: int = 4, poll_interval: float = 0.5, block_timeout: Optional[float] = None,
+                 batch_size: int = 10, maintenance_interval: float = 30.0, transform_threads: int = 2,
+                 prefetch: int = 20, forward_buffer: int = 8, forward_batch_size: int = 0,
+                 forward_batch_wait: float = 0.05, drain_timeout: float = 25.0):
+        """
+        Initialisiere den Pipeline-Worker
+
+        Args:
+            num_threads: Anzahl der Threads der forward-Stufe
+            poll_interval: Zeit zwischen Queue-Abfragen in Sekunden (nur ohne blockierendes Abholen)
+            block_timeout: Wartezeit für blockierendes Abholen in Sekunden (None = Standardwert der Queue)
+            batch_size: Maximale Anzahl an Nachrichten pro Queue-Zugriff
+            maintenance_interval: Zeit zwischen zwei Wartungsläufen in Sekunden
+            transform_threads: Anzahl der Threads der transform-Stufe
+            prefetch: Größe des Puffers zwischen fetch und transform
+            forward_buffer: Größe des Puffers zwischen transform und forward
+            forward_batch_size: Maximale Anzahl Events pro gesammelter Weiterleitung (0 oder 1 = nicht sammeln)
+            forward_batch_wait: Maximale Wartezeit eines Events vor der gesammelten Weiterleitung in Sekunden
+            drain_timeout: Frist in Sekunden, in der laufende Nachrichten beim Herunterfahren abgeschlossen werden
+        """
+        super().__init__(num_threads=num_threads, poll_interval=poll_interval, block_timeout=block_timeout,
+                         batch_size=batch_size, maintenance_interval=maintenance_interval,
+                         forward_batch_size=forward_batch_size, forward_batch_wait=forward_batch_wait,
+                         drain_timeout=drain_timeout)
+        self.stages = {
+            'fetch': PipelineStage('fetch', 0, 1),
+            'transform': PipelineStage('transform', max(1, prefetch), max(1, transform_threads)),
+            'forward': PipelineStage('forward', max(1, forward_buffer), self.num_threads)
+        }
+        logger.info(f"Pipeline-Worker initialisiert: Prefetch {prefetch}, {transform_threads} Transform-Threads, "
+                    f"Forward-Puffer {forward_buffer}, {self.num_threads} Forward-Threads")
+
+    def _start_processing(self):
+        """
+        Startet die Threads aller Stufen (nach dem Aufwärmen)
+        """
+        self._spawn(self._fetch_loop, 'pipeline-fetch')
+        for index in range(self.stages['transform'].workers):
+            self._spawn(lambda: self._stage_loop('transform', self._transform), f"pipeline-transform-{index}")
+        for index in range(self.stages['forward'].workers):
+            self._spawn(lambda: self._stage_loop('forward', self._forward), f"pipeline-forward-{index}")
+
+        self._start_maintenance_thread()
+
+        if self.forward_batcher:
+            self.forward_batcher.start()
+
+        logger.info("Pipeline-Worker gestartet")
+
+    def _spawn(self, target: Callable, name: str):
+        thread = threading.Thread(target=target, name=name)
+        thread.daemon = True
+        thread.start()
+        self.threads.append(thread)
+
+    def _should_stop(self) -> bool:
+        return not self.running or self.draining
+
+    def _fetch_loop(self):
+        """
+        fetch-Stufe: holt so viele Nachrichten, wie im Prefetch-Puffer Platz ist
+        """
+        fetch = self.stages['fetch']
+        transform = self.stages['transform']
+        consumer_id = f"{self.consumer_prefix}:pipeline"
+
+        try:
+            self.queue.recover_inflight_messages(consumer_id)
+        except Exception as e:
+            logger.error(f"Fehler beim Wiederherstellen der Inflight-Nachrichten für {consumer_id}: {str(e)}")
+
+        while not self._should_stop():
+            free = transform.free_slots()
+            if free <= 0:
+                # Backpressure: Erst abholen, wenn transform wieder Platz hat
+                time.sleep(0.01)
+                fetch.add_blocked(0.01)
+                continue
+
+            try:
+                fetch.started()
+                jobs = self.queue.get_next_messages(min(self.batch_size, free), block_timeout=self.block_timeout,
+                                                    consumer_id=consumer_id)
+            except Exception as e:
+                fetch.finished(0)
+                logger.error(f"Fehler beim Abholen von Nachrichten: {str(e)}")
+                time.sleep(1)
+                continue
+            fetch.finished(len(jobs))
+
+            if not jobs:
+                if not self.block_timeout:
+                    time.sleep(self.poll_interval)
+                continue
+
+            self._track_jobs(jobs)
+            if self.draining:
+                # Während des Drain abgeholt: sofort an andere Worker übergeben
+                self._hand_off([job['id'] for job in jobs])
+                break
+
+            for job in jobs:
+                if not transform.put(job, self._should_stop, upstream=fetch):
+                    self._hand_off([job['id']])
+
+        logger.info("fetch-Stufe beendet")
+
+    def _stage_loop(self, name: str, handler: Callable[[Any], None]):
+        """
+        Verarbeitet Elemente aus dem Eingangspuffer einer Stufe, bis der Worker stoppt
+        """
+        stage = self.stages[name]
+        while not self._should_stop():
+            try:
+                item = stage.get()
+            except queue.Empty:
+                continue
+
+            stage.started()
+            try:
+                handler(item)
+            except Exception as e:
+                logger.error(f"Fehler in der {name}-Stufe: {str(e)}")
+            finally:
+                stage.finished()
+
+        # Noch nicht begonnene Nachrichten übernehmen andere Worker
+        pending = stage.drain_buffer()
+        if pending:
+            self._hand_off([item['id'] if name == 'transform' else item[0]['id'] for item in pending])
+        logger.info(f"{name}-Stufe beendet")
+
+    def _transform(self, job: Dict[str, Any]):
+        """
+        transform-Stufe: prüft und transformiert die Nachricht und ermittelt den Endpunkt
+        """
+        try:
+            status, context = self._prepare_job(job)
+            if status == 'failed':
+                self._report_results([(job, status, context)])
+                return
+
+            resolved = self.message_forwarder.resolve_endpoint(
+                context['transformed_message'],
+                'auto',
+                gateway_uuid=context['gateway_id']
+            )
+        except Exception as e:
+            logger.error(f"Fehler bei der Transformation von Nachricht {job['id']}: {str(e)}")
+            self._report_results([(job, 'failed', str(e))])
+            return
+
+        if not self.stages['forward'].put((job, context, resolved), self._should_stop, upstream=self.stages['transform']):
+            self._hand_off([job['id']])
+
+    def _forward(self, item):
+        """
+        forward-Stufe: sendet die Nachricht und meldet das Ergebnis an die Queue
+        """
+        job, context, resolved = item
+        try:
+            status, payload = self._forward_job(job, context, resolved)
+        except EndpointUnavailableError as e:
+            logger.warning(f"Nachricht {job['id']} zurückgestellt: {str(e)}")
+            status, payload = 'deferred', e.retry_after
+        except Exception as e:
+            logger.error(f"Fehler bei der Weiterleitung von Nachricht {job['id']}: {str(e)}")
+            status, payload = 'failed', str(e)
+
+        # Gesammelte Nachrichten meldet der ForwardBatcher nach dem Versand
+        if status != 'batched':
+            self._report_results([(job, status, payload)])
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Gibt den Status des Workers inklusive der Pipeline-Stufen zurück
+        """
+        status = super().get_status()
+        status.update({
+            'mode': 'pipeline',
+            'pipeline': {name: stage.get_status() for name, stage in self.stages.items()}
+        })
+        return status
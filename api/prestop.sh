@@ -0,0 +1,38 @@
+#!/bin/bash
+
+# Pre-Stop-Hook für Container-Orchestrierung (z.B. Kubernetes lifecycle.preStop)
+# Startet den Drain des Workers und wartet, bis alle laufenden Nachrichten
+# abgeschlossen oder an andere Worker übergeben sind.
+#
+# Aufruf: api/prestop.sh [Port]   (Standard: PROCESSOR_PORT bzw. 8082, Worker-Service: 8083)
+
+PORT=${1:-${PROCESSOR_PORT:-8082}}
+DRAIN_TIMEOUT=${WORKER_DRAIN_TIMEOUT:-25}
+URL="http://127.0.0.1:$PORT/api/v1/system/drain"
+
+echo "Starte Drain über $URL (Frist ${DRAIN_TIMEOUT}s)..."
+if ! curl -s -f -X POST -H "Content-Type: application/json" -d "{\"timeout\": $DRAIN_TIMEOUT}" "$URL" > /dev/null; then
+    echo "Drain konnte nicht gestartet werden - Worker läuft vermutlich nicht."
+    exit 0
+fi
+
+# Etwas länger als die Frist warten, damit die Übergabe der restlichen Nachrichten durchläuft
+DEADLINE=$(( $(date +%s) + ${DRAIN_TIMEOUT%.*} + 5 ))
+while [ "$(date +%s)" -lt "$DEADLINE" ]; do
+    STATE=$(curl -s "$URL" | python3 -c "
+import json
+import sys
+try:
+    print(json.load(sys.stdin)['data']['state'])
+except Exception:
+    print('unknown')
+")
+    if [ "$STATE" = "drained" ]; then
+        echo "Drain abgeschlossen."
+        exit 0
+    fi
+    sleep 1
+done
+
+echo "Drain nicht innerhalb der Frist abgeschlossen."
+exit 0
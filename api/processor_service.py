@@ -58,6 +58,13 @@ except ImportError:
     LEARNING_SYSTEM_AVAILABLE = False
     learning_engine = None
 
+# Versuche, den gemeinsamen Template-Store zu importieren (benötigt redis)
+try:
+    from utils.template_store import get_template_store
+except ImportError:
+    logger.warning("Konnte Template-Store nicht importieren. Templates werden aus dem Verzeichnis gelistet.")
+    get_template_store = lambda: None
+
 app = Flask(__name__)
 
 # Template-Auswahl basierend auf Nachrichteninhalt
@@ -749,16 +756,32 @@ def generate_template():
 def list_templates():
     """
     Listet alle verfügbaren Templates auf
-    """
-    # Statt nur Beispiel-Template-Namen zurückgeben, echte Template-Objekte erstellen
-    templates = []
-    template_names = ["evalarm_payload", "evalarm_panic", "standard", "evalarm_panic_v2", "evalarm", "evalarm_status", "endpoints", "customer_config", "evalarm_alarm", "evalarm_raw"]
     
-    # Aktuelle Zeit für created_at
+    Mit TEMPLATE_STORE=redis stammen die Templates (mit Version) aus dem gemeinsamen
+    Template-Store, sonst aus dem Templates-Verzeichnis.
+    """
     import datetime
     current_time = datetime.datetime.now().isoformat()
     
-    for name in template_names:
+    versions = None
+    try:
+        store = get_template_store()
+        if store is not None:
+            versions = store.get_versions()
+    except Exception as e:
+        logger.error(f"Template-Store nicht erreichbar, verwende Templates-Verzeichnis: {str(e)}")
+    
+    if versions is None:
+        templates_dir = os.path.join(project_dir, 'templates')
+        versions = {}
+        if os.path.isdir(templates_dir):
+            for filename in os.listdir(templates_dir):
+                name, extension = os.path.splitext(filename)
+                if extension in ('.json', '.yaml', '.yml') and os.path.isfile(os.path.join(templates_dir, filename)):
+                    versions[name] = None
+    
+    templates = []
+    for name in sorted(versions):
         # Provider-Typ bestimmen
         provider_type = 'generic'
         if 'evalarm' in name:
@@ -766,14 +789,13 @@ def list_templates():
         elif 'roombanker' in name:
             provider_type = 'roombanker'
         
-        # Template-Objekt erstellen
-        template = {
+        templates.append({
             'id': name,
             'name': name,
             'provider_type': provider_type,
-            'created_at': current_time
-        }
-        templates.append(template)
+            'created_at': current_time,
+            'version': versions[name]
+        })
     
     return jsonify({
         'status': 'success',
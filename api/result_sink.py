@@ -0,0 +1,411 @@
+"""
+Schreibt Verarbeitungsergebnisse gesammelt in die MongoDB
+
+Die Redis-Queue behält nur die letzten 100 Ergebnisse (results_list). Für Audits
+und Dashboards puffert der ResultSink abgeschlossene und fehlgeschlagene
+Verarbeitungen im Worker und schreibt sie mit insert_many in die Collection
+'processing_results' - sobald batch_size Einträge gesammelt sind oder
+spätestens nach flush_interval Sekunden.
+
+Ein TTL-Index auf processed_at löscht Einträge nach retention_days Tagen. Die
+Abfrage (query_results) blättert mit einem Cursor auf (processed_at, _id) und
+filtert nach Gateway, Kunde, Status und Zeitraum.
+
+Ist die MongoDB nicht erreichbar, bleiben die Einträge im Puffer (höchstens
+max_buffer, danach werden die ältesten verworfen) und werden beim nächsten
+Flush erneut geschrieben. Die _id wird beim Erfassen vergeben, ein erneutes
+Schreiben erzeugt daher keine Duplikate.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Tuple, Optional, Union
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
+
+logger = logging.getLogger('message-worker')
+
+RESULTS_COLLECTION = 'processing_results'
+
+# Fehlercode der MongoDB für doppelte Schlüssel
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _utcnow() -> datetime:
+    """
+    Aktuelle Zeit in UTC, auf Millisekunden gekürzt (Genauigkeit von BSON-Datumswerten)
+    """
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def _to_datetime(value: Union[str, int, float, datetime, None]) -> Optional[datetime]:
+    """
+    Wandelt Unix-Zeitstempel oder ISO-8601-Zeichenketten in ein UTC-Datum um
+
+    Raises:
+        ValueError: Wert ist weder Zeitstempel noch ISO-8601
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        return datetime.fromtimestamp(float(value), timezone.utc)
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Ungültiger Zeitpunkt: {value}")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class ResultSink:
+    """
+    Puffert Verarbeitungsergebnisse und schreibt sie gesammelt in die MongoDB
+    """
+
+    def __init__(self, collection=None, batch_size: int = 200, flush_interval: float = 2.0,
+                 retention_days: int = 30, max_buffer: int = 10000):
+        """
+        Initialisiere den ResultSink
+
+        Args:
+            collection: MongoDB-Collection (None = 'processing_results' der Standard-Datenbank)
+            batch_size: Anzahl Einträge, ab der sofort geschrieben wird
+            flush_interval: Maximale Zeit in Sekunden, die ein Eintrag im Puffer wartet
+            retention_days: Aufbewahrungsdauer in Tagen (TTL-Index, 0 = unbegrenzt)
+            max_buffer: Maximale Anzahl gepufferter Einträge, wenn die MongoDB nicht erreichbar ist
+        """
+        self._collection = collection
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.max_buffer = max(self.batch_size, max_buffer)
+
+        self.buffer: deque = deque()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        # Nur ein Flush gleichzeitig, damit die Reihenfolge beim erneuten Einreihen erhalten bleibt
+        self.flush_lock = threading.Lock()
+        self.running = False
+        self.flush_thread: Optional[threading.Thread] = None
+        self.indexes_created = False
+
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from api.models import db
+            self._collection = db[RESULTS_COLLECTION]
+        return self._collection
+
+    def ensure_indexes(self) -> None:
+        """
+        Legt den TTL-Index und die Indizes für die Abfragen an
+        """
+        collection = self.collection
+        collection.create_index([('gateway_id', ASCENDING), ('processed_at', DESCENDING), ('_id', DESCENDING)])
+        collection.create_index([('customer', ASCENDING), ('processed_at', DESCENDING), ('_id', DESCENDING)])
+
+        if self.retention_days > 0:
+            expire_after = int(self.retention_days * 86400)
+            try:
+                collection.create_index('processed_at', expireAfterSeconds=expire_after)
+            except OperationFailure:
+                # Index besteht mit anderer Aufbewahrungsdauer: Dauer anpassen
+                collection.database.command('collMod', collection.name, index={
+                    'keyPattern': {'processed_at': 1},
+                    'expireAfterSeconds': expire_after
+                })
+        else:
+            collection.create_index('processed_at')
+        self.indexes_created = True
+
+    @staticmethod
+    def build_record(job: Dict[str, Any], status: str, payload: Any) -> Dict[str, Any]:
+        """
+        Baut den Eintrag für eine verarbeitete Nachricht
+
+        Args:
+            job: Die Nachricht mit Metadaten aus der Queue
+            status: 'completed' oder 'failed'
+            payload: Ergebnis von _finish_job bzw. Fehlermeldung
+        """
+        customer_config = job.get('customer_config') or {}
+        record = {
+            '_id': ObjectId(),
+            'job_id': job['id'],
+            'status': status,
+            'gateway_id': job.get('gateway_id'),
+            'customer': customer_config.get('name'),
+            'tenant': job.get('tenant'),
+            'template': job.get('template'),
+            'priority': job.get('priority'),
+            'attempt': job.get('retry_count', 0) + 1,
+            'queued_at': _to_datetime(job.get('queued_at') or job.get('created_at')),
+            'processed_at': _utcnow()
+        }
+
+        if status == 'completed' and isinstance(payload, dict):
+            record['customer'] = payload.get('customer') or record['customer']
+            record['response_status'] = payload.get('response_status')
+            if payload.get('batch'):
+                record['batch_id'] = payload['batch'].get('id')
+        elif status != 'completed':
+            record['error'] = str(payload)
+        return record
+
+    def record(self, job: Dict[str, Any], status: str, payload: Any) -> None:
+        """
+        Erfasst das Ergebnis einer Nachricht
+        """
+        self.record_many([(job, status, payload)])
+
+    def record_many(self, results: List[Tuple[Dict[str, Any], str, Any]]) -> None:
+        """
+        Erfasst die Ergebnisse mehrerer Nachrichten
+
+        Args:
+            results: Liste von (Job, Status, Ergebnis) mit Status 'completed' oder 'failed'
+        """
+        records = [self.build_record(job, status, payload) for job, status, payload in results]
+        if not records:
+            return
+
+        with self.lock:
+            self._append(records)
+            if len(self.buffer) >= self.batch_size:
+                self.wakeup.notify()
+
+    def _append(self, records: List[Dict[str, Any]], front: bool = False) -> None:
+        """
+        Reiht Einträge in den Puffer ein und verwirft bei Überlauf die ältesten (Lock muss gehalten werden)
+        """
+        if front:
+            self.buffer.extendleft(reversed(records))
+        else:
+            self.buffer.extend(records)
+
+        overflow = len(self.buffer) - self.max_buffer
+        if overflow > 0:
+            for _ in range(overflow):
+                self.buffer.popleft()
+            self.dropped += overflow
+            logger.warning(f"Ergebnispuffer voll, {overflow} älteste Einträge verworfen")
+
+    def flush(self) -> int:
+        """
+        Schreibt alle gepufferten Einträge in Batches von batch_size
+
+        Returns:
+            Anzahl der geschriebenen Einträge
+        """
+        written = 0
+        with self.flush_lock:
+            while True:
+                with self.lock:
+                    records = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+                if not records:
+                    return written
+
+                try:
+                    if not self.indexes_created:
+                        self.ensure_indexes()
+                    self.collection.insert_many(records, ordered=False)
+                    inserted = len(records)
+                except BulkWriteError as e:
+                    # Doppelte _id: bereits bei einem früheren Versuch geschrieben
+                    errors = e.details.get('writeErrors', [])
+                    rejected = [error for error in errors if error.get('code') != DUPLICATE_KEY_ERROR]
+                    inserted = len(records) - len(rejected)
+                    if rejected:
+                        with self.lock:
+                            self.write_errors += len(rejected)
+                            self.last_error = rejected[0].get('errmsg')
+                        logger.error(f"{len(rejected)} Ergebnisse konnten nicht gespeichert werden: "
+                                     f"{rejected[0].get('errmsg')}")
+                except PyMongoError as e:
+                    # MongoDB nicht erreichbar: beim nächsten Flush erneut versuchen
+                    with self.lock:
+                        self._append(records, front=True)
+                        self.last_error = str(e)
+                    logger.error(f"Fehler beim Speichern von {len(records)} Ergebnissen: {str(e)}")
+                    return written
+
+                written += inserted
+                with self.lock:
+                    self.written += inserted
+
+    def start(self) -> None:
+        """
+        Startet den Thread, der den Puffer regelmäßig schreibt
+        """
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+        self.flush_thread = threading.Thread(target=self._flush_loop, name='result-sink')
+        self.flush_thread.daemon = True
+        self.flush_thread.start()
+        logger.info(f"ResultSink gestartet (Batch {self.batch_size}, Intervall {self.flush_interval}s, "
+                    f"Aufbewahrung {self.retention_days} Tage)")
+
+    def stop(self) -> None:
+        """
+        Beendet den Flush-Thread und schreibt den restlichen Puffer
+        """
+        with self.lock:
+            self.running = False
+            self.wakeup.notify()
+        if self.flush_thread:
+            self.flush_thread.join()
+            self.flush_thread = None
+        self.flush()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self.lock:
+                if self.running and len(self.buffer) < self.batch_size:
+                    self.wakeup.wait(timeout=self.flush_interval)
+                if not self.running:
+                    return
+            self.flush()
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Gibt Puffer- und Schreibstatistiken zurück
+        """
+        with self.lock:
+            return {
+                'batch_size': self.batch_size,
+                'flush_interval': self.flush_interval,
+                'retention_days': self.retention_days,
+                'buffered': len(self.buffer),
+                'written': self.written,
+                'dropped': self.dropped,
+                'write_errors': self.write_errors,
+                'last_error': self.last_error
+            }
+
+
+def _parse_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, ObjectId]]:
+    """
+    Zerlegt einen Cursor der Form '<processed_at in ms>:<_id>'
+    """
+    if not cursor:
+        return None
+    try:
+        millis, object_id = cursor.split(':', 1)
+        return datetime.fromtimestamp(int(millis) / 1000, timezone.utc), ObjectId(object_id)
+    except Exception:
+        raise ValueError(f"Ungültiger Cursor: {cursor}")
+
+
+def _format_cursor(record: Dict[str, Any]) -> str:
+    processed_at = _to_datetime(record['processed_at'])
+    return f"{round(processed_at.timestamp() * 1000)}:{record['_id']}"
+
+
+def query_results(collection=None, gateway_id: Optional[str] = None, customer: Optional[str] = None,
+                  status: Optional[str] = None, since=None, until=None, cursor: Optional[str] = None,
+                  limit: int = 50) -> Dict[str, Any]:
+    """
+    Gibt gespeicherte Verarbeitungsergebnisse seitenweise zurück (neueste zuerst)
+
+    Args:
+        collection: MongoDB-Collection (None = 'processing_results' der Standard-Datenbank)
+        gateway_id: Nur Ergebnisse dieses Gateways
+        customer: Nur Ergebnisse dieses Kunden (Name)
+        status: Nur Ergebnisse mit diesem Status ('completed' oder 'failed')
+        since: Frühester Verarbeitungszeitpunkt (Unix-Zeitstempel oder ISO 8601)
+        until: Spätester Verarbeitungszeitpunkt (Unix-Zeitstempel oder ISO 8601, exklusiv)
+        cursor: next_cursor der vorherigen Seite (None = erste Seite)
+        limit: Seitengröße (maximal 500)
+
+    Returns:
+        Dictionary mit 'results' und 'next_cursor' (None auf der letzten Seite)
+
+    Raises:
+        ValueError: Ungültiger Cursor oder Zeitpunkt
+    """
+    if collection is None:
+        from api.models import db
+        collection = db[RESULTS_COLLECTION]
+    limit = max(1, min(int(limit), 500))
+
+    query: Dict[str, Any] = {}
+    if gateway_id:
+        query['gateway_id'] = gateway_id
+    if customer:
+        query['customer'] = customer
+    if status:
+        query['status'] = status
+
+    since, until = _to_datetime(since), _to_datetime(until)
+    time_range = {}
+    if since:
+        time_range['$gte'] = since
+    if until:
+        time_range['$lt'] = until
+    if time_range:
+        query['processed_at'] = time_range
+
+    position = _parse_cursor(cursor)
+    if position:
+        processed_at, object_id = position
+        query['$or'] = [
+            {'processed_at': {'$lt': processed_at}},
+            {'processed_at': processed_at, '_id': {'$lt': object_id}}
+        ]
+
+    records = list(collection.find(query).sort([('processed_at', DESCENDING), ('_id', DESCENDING)]).limit(limit + 1))
+    next_cursor = _format_cursor(records[limit - 1]) if len(records) > limit else None
+
+    results = []
+    for record in records[:limit]:
+        record = dict(record)
+        record['id'] = str(record.pop('_id'))
+        for key in ('processed_at', 'queued_at'):
+            if isinstance(record.get(key), datetime):
+                record[key] = _to_datetime(record[key]).isoformat()
+        results.append(record)
+
+    return {'results': results, 'next_cursor': next_cursor}
+
+
+# Singleton-Instanz (None, wenn RESULT_SINK_ENABLED nicht gesetzt ist)
+_result_sink: Optional[ResultSink] = None
+_result_sink_lock = threading.Lock()
+
+
+def get_result_sink() -> Optional[ResultSink]:
+    """
+    Gibt den ResultSink des Prozesses zurück und legt ihn beim ersten Aufruf aus der Umgebung an
+
+    Returns:
+        ResultSink oder None, wenn das Speichern der Ergebnisse deaktiviert ist
+    """
+    global _result_sink
+    if os.environ.get('RESULT_SINK_ENABLED', 'false').lower() not in ('true', '1', 'yes'):
+        return None
+    with _result_sink_lock:
+        if _result_sink is None:
+            _result_sink = ResultSink(
+                batch_size=int(os.environ.get('RESULT_SINK_BATCH_SIZE', 200)),
+                flush_interval=int(os.environ.get('RESULT_SINK_FLUSH_MS', 2000)) / 1000,
+                retention_days=int(os.environ.get('RESULT_RETENTION_DAYS', 30)),
+                max_buffer=int(os.environ.get('RESULT_SINK_MAX_BUFFER', 10000))
+            )
+        return _result_sink
@@ -9,6 +9,7 @@ export WORKER_PORT=8083
 export WORKER_API_PORT=$WORKER_PORT
 export WORKER_THREADS=2
 export WORKER_POLL_INTERVAL=0.5
+export WORKER_BLOCK_TIMEOUT=1.0
 
 # Redis-Konfiguration aus Processor-Skript übernehmen
 export REDIS_PORT=6379
@@ -61,5 +62,11 @@ if [ "$CONNECTION_SUCCESSFUL" = false ]; then
     exit 1
 fi
 
-echo "Starte Message Worker auf Port $WORKER_PORT mit Redis-Host: $REDIS_HOST"
-python3 message_worker.py 
\ No newline at end of file
+# Mit WORKER_PROCESSES (0 = Anzahl CPU-Kerne) startet der Supervisor mehrere Worker-Prozesse
+if [ -n "$WORKER_PROCESSES" ]; then
+    echo "Starte Worker-Supervisor mit Redis-Host: $REDIS_HOST"
+    python3 worker_supervisor.py
+else
+    echo "Starte Message Worker auf Port $WORKER_PORT mit Redis-Host: $REDIS_HOST"
+    python3 message_worker.py
+fi 
\ No newline at end of file
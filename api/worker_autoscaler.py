@@ -0,0 +1,124 @@
+"""
+Autoscaler für die Worker-Threads
+
+Berechnet aus der Anzahl wartender Nachrichten und der zuletzt gemessenen
+Verarbeitungszeit, wie viele Worker-Threads benötigt werden, um die Queue
+innerhalb von target_drain_time Sekunden abzuarbeiten. Vergrößert wird sofort,
+verkleinert erst, wenn der Bedarf mehrere Intervalle hintereinander niedriger
+war, und dann nur um einen Thread pro Intervall.
+"""
+
+import math
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+
+class WorkerAutoscaler:
+    """
+    Entscheidet über die Anzahl der Worker-Threads zwischen min_workers und max_workers
+    """
+
+    def __init__(self, min_workers: int, max_workers: int, target_drain_time: float = 5.0,
+                 scale_down_delay: int = 3, smoothing: float = 0.2, history_size: int = 20):
+        """
+        Initialisiere den Autoscaler
+
+        Args:
+            min_workers: Minimale Anzahl an Threads
+            max_workers: Maximale Anzahl an Threads
+            target_drain_time: Zeit in Sekunden, in der wartende Nachrichten abgearbeitet sein sollen
+            scale_down_delay: Anzahl Intervalle mit geringerem Bedarf, bevor ein Thread entfernt wird
+            smoothing: Gewicht neuer Messwerte im gleitenden Mittel der Verarbeitungszeit (0-1)
+            history_size: Anzahl der gespeicherten Entscheidungen
+        """
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.target_drain_time = target_drain_time
+        self.scale_down_delay = max(1, scale_down_delay)
+        self.smoothing = smoothing
+        self.processing_time: Optional[float] = None
+        self.low_demand_intervals = 0
+        self.decisions = deque(maxlen=history_size)
+        self.last_evaluation: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def record_processing_time(self, seconds: float) -> None:
+        """
+        Nimmt die Verarbeitungszeit einer Nachricht in das gleitende Mittel auf
+        """
+        with self._lock:
+            if self.processing_time is None:
+                self.processing_time = seconds
+            else:
+                self.processing_time += self.smoothing * (seconds - self.processing_time)
+
+    def desired_workers(self, pending: int, current: int) -> int:
+        """
+        Berechnet den Bedarf an Threads (begrenzt auf min_workers..max_workers)
+
+        Args:
+            pending: Anzahl wartender Nachrichten
+            current: Aktuelle Anzahl an Threads
+        """
+        if pending <= 0:
+            desired = self.min_workers
+        elif self.processing_time is None:
+            # Noch keine Messwerte: vorsichtig um einen Thread wachsen
+            desired = current + 1
+        else:
+            desired = math.ceil(pending * self.processing_time / self.target_drain_time)
+        return max(self.min_workers, min(self.max_workers, desired))
+
+    def evaluate(self, pending: int, current: int) -> int:
+        """
+        Entscheidet über die neue Anzahl an Threads
+
+        Args:
+            pending: Anzahl wartender Nachrichten
+            current: Aktuelle Anzahl an Threads
+
+        Returns:
+            Neue Anzahl an Threads
+        """
+        desired = self.desired_workers(pending, current)
+        target = current
+        reason = None
+
+        if desired > current:
+            target = desired
+            self.low_demand_intervals = 0
+            reason = 'queue_backlog'
+        elif desired < current:
+            self.low_demand_intervals += 1
+            if self.low_demand_intervals >= self.scale_down_delay:
+                target = current - 1
+                self.low_demand_intervals = 0
+                reason = 'idle' if pending <= 0 else 'low_demand'
+        else:
+            self.low_demand_intervals = 0
+
+        self.last_evaluation = {
+            'timestamp': time.time(),
+            'pending': pending,
+            'processing_time_avg': self.processing_time,
+            'current': current,
+            'desired': desired
+        }
+        if target != current:
+            self.decisions.append(dict(self.last_evaluation, target=target, reason=reason))
+        return target
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Gibt Konfiguration, letzte Bewertung und die letzten Entscheidungen zurück
+        """
+        return {
+            'min_workers': self.min_workers,
+            'max_workers': self.max_workers,
+            'target_drain_time': self.target_drain_time,
+            'processing_time_avg': self.processing_time,
+            'last_evaluation': self.last_evaluation,
+            'decisions': list(self.decisions)
+        }
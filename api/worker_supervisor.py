@@ -0,0 +1,269 @@
+"""
+Worker Supervisor
+
+Startet mehrere Message-Worker-Prozesse (Standard: ein Prozess pro CPU-Kern),
+damit Template-Rendering und JSON-Verarbeitung nicht am GIL eines einzelnen
+Prozesses hängen. Der Supervisor
+- leitet SIGTERM/SIGINT an alle Kindprozesse weiter und wartet auf deren Ende,
+- startet abgestürzte Kindprozesse mit steigender Wartezeit neu,
+- meldet seinen eigenen Status als Heartbeat, den /system/health zusammen mit
+  den Heartbeats der Kindprozesse ausgibt.
+
+Jeder Kindprozess erhält eine feste Consumer-ID (<host>:p<index>), damit ein
+neu gestarteter Prozess die Inflight-Nachrichten seines Vorgängers übernimmt.
+
+Start: python api/worker_supervisor.py (Konfiguration über WORKER_* Variablen)
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import threading
+import multiprocessing
+from typing import Dict, Any, Optional, Callable
+
+import redis
+
+# Füge das Projektverzeichnis zum Python-Pfad hinzu
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.message_queue import get_message_queue
+
+logger = logging.getLogger('worker-supervisor')
+
+# Läuft ein Kindprozess länger als diese Zeit, gilt er als stabil und die Wartezeit beginnt von vorn
+STABLE_RUNTIME = 60.0
+
+
+def run_worker_process(index: int, health_interval: float = 5.0):
+    """
+    Einstiegspunkt eines Kindprozesses: startet einen Message Worker und meldet regelmäßig seinen Status
+
+    Args:
+        index: Nummer des Prozesses (bestimmt die Consumer-ID)
+        health_interval: Zeit zwischen zwei Heartbeats in Sekunden
+    """
+    # Signal-Handler des Supervisors nicht erben; der Worker installiert eigene
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    worker_id = f"{socket.gethostname()}:p{index}"
+    os.environ['WORKER_CONSUMER_ID'] = worker_id
+
+    # Erst im Kindprozess importieren, damit Datenbank- und Redis-Verbindungen nicht geteilt werden
+    from api.message_worker import init_worker
+
+    worker = init_worker(
+        num_threads=int(os.environ.get('WORKER_THREADS', 2)),
+        poll_interval=float(os.environ.get('WORKER_POLL_INTERVAL', 0.5)),
+        block_timeout=float(os.environ['WORKER_BLOCK_TIMEOUT']) if 'WORKER_BLOCK_TIMEOUT' in os.environ else None,
+        batch_size=int(os.environ.get('WORKER_BATCH_SIZE', 1)),
+        maintenance_interval=float(os.environ.get('WORKER_MAINTENANCE_INTERVAL', 30)),
+        mode=os.environ.get('WORKER_MODE', 'threads'),
+        max_concurrency=int(os.environ.get('WORKER_MAX_CONCURRENCY', 200)),
+        endpoint_concurrency=int(os.environ.get('WORKER_ENDPOINT_CONCURRENCY', 20)),
+        min_threads=int(os.environ['WORKER_MIN_THREADS']) if 'WORKER_MIN_THREADS' in os.environ else None,
+        max_threads=int(os.environ['WORKER_MAX_THREADS']) if 'WORKER_MAX_THREADS' in os.environ else None,
+        autoscale_interval=float(os.environ.get('WORKER_AUTOSCALE_INTERVAL', 10)),
+        target_drain_time=float(os.environ.get('WORKER_TARGET_DRAIN_TIME', 5)),
+        forward_batch_size=int(os.environ.get('WORKER_FORWARD_BATCH_SIZE', 0)),
+        forward_batch_wait=float(os.environ.get('WORKER_FORWARD_BATCH_WAIT_MS', 50)) / 1000,
+        drain_timeout=float(os.environ.get('WORKER_DRAIN_TIMEOUT', 25)),
+        transform_threads=int(os.environ.get('WORKER_TRANSFORM_THREADS', 2)),
+        prefetch=int(os.environ.get('WORKER_PREFETCH', 20)),
+        forward_buffer=int(os.environ.get('WORKER_FORWARD_BUFFER', 8))
+    )
+    queue = worker.queue
+
+    try:
+        while worker.running:
+            try:
+                status = worker.get_status()
+                status.pop('queue_status', None)
+                status.update({'role': 'worker', 'pid': os.getpid(), 'index': index})
+                queue.report_worker_health(worker_id, status)
+            except redis.RedisError as e:
+                logger.error(f"Heartbeat von {worker_id} fehlgeschlagen: {str(e)}")
+            worker.stop_event.wait(health_interval)
+    finally:
+        if worker.running:
+            worker.stop()
+        try:
+            queue.remove_worker_health(worker_id)
+        except redis.RedisError:
+            pass
+
+
+class WorkerSupervisor:
+    """
+    Startet und überwacht mehrere Worker-Prozesse
+    """
+
+    def __init__(self, num_processes: Optional[int] = None, health_interval: float = 5.0,
+                 shutdown_timeout: float = 30.0, restart_max_delay: float = 60.0,
+                 target: Callable = run_worker_process, queue=None):
+        """
+        Initialisiere den Supervisor
+
+        Args:
+            num_processes: Anzahl der Worker-Prozesse (None oder 0 = Anzahl der CPU-Kerne)
+            health_interval: Zeit zwischen zwei Heartbeats in Sekunden
+            shutdown_timeout: Maximale Wartezeit auf das Ende der Kindprozesse beim Stoppen
+            restart_max_delay: Maximale Wartezeit vor dem Neustart eines abgestürzten Prozesses
+            target: Funktion, die im Kindprozess ausgeführt wird (erhält index und health_interval)
+            queue: Message Queue für Heartbeats (Standard: get_message_queue())
+        """
+        self.num_processes = num_processes or os.cpu_count() or 1
+        self.health_interval = health_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.restart_max_delay = restart_max_delay
+        self.target = target
+        self.queue = queue
+        self.supervisor_id = f"{socket.gethostname()}:supervisor"
+
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.started_at: Dict[int, float] = {}
+        self.restart_at: Dict[int, float] = {}
+        self.restarts: Dict[int, int] = {index: 0 for index in range(self.num_processes)}
+        self.consecutive_failures: Dict[int, int] = {index: 0 for index in range(self.num_processes)}
+        self.stop_event = threading.Event()
+
+    def _signal_handler(self, signum, frame):
+        """
+        Handler für SIGINT und SIGTERM
+        """
+        logger.info(f"Signal {signum} empfangen, Worker-Prozesse werden gestoppt...")
+        self.stop_event.set()
+
+    def _spawn(self, index: int):
+        """
+        Startet den Kindprozess mit der angegebenen Nummer
+        """
+        process = multiprocessing.Process(
+            target=self.target,
+            args=(index, self.health_interval),
+            name=f"message-worker-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.time()
+        self.restart_at.pop(index, None)
+        logger.info(f"Worker-Prozess {index} gestartet (PID {process.pid})")
+
+    def check_processes(self):
+        """
+        Prüft alle Kindprozesse und startet beendete Prozesse nach einer Wartezeit neu
+        """
+        now = time.time()
+        for index in range(self.num_processes):
+            process = self.processes.get(index)
+
+            if process is not None and not process.is_alive():
+                process.join()
+                runtime = now - self.started_at.get(index, now)
+                if runtime >= STABLE_RUNTIME:
+                    self.consecutive_failures[index] = 0
+                self.consecutive_failures[index] += 1
+                delay = min(self.restart_max_delay, 2 ** (self.consecutive_failures[index] - 1))
+                logger.warning(f"Worker-Prozess {index} (PID {process.pid}) beendet mit Code {process.exitcode}, "
+                               f"Neustart in {delay:.0f}s")
+                self.processes[index] = None
+                self.restart_at[index] = now + delay
+                self.restarts[index] += 1
+
+            if self.processes.get(index) is None and now >= self.restart_at.get(index, 0):
+                self._spawn(index)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Gibt den Status des Supervisors und seiner Kindprozesse zurück
+        """
+        children = []
+        for index in range(self.num_processes):
+            process = self.processes.get(index)
+            children.append({
+                'index': index,
+                'pid': process.pid if process else None,
+                'alive': bool(process and process.is_alive()),
+                'restarts': self.restarts[index]
+            })
+        return {
+            'role': 'supervisor',
+            'running': not self.stop_event.is_set(),
+            'pid': os.getpid(),
+            'num_processes': self.num_processes,
+            'alive_processes': len([child for child in children if child['alive']]),
+            'total_restarts': sum(self.restarts.values()),
+            'children': children
+        }
+
+    def _report_health(self):
+        """
+        Meldet den Status des Supervisors als Heartbeat
+        """
+        try:
+            self.queue.report_worker_health(self.supervisor_id, self.get_status())
+        except redis.RedisError as e:
+            logger.error(f"Heartbeat des Supervisors fehlgeschlagen: {str(e)}")
+
+    def run(self):
+        """
+        Startet alle Kindprozesse und überwacht sie, bis SIGTERM oder SIGINT empfangen wird
+        """
+        if self.queue is None:
+            self.queue = get_message_queue()
+
+        signal.signal(signal.SIGTERM, self._signal_handler)
+        signal.signal(signal.SIGINT, self._signal_handler)
+
+        logger.info(f"Supervisor startet {self.num_processes} Worker-Prozesse")
+        last_report = 0.0
+        try:
+            while not self.stop_event.is_set():
+                self.check_processes()
+                if time.time() - last_report >= self.health_interval:
+                    self._report_health()
+                    last_report = time.time()
+                self.stop_event.wait(0.5)
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """
+        Sendet SIGTERM an alle Kindprozesse und beendet übrig gebliebene Prozesse nach shutdown_timeout hart
+        """
+        self.stop_event.set()
+        alive = [process for process in self.processes.values() if process is not None and process.is_alive()]
+        for process in alive:
+            process.terminate()
+
+        deadline = time.time() + self.shutdown_timeout
+        for process in alive:
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                logger.warning(f"Worker-Prozess {process.name} (PID {process.pid}) reagiert nicht, wird beendet")
+                process.kill()
+                process.join()
+
+        try:
+            self.queue.remove_worker_health(self.supervisor_id)
+        except (redis.RedisError, AttributeError):
+            pass
+        logger.info("Alle Worker-Prozesse gestoppt")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    supervisor = WorkerSupervisor(
+        num_processes=int(os.environ.get('WORKER_PROCESSES', 0)),
+        health_interval=float(os.environ.get('WORKER_HEALTH_INTERVAL', 5)),
+        shutdown_timeout=float(os.environ.get('WORKER_SHUTDOWN_TIMEOUT', 30))
+    )
+    supervisor.run()
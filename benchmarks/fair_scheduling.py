@@ -0,0 +1,160 @@
+"""
+Lasttest: Latenz eines ruhigen Kunden neben einem Kunden mit Nachrichtenflut
+
+Ein "lauter" Tenant schickt zu Beginn eine Flut von Nachrichten und danach
+dauerhaft mehr, als die Worker abarbeiten können. Ein "ruhiger" Tenant schickt
+in festen Abständen einzelne Nachrichten. Gemessen wird die Zeit vom Einreihen
+bis zum Abschluss je Tenant, einmal ohne Fair Scheduling, einmal mit Fair
+Scheduling und einmal zusätzlich mit Obergrenze je Tenant.
+
+Die Verarbeitung wird mit simulierter Zeit nachgestellt (feste Bearbeitungszeit
+je Nachricht, Worker als Slots). Abholen und Abschließen laufen dabei über die
+echte Queue, sodass die gemessene Reihenfolge der Scheduling-Logik entspricht.
+
+Aufruf:
+    python benchmarks/fair_scheduling.py                # gegen REDIS_HOST/REDIS_PORT
+    python benchmarks/fair_scheduling.py --fake         # gegen fakeredis
+    python benchmarks/fair_scheduling.py --workers 8 --flood 5000
+
+ACHTUNG: Verwendet den Präfix 'benchmark' und löscht dessen Queues.
+"""
+
+import os
+import sys
+import heapq
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import message_queue as message_queue_module
+from api.message_queue import RedisMessageQueue
+
+MESSAGE = {'code': 2030, 'subdeviceid': 673922542395461}
+
+
+def percentile(values, quantile):
+    """Perzentil einer Liste (nächster Rang)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+def arrivals(args):
+    """Erzeugt die Ankunftszeiten beider Tenants, sortiert nach Zeit"""
+    events = [(0.0, 'noisy')] * args.flood
+    step = 1.0 / args.noisy_rate
+    t = 0.0
+    while t < args.duration:
+        events.append((t, 'noisy'))
+        t += step
+    t = 0.0
+    while t < args.duration:
+        events.append((t, 'quiet'))
+        t += args.quiet_interval
+    return sorted(events, key=lambda event: event[0])
+
+
+def run_variant(options: dict, args) -> dict:
+    queue = RedisMessageQueue(
+        host=os.environ.get('REDIS_HOST', 'localhost'),
+        port=int(os.environ.get('REDIS_PORT', 6379)),
+        prefix='benchmark',
+        dedup_window=0,
+        **options
+    )
+    queue.clear_all_queues()
+
+    pending_arrivals = arrivals(args)
+    arrival_index = 0
+    enqueued_at = {}
+    latencies = {'noisy': [], 'quiet': []}
+    completions = []  # Heap aus (Zeitpunkt, Worker, Job)
+    free_workers = list(range(args.workers))
+    now = 0.0
+
+    while arrival_index < len(pending_arrivals) or completions:
+        # Abgeschlossene Nachrichten melden und Worker freigeben
+        while completions and completions[0][0] <= now:
+            _, worker, job = heapq.heappop(completions)
+            queue.mark_as_completed(job['id'], {'response_status': 200})
+            latencies[job['tenant']].append(now - enqueued_at.pop(job['id']))
+            free_workers.append(worker)
+
+        # Neue Nachrichten einreihen
+        while arrival_index < len(pending_arrivals) and pending_arrivals[arrival_index][0] <= now:
+            _, tenant = pending_arrivals[arrival_index]
+            message_id = queue.enqueue_message(MESSAGE, 'evalarm_panic', 'auto', gateway_id=f"gw-{tenant}", tenant=tenant)
+            enqueued_at[message_id] = now
+            arrival_index += 1
+
+        # Freie Worker holen je eine Nachricht
+        while free_workers:
+            job = queue.get_next_message(block_timeout=0, consumer_id=f"worker-{free_workers[-1]}")
+            if not job:
+                break
+            heapq.heappush(completions, (now + args.service_time, free_workers.pop(), job))
+
+        # Zum nächsten Ereignis springen
+        next_times = []
+        if arrival_index < len(pending_arrivals):
+            next_times.append(pending_arrivals[arrival_index][0])
+        if completions:
+            next_times.append(completions[0][0])
+        if not next_times:
+            break
+        now = max(now, min(next_times))
+
+    queue.clear_all_queues()
+    return {
+        tenant: {
+            'count': len(values),
+            'p50': percentile(values, 0.5),
+            'p99': percentile(values, 0.99),
+            'max': max(values) if values else None
+        }
+        for tenant, values in latencies.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lasttest Fair Scheduling (Noisy Neighbour)')
+    parser.add_argument('--workers', type=int, default=4, help='Anzahl gleichzeitiger Worker (Standard: 4)')
+    parser.add_argument('--service-time', type=float, default=0.05, help='Bearbeitungszeit je Nachricht in Sekunden')
+    parser.add_argument('--flood', type=int, default=1000, help='Nachrichten des lauten Tenants zu Beginn')
+    parser.add_argument('--noisy-rate', type=float, default=100.0, help='Nachrichten/s des lauten Tenants danach')
+    parser.add_argument('--quiet-interval', type=float, default=0.5, help='Abstand der Nachrichten des ruhigen Tenants')
+    parser.add_argument('--duration', type=float, default=20.0, help='Dauer der Ankünfte in Sekunden (simuliert)')
+    parser.add_argument('--fake', action='store_true', help='fakeredis statt eines echten Redis verwenden')
+    args = parser.parse_args()
+
+    # Log-Ausgaben je Job würden die Messung dominieren
+    logging.getLogger('message-queue').setLevel(logging.ERROR)
+
+    if args.fake:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        message_queue_module.redis.Redis = lambda **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True)
+
+    variants = [
+        ('ohne Fair Scheduling', {'fair_scheduling': False}),
+        ('Fair Scheduling', {'fair_scheduling': True}),
+        ('Fair + Obergrenze', {'fair_scheduling': True, 'tenant_concurrency': max(1, args.workers // 2)}),
+    ]
+
+    capacity = args.workers / args.service_time
+    print(f"{args.workers} Worker à {args.service_time * 1000:.0f} ms (Kapazität {capacity:.0f}/s), "
+          f"lauter Tenant: {args.flood} sofort + {args.noisy_rate:.0f}/s, "
+          f"ruhiger Tenant: alle {args.quiet_interval}s, {args.duration:.0f}s simuliert")
+    print(f"{'Variante':<22}{'ruhig p50 s':>12}{'ruhig p99 s':>12}{'ruhig max s':>12}{'laut p50 s':>12}{'laut p99 s':>12}")
+
+    for name, options in variants:
+        result = run_variant(options, args)
+        quiet, noisy = result['quiet'], result['noisy']
+        print(f"{name:<22}{quiet['p50']:>12.2f}{quiet['p99']:>12.2f}{quiet['max']:>12.2f}"
+              f"{noisy['p50']:>12.2f}{noisy['p99']:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
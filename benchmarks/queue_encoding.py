@@ -0,0 +1,146 @@
+"""
+Benchmark: Speicherbedarf und CPU-Zeit der Message Queue je Job-Kodierung
+
+Vergleicht vollständig eingebettete Kundenkonfiguration mit Konfiguration per
+Referenz sowie die Codecs 'json' und 'orjson'. Gemessen werden der Redis-Speicher
+nach dem Einreihen aller Jobs und die CPU-Zeit des Clients für Einreihen,
+Abholen und Abschließen.
+
+Aufruf:
+    python benchmarks/queue_encoding.py                 # gegen REDIS_HOST/REDIS_PORT
+    python benchmarks/queue_encoding.py --fake          # gegen fakeredis (Speicher = Summe der Job-Größen)
+    python benchmarks/queue_encoding.py --jobs 10000
+
+ACHTUNG: Verwendet den Präfix 'benchmark' und löscht dessen Queues.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import message_queue as message_queue_module
+from api.message_queue import RedisMessageQueue, ORJSON_AVAILABLE
+
+# Typische Kundenkonfiguration mit Zugangsdaten und Headern
+CUSTOMER_CONFIG = {
+    'id': '6620f0c2a1b2c3d4e5f60718',
+    'name': 'Musterkunde Pflegeheim Nord',
+    'contact_person': 'Max Mustermann',
+    'email': 'technik@musterkunde.example',
+    'phone': '+49 30 1234567',
+    'status': 'active',
+    'immediate_forwarding': True,
+    'response_mode': 'immediate',
+    'api_config': {
+        'url': 'https://tas.dev.evalarm.de/api/v1/espa',
+        'username': 'musterkunde-api',
+        'password': 'xK9#mP2$vL8@qR5!wT3&',
+        'auth_type': 'basic',
+        'headers': {
+            'X-EVALARM-API-VERSION': '2.1.5',
+            'Content-Type': 'application/json',
+            'User-Agent': 'roombanker-iot-gateway/1.0'
+        }
+    },
+    'created_at': '2024-04-18T10:22:31',
+    'updated_at': '2024-05-02T08:01:12'
+}
+
+MESSAGE = {
+    'code': 2030,
+    'gateway_id': 'gw-c490b022-cc18-407e-a07e-a355747a8fdd',
+    'ts': 1747344697,
+    'subdevicelist': [{
+        'id': 673922542395461,
+        'value': {'alarmstatus': 'alarm', 'alarmtype': 'panic', 'batterystatus': 'connected', 'onlinestatus': 'online'}
+    }]
+}
+
+VARIANTS = [
+    ('inline/json', {'codec': 'json', 'config_by_reference': False}),
+    ('referenz/json', {'codec': 'json', 'config_by_reference': True}),
+    ('referenz/orjson', {'codec': 'orjson', 'config_by_reference': True}),
+]
+
+
+def queue_memory(queue: RedisMessageQueue, fake: bool) -> int:
+    """Speicherbedarf der Queue in Bytes"""
+    if fake:
+        # fakeredis kennt kein INFO memory: Summe der gespeicherten Job- und Konfigurationsgrößen
+        jobs = queue.redis_client.lrange(queue.main_queue, 0, -1)
+        configs = queue.redis_client.hvals(queue.config_key)
+        return sum(len(item.encode('utf-8')) for item in jobs + configs)
+    return queue.redis_client.info('memory')['used_memory']
+
+
+def run_variant(name: str, options: dict, jobs: int, batch_size: int, fake: bool) -> dict:
+    queue = RedisMessageQueue(
+        host=os.environ.get('REDIS_HOST', 'localhost'),
+        port=int(os.environ.get('REDIS_PORT', 6379)),
+        prefix='benchmark',
+        **options
+    )
+    queue.clear_all_queues()
+    memory_before = 0 if fake else queue_memory(queue, fake)
+    
+    cpu_start = time.process_time()
+    for _ in range(jobs):
+        queue.enqueue_message(MESSAGE, 'evalarm_panic', 'auto', customer_config=CUSTOMER_CONFIG,
+                              gateway_id=MESSAGE['gateway_id'])
+    enqueue_cpu = time.process_time() - cpu_start
+    
+    memory = queue_memory(queue, fake) - memory_before
+    
+    cpu_start = time.process_time()
+    processed = 0
+    while processed < jobs:
+        batch = queue.get_next_messages(batch_size, block_timeout=0, consumer_id='benchmark')
+        if not batch:
+            break
+        queue.mark_many_completed([(job['id'], {'response_status': 200}) for job in batch])
+        processed += len(batch)
+    process_cpu = time.process_time() - cpu_start
+    
+    queue.clear_all_queues()
+    return {
+        'variant': name,
+        'memory_mb': memory / 1024 / 1024,
+        'bytes_per_job': memory / jobs,
+        'enqueue_cpu': enqueue_cpu,
+        'process_cpu': process_cpu
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark der Job-Kodierung der Message Queue')
+    parser.add_argument('--jobs', type=int, default=100000, help='Anzahl der Jobs (Standard: 100000)')
+    parser.add_argument('--batch-size', type=int, default=100, help='Batch-Größe beim Abholen')
+    parser.add_argument('--fake', action='store_true', help='fakeredis statt eines echten Redis verwenden')
+    args = parser.parse_args()
+    
+    # Log-Ausgaben je Job würden die Messung dominieren
+    logging.getLogger('message-queue').setLevel(logging.ERROR)
+    
+    if args.fake:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        message_queue_module.redis.Redis = lambda **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True)
+    
+    print(f"{args.jobs} Jobs, Batch-Größe {args.batch_size}{' (fakeredis)' if args.fake else ''}")
+    print(f"{'Variante':<18}{'Speicher MB':>12}{'Bytes/Job':>11}{'CPU Einreihen s':>17}{'CPU Verarbeiten s':>19}")
+    
+    for name, options in VARIANTS:
+        if options['codec'] == 'orjson' and not ORJSON_AVAILABLE:
+            print(f"{name:<18}übersprungen (orjson nicht installiert)")
+            continue
+        result = run_variant(name, options, args.jobs, args.batch_size, args.fake)
+        print(f"{result['variant']:<18}{result['memory_mb']:>12.1f}{result['bytes_per_job']:>11.0f}"
+              f"{result['enqueue_cpu']:>17.2f}{result['process_cpu']:>19.2f}")
+
+
+if __name__ == '__main__':
+    main()
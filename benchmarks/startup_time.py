@@ -0,0 +1,102 @@
+"""
+Benchmark: Startzeit des Message Workers
+
+Startet für jeden Lauf einen frischen Python-Prozess und misst dort
+- den Import von api.message_worker,
+- das Anlegen des MessageWorker (ohne Laden von Templates und Endpunkten),
+- das parallele Aufwärmen (Templates, Endpunkte, MongoDB, Redis) je Schritt,
+- die Zeit vom Prozessstart bis zur Bereitschaft (/system/ready).
+
+Die Summe der Schrittzeiten entspricht ungefähr einem sequenziellen Start.
+
+Aufruf:
+    python benchmarks/startup_time.py                       # gegen REDIS_HOST/MONGODB_URI
+    python benchmarks/startup_time.py --fake --skip-mongo   # ohne Redis- und MongoDB-Server
+    python benchmarks/startup_time.py --runs 10
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json
+import logging
+import os
+import sys
+import time
+
+process_started = time.perf_counter()
+sys.path.insert(0, {project_dir!r})
+logging.disable(logging.CRITICAL)
+
+if {fake!r}:
+    import fakeredis
+    import redis
+    redis.Redis = lambda **kwargs: fakeredis.FakeRedis(decode_responses=True)
+
+from api.message_queue import init_message_queue
+init_message_queue(host=os.environ.get('REDIS_HOST', 'localhost'), port=int(os.environ.get('REDIS_PORT', 6379)),
+                   prefix='benchmark')
+
+started = time.perf_counter()
+from api import message_worker
+imported = time.perf_counter()
+
+message_worker.signal.signal = lambda *args: None
+worker = message_worker.MessageWorker(num_threads=1)
+constructed = time.perf_counter()
+
+if {skip_mongo!r}:
+    steps = worker._warm_up_steps()
+    worker._warm_up_steps = lambda: {{name: step for name, step in steps.items() if name not in ('mongodb', 'endpoints')}}
+status = worker.warm_up()
+warmed = time.perf_counter()
+
+print(json.dumps({{
+    'import': imported - started,
+    'construct': constructed - imported,
+    'warm_up': warmed - constructed,
+    'steps': {{name: step['seconds'] for name, step in status['steps'].items()}},
+    'state': status['state'],
+    'total': warmed - process_started
+}}))
+'''
+
+
+def run_once(args) -> dict:
+    code = CHILD.format(project_dir=PROJECT_DIR, fake=args.fake, skip_mongo=args.skip_mongo)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startzeit des Message Workers messen')
+    parser.add_argument('--runs', type=int, default=5, help='Anzahl der Läufe (Standard: 5)')
+    parser.add_argument('--fake', action='store_true', help='fakeredis statt eines echten Redis verwenden')
+    parser.add_argument('--skip-mongo', action='store_true', help='MongoDB und Kunden-Endpunkte nicht aufwärmen')
+    args = parser.parse_args()
+
+    runs = [run_once(args) for _ in range(args.runs)]
+
+    def median(key):
+        return statistics.median(run[key] for run in runs)
+
+    print(f"{args.runs} Läufe, Median in Millisekunden (Zustand: {', '.join(sorted({run['state'] for run in runs}))})")
+    print(f"{'Import api.message_worker':<32}{median('import') * 1000:>10.1f}")
+    print(f"{'MessageWorker()':<32}{median('construct') * 1000:>10.1f}")
+    for name in runs[0]['steps']:
+        step = statistics.median(run['steps'][name] for run in runs)
+        print(f"{'  Aufwärmen ' + name:<32}{step * 1000:>10.1f}")
+    sequential = statistics.median(sum(run['steps'].values()) for run in runs)
+    print(f"{'Aufwärmen parallel':<32}{median('warm_up') * 1000:>10.1f}   (sequenziell ~{sequential * 1000:.1f})")
+    print(f"{'Prozessstart bis bereit':<32}{median('total') * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
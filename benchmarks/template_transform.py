@@ -0,0 +1,97 @@
+"""
+Benchmark: Durchsatz von TemplateEngine.transform_message
+
+Vergleicht drei Varianten:
+- pro Nachricht eine neue Jinja2-Umgebung, jeder String wird neu kompiliert (früherer Ablauf),
+- vorkompilierte transform-Bäume mit Jinja2-Templates,
+- vorkompilierte transform-Bäume mit nativen Render-Funktionen (utils.template_compiler).
+
+Aufruf:
+    python benchmarks/template_transform.py
+    python benchmarks/template_transform.py --messages 20000 --template evalarm_panic
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+import jinja2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.template_engine import TemplateEngine
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+MESSAGE = {
+    'code': 2030,
+    'gateway_id': 'gw-c490b022-cc18-407e-a07e-a355747a8fdd',
+    'ts': 1747344697,
+    'subdevicelist': [{
+        'id': 673922542395461,
+        'value': {'alarmstatus': 'alarm', 'alarmtype': 'panic', 'batterystatus': 'connected', 'onlinestatus': 'online'}
+    }]
+}
+
+CUSTOMER_CONFIG = {'name': 'Musterkunde', 'evalarm_namespace': 'musterkunde.evalarm.de'}
+
+
+class JinjaPlanTemplateEngine(TemplateEngine):
+    """
+    Vorkompilierte transform-Bäume, aber alle Strings als Jinja2-Templates
+    """
+
+    def _compile_string(self, source):
+        return ('template', self.render_env.from_string(source))
+
+
+class UncompiledTemplateEngine(JinjaPlanTemplateEngine):
+    """
+    Früherer Ablauf: neue Jinja2-Umgebung und Kompilieren aller Strings pro Nachricht
+    """
+
+    def _get_plan(self, template_name, template=None):
+        self.render_env = jinja2.Environment(autoescape=True)
+        return self._compile_transform((template or self.templates[template_name])['data'].get('transform', {}))
+
+
+def measure(engine: TemplateEngine, template_name: str, count: int) -> float:
+    """
+    Transformiert count Nachrichten und gibt Nachrichten pro Sekunde zurück
+    """
+    started = time.perf_counter()
+    for index in range(count):
+        message = dict(MESSAGE, ts=MESSAGE['ts'] + index)
+        if engine.transform_message(message, template_name, customer_config=CUSTOMER_CONFIG) is None:
+            raise RuntimeError(f"Transformation mit Template '{template_name}' fehlgeschlagen")
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Durchsatz von TemplateEngine.transform_message messen')
+    parser.add_argument('--messages', type=int, default=5000, help='Anzahl Nachrichten je Durchlauf (Standard: 5000)')
+    parser.add_argument('--template', default='evalarm_panic', help='Template (Standard: evalarm_panic)')
+    args = parser.parse_args()
+
+    # Das Logging pro Nachricht würde die Messung dominieren
+    logging.disable(logging.CRITICAL)
+
+    results = {}
+    for label, engine_class in (('pro Nachricht kompiliert', UncompiledTemplateEngine),
+                                ('vorkompiliert, Jinja2', JinjaPlanTemplateEngine),
+                                ('vorkompiliert, nativ', TemplateEngine)):
+        engine = engine_class(TEMPLATES_DIR)
+        measure(engine, args.template, min(200, args.messages))  # Aufwärmen
+        results[label] = measure(engine, args.template, args.messages)
+
+    print(f"Template '{args.template}', {args.messages} Nachrichten")
+    for label, rate in results.items():
+        print(f"{label:<30}{rate:>12.0f} Nachrichten/s")
+    before, jinja_plan, native = results.values()
+    print(f"{'Faktor Jinja2 / nativ':<30}{jinja_plan / before:>11.1f}x {native / before:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
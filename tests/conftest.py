@@ -0,0 +1,43 @@
+"""
+Gemeinsame Fixtures der Tests
+"""
+
+import time
+
+import pytest
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """
+    Frischer fakeredis-Server, auf den alle Redis-Clients eines Tests zugreifen
+
+    Ersetzt redis.Redis, so dass Message Queue, Template-Store usw. ohne Redis-Server laufen.
+    """
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = pytest.importorskip("redis")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis, 'Redis',
+        lambda **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True)
+    )
+    return server
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def wait_for():
+    """
+    Wartet bis zu timeout Sekunden, bis condition() zutrifft
+
+    Aufruf: assert wait_for(lambda: ..., timeout=5.0)
+    """
+    return _wait_for
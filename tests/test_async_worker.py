@@ -0,0 +1,207 @@
+"""
+Tests für den asynchronen Worker (api.async_worker)
+
+Die Queue läuft gegen fakeredis, der Endpunkt ist ein Stub anstelle von
+MessageForwarder.send_to_endpoint.
+"""
+
+import sys
+import os
+import asyncio
+import threading
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("fakeredis")
+
+from api import message_queue as message_queue_module
+from api import message_worker as message_worker_module
+from api.async_worker import AsyncMessageWorker, ForwardResponse
+from api.message_queue import RedisMessageQueue
+from utils.circuit_breaker import EndpointUnavailableError
+
+
+class StubEndpoint:
+    """Nimmt Anfragen entgegen, zählt gleichzeitige Anfragen und hält sie bis release gesetzt ist"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.calls = 0
+        self.finished = 0
+
+    def send_to_endpoint(self, message, endpoint_name, endpoint):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.error:
+                raise self.error
+            self.release.wait(5.0)
+            return ForwardResponse(200, 'ok')
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.finished += 1
+
+
+class RecordingSink:
+    def __init__(self):
+        self.records = []
+
+    def record(self, job, status, payload):
+        self.records.append((job['id'], status))
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def endpoint():
+    return StubEndpoint()
+
+
+@pytest.fixture
+def worker(server, monkeypatch, endpoint):
+    monkeypatch.setattr(message_queue_module, 'message_queue', RedisMessageQueue(prefix='test'))
+    monkeypatch.setattr(message_worker_module.signal, 'signal', lambda *args: None)
+
+    worker = AsyncMessageWorker(poll_interval=0.01, block_timeout=0, batch_size=10, max_concurrency=10,
+                                endpoint_concurrency=2, drain_timeout=1.0)
+    worker._warm_up_steps = lambda: {'templates': worker._warm_up_templates}
+    monkeypatch.setattr(worker.message_forwarder, 'resolve_endpoint',
+                        lambda message, endpoint_name, gateway_id: ('stub', {'url': 'http://stub.invalid'}))
+    monkeypatch.setattr(worker.message_forwarder, 'send_to_endpoint', endpoint.send_to_endpoint)
+    yield worker
+    endpoint.release.set()
+    if worker.running:
+        worker.stop()
+
+
+def _enqueue(queue, count):
+    return [queue.enqueue_message({'code': 2030, 'subdeviceid': index}, 'evalarm_panic', 'auto',
+                                  customer_config={'name': 'Testkunde'}, gateway_id='gw-1')
+            for index in range(count)]
+
+
+def _stats(worker):
+    return worker.queue.get_queue_status()['stats']
+
+
+def test_forwarding_respects_endpoint_concurrency(worker, endpoint, wait_for):
+    _enqueue(worker.queue, 6)
+    worker.start()
+
+    # Alle Nachrichten sind abgeholt, aber nur zwei Anfragen gleichzeitig beim Endpunkt
+    assert wait_for(lambda: len(worker.tasks) == 6 and endpoint.active == 2)
+    assert worker.get_status()['in_flight'] == 6
+
+    endpoint.release.set()
+    assert wait_for(lambda: int(_stats(worker)['total_processed']) == 6)
+    assert endpoint.calls == 6
+    assert endpoint.max_active == 2
+
+
+def test_unavailable_endpoint_defers_jobs(worker, endpoint, monkeypatch, wait_for):
+    endpoint.error = EndpointUnavailableError('stub', 'Circuit offen', 30.0)
+    deferrals = []
+    defer_jobs = worker.queue.defer_jobs
+
+    def record_deferrals(jobs):
+        deferrals.extend(jobs)
+        return defer_jobs(jobs)
+
+    monkeypatch.setattr(worker.queue, 'defer_jobs', record_deferrals)
+    ids = _enqueue(worker.queue, 2)
+    worker.start()
+
+    assert wait_for(lambda: int(_stats(worker).get('total_deferred', 0)) == 2)
+    assert sorted(deferrals) == sorted((job_id, 30.0) for job_id in ids)
+    status = worker.queue.get_queue_status()
+    assert status['delayed_count'] == 2
+    assert status['processing_count'] == 0
+    assert int(status['stats']['total_failed']) == 0
+
+
+def test_jobs_fetched_during_drain_are_handed_off(worker, endpoint, monkeypatch, wait_for):
+    get_next_messages = worker.queue.get_next_messages
+
+    def fetch_while_draining(*args, **kwargs):
+        jobs = get_next_messages(*args, **kwargs)
+        if jobs:
+            # Der Drain beginnt, während der Abruf noch unterwegs ist
+            worker.drain(wait=False)
+        return jobs
+
+    monkeypatch.setattr(worker.queue, 'get_next_messages', fetch_while_draining)
+    _enqueue(worker.queue, 2)
+    worker.start()
+
+    assert wait_for(lambda: worker.get_drain_status()['state'] == 'drained')
+    assert worker.get_drain_status()['handed_off'] == 2
+    status = worker.queue.get_queue_status()
+    assert status['pending_count'] == 2
+    assert status['processing_count'] == 0
+    assert endpoint.calls == 0
+
+
+def test_drain_hands_off_slow_jobs_and_discards_late_results(worker, endpoint, wait_for):
+    _enqueue(worker.queue, 2)
+    worker.start()
+    assert wait_for(lambda: endpoint.active == 2)
+
+    status = worker.drain(timeout=0.2)
+    assert status['state'] == 'drained'
+    assert status['handed_off'] == 2
+
+    # Die Antworten kommen erst nach der Übergabe an andere Worker
+    endpoint.release.set()
+    assert wait_for(lambda: endpoint.finished == 2)
+    for thread in worker.threads:
+        thread.join(5.0)
+    worker.executor.shutdown(wait=True)
+
+    queue_status = worker.queue.get_queue_status()
+    assert int(queue_status['stats']['total_processed']) == 0
+    assert queue_status['pending_count'] == 2
+    assert queue_status['processing_count'] == 0
+
+
+def test_late_result_of_handed_off_job_is_discarded(worker, endpoint):
+    worker.result_sink = RecordingSink()
+    worker._warm_up_templates()
+    _enqueue(worker.queue, 1)
+    jobs = worker.queue.get_next_messages(1, block_timeout=0, consumer_id='draining')
+    worker._track_jobs(jobs)
+    assert worker.drain(timeout=0)['handed_off'] == 1
+
+    endpoint.release.set()
+    asyncio.run(worker._handle_job(jobs[0], None))
+
+    assert worker.result_sink.records == []
+    assert int(_stats(worker)['total_processed']) == 0
+    assert worker.queue.get_queue_status()['pending_count'] == 1
+
+
+def test_deferral_past_the_limit_is_recorded_as_failure(worker, endpoint):
+    endpoint.error = EndpointUnavailableError('stub', 'Circuit offen', 30.0)
+    worker.result_sink = RecordingSink()
+    worker.queue.max_deferrals = 1
+    worker._warm_up_templates()
+    job_id = _enqueue(worker.queue, 1)[0]
+    worker.queue.get_next_message(block_timeout=0, consumer_id='w1')
+    worker.queue.defer_jobs([(job_id, 0.0)])
+    worker.queue.promote_due_jobs()
+
+    job = worker.queue.get_next_message(block_timeout=0, consumer_id='w1')
+    worker._track_jobs([job])
+    asyncio.run(worker._handle_job(job, None))
+
+    assert worker.result_sink.records == [(job_id, 'failed')]
+    assert [failed['id'] for failed in worker.queue.get_failed_messages()] == []
+    assert worker.queue.get_queue_status()['delayed_count'] == 1
@@ -0,0 +1,74 @@
+"""
+Tests für Circuit Breaker und Bulkhead der Weiterleitung
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.circuit_breaker import CircuitBreaker, Bulkhead
+
+
+def test_opens_when_failure_rate_exceeds_threshold():
+    breaker = CircuitBreaker('ep', failure_rate_threshold=0.5, window_size=10, minimum_calls=4)
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.retry_after() > 1.0
+
+
+def test_stays_closed_below_minimum_calls():
+    breaker = CircuitBreaker('ep', minimum_calls=5)
+    for _ in range(4):
+        breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_half_open_allows_single_probe_and_closes_on_success():
+    breaker = CircuitBreaker('ep', minimum_calls=1, open_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens_circuit():
+    breaker = CircuitBreaker('ep', minimum_calls=1, open_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.get_status()['times_opened'] == 2
+
+
+def test_bulkhead_rejects_beyond_limit():
+    bulkhead = Bulkhead('ep', max_concurrent=2)
+
+    assert bulkhead.try_acquire()
+    assert bulkhead.try_acquire()
+    assert not bulkhead.try_acquire()
+
+    bulkhead.release()
+
+    assert bulkhead.try_acquire()
+    assert bulkhead.get_status() == {'in_flight': 2, 'max_concurrent': 2, 'rejected': 1}
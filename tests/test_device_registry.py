@@ -195,6 +195,21 @@ def test_message_codes():
     
     print("✓ Message code tests passed!")
 
+def test_message_priority():
+    """Test priority derivation used for the queue lanes"""
+    print("\n=== Testing Message Priority ===")
+    
+    panic = {"code": 2030, "subdeviceid": 673922542395461, "alarmstatus": "alarm", "alarmtype": "panic"}
+    environment = {"code": 2001, "temperature": 21.5, "humidity": 40}
+    panic_without_code = {"subdevicelist": [{"id": 1, "value": {"alarmstatus": "alarm", "alarmtype": "panic"}}]}
+    
+    assert device_registry.get_message_priority(panic) == "critical"
+    assert device_registry.get_message_priority(environment) == "normal"
+    assert device_registry.get_message_priority(panic_without_code) == "high"
+    assert device_registry.get_message_priority({"foo": "bar"}) == "low"
+    
+    print("✓ Message priority tests passed!")
+
 def main():
     """Run all tests"""
     print("Starting Device Registry Tests...")
@@ -206,6 +221,7 @@ def main():
         test_template_suggestions()
         test_mqtt_topics()
         test_message_codes()
+        test_message_priority()
         
         print("\n✅ All tests passed! The central Device Registry is working correctly.")
         
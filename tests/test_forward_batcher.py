@@ -0,0 +1,160 @@
+"""
+Tests für das gesammelte Weiterleiten von Events (ForwardBatcher)
+"""
+
+import sys
+import os
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.forward_batcher import ForwardBatcher
+from utils.circuit_breaker import EndpointUnavailableError
+
+Response = namedtuple('Response', ['status_code', 'text'])
+
+
+class RecordingForwarder:
+    """Nimmt gesendete Payloads auf; lehnt Payloads mit einem Event 'bad' mit 422 ab"""
+
+    def __init__(self, error=None):
+        self.sent = []
+        self.error = error
+
+    def send_to_endpoint(self, message, endpoint_name, endpoint):
+        if self.error:
+            raise self.error
+        self.sent.append((endpoint_name, message))
+        if any(event.get('bad') for event in message['events']):
+            return Response(422, 'invalid event')
+        return Response(200, 'ok')
+
+
+def finish(job, context, response):
+    if response.status_code >= 400:
+        return 'failed', f"HTTP {response.status_code}"
+    return 'completed', {'response_status': response.status_code}
+
+
+def make_job(index, namespace='ns1', priority='normal', bad=False):
+    job = {'id': f"job-{index}", 'priority': priority, 'template': 'evalarm_status'}
+    event = {'namespace': namespace, 'id': index}
+    if bad:
+        event['bad'] = True
+    return job, {'transformed_message': {'events': [event]}}
+
+
+def make_batcher(forwarder, max_events=3, max_wait=10.0):
+    reported = []
+    batcher = ForwardBatcher(forwarder, finish, reported.extend, max_events=max_events, max_wait=max_wait)
+    return batcher, reported
+
+
+def test_full_batch_is_sent_as_one_request():
+    forwarder = RecordingForwarder()
+    batcher, reported = make_batcher(forwarder, max_events=3)
+
+    for index in range(3):
+        job, context = make_job(index)
+        assert batcher.submit(job, context, 'ep', {})
+
+    assert len(forwarder.sent) == 1
+    assert [event['id'] for event in forwarder.sent[0][1]['events']] == [0, 1, 2]
+    assert [(job['id'], status) for job, status, _ in reported] == [('job-0', 'completed'), ('job-1', 'completed'), ('job-2', 'completed')]
+    assert reported[0][2]['batch']['size'] == 3
+
+
+def test_batches_are_separated_by_namespace():
+    forwarder = RecordingForwarder()
+    batcher, reported = make_batcher(forwarder, max_events=2)
+
+    for index, namespace in enumerate(['ns1', 'ns2', 'ns1']):
+        job, context = make_job(index, namespace)
+        batcher.submit(job, context, 'ep', {})
+
+    assert len(forwarder.sent) == 1
+    assert {event['namespace'] for event in forwarder.sent[0][1]['events']} == {'ns1'}
+    assert batcher.get_status()['buffered'] == 1
+
+
+def test_flush_thread_sends_after_max_wait():
+    forwarder = RecordingForwarder()
+    batcher, reported = make_batcher(forwarder, max_events=10, max_wait=0.05)
+    batcher.start()
+    try:
+        job, context = make_job(0)
+        batcher.submit(job, context, 'ep', {})
+        deadline = time.time() + 2.0
+        while not reported and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        batcher.stop()
+
+    assert [status for _, status, _ in reported] == ['completed']
+
+
+def test_flush_thread_survives_failing_report():
+    forwarder = RecordingForwarder()
+    reported = []
+    failures = ['Redis nicht erreichbar']
+
+    def report(results):
+        if failures:
+            raise ConnectionError(failures.pop())
+        reported.extend(results)
+
+    batcher = ForwardBatcher(forwarder, finish, report, max_events=10, max_wait=0.05)
+    batcher.start()
+    try:
+        for index in range(2):
+            job, context = make_job(index)
+            batcher.submit(job, context, 'ep', {})
+            deadline = time.time() + 2.0
+            while len(forwarder.sent) <= index and time.time() < deadline:
+                time.sleep(0.01)
+        deadline = time.time() + 2.0
+        while not reported and time.time() < deadline:
+            time.sleep(0.01)
+        # Vor stop() prüfen: stop() sendet liegengebliebene Batches selbst
+        assert len(forwarder.sent) == 2
+        assert [(job['id'], status) for job, status, _ in reported] == [('job-1', 'completed')]
+    finally:
+        batcher.stop()
+
+
+def test_rejected_batch_is_split_to_isolate_bad_event():
+    forwarder = RecordingForwarder()
+    batcher, reported = make_batcher(forwarder, max_events=3)
+
+    for index in range(3):
+        job, context = make_job(index, bad=(index == 1))
+        batcher.submit(job, context, 'ep', {})
+
+    statuses = {job['id']: status for job, status, _ in reported}
+    assert statuses == {'job-0': 'completed', 'job-1': 'failed', 'job-2': 'completed'}
+    assert len(forwarder.sent) == 4
+    assert batcher.get_status()['split_batches'] == 1
+
+
+def test_unavailable_endpoint_defers_all_jobs():
+    forwarder = RecordingForwarder(error=EndpointUnavailableError('ep', 'circuit_open', 12.0))
+    batcher, reported = make_batcher(forwarder, max_events=10)
+
+    for index in range(2):
+        job, context = make_job(index)
+        batcher.submit(job, context, 'ep', {})
+    batcher.flush_all()
+
+    assert [(status, retry_after) for _, status, retry_after in reported] == [('deferred', 12.0), ('deferred', 12.0)]
+
+
+def test_alarms_and_foreign_payloads_bypass_batching():
+    batcher, _ = make_batcher(RecordingForwarder())
+
+    assert not batcher.accepts({'priority': 'critical', 'template': 'evalarm_status'})
+    assert not batcher.accepts({'priority': 'normal', 'template': 'evalarm_panic'})
+    assert batcher.accepts({'priority': 'bulk', 'template': 'evalarm_status'})
+
+    job, _ = make_job(0)
+    assert not batcher.submit(job, {'transformed_message': {'events': [], 'extra': 1}}, 'ep', {})
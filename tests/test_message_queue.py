@@ -0,0 +1,712 @@
+"""
+Tests für die Redis Message Queue
+
+Die Tests laufen gegen fakeredis, damit kein Redis-Server benötigt wird.
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("fakeredis")
+
+from api import message_queue as message_queue_module
+from api.message_queue import RedisMessageQueue, RedisStreamMessageQueue
+
+
+@pytest.fixture
+def queue(server):
+    """Erzeugt eine Listen-basierte Queue"""
+    return RedisMessageQueue(prefix='test')
+
+
+@pytest.fixture
+def stream_queue(server):
+    """Erzeugt eine Stream-basierte Queue"""
+    return RedisStreamMessageQueue(prefix='test', reclaim_idle=0.05)
+
+
+def _make_delayed_jobs_due(queue):
+    """Setzt den nächsten Versuch aller vorgemerkten Nachrichten in die Vergangenheit"""
+    for job_json in queue.redis_client.zrange(queue.delayed_queue, 0, -1):
+        queue.redis_client.zadd(queue.delayed_queue, {job_json: 0})
+
+
+def _enqueue(queue, gateway_id='gw-1', **kwargs):
+    return queue.enqueue_message(
+        message={'code': 2030, 'subdeviceid': 1},
+        template_name='evalarm_panic',
+        endpoint_name='auto',
+        customer_config={'name': 'Kunde'},
+        gateway_id=gateway_id,
+        **kwargs
+    )
+
+
+def test_blocking_dequeue_returns_job_and_registers_processing(queue):
+    """Eine blockierend abgeholte Nachricht landet im Processing-Hash, nicht in der Inflight-Liste"""
+    message_id = _enqueue(queue)
+
+    job = queue.get_next_message(block_timeout=0.1, consumer_id='w1')
+
+    assert job['id'] == message_id
+    assert job['status'] == 'processing'
+    assert queue.redis_client.hexists(queue.processing_queue, message_id)
+    assert queue.redis_client.llen(queue._inflight_key('w1')) == 0
+
+
+def test_blocking_dequeue_times_out_on_empty_queue(queue):
+    """Bei leerer Queue wird höchstens block_timeout gewartet"""
+    start = time.time()
+    assert queue.get_next_message(block_timeout=0.1, consumer_id='w1') is None
+    assert time.time() - start < 1.0
+
+
+def test_recover_inflight_messages_requeues_orphans(queue):
+    """Nachrichten, die zwischen Abholen und Registrieren hängen bleiben, gehen nicht verloren"""
+    _enqueue(queue)
+    # Simuliere einen Absturz direkt nach dem LMOVE
+    queue.redis_client.lmove(queue.main_queue, queue._inflight_key('w1'), 'LEFT', 'LEFT')
+    assert queue.redis_client.llen(queue.main_queue) == 0
+
+    assert queue.recover_inflight_messages('w1') == 1
+    assert queue.redis_client.llen(queue.main_queue) == 1
+    assert queue.get_next_message(consumer_id='w1') is not None
+
+
+@pytest.mark.parametrize('fair_scheduling', [False, True])
+def test_abandoned_inflight_lists_of_other_consumers_are_recovered(server, fair_scheduling):
+    """Ein neu erzeugter Container (neue Consumer-ID) holt die Inflight-Liste seines Vorgängers zurück"""
+    queue = RedisMessageQueue(prefix='test', fair_scheduling=fair_scheduling)
+    ids = {_enqueue(queue, gateway_id=f'gw-{index}', tenant='t1') for index in range(2)}
+    # Simuliere einen Absturz zwischen Abholen und Registrieren
+    queue._pop_lanes(2, queue._inflight_key('old-host:0'))
+    live = queue.get_next_messages(1, block_timeout=0, consumer_id='new-host:0')
+    assert live == []
+
+    # Solange der Consumer noch abholen könnte, bleibt seine Liste unangetastet
+    assert queue.recover_abandoned_inflight(max_idle=60) == 0
+    assert queue.redis_client.llen(queue._inflight_key('old-host:0')) == 2
+
+    assert queue.recover_abandoned_inflight(max_idle=0) == 2
+    assert queue.recover_abandoned_inflight(max_idle=0) == 0
+    assert queue.redis_client.zcard(queue.inflight_registry) == 0
+    if fair_scheduling:
+        assert int(queue.redis_client.hget(queue.tenant_active_key, 't1')) == 0
+
+    jobs = queue.get_next_messages(5, block_timeout=0, consumer_id='new-host:0')
+    assert {job['id'] for job in jobs} == ids
+
+
+def test_get_next_messages_returns_batch(queue):
+    """Ein Batch-Abruf liefert höchstens count Nachrichten und registriert alle"""
+    ids = {_enqueue(queue) for _ in range(5)}
+
+    jobs = queue.get_next_messages(3, block_timeout=0, consumer_id='w1')
+    assert len(jobs) == 3
+    assert queue.redis_client.hlen(queue.processing_queue) == 3
+
+    rest = queue.get_next_messages(10, block_timeout=0, consumer_id='w1')
+    assert len(rest) == 2
+    assert {job['id'] for job in jobs + rest} == ids
+    assert queue.get_next_messages(10, block_timeout=0, consumer_id='w1') == []
+
+
+def test_mark_many_completed_and_failed(queue):
+    """Batch-Markierung aktualisiert Processing-Hash, Ergebnisse, Retries und Statistiken"""
+    for _ in range(4):
+        _enqueue(queue)
+    jobs = queue.get_next_messages(4, block_timeout=0, consumer_id='w1')
+
+    queue.mark_many_completed([(job['id'], {'ok': True}) for job in jobs[:3]])
+    queue.mark_many_failed([(jobs[3]['id'], 'Timeout')])
+
+    status = queue.get_queue_status()
+    assert status['processing_count'] == 0
+    assert status['stats']['total_processed'] == 3
+    assert queue.redis_client.llen(queue.results_list) == 3
+    # Erster Fehlversuch: Nachricht wird für einen späteren Versuch vorgemerkt
+    assert status['pending_count'] == 0
+    assert status['delayed_count'] == 1
+    assert status['failed_count'] == 0
+
+
+def test_latency_histogram_and_percentiles(queue):
+    """Verarbeitungszeiten landen im Histogramm, Perzentile werden daraus geschätzt"""
+    for _ in range(10):
+        _enqueue(queue)
+    jobs = queue.get_next_messages(10, block_timeout=0, consumer_id='w1')
+    # Neun schnelle und eine langsame Nachricht
+    for job in jobs[:9]:
+        queue.redis_client.zadd(queue.processing_index, {job['id']: time.time() - 0.01})
+    queue.redis_client.zadd(queue.processing_index, {jobs[9]['id']: time.time() - 7})
+
+    queue.mark_many_completed([(job['id'], {}) for job in jobs])
+
+    status = queue.get_queue_status()
+    latency = status['latency']
+    assert latency['count'] == 10
+    assert latency['buckets']['le_0.05'] == 9
+    assert latency['buckets']['le_10.0'] == 1
+    assert latency['p50'] <= 0.05
+    assert 5.0 <= latency['p99'] <= 10.0
+    assert status['stats']['processing_time_avg'] == pytest.approx(0.709, abs=0.05)
+
+
+def test_stream_queue_delivers_each_message_to_one_consumer(stream_queue):
+    """Zwei Consumer derselben Gruppe erhalten disjunkte Nachrichten"""
+    ids = {_enqueue(stream_queue) for _ in range(4)}
+
+    first = stream_queue.get_next_messages(2, block_timeout=0, consumer_id='w1')
+    second = stream_queue.get_next_messages(10, block_timeout=0, consumer_id='w2')
+
+    assert len(first) == 2 and len(second) == 2
+    assert {job['id'] for job in first + second} == ids
+    assert stream_queue.get_queue_status()['pending_count'] == 0
+
+
+def test_stream_queue_acknowledges_completed_and_retries_failed(stream_queue):
+    """Abgeschlossene Nachrichten werden quittiert, fehlgeschlagene neu eingestellt"""
+    _enqueue(stream_queue)
+    _enqueue(stream_queue)
+    jobs = stream_queue.get_next_messages(2, block_timeout=0, consumer_id='w1')
+
+    stream_queue.mark_as_completed(jobs[0]['id'], {'ok': True})
+    stream_queue.mark_as_failed(jobs[1]['id'], 'Timeout')
+
+    status = stream_queue.get_queue_status()
+    assert status['processing_count'] == 0
+    assert status['delayed_count'] == 1
+    assert status['stream']['unacknowledged'] == 0
+    assert [result['id'] for result in stream_queue.get_recent_results()] == [jobs[0]['id']]
+
+    _make_delayed_jobs_due(stream_queue)
+    assert stream_queue.promote_due_jobs() == 1
+    retry = stream_queue.get_next_message(block_timeout=0, consumer_id='w1')
+    assert retry['id'] == jobs[1]['id']
+    assert retry['retry_count'] == 1
+
+
+def test_stream_queue_reclaims_messages_of_dead_consumer(stream_queue):
+    """Unquittierte Nachrichten eines ausgefallenen Consumers werden übernommen"""
+    message_id = _enqueue(stream_queue)
+    assert stream_queue.get_next_message(block_timeout=0, consumer_id='dead')['id'] == message_id
+
+    time.sleep(0.1)
+    stream_queue._last_reclaim = 0
+    job = stream_queue.get_next_message(block_timeout=0, consumer_id='w2')
+
+    assert job['id'] == message_id
+    stream_queue.mark_as_completed(job['id'], {})
+    assert stream_queue.get_queue_status()['stats']['total_reclaimed'] == 1
+    assert stream_queue.get_queue_status()['stream']['unacknowledged'] == 0
+
+
+def test_reaper_requeues_expired_processing_jobs(queue):
+    """Nachrichten, die länger als der Visibility-Timeout in Bearbeitung sind, werden zurückgeholt"""
+    stale_id = _enqueue(queue)
+    fresh_id = _enqueue(queue)
+    jobs = {job['id']: job for job in queue.get_next_messages(2, block_timeout=0, consumer_id='w1')}
+    # Die erste Nachricht ist seit 10 Minuten in Bearbeitung
+    queue.redis_client.zadd(queue.processing_index, {stale_id: time.time() - 600})
+
+    assert queue.reap_expired_jobs(visibility_timeout=300) == 1
+
+    assert queue.redis_client.hexists(queue.processing_queue, fresh_id)
+    assert not queue.redis_client.hexists(queue.processing_queue, stale_id)
+    assert queue.redis_client.zrange(queue.processing_index, 0, -1) == [fresh_id]
+    status = queue.get_queue_status()
+    assert status['delayed_count'] == 1
+    assert status['stats']['total_reclaimed'] == 1
+    # Ein zweiter Lauf findet nichts mehr
+    assert queue.reap_expired_jobs(visibility_timeout=300) == 0
+
+    queue.mark_as_completed(fresh_id, {})
+    assert queue.redis_client.zcard(queue.processing_index) == 0
+
+
+def test_reaper_crash_does_not_strand_the_job(queue, monkeypatch):
+    """Bricht der Reaper beim Schreiben ab, bleibt die Nachricht im Index und wird beim nächsten Lauf behandelt"""
+    job_id = _enqueue(queue)
+    queue.get_next_message(block_timeout=0, consumer_id='w1')
+    queue.redis_client.zadd(queue.processing_index, {job_id: time.time() - 600})
+
+    owned_jobs_script = queue._owned_jobs_script
+
+    def lose_connection(*args, **kwargs):
+        raise message_queue_module.redis.ConnectionError('Verbindung verloren')
+
+    monkeypatch.setattr(queue, '_owned_jobs_script', lose_connection)
+    with pytest.raises(message_queue_module.redis.ConnectionError):
+        queue.reap_expired_jobs(visibility_timeout=300)
+    assert queue.redis_client.zrange(queue.processing_index, 0, -1) == [job_id]
+
+    monkeypatch.setattr(queue, '_owned_jobs_script', owned_jobs_script)
+    assert queue.reap_expired_jobs(visibility_timeout=300) == 1
+    assert queue.get_queue_status()['delayed_count'] == 1
+
+
+def test_reaper_removes_index_entries_without_job(queue):
+    queue.redis_client.zadd(queue.processing_index, {'verschwunden': time.time() - 600})
+
+    assert queue.reap_expired_jobs(visibility_timeout=300) == 0
+    assert queue.redis_client.zcard(queue.processing_index) == 0
+
+
+def _run_first(queue, monkeypatch, competitor):
+    """Lässt competitor laufen, nachdem queue die Nachrichten gelesen, aber bevor es sein Ergebnis geschrieben hat"""
+    owned_job_commands = queue._owned_job_commands
+
+    def racing_commands():
+        commands = owned_job_commands()
+        execute = commands.execute
+
+        def execute_after_competitor():
+            competitor()
+            return execute()
+
+        commands.execute = execute_after_competitor
+        return commands
+
+    monkeypatch.setattr(queue, '_owned_job_commands', racing_commands)
+
+
+@pytest.mark.parametrize('winner', ['reaper', 'worker'])
+def test_reaper_and_completion_race_on_the_same_job(server, monkeypatch, winner):
+    """Reaper und Worker lesen dieselbe Nachricht; nur das zuerst geschriebene Ergebnis zählt"""
+    worker = RedisMessageQueue(prefix='test', fair_scheduling=True)
+    reaper = RedisMessageQueue(prefix='test', fair_scheduling=True)
+    _enqueue(worker, tenant='t1')
+    job = worker.get_next_message(block_timeout=0, consumer_id='w1')
+    worker.redis_client.zadd(worker.processing_index, {job['id']: time.time() - 600})
+
+    if winner == 'reaper':
+        _run_first(worker, monkeypatch, lambda: reaper.reap_expired_jobs(visibility_timeout=300))
+        worker.mark_as_completed(job['id'], {'ok': True})
+    else:
+        _run_first(reaper, monkeypatch, lambda: worker.mark_as_completed(job['id'], {'ok': True}))
+        assert reaper.reap_expired_jobs(visibility_timeout=300) == 0
+
+    status = worker.get_queue_status()
+    assert status['processing_count'] == 0
+    assert status['delayed_count'] == (1 if winner == 'reaper' else 0)
+    assert status['stats'].get('total_processed', 0) == (0 if winner == 'reaper' else 1)
+    assert len(worker.get_recent_results()) == (0 if winner == 'reaper' else 1)
+    # Der Zähler aktiver Nachrichten des Tenants wird genau einmal verringert
+    assert int(worker.redis_client.hget(worker.tenant_active_key, 't1')) == 0
+
+
+def test_processing_index_is_backfilled_for_legacy_entries(queue):
+    """Bestehende Einträge ohne Index werden beim Start indiziert"""
+    queue.redis_client.hset(queue.processing_queue, 'legacy', json.dumps({
+        'id': 'legacy', 'status': 'processing', 'processing_started': time.time() - 600
+    }))
+
+    restarted = RedisMessageQueue(prefix='test')
+
+    assert restarted.redis_client.zscore(restarted.processing_index, 'legacy') is not None
+    assert restarted.reap_expired_jobs(visibility_timeout=300) == 1
+
+
+def test_failed_jobs_wait_for_backoff_before_retry(queue):
+    """Wiederholungen werden erst nach Ablauf der Backoff-Zeit in die Queue verschoben"""
+    message_id = _enqueue(queue)
+    queue.get_next_message(consumer_id='w1')
+    queue.mark_as_failed(message_id, 'HTTP 503')
+
+    assert queue.promote_due_jobs() == 0
+    assert queue.get_next_message(consumer_id='w1') is None
+
+    _make_delayed_jobs_due(queue)
+    assert queue.promote_due_jobs() == 1
+    assert queue.get_queue_status()['delayed_count'] == 0
+    assert queue.get_next_message(consumer_id='w1')['retry_count'] == 1
+
+
+def test_retry_delay_grows_exponentially_with_jitter(queue):
+    """Die Wartezeit verdoppelt sich je Versuch, liegt aber zwischen halber und voller Backoff-Zeit"""
+    queue.retry_base_delay = 2.0
+    queue.retry_max_delay = 30.0
+
+    for retry_count, delay in [(1, 2.0), (2, 4.0), (3, 8.0), (10, 30.0)]:
+        for _ in range(20):
+            assert delay / 2 <= queue._retry_delay(retry_count) <= delay
+
+
+def test_max_attempts_moves_job_to_failed_queue(queue):
+    """Nach max_attempts Fehlversuchen landet die Nachricht in der Failed-Queue"""
+    queue.max_attempts = 2
+    message_id = _enqueue(queue)
+
+    for _ in range(2):
+        _make_delayed_jobs_due(queue)
+        queue.promote_due_jobs()
+        queue.get_next_message(consumer_id='w1')
+        queue.mark_as_failed(message_id, 'HTTP 503')
+
+    status = queue.get_queue_status()
+    assert status['delayed_count'] == 0
+    assert status['failed_count'] == 1
+    assert status['stats']['total_failed'] == 1
+
+
+def test_strict_priority_lanes_serve_critical_first(queue):
+    """Panic-Alarme überholen Telemetrie, die vorher eingereiht wurde"""
+    bulk_ids = [_enqueue(queue, priority='low') for _ in range(3)]
+    normal_id = _enqueue(queue)
+    critical_id = _enqueue(queue, priority='critical')
+
+    jobs = queue.get_next_messages(2, block_timeout=0, consumer_id='w1')
+    assert [job['id'] for job in jobs] == [critical_id, normal_id]
+    assert jobs[0]['priority'] == 'critical'
+
+    rest = queue.get_next_messages(10, block_timeout=0, consumer_id='w1')
+    assert {job['id'] for job in rest} == set(bulk_ids)
+    assert all(job['priority'] == 'bulk' for job in rest)
+
+
+def test_blocking_dequeue_wakes_up_for_any_lane(queue):
+    """Ein blockierend wartender Worker wird auch durch Nachrichten in anderen Lanes geweckt"""
+    timer = threading.Timer(0.2, lambda: _enqueue(queue, priority='high'))
+    timer.start()
+
+    start = time.time()
+    job = queue.get_next_message(block_timeout=5, consumer_id='w1')
+    timer.join()
+
+    assert job is not None and job['priority'] == 'high'
+    assert time.time() - start < 2
+
+
+@pytest.mark.parametrize('fair_scheduling', [False, True])
+def test_dequeue_consumes_notify_tokens_of_taken_jobs(server, fair_scheduling):
+    """Abgeholte Nachrichten verbrauchen ihre Tokens, damit wartende Consumer danach wirklich blockieren"""
+    queue = RedisMessageQueue(prefix='test', fair_scheduling=fair_scheduling)
+    for index in range(5):
+        _enqueue(queue, gateway_id=f'gw-{index}', tenant='t1')
+
+    assert len(queue.get_next_messages(3, block_timeout=0, consumer_id='w1')) == 3
+    assert queue.redis_client.llen(queue.notify_key) == 2
+    assert len(queue.get_next_messages(5, block_timeout=0, consumer_id='w1')) == 2
+    assert queue.redis_client.llen(queue.notify_key) == 0
+
+    # Nach dem Wecken per BLPOP zählt das entnommene Token mit
+    timer = threading.Timer(0.1, lambda: [_enqueue(queue, gateway_id=f'gw-late-{i}', tenant='t1') for i in range(2)])
+    timer.start()
+    jobs = queue.get_next_messages(1, block_timeout=5, consumer_id='w2')
+    timer.join()
+    assert len(jobs) == 1
+    assert queue.redis_client.llen(queue.notify_key) == 1
+
+
+def test_retries_return_to_their_lane(queue):
+    """Fällige Wiederholungen landen wieder in der Lane der ursprünglichen Nachricht"""
+    message_id = _enqueue(queue, priority='critical')
+    queue.get_next_message(consumer_id='w1')
+    queue.mark_as_failed(message_id, 'HTTP 503')
+
+    _make_delayed_jobs_due(queue)
+    queue.promote_due_jobs()
+
+    assert queue.get_queue_status()['lanes']['critical']['depth'] == 1
+
+
+def test_lane_depth_and_wait_time_metrics(queue):
+    """Queue-Status enthält Tiefe und Wartezeit je Lane"""
+    _enqueue(queue, priority='high')
+    _enqueue(queue, priority='bulk')
+    _enqueue(queue, priority='bulk')
+    queue.get_next_message(consumer_id='w1')
+
+    lanes = queue.get_queue_status()['lanes']
+    assert lanes['high'] == {'depth': 0, 'dequeued': 1, 'wait_time_avg': pytest.approx(0, abs=1)}
+    assert lanes['bulk']['depth'] == 2
+    assert lanes['critical']['depth'] == 0
+
+
+def test_weighted_lane_order_contains_every_lane(queue):
+    """Gewichtete Abholung zieht eine vollständige Reihenfolge, meist mit der höchsten Lane vorn"""
+    queue.lane_mode = 'weighted'
+    orders = [queue._lane_order() for _ in range(200)]
+
+    assert all(sorted(order) == sorted(message_queue_module.PRIORITY_LANES) for order in orders)
+    assert sum(order[0] == 'critical' for order in orders) > sum(order[0] == 'bulk' for order in orders)
+
+
+def test_customer_config_is_stored_once_and_resolved_on_dequeue(queue):
+    """Jobs tragen nur eine Referenz, der Worker erhält die vollständige Konfiguration"""
+    config = {'name': 'Kunde', 'api_config': {'username': 'user', 'password': 'geheim', 'headers': {'X-Test': '1'}}}
+    for _ in range(3):
+        queue.enqueue_message(message={'code': 2030}, template_name='evalarm_panic', endpoint_name='auto',
+                              customer_config=config, gateway_id='gw-1')
+
+    raw_jobs = queue.redis_client.lrange(queue.main_queue, 0, -1)
+    assert all('geheim' not in raw_job for raw_job in raw_jobs)
+    assert queue.redis_client.hlen(queue.config_key) == 1
+
+    jobs = queue.get_next_messages(3, block_timeout=0, consumer_id='w1')
+    assert all(job['customer_config'] == config for job in jobs)
+    # Der Processing-Hash enthält den Job unverändert, also ebenfalls ohne Zugangsdaten
+    assert all('geheim' not in raw_job for raw_job in queue.redis_client.hvals(queue.processing_queue))
+
+    # Eine geänderte Konfiguration erhält eine neue Referenz
+    changed = dict(config, name='Kunde 2')
+    assert queue.config_reference(changed) != queue.config_reference(config)
+
+
+def test_orjson_codec_round_trip(server):
+    """Mit orjson kodierte Jobs durchlaufen die Queue wie JSON-Jobs"""
+    pytest.importorskip('orjson')
+    queue = RedisMessageQueue(prefix='test', codec='orjson')
+    message_id = _enqueue(queue, priority='critical')
+
+    job = queue.get_next_message(consumer_id='w1')
+    assert job['id'] == message_id
+    assert job['customer_config'] == {'name': 'Kunde'}
+
+    queue.mark_as_failed(message_id, 'HTTP 503')
+    _make_delayed_jobs_due(queue)
+    assert queue.promote_due_jobs() == 1
+    assert queue.get_next_message(consumer_id='w1')['retry_count'] == 1
+
+
+def _fail_permanently(queue, failures):
+    """Lässt Nachrichten sofort endgültig fehlschlagen: [(gateway_id, Fehlermeldung), ...]"""
+    queue.max_attempts = 1
+    ids = []
+    for gateway_id, error in failures:
+        message_id = _enqueue(queue, gateway_id=gateway_id)
+        queue.get_next_message(consumer_id='w1')
+        queue.mark_as_failed(message_id, error)
+        ids.append(message_id)
+    return ids
+
+
+def test_failed_messages_page_walks_all_entries_once(queue):
+    """Cursor-Paginierung liefert jede Nachricht genau einmal, neueste zuerst"""
+    queue.max_attempts = 1
+    for _ in range(7):
+        _enqueue(queue)
+    # Ein Batch: alle Nachrichten erhalten denselben failed_at-Zeitstempel
+    jobs = queue.get_next_messages(7, block_timeout=0, consumer_id='w1')
+    queue.mark_many_failed([(job['id'], 'HTTP 503') for job in jobs])
+    late_id = _fail_permanently(queue, [('gw-1', 'HTTP 503')])[0]
+
+    seen = []
+    cursor = None
+    while True:
+        page = queue.get_failed_messages_page(cursor=cursor, limit=3)
+        seen.extend(job['id'] for job in page['messages'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert page['total'] == 8
+    assert seen[0] == late_id
+    assert sorted(seen) == sorted([job['id'] for job in jobs] + [late_id])
+
+
+def test_failed_messages_page_filters_by_gateway_and_error_class(queue):
+    """Filter nach Gateway und Fehlerklasse nutzen die jeweiligen Indizes"""
+    _fail_permanently(queue, [
+        ('gw-1', 'Fehler bei der Weiterleitung an evAlarm API: HTTP 503 - Service Unavailable'),
+        ('gw-1', 'Fehler bei der Weiterleitung an evAlarm API: Ungültiges Datenformat - {}'),
+        ('gw-2', 'Fehler bei der Weiterleitung an evAlarm API: HTTP 502 - Bad Gateway'),
+    ])
+
+    assert len(queue.get_failed_messages_page(gateway_id='gw-1')['messages']) == 2
+    assert [job['gateway_id'] for job in queue.get_failed_messages_page(error_class='http_5xx')['messages']] == ['gw-2', 'gw-1']
+    both = queue.get_failed_messages_page(gateway_id='gw-1', error_class='validation')['messages']
+    assert len(both) == 1 and both[0]['error_class'] == 'validation'
+
+
+def test_retry_removes_message_from_failed_indexes(queue):
+    """Ein erneuter Versuch entfernt die Nachricht aus allen Failed-Indizes"""
+    message_id = _fail_permanently(queue, [('gw-1', 'Timeout')])[0]
+
+    assert queue.retry_failed_message(message_id)
+
+    assert queue.get_failed_messages_page()['total'] == 0
+    assert queue.get_failed_messages_page(gateway_id='gw-1')['messages'] == []
+    assert queue.get_failed_messages_page(error_class='timeout')['total'] == 0
+
+
+def test_duplicate_messages_are_dropped_within_window(queue):
+    """Inhaltsgleiche Nachrichten mit Zeitstempel werden je Gateway nur einmal eingereiht"""
+    message = {'code': 2030, 'subdeviceid': 1, 'ts': 1747344697}
+
+    first_id = queue.enqueue_message(message, 'evalarm_panic', 'auto', gateway_id='gw-1')
+    duplicate_id = queue.enqueue_message(dict(message), 'evalarm_panic', 'auto', gateway_id='gw-1')
+    other_gateway_id = queue.enqueue_message(dict(message), 'evalarm_panic', 'auto', gateway_id='gw-2')
+
+    assert duplicate_id == first_id
+    assert other_gateway_id != first_id
+    status = queue.get_queue_status()
+    assert status['pending_count'] == 2
+    assert status['stats']['total_deduplicated'] == 1
+
+
+def test_explicit_idempotency_key_and_messages_without_ts(queue):
+    """Explizite Schlüssel gelten unabhängig vom Inhalt, Nachrichten ohne 'ts' werden nie abgeleitet verworfen"""
+    first_id = queue.enqueue_message({'code': 2030}, 'evalarm_panic', 'auto', gateway_id='gw-1', idempotency_key='req-1')
+    assert queue.enqueue_message({'code': 2001}, 'evalarm', 'auto', gateway_id='gw-1', idempotency_key='req-1') == first_id
+
+    # Zweimal derselbe Alarm ohne Zeitstempel: beide werden eingereiht
+    queue.enqueue_message({'code': 2030}, 'evalarm_panic', 'auto', gateway_id='gw-1')
+    queue.enqueue_message({'code': 2030}, 'evalarm_panic', 'auto', gateway_id='gw-1')
+    assert queue.get_queue_status()['pending_count'] == 3
+
+
+def test_dedup_window_expires(queue):
+    """Nach Ablauf des Fensters wird dieselbe Nachricht wieder angenommen"""
+    queue.dedup_window = 1
+    message = {'code': 2030, 'ts': 1747344697}
+    first_id = queue.enqueue_message(message, 'evalarm_panic', 'auto', gateway_id='gw-1')
+
+    time.sleep(1.1)
+
+    assert queue.enqueue_message(message, 'evalarm_panic', 'auto', gateway_id='gw-1') != first_id
+
+
+def test_worker_health_marks_and_prunes_old_heartbeats(queue):
+    queue.report_worker_health('host:p0', {'running': True})
+    queue.report_worker_health('host:p1', {'running': True})
+    queue.report_worker_health('host:p2', {'running': True})
+    stale = json.loads(queue.redis_client.hget(queue.worker_health_key, 'host:p1'))
+    stale['reported_at'] -= 60
+    queue.redis_client.hset(queue.worker_health_key, 'host:p1', json.dumps(stale))
+    gone = json.loads(queue.redis_client.hget(queue.worker_health_key, 'host:p2'))
+    gone['reported_at'] -= 3600
+    queue.redis_client.hset(queue.worker_health_key, 'host:p2', json.dumps(gone))
+
+    processes = queue.get_worker_health(max_age=30)
+
+    assert [(p['worker_id'], p['stale']) for p in processes] == [('host:p0', False), ('host:p1', True)]
+    assert not queue.redis_client.hexists(queue.worker_health_key, 'host:p2')
+
+
+@pytest.fixture
+def fair_queue(server):
+    """Erzeugt eine Listen-basierte Queue mit Fair Scheduling"""
+    return RedisMessageQueue(prefix='test', fair_scheduling=True)
+
+
+def test_fair_scheduling_alternates_between_tenants(fair_queue):
+    for _ in range(5):
+        _enqueue(fair_queue, tenant='noisy')
+    _enqueue(fair_queue, tenant='quiet')
+
+    jobs = fair_queue.get_next_messages(3, block_timeout=0, consumer_id='c1')
+
+    assert [job['tenant'] for job in jobs] == ['noisy', 'quiet', 'noisy']
+    assert fair_queue.get_queue_status()['pending_count'] == 3
+
+
+def test_fair_scheduling_caps_active_jobs_per_tenant(server):
+    queue = RedisMessageQueue(prefix='test', fair_scheduling=True, tenant_concurrency=2)
+    for _ in range(5):
+        _enqueue(queue, tenant='noisy')
+
+    jobs = queue.get_next_messages(5, block_timeout=0, consumer_id='c1')
+    assert len(jobs) == 2
+    assert queue.get_next_messages(5, block_timeout=0, consumer_id='c2') == []
+    assert queue.get_tenant_stats()['noisy'] == {'pending': 3, 'active': 2, 'lanes': {'normal': 3}}
+
+    queue.mark_as_completed(jobs[0]['id'], {'ok': True})
+
+    assert len(queue.get_next_messages(5, block_timeout=0, consumer_id='c1')) == 1
+
+
+def test_fair_scheduling_keeps_tenant_for_retries(server):
+    queue = RedisMessageQueue(prefix='test', fair_scheduling=True, tenant_concurrency=1)
+    _enqueue(queue, tenant='t1')
+    job = queue.get_next_message(block_timeout=0, consumer_id='c1')
+
+    queue.mark_as_failed(job['id'], 'HTTP 503')
+    _make_delayed_jobs_due(queue)
+    queue.promote_due_jobs()
+
+    retried = queue.get_next_message(block_timeout=0, consumer_id='c1')
+    assert retried['id'] == job['id']
+    assert queue.get_tenant_stats()['t1']['active'] == 1
+
+
+def test_fair_scheduling_recovers_inflight_jobs_to_their_tenant(fair_queue):
+    _enqueue(fair_queue, tenant='t1')
+    fair_queue._pop_lanes(1, fair_queue._inflight_key('c1'))
+
+    assert fair_queue.recover_inflight_messages('c1') == 1
+    assert fair_queue.get_tenant_stats() == {'t1': {'pending': 1, 'active': 0, 'lanes': {'normal': 1}}}
+
+
+def test_fair_scheduling_derives_tenant_from_customer(fair_queue):
+    fair_queue.enqueue_message({'code': 1}, 'evalarm', 'auto', customer_config={'customer_id': 'c-42'}, gateway_id='gw-1')
+    fair_queue.enqueue_message({'code': 1}, 'evalarm', 'auto', gateway_id='gw-2')
+
+    assert set(fair_queue.get_tenant_stats()) == {'c-42', 'gw-2'}
+
+
+def test_defer_jobs_delays_without_counting_an_attempt(queue):
+    _enqueue(queue)
+    job = queue.get_next_message(block_timeout=0, consumer_id='c1')
+
+    assert queue.defer_jobs([(job['id'], 30.0)]) == []
+
+    status = queue.get_queue_status()
+    assert status['processing_count'] == 0
+    assert status['delayed_count'] == 1
+    assert status['stats']['total_deferred'] == 1
+
+    _make_delayed_jobs_due(queue)
+    queue.promote_due_jobs()
+    retried = queue.get_next_message(block_timeout=0, consumer_id='c1')
+    assert retried['id'] == job['id']
+    assert retried.get('retry_count', 0) == 0
+    assert retried['deferred_count'] == 1
+
+
+def test_defer_jobs_counts_an_attempt_after_max_deferrals(server):
+    """Bei dauerhaft ausgefallenem Endpunkt landet die Nachricht nach max_attempts in der Failed-Queue"""
+    queue = RedisMessageQueue(prefix='test', max_deferrals=2, max_attempts=2)
+    job_id = _enqueue(queue)
+
+    outcomes = []
+    for _ in range(4):
+        job = queue.get_next_message(block_timeout=0, consumer_id='c1')
+        assert job['id'] == job_id
+        outcomes.append(queue.defer_jobs([(job_id, 30.0)]))
+        _make_delayed_jobs_due(queue)
+        queue.promote_due_jobs()
+
+    # Zweimal zurückgestellt, danach zwei Fehlversuche
+    error = 'Endpunkt nicht erreichbar, 2 Zurückstellungen überschritten'
+    assert outcomes == [[], [], [(job_id, error)], [(job_id, error)]]
+    status = queue.get_queue_status()
+    assert status['processing_count'] == 0
+    assert status['pending_count'] == 0
+    assert status['stats']['total_deferred'] == 2
+    failed = queue.get_failed_messages()
+    assert [job['id'] for job in failed] == [job_id]
+    assert failed[0]['error_class'] == 'endpoint_unavailable'
+    assert failed[0]['retry_count'] == 2
+
+
+def test_hand_off_jobs_returns_messages_to_the_front_of_their_lane(queue):
+    first = _enqueue(queue, gateway_id='gw-1')
+    job = queue.get_next_message(block_timeout=0, consumer_id='draining')
+    _enqueue(queue, gateway_id='gw-2')
+
+    assert queue.hand_off_jobs([job['id'], 'missing']) == 1
+
+    status = queue.get_queue_status()
+    assert status['processing_count'] == 0
+    assert status['stats']['total_handed_off'] == 1
+
+    taken_over = queue.get_next_message(block_timeout=0, consumer_id='other')
+    assert taken_over['id'] == first
+    assert taken_over.get('retry_count', 0) == 0
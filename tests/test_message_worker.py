@@ -0,0 +1,154 @@
+"""
+Tests für Aufwärmen, Readiness und Drain des Message Workers
+
+Die Queue läuft gegen fakeredis. Die MongoDB-Schritte des Aufwärmens werden
+ausgelassen, da in den Tests kein MongoDB-Server läuft.
+"""
+
+import sys
+import os
+import time
+import threading
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("fakeredis")
+
+from api import message_queue as message_queue_module
+from api import message_worker as message_worker_module
+from api.message_queue import RedisMessageQueue
+from api.message_worker import MessageWorker
+
+
+@pytest.fixture
+def worker(server, monkeypatch):
+    monkeypatch.setattr(message_queue_module, 'message_queue', RedisMessageQueue(prefix='test'))
+    # Die Signal-Handler des Workers würden die von pytest ersetzen
+    monkeypatch.setattr(message_worker_module.signal, 'signal', lambda *args: None)
+
+    worker = MessageWorker(num_threads=1, poll_interval=0.01, block_timeout=0, drain_timeout=1.0)
+    worker._warm_up_steps = lambda: {
+        'templates': worker._warm_up_templates,
+        'redis': worker.queue.redis_client.ping
+    }
+    yield worker
+    if worker.running:
+        worker.stop()
+
+
+def _enqueue(queue, count):
+    return [
+        queue.enqueue_message({'code': 2030, 'ts': index}, 'evalarm_panic', 'auto',
+                              customer_config={'name': 'Kunde'}, gateway_id='gw-1')
+        for index in range(count)
+    ]
+
+
+def test_worker_is_ready_once_templates_are_warm(worker):
+    assert not worker.is_ready()
+    assert worker.template_engine.templates == {}
+
+    worker.start()
+    deadline = time.time() + 5.0
+    while not worker.is_ready() and time.time() < deadline:
+        time.sleep(0.01)
+
+    startup = worker.get_startup_status()
+    assert worker.is_ready()
+    assert startup['state'] == 'ready'
+    assert set(startup['steps']) == {'templates', 'redis'}
+    assert startup['ready_after'] >= 0
+    assert 'evalarm_panic' in worker.template_engine.templates
+
+
+def test_failed_warm_up_step_is_retried_until_ready(worker):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError('nicht erreichbar')
+
+    worker._warm_up_steps = lambda: {'templates': lambda: None, 'mongodb': flaky}
+
+    status = worker.warm_up()
+    assert status['state'] == 'degraded'
+    assert status['steps']['mongodb']['error'] == 'nicht erreichbar'
+
+    status = worker.warm_up(['mongodb'])
+    assert status['state'] == 'ready'
+    assert len(attempts) == 2
+
+
+def test_drain_hands_off_unfinished_jobs_and_drops_late_results(worker):
+    _enqueue(worker.queue, 3)
+    jobs = worker.queue.get_next_messages(3, block_timeout=0, consumer_id='draining')
+    worker._track_jobs(jobs)
+
+    status = worker.drain(timeout=0)
+
+    assert status['state'] == 'drained'
+    assert status['handed_off'] == 3
+    assert status['in_flight'] == 0
+    queue_status = worker.queue.get_queue_status()
+    assert queue_status['processing_count'] == 0
+    assert queue_status['pending_count'] == 3
+
+    # Ein spätes Ergebnis gehört nicht mehr diesem Worker
+    worker._report_results([(jobs[0], 'completed', {'response_status': 200})])
+    assert 'total_completed' not in worker.queue.get_queue_status()['stats']
+
+
+class RecordingSink:
+    def __init__(self):
+        self.records = []
+
+    def record_many(self, results):
+        self.records.extend((job['id'], status, payload) for job, status, payload in results)
+
+
+def test_deferral_past_the_limit_is_recorded_as_failure(worker):
+    worker.result_sink = RecordingSink()
+    worker.queue.max_deferrals = 1
+    job_id = _enqueue(worker.queue, 1)[0]
+
+    for _ in range(2):
+        # Nächsten Versuch sofort fällig machen
+        for job_json in worker.queue.redis_client.zrange(worker.queue.delayed_queue, 0, -1):
+            worker.queue.redis_client.zadd(worker.queue.delayed_queue, {job_json: 0})
+        worker.queue.promote_due_jobs()
+        jobs = worker.queue.get_next_messages(1, block_timeout=0, consumer_id='w1')
+        worker._track_jobs(jobs)
+        worker._report_results([(jobs[0], 'deferred', 30.0)])
+
+    # Die erste Zurückstellung erscheint nicht in der Historie, der Fehlversuch danach schon
+    assert worker.result_sink.records == [
+        (job_id, 'failed', 'Endpunkt nicht erreichbar, 1 Zurückstellungen überschritten')
+    ]
+
+
+def test_scale_up_waits_for_retiring_thread_before_reusing_its_index(worker, monkeypatch):
+    release = threading.Event()
+    started = []
+
+    def busy_thread(consumer_id, retire_event):
+        # Arbeitet seinen Batch ab, auch wenn der Autoscaler ihn beendet
+        started.append(consumer_id)
+        release.wait(5.0)
+
+    monkeypatch.setattr(worker, '_worker_thread', busy_thread)
+    prefix = worker.consumer_prefix
+
+    worker._scale_to(2)
+    worker._scale_to(1)
+    worker._scale_to(2)
+    # Thread 1 läuft noch: der neue Thread darf dessen Inflight-Liste nicht übernehmen
+    assert started == [f'{prefix}:0', f'{prefix}:1', f'{prefix}:2']
+
+    release.set()
+    for thread in worker.threads:
+        thread.join(1.0)
+    worker._scale_to(1)
+    worker._scale_to(2)
+    assert started[-1] == f'{prefix}:1'
@@ -0,0 +1,95 @@
+"""
+Tests für den Pipeline-Worker (fetch -> transform -> forward mit begrenzten Puffern)
+"""
+
+import sys
+import os
+import time
+import threading
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("fakeredis")
+
+from api import message_queue as message_queue_module
+from api import message_worker as message_worker_module
+from api.message_queue import RedisMessageQueue
+from api.pipeline_worker import PipelineStage, PipelineMessageWorker
+
+
+@pytest.fixture
+def worker(server, monkeypatch):
+    monkeypatch.setattr(message_queue_module, 'message_queue', RedisMessageQueue(prefix='test'))
+    monkeypatch.setattr(message_worker_module.signal, 'signal', lambda *args: None)
+
+    worker = PipelineMessageWorker(num_threads=1, poll_interval=0.01, block_timeout=0, batch_size=5,
+                                   transform_threads=1, prefetch=2, forward_buffer=1, drain_timeout=1.0)
+    worker._warm_up_steps = lambda: {'templates': worker._warm_up_templates}
+    yield worker
+    if worker.running:
+        worker.stop()
+
+
+def _enqueue(queue, count, **kwargs):
+    return [queue.enqueue_message({'code': 2030, 'ts': index}, 'evalarm_panic', 'auto', **kwargs)
+            for index in range(count)]
+
+
+def test_stage_put_blocks_while_buffer_is_full():
+    upstream = PipelineStage('fetch', 0, 1)
+    stage = PipelineStage('transform', 2, 1)
+    assert stage.put('a', lambda: False) and stage.put('b', lambda: False)
+    assert stage.free_slots() == 0
+
+    stop = threading.Event()
+    threading.Timer(0.3, stop.set).start()
+    assert not stage.put('c', stop.is_set, upstream=upstream)
+
+    assert upstream.get_status()['blocked_seconds'] >= 0.25
+    assert stage.get_status()['depth'] == 2
+
+
+def test_stage_counts_throughput():
+    stage = PipelineStage('forward', 4, 2, throughput_window=1.0)
+    for _ in range(3):
+        stage.started()
+        stage.finished()
+
+    status = stage.get_status()
+    assert status['processed'] == 3
+    assert status['busy'] == 0
+    assert status['throughput_per_second'] == 3.0
+
+
+def test_fetch_stops_while_transform_buffer_is_full(worker):
+    _enqueue(worker.queue, 3, gateway_id='gw-1')
+    transform = worker.stages['transform']
+    transform.put({'id': 'x'}, lambda: False)
+    transform.put({'id': 'y'}, lambda: False)
+
+    worker.running = True
+    fetcher = threading.Thread(target=worker._fetch_loop)
+    fetcher.start()
+    time.sleep(0.2)
+    worker.running = False
+    fetcher.join()
+
+    assert worker.queue.get_queue_status()['pending_count'] == 3
+    assert worker.stages['fetch'].get_status()['blocked_seconds'] > 0
+
+
+def test_pipeline_reports_transform_failures(worker, wait_for):
+    # Ohne Gateway-ID schlägt die Prüfung in der transform-Stufe fehl
+    _enqueue(worker.queue, 4)
+    worker.start()
+
+    assert wait_for(lambda: worker.queue.get_queue_status()['delayed_count'] == 4)
+    # Die Stufen zählen erst, nachdem das Ergebnis geschrieben ist
+    assert wait_for(lambda: worker.get_status()['pipeline']['transform']['processed'] == 4)
+    status = worker.get_status()
+    assert status['mode'] == 'pipeline'
+    assert status['pipeline']['fetch']['processed'] == 4
+    assert status['pipeline']['transform']['processed'] == 4
+    assert status['pipeline']['forward']['processed'] == 0
+    assert status['drain']['in_flight'] == 0
@@ -0,0 +1,154 @@
+"""
+Tests für den ResultSink (gesammeltes Schreiben der Verarbeitungsergebnisse)
+
+Statt einer MongoDB wird eine Collection im Speicher verwendet, die nur die
+vom ResultSink genutzten Methoden bereitstellt.
+"""
+
+import sys
+import os
+import time
+from datetime import datetime, timezone
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.result_sink import ResultSink, query_results
+
+
+class MemoryCollection:
+    def __init__(self, failures=0):
+        self.records = {}
+        self.batches = []
+        self.indexes = []
+        self.failures = failures
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+
+    def insert_many(self, records, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            # Der erste Eintrag wurde vor dem Verbindungsabbruch noch geschrieben
+            self.records[records[0]['_id']] = records[0]
+            raise AutoReconnect('Verbindung verloren')
+        duplicates = [index for index, record in enumerate(records) if record['_id'] in self.records]
+        for record in records:
+            self.records[record['_id']] = record
+        self.batches.append(len(records))
+        if duplicates:
+            raise BulkWriteError({'writeErrors': [{'index': index, 'code': 11000, 'errmsg': 'duplicate key'}
+                                                  for index in duplicates]})
+
+
+def _job(index, **kwargs):
+    job = {'id': f'job-{index}', 'gateway_id': 'gw-1', 'template': 'evalarm_status', 'priority': 'normal',
+           'queued_at': time.time(), 'customer_config': {'name': 'Kunde'}}
+    job.update(kwargs)
+    return job
+
+
+def test_writes_in_batches_of_batch_size():
+    collection = MemoryCollection()
+    sink = ResultSink(collection, batch_size=3, flush_interval=60)
+    sink.record_many([(_job(index), 'completed', {'response_status': 200}) for index in range(7)])
+
+    assert sink.flush() == 7
+    assert collection.batches == [3, 3, 1]
+    assert any(kwargs.get('expireAfterSeconds') == 30 * 86400 for _, kwargs in collection.indexes)
+
+    record = collection.records[next(iter(collection.records))]
+    assert record['status'] == 'completed'
+    assert record['customer'] == 'Kunde'
+    assert record['response_status'] == 200
+    assert record['processed_at'].tzinfo is timezone.utc
+
+
+def test_flush_thread_writes_full_batch_without_waiting_for_interval():
+    collection = MemoryCollection()
+    sink = ResultSink(collection, batch_size=2, flush_interval=60)
+    sink.start()
+    try:
+        sink.record_many([(_job(1), 'completed', {}), (_job(2), 'failed', 'HTTP 500')])
+        deadline = time.time() + 5.0
+        while len(collection.records) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(collection.records) == 2
+    finally:
+        sink.stop()
+
+
+def test_stop_writes_remaining_records():
+    collection = MemoryCollection()
+    sink = ResultSink(collection, batch_size=100, flush_interval=60)
+    sink.start()
+    sink.record(_job(1), 'failed', 'Timeout')
+    sink.stop()
+
+    record = next(iter(collection.records.values()))
+    assert record['error'] == 'Timeout'
+    assert sink.get_status()['written'] == 1
+
+
+def test_records_are_kept_and_written_once_after_connection_error():
+    collection = MemoryCollection(failures=1)
+    sink = ResultSink(collection, batch_size=10, flush_interval=60)
+    sink.record_many([(_job(index), 'completed', {}) for index in range(3)])
+
+    assert sink.flush() == 0
+    assert sink.get_status()['buffered'] == 3
+
+    # Der bereits geschriebene Eintrag wird als Duplikat erkannt, nicht als Fehler
+    assert sink.flush() == 3
+    assert len(collection.records) == 3
+    assert sink.get_status()['write_errors'] == 0
+
+
+def test_full_buffer_drops_oldest_records():
+    sink = ResultSink(MemoryCollection(), batch_size=2, max_buffer=3)
+    sink.record_many([(_job(index), 'completed', {}) for index in range(5)])
+
+    status = sink.get_status()
+    assert status['buffered'] == 3
+    assert status['dropped'] == 2
+    assert [record['job_id'] for record in sink.buffer] == ['job-2', 'job-3', 'job-4']
+
+
+class RecordingCollection:
+    def __init__(self, records):
+        self.records = records
+        self.query = None
+
+    def find(self, query):
+        self.query = query
+        return self
+
+    def sort(self, keys):
+        return self
+
+    def limit(self, count):
+        return self.records[:count]
+
+
+def test_query_pages_with_cursor_and_filters():
+    sink = ResultSink(None)
+    records = [sink.build_record(_job(index), 'completed', {}) for index in range(3)]
+    records.sort(key=lambda record: (record['processed_at'], record['_id']), reverse=True)
+    collection = RecordingCollection(records)
+
+    page = query_results(collection, gateway_id='gw-1', customer='Kunde', since='2026-01-01T00:00:00Z', limit=2)
+    assert [result['job_id'] for result in page['results']] == [records[0]['job_id'], records[1]['job_id']]
+    assert collection.query['gateway_id'] == 'gw-1'
+    assert collection.query['processed_at']['$gte'] == datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    query_results(collection, cursor=page['next_cursor'])
+    processed_at, object_id = records[1]['processed_at'], records[1]['_id']
+    assert collection.query['$or'] == [
+        {'processed_at': {'$lt': processed_at}},
+        {'processed_at': processed_at, '_id': {'$lt': object_id}}
+    ]
+
+    with pytest.raises(ValueError):
+        query_results(collection, cursor='kein-cursor')
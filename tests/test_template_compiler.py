@@ -0,0 +1,215 @@
+"""
+Differenztests: native Render-Funktionen (utils.template_compiler) gegen Jinja2
+
+Jeder Template-String wird mit beiden Verfahren gerendert; die Ergebnisse müssen
+zeichengleich sein bzw. dieselbe Exception auslösen.
+"""
+
+import sys
+import os
+import glob
+import json
+
+import jinja2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.template_compiler import compile_template, compile_value
+from utils.normalized_template_engine import NormalizedTemplateEngine
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+# Einfache Ausdrücke, die nativ übersetzt werden
+NATIVE_SOURCES = [
+    '{{ gateway_id }}',
+    '{{ timestamp }}_{{ uuid }}',
+    'Alarm von Gateway {{ gateway_id }}',
+    '{{ message }}',
+    '{{ message.subdeviceid }}',
+    '{{ message.subdevicelist[0].id }}',
+    "{{ message['code'] }}",
+    '{{ message.missing }}',
+    '{{ missing }}',
+    '{{ missing.attribute }}',
+    '{{ message.subdevicelist[5] }}',
+    '{{ message.items }}',
+    '{{ html }}',
+    '{{ flag }}',
+    '{{ nothing }}',
+    "{{ customer_config.evalarm_namespace if customer_config else 'default' }}",
+    "{{ empty_config.evalarm_namespace if empty_config else 'default' }}",
+    '{{ gateway_id if missing }}',
+    "{{ devices[0].values.alarmtype | default('Alarm') }}",
+    "{{ devices[1].values | default('keine') }}",
+    "{{ customer_config.namespace | default('default') }}",
+    '{{ message.subdevicelist | length }}',
+    '{{ html | upper }}',
+    "{{ 'a<b' }} {{ 42 }}",
+    'Zeile\n',
+    'Zeile\n\n',
+    '{{ gateway_id }}\n',
+    '',
+]
+
+# Komplexe Templates, die bei Jinja2 bleiben
+JINJA_SOURCES = [
+    '{% if message.subdeviceid is defined %}{{ message.subdeviceid }}{% else %}unknown{% endif %}',
+    '{% for device in devices %}{{ device.id }} {% endfor %}',
+    '{{ now() }}',
+    '{{ timestamp + 1 }}',
+    '{{ message.subdevicelist[index] }}',
+    '{{ html | default(gateway_id) }}',
+    '{{ message is defined }}',
+]
+
+CONTEXT = {
+    'message': {
+        'code': 2030,
+        'subdeviceid': 673922542395461,
+        'subdevicelist': [{'id': 673922542395461, 'value': {'alarmstatus': 'alarm', 'alarmtype': 'panic'}}],
+        'items': 'kein Methodenaufruf'
+    },
+    'devices': [{'id': 'dev-1', 'type': 'panic_button', 'values': {'alarmtype': 'panic'}}],
+    'uuid': '0b4e7a0e-5d8c-4a53-9b54-1e9c3d5f0a11',
+    'timestamp': 1747344697,
+    'gateway_id': 'gw-c490b022',
+    'customer_config': {'name': 'Kunde', 'evalarm_namespace': 'kunde.evalarm.de'},
+    'empty_config': {},
+    'html': '<b>"Alarm" & Co</b>',
+    'flag': True,
+    'nothing': None,
+    'index': 0
+}
+
+
+@pytest.fixture(scope='module')
+def environments(tmp_path_factory):
+    engine = NormalizedTemplateEngine(str(tmp_path_factory.mktemp('templates')))
+    return {
+        'autoescape': jinja2.Environment(autoescape=True),
+        'plain': jinja2.Environment(),
+        'normalized': engine.jinja_env
+    }
+
+
+def _render_both(env, source, context):
+    """
+    Rendert mit Jinja2 und nativ; Exceptions werden als (Typ, Nachricht) verglichen
+    """
+    native = compile_template(env, source)
+    assert native is not None, source
+
+    def outcome(render):
+        try:
+            return render()
+        except Exception as e:
+            return type(e), str(e)
+
+    return outcome(lambda: env.from_string(source).render(**context)), outcome(lambda: native(context))
+
+
+@pytest.mark.parametrize('name', ['autoescape', 'plain', 'normalized'])
+@pytest.mark.parametrize('source', NATIVE_SOURCES)
+def test_native_render_matches_jinja(environments, name, source):
+    expected, actual = _render_both(environments[name], source, CONTEXT)
+    assert actual == expected
+    assert type(actual) is type(expected)
+
+
+@pytest.mark.parametrize('source', JINJA_SOURCES)
+def test_complex_templates_fall_back_to_jinja(environments, source):
+    assert compile_template(environments['autoescape'], source) is None
+
+
+def test_filters_with_context_access_stay_with_jinja(environments):
+    source = '{{ message.subdevicelist[0].value | tojson(indent=None) }}'
+    # Das eingebaute tojson benötigt den Auswertungskontext, das der NormalizedTemplateEngine nicht
+    assert compile_template(environments['autoescape'], source) is None
+    expected, actual = _render_both(environments['normalized'], source, CONTEXT)
+    assert actual == expected
+
+
+def test_unknown_filter_is_left_to_jinja(environments):
+    env = environments['autoescape']
+    assert compile_template(env, '{{ now | datetime }}') is None
+    with pytest.raises(jinja2.TemplateAssertionError):
+        env.from_string('{{ now | datetime }}')
+
+
+def _string_leaves(value):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield key
+            yield from _string_leaves(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _string_leaves(item)
+    elif isinstance(value, str):
+        yield value
+
+
+def test_repository_templates_render_identically(environments):
+    compiled = 0
+    for path in glob.glob(os.path.join(TEMPLATES_DIR, '*.json')):
+        with open(path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            continue
+        for source in _string_leaves(data.get('transform', {})):
+            for env in environments.values():
+                try:
+                    native = compile_template(env, source)
+                except jinja2.TemplateSyntaxError:
+                    continue
+                if native is None:
+                    continue
+                compiled += 1
+                expected, actual = _render_both(env, source, CONTEXT)
+                assert actual == expected, (path, source)
+
+    assert compiled > 0
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('{{ message.subdeviceid }}', 673922542395461),
+    ('{{- message.subdevicelist[0].value -}}\n', {'alarmstatus': 'alarm', 'alarmtype': 'panic'}),
+    ('{{ flag }}', True),
+    ('{{ message.missing }}', None),
+    ("{{ devices[0]['values'].alarmtype | default('Alarm') }}", 'panic'),
+    ('{{ timestamp + 1 }}', 1747344698),
+    ('{{ devices | map(attribute="id") | list }}', ['dev-1']),
+])
+def test_compile_value_returns_python_objects(environments, source, expected):
+    evaluate = compile_value(environments['normalized'], source)
+    assert evaluate(CONTEXT) == expected
+    assert type(evaluate(CONTEXT)) is type(expected)
+
+
+@pytest.mark.parametrize('source', ['ID {{ gateway_id }}', '{{ timestamp }}_{{ uuid }}', '{% if flag %}ja{% endif %}'])
+def test_compile_value_rejects_more_than_one_expression(environments, source):
+    assert compile_value(environments['normalized'], source) is None
+
+
+def test_native_types_is_opt_in_per_template(tmp_path):
+    transform = {
+        'device_id': '{{ devices[0].id }}',
+        'values': "{{ devices[0]['values'] }}",
+        'label': 'Gerät {{ devices[0].id }}',
+        'count': '{{ devices | length }}'
+    }
+    for name, native_types in (('legacy', False), ('typed', True)):
+        with open(tmp_path / f'{name}.json', 'w') as f:
+            json.dump({'name': name, 'native_types': native_types, 'transform': transform}, f)
+    engine = NormalizedTemplateEngine(str(tmp_path))
+    message = {'gateway': {'id': 'gw-1'}, 'devices': [{'id': '0815', 'values': {'alarmtype': 'panic'}}]}
+
+    legacy = engine.transform(message, 'legacy')
+    typed = engine.transform(message, 'typed')
+
+    # Ohne Option wird der Typ aus dem Text geraten: die Geräte-ID wird zur Zahl
+    assert legacy['device_id'] == 815
+    assert typed['device_id'] == '0815'
+    assert typed['values'] == {'alarmtype': 'panic'}
+    assert typed['label'] == 'Gerät 0815'
+    assert typed['count'] == 1
@@ -0,0 +1,177 @@
+"""
+Tests für die vorkompilierten transform-Bäume und das Nachladen von Templates der TemplateEngine
+"""
+
+import sys
+import os
+import json
+import shutil
+import threading
+import time
+
+import jinja2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.template_engine import TemplateEngine
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+CONTEXT = {
+    'message': {'code': 2030, 'subdeviceid': 4711, 'subdevicelist': [{'id': 4711, 'value': {'alarmtype': 'panic'}}]},
+    'uuid': '00000000-0000-0000-0000-000000000000',
+    'timestamp': 1747344697,
+    'gateway_id': 'gw-1',
+    'customer_config': {'name': 'Kunde', 'evalarm_namespace': 'kunde.evalarm.de'}
+}
+
+
+def _render_uncompiled(transform, env, context):
+    """
+    Früherer Ablauf: jeden String bei jeder Nachricht neu kompilieren
+    """
+    if isinstance(transform, dict):
+        return {key: _render_uncompiled(value, env, context) for key, value in transform.items()}
+    if isinstance(transform, list):
+        return [_render_uncompiled(item, env, context) for item in transform]
+    if isinstance(transform, str):
+        return env.from_string(transform).render(**context)
+    return transform
+
+
+@pytest.fixture
+def templates_dir(tmp_path):
+    for name in ('evalarm_panic.json', 'evalarm_status.json'):
+        shutil.copy(os.path.join(TEMPLATES_DIR, name), tmp_path / name)
+    return str(tmp_path)
+
+
+def test_plans_render_like_uncompiled_templates():
+    engine = TemplateEngine(TEMPLATES_DIR)
+    env = jinja2.Environment(autoescape=True)
+    assert engine.plans
+
+    for name, template in engine.templates.items():
+        transform = template['data'].get('transform', {})
+        try:
+            expected = _render_uncompiled(transform, env, CONTEXT)
+        except jinja2.TemplateError:
+            # Fehlerhafte Templates scheitern weiterhin erst bei der Transformation
+            with pytest.raises(jinja2.TemplateError):
+                engine._render_plan(engine._get_plan(name), CONTEXT)
+            continue
+        assert engine._render_plan(engine._get_plan(name), CONTEXT) == expected, name
+
+
+def test_strings_without_jinja_syntax_stay_literals():
+    engine = TemplateEngine(TEMPLATES_DIR, preload=False)
+    plan = engine._compile_transform({'message': 'Alarm Knopf', 'count': 3, 'id': '{{ uuid }}', 'text': 'a\n'})
+
+    kinds = {key: item[0] for key, item in plan[1]}
+    assert kinds == {'message': 'literal', 'count': 'literal', 'id': 'native', 'text': 'native'}
+    assert engine._render_plan(plan, CONTEXT)['text'] == 'a'
+
+
+def test_plans_are_reused_and_rebuilt_on_reload(templates_dir):
+    engine = TemplateEngine(templates_dir)
+    plan = engine._get_plan('evalarm_panic')
+    assert engine._get_plan('evalarm_panic') is plan
+
+    path = os.path.join(templates_dir, 'evalarm_panic.json')
+    with open(path) as f:
+        data = json.load(f)
+    data['transform']['events'][0]['message'] = 'Notruf {{ gateway_id }}'
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+    engine.reload_templates()
+    assert engine._get_plan('evalarm_panic') is not plan
+
+    result = engine.transform_message({'subdeviceid': 1, 'gateway_id': 'gw-7'}, 'evalarm_panic')
+    assert result['events'][0]['message'] == 'Notruf gw-7'
+
+
+def _rewrite(path, message):
+    with open(path) as f:
+        data = json.load(f)
+    data['transform']['events'][0]['message'] = message
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    # mtime sicher verändern, auch bei grober Zeitauflösung des Dateisystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_check_for_changes_reloads_only_changed_templates(templates_dir):
+    engine = TemplateEngine(templates_dir)
+    notifications = []
+    engine.add_reload_listener(lambda version, names: notifications.append((version, names)))
+    status_plan = engine._get_plan('evalarm_status')
+    version = engine.version
+
+    assert engine.check_for_changes() == []
+
+    _rewrite(os.path.join(templates_dir, 'evalarm_panic.json'), 'Notruf')
+    assert engine.check_for_changes() == ['evalarm_panic']
+    assert engine.version == version + 1
+    assert notifications == [(version + 1, ['evalarm_panic'])]
+    assert engine._get_plan('evalarm_status') is status_plan
+    assert engine.transform_message({'subdeviceid': 1}, 'evalarm_panic')['events'][0]['message'] == 'Notruf'
+
+    os.remove(os.path.join(templates_dir, 'evalarm_status.json'))
+    assert engine.check_for_changes() == ['evalarm_status']
+    assert 'evalarm_status' not in engine.templates and 'evalarm_status' not in engine.plans
+
+
+def test_unreadable_file_keeps_previous_template_until_fixed(templates_dir):
+    engine = TemplateEngine(templates_dir)
+    path = os.path.join(templates_dir, 'evalarm_panic.json')
+    with open(path) as f:
+        original = f.read()
+
+    # Halb geschriebene Datei
+    with open(path, 'w') as f:
+        f.write(original[:40])
+    assert engine.check_for_changes() == []
+    assert engine.transform_message({'subdeviceid': 1}, 'evalarm_panic')['events'][0]['message'] == 'Alarm Knopf'
+
+    with open(path, 'w') as f:
+        f.write(original.replace('Alarm Knopf', 'Notruf'))
+    assert engine.check_for_changes() == ['evalarm_panic']
+
+
+def test_transformations_never_miss_templates_during_reload(templates_dir):
+    engine = TemplateEngine(templates_dir)
+    stop = threading.Event()
+    failures = []
+
+    def transform():
+        while not stop.is_set():
+            if engine.transform_message({'subdeviceid': 1}, 'evalarm_panic') is None:
+                failures.append(1)
+
+    thread = threading.Thread(target=transform)
+    thread.start()
+    try:
+        for _ in range(50):
+            engine.reload_templates()
+    finally:
+        stop.set()
+        thread.join()
+
+    assert failures == []
+
+
+def test_watcher_picks_up_changes(templates_dir):
+    engine = TemplateEngine(templates_dir)
+    assert not engine.start_watching(0)
+    assert engine.start_watching(0.02)
+    try:
+        _rewrite(os.path.join(templates_dir, 'evalarm_panic.json'), 'Notruf')
+        deadline = time.time() + 5.0
+        while engine.templates['evalarm_panic']['data']['transform']['events'][0]['message'] != 'Notruf':
+            assert time.time() < deadline
+            time.sleep(0.01)
+    finally:
+        engine.stop_watching()
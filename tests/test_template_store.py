@@ -0,0 +1,155 @@
+"""
+Tests für den gemeinsamen Template-Store (utils.template_store) und seine Anbindung an die TemplateEngine
+
+Zwei TemplateEngines stehen für zwei Container, die sich einen Redis-Server (fakeredis) teilen.
+"""
+
+import sys
+import os
+import shutil
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("fakeredis")
+
+from utils import template_store as template_store_module
+from utils.template_store import RedisTemplateStore
+from utils.template_engine import TemplateEngine
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+
+@pytest.fixture
+def templates_dir(tmp_path):
+    for name in ('evalarm_panic.json', 'evalarm_status.json'):
+        shutil.copy(os.path.join(TEMPLATES_DIR, name), tmp_path / name)
+    return str(tmp_path)
+
+
+@pytest.fixture
+def engines(server, templates_dir, tmp_path_factory):
+    """Zwei Engines mit eigenem Store; die zweite hat ein leeres Templates-Verzeichnis"""
+    started = []
+    for directory in (templates_dir, str(tmp_path_factory.mktemp('empty'))):
+        engine = TemplateEngine(directory, preload=False)
+        engine.attach_store(RedisTemplateStore(prefix='test'))
+        started.append(engine)
+    yield started
+    for engine in started:
+        engine.stop_watching()
+
+
+def _panic_message(engine):
+    return engine.transform_message({'subdeviceid': 1, 'gateway_id': 'gw-7'}, 'evalarm_panic')['events'][0]['message']
+
+
+def test_local_files_seed_the_store_for_all_processes(engines):
+    first, second = engines
+
+    assert sorted(first.get_template_names()) == ['evalarm_panic', 'evalarm_status']
+    assert sorted(second.get_template_names()) == ['evalarm_panic', 'evalarm_status']
+    assert _panic_message(second) == 'Alarm Knopf'
+    assert second.get_template('evalarm_panic')['path'] is None
+
+
+def test_changes_reach_other_processes_within_a_second(engines, wait_for):
+    first, second = engines
+    data = dict(first.templates['evalarm_panic']['data'])
+    data['transform'] = {'events': [{'message': 'Notruf {{ gateway_id }}'}]}
+    status_plan = second._get_plan('evalarm_status')
+
+    version = first.save_template('evalarm_panic', data)
+
+    assert _panic_message(first) == 'Notruf gw-7'
+    assert wait_for(lambda: second.templates['evalarm_panic'].get('version') == version, timeout=1.0)
+    assert _panic_message(second) == 'Notruf gw-7'
+    # Nur das geänderte Template wird neu kompiliert
+    assert second._get_plan('evalarm_status') is status_plan
+
+    assert first.delete_template('evalarm_status')
+    assert wait_for(lambda: 'evalarm_status' not in second.templates, timeout=1.0)
+
+
+def test_save_with_stale_version_is_rejected(engines):
+    first, second = engines
+    version = first.templates['evalarm_panic']['version']
+    data = first.templates['evalarm_panic']['data']
+
+    assert second.save_template('evalarm_panic', data, expected_version=version) is not None
+    assert first.save_template('evalarm_panic', data, expected_version=version) is None
+    # 0 = nur neu anlegen
+    assert first.save_template('evalarm_status', data, expected_version=0) is None
+    assert first.save_template('evalarm_neu', data, expected_version=0) is not None
+
+
+def test_deleted_templates_are_not_seeded_again(server, templates_dir, engines):
+    first, _ = engines
+    first.delete_template('evalarm_status')
+
+    # Ein neu gestarteter Container mit der Datei im Verzeichnis
+    restarted = TemplateEngine(templates_dir, preload=False)
+    restarted.attach_store(RedisTemplateStore(prefix='test'))
+    try:
+        assert restarted.get_template_names() == ['evalarm_panic']
+    finally:
+        restarted.stop_watching()
+
+
+def test_engines_sharing_one_store_each_receive_changes(server, templates_dir, engines, wait_for):
+    first, _ = engines
+    # Processor und Worker eines Containers nutzen denselben Store (get_template_store())
+    shared = RedisTemplateStore(prefix='test')
+    processor, worker = TemplateEngine(templates_dir, preload=False), TemplateEngine(templates_dir, preload=False)
+    processor.attach_store(shared)
+    worker.attach_store(shared)
+    try:
+        data = first.templates['evalarm_panic']['data']
+        version = first.save_template('evalarm_panic', data)
+        assert wait_for(lambda: processor.templates['evalarm_panic'].get('version') == version, timeout=1.0)
+        assert wait_for(lambda: worker.templates['evalarm_panic'].get('version') == version, timeout=1.0)
+
+        # Stoppt der Worker, muss der Processor weiterhin Änderungen erhalten
+        worker.stop_watching()
+        version = first.save_template('evalarm_panic', data)
+        assert wait_for(lambda: processor.templates['evalarm_panic'].get('version') == version, timeout=1.0)
+        assert worker.templates['evalarm_panic'].get('version') < version
+    finally:
+        processor.stop_watching()
+        worker.stop_watching()
+    assert shared.subscribe_thread is None
+
+
+def test_stale_notifications_are_ignored(engines):
+    first, _ = engines
+    entry = first.templates['evalarm_panic']
+    version = first.version
+
+    first._on_store_change('evalarm_panic', entry['version'])
+
+    assert first.templates['evalarm_panic'] is entry
+    assert first.version == version
+
+
+def test_connection_loss_triggers_full_resync(server):
+    store = RedisTemplateStore(prefix='test', reconnect_delay=0.01)
+
+    class BrokenPubSub:
+        def get_message(self, timeout):
+            raise template_store_module.redis.ConnectionError('Verbindung verloren')
+
+        def close(self):
+            pass
+
+    calls = []
+
+    def callback(name, version):
+        calls.append((name, version))
+        store.subscribe_stop.set()
+
+    store.callbacks.append(callback)
+    store._subscribe_loop(BrokenPubSub())
+
+    # Änderungen während der Unterbrechung sind unbekannt: alles neu abgleichen
+    assert calls == [(None, None)]
@@ -0,0 +1,51 @@
+"""
+Tests für den Autoscaler der Worker-Threads
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.worker_autoscaler import WorkerAutoscaler
+
+
+def test_scales_up_to_drain_backlog_within_target_time():
+    autoscaler = WorkerAutoscaler(min_workers=1, max_workers=16, target_drain_time=5.0)
+    autoscaler.record_processing_time(0.1)
+
+    # 300 Nachrichten * 0.1s / 5s = 6 Threads
+    assert autoscaler.evaluate(pending=300, current=2) == 6
+    assert autoscaler.decisions[-1]['reason'] == 'queue_backlog'
+
+
+def test_scale_up_is_capped_at_max_workers():
+    autoscaler = WorkerAutoscaler(min_workers=1, max_workers=4)
+    autoscaler.record_processing_time(1.0)
+
+    assert autoscaler.evaluate(pending=10000, current=2) == 4
+
+
+def test_grows_by_one_without_measurements():
+    autoscaler = WorkerAutoscaler(min_workers=1, max_workers=8)
+
+    assert autoscaler.evaluate(pending=50, current=2) == 3
+
+
+def test_scales_down_one_thread_after_sustained_idle():
+    autoscaler = WorkerAutoscaler(min_workers=1, max_workers=8, scale_down_delay=3)
+
+    assert autoscaler.evaluate(pending=0, current=4) == 4
+    assert autoscaler.evaluate(pending=0, current=4) == 4
+    assert autoscaler.evaluate(pending=0, current=4) == 3
+    assert autoscaler.decisions[-1]['reason'] == 'idle'
+
+
+def test_backlog_resets_scale_down_countdown():
+    autoscaler = WorkerAutoscaler(min_workers=1, max_workers=8, scale_down_delay=2)
+    autoscaler.record_processing_time(0.5)
+
+    assert autoscaler.evaluate(pending=0, current=3) == 3
+    assert autoscaler.evaluate(pending=30, current=3) == 3
+    assert autoscaler.evaluate(pending=0, current=3) == 3
+    assert autoscaler.evaluate(pending=0, current=3) == 2
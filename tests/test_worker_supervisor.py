@@ -0,0 +1,86 @@
+"""
+Tests für den Worker Supervisor
+
+Die Kindprozesse führen einfache Testfunktionen statt echter Worker aus, damit
+weder Redis noch MongoDB benötigt werden.
+"""
+
+import sys
+import os
+import time
+import signal
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("fakeredis")
+
+from api.message_queue import RedisMessageQueue
+from api.worker_supervisor import WorkerSupervisor
+
+
+def _crash(index, health_interval):
+    sys.exit(3)
+
+
+def _run_until_terminated(index, health_interval):
+    stopped = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.append(signum))
+    while not stopped:
+        time.sleep(0.01)
+
+
+def _ignore_sigterm(index, health_interval):
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    while True:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def queue(server):
+    return RedisMessageQueue(prefix='test')
+
+
+def test_starts_one_process_per_slot_and_stops_them_with_sigterm(queue, wait_for):
+    supervisor = WorkerSupervisor(num_processes=2, target=_run_until_terminated, queue=queue)
+    supervisor.check_processes()
+    processes = list(supervisor.processes.values())
+
+    assert wait_for(lambda: all(process.is_alive() for process in processes))
+    assert supervisor.get_status()['alive_processes'] == 2
+    time.sleep(0.2)
+
+    supervisor.shutdown()
+
+    assert [process.exitcode for process in processes] == [0, 0]
+
+
+def test_restarts_crashed_process_with_backoff(queue):
+    supervisor = WorkerSupervisor(num_processes=1, target=_crash, queue=queue)
+    supervisor.check_processes()
+    first = supervisor.processes[0]
+    first.join(5)
+
+    supervisor.check_processes()
+
+    assert supervisor.restarts[0] == 1
+    assert supervisor.processes[0] is None
+    assert supervisor.restart_at[0] > time.time()
+
+    supervisor.restart_at[0] = 0
+    supervisor.check_processes()
+
+    assert supervisor.processes[0] is not first
+    supervisor.shutdown()
+
+
+def test_kills_processes_that_ignore_sigterm(queue, wait_for):
+    supervisor = WorkerSupervisor(num_processes=1, target=_ignore_sigterm, queue=queue, shutdown_timeout=0.2)
+    supervisor.check_processes()
+    process = supervisor.processes[0]
+    assert wait_for(process.is_alive)
+    time.sleep(0.2)
+
+    supervisor.shutdown()
+
+    assert process.exitcode == -signal.SIGKILL
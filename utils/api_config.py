@@ -91,6 +91,7 @@ ENDPOINTS = {
         'forwarding': '/forwarding',
         'retry': '/retry/<message_id>',
         'failed': '/failed',
+        'history': '/history',   # /api/v1/messages/history - Gespeicherte Verarbeitungsergebnisse (MongoDB)
         'clear': '/clear'
     },
     
@@ -99,6 +100,7 @@ ENDPOINTS = {
         'list': '',
         'detail': '/<template_id>',
         'delete': '/<template_id>',
+        'save': '/<template_id>',   # PUT - Template speichern (mit TEMPLATE_STORE=redis in allen Prozessen)
         'test': '/test-transform',
         'reload': '/reload',
         'generate': '/generate',
@@ -122,7 +124,9 @@ ENDPOINTS = {
         'health': '/health',
         'iot_status': '/iot-status',
         'endpoints': '/endpoints',
-        'logs': '/logs'
+        'logs': '/logs',
+        'drain': '/drain',
+        'ready': '/ready'
     },
     
     # Template-Lernsystem Endpunkte
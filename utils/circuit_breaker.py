@@ -0,0 +1,196 @@
+"""
+Circuit Breaker und Bulkhead für die Weiterleitung an Kunden-Endpunkte
+
+Der Circuit Breaker beobachtet die letzten Anfragen an einen Endpunkt. Liegt
+die Fehlerquote über einem Schwellwert, wird der Endpunkt für eine Weile
+gesperrt (open), danach mit einzelnen Testanfragen geprüft (half-open) und bei
+Erfolg wieder freigegeben (closed). Das Bulkhead begrenzt die gleichzeitig
+laufenden Anfragen je Endpunkt, damit ein langsamer Endpunkt nicht alle
+Worker-Threads belegt.
+
+Ist ein Endpunkt gesperrt oder ausgelastet, wird EndpointUnavailableError
+ausgelöst; der Worker stellt die Nachricht dann ohne Fehlversuch zurück.
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Dict, Any
+
+
+class EndpointUnavailableError(Exception):
+    """
+    Der Endpunkt nimmt gerade keine Anfragen an (Circuit offen oder Bulkhead voll)
+    """
+
+    def __init__(self, endpoint_name: str, reason: str, retry_after: float):
+        self.endpoint_name = endpoint_name
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Endpunkt '{endpoint_name}' nicht verfügbar ({reason}), erneut in {retry_after:.1f}s")
+
+
+class CircuitBreaker:
+    """
+    Circuit Breaker mit Fehlerquote über die letzten window_size Anfragen
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, window_size: int = 20,
+                 minimum_calls: int = 5, open_timeout: float = 30.0, half_open_max_calls: int = 1):
+        """
+        Initialisiere den Circuit Breaker
+
+        Args:
+            name: Name des Endpunkts (für Logs und Status)
+            failure_rate_threshold: Fehlerquote (0-1), ab der der Circuit öffnet
+            window_size: Anzahl der letzten Anfragen, über die die Fehlerquote berechnet wird
+            minimum_calls: Mindestanzahl an Anfragen im Fenster, bevor der Circuit öffnen kann
+            open_timeout: Sekunden, die der Circuit offen bleibt, bevor Testanfragen erlaubt sind
+            half_open_max_calls: Anzahl gleichzeitiger Testanfragen im Zustand half-open
+        """
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.window_size = window_size
+        self.minimum_calls = minimum_calls
+        self.open_timeout = open_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = self.CLOSED
+        self.outcomes = deque(maxlen=window_size)
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Prüft, ob eine Anfrage erlaubt ist, und reserviert im Zustand half-open eine Testanfrage
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.open_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.half_open_calls = 0
+
+            if self.state == self.HALF_OPEN:
+                if self.half_open_calls >= self.half_open_max_calls:
+                    return False
+                self.half_open_calls += 1
+
+            return True
+
+    def retry_after(self) -> float:
+        """
+        Sekunden, bis der Circuit wieder Testanfragen zulässt (mindestens 1)
+        """
+        with self._lock:
+            if self.state != self.OPEN:
+                return 1.0
+            return max(1.0, self.open_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        """
+        Meldet eine erfolgreiche Anfrage; eine erfolgreiche Testanfrage schließt den Circuit
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self.outcomes.clear()
+            self.outcomes.append(True)
+
+    def record_failure(self) -> None:
+        """
+        Meldet eine fehlgeschlagene Anfrage; öffnet den Circuit bei zu hoher Fehlerquote
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+
+            self.outcomes.append(False)
+            if len(self.outcomes) >= self.minimum_calls and self._failure_rate() >= self.failure_rate_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        """
+        Öffnet den Circuit (Lock muss gehalten werden)
+        """
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self.outcomes.clear()
+
+    def _failure_rate(self) -> float:
+        """
+        Fehlerquote im aktuellen Fenster (Lock muss gehalten werden)
+        """
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Gibt Zustand und Fehlerquote des Circuits zurück
+        """
+        with self._lock:
+            return {
+                'state': self.state,
+                'failure_rate': round(self._failure_rate(), 3),
+                'calls_in_window': len(self.outcomes),
+                'times_opened': self.times_opened
+            }
+
+
+class Bulkhead:
+    """
+    Begrenzt die gleichzeitig laufenden Anfragen an einen Endpunkt
+    """
+
+    def __init__(self, name: str, max_concurrent: int):
+        """
+        Args:
+            name: Name des Endpunkts
+            max_concurrent: Maximale Anzahl gleichzeitiger Anfragen
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """
+        Reserviert einen Platz, ohne zu warten
+
+        Returns:
+            True, wenn ein Platz frei war
+        """
+        with self._lock:
+            if self.in_flight >= self.max_concurrent:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self) -> None:
+        """
+        Gibt einen reservierten Platz frei
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Gibt Auslastung und Anzahl abgewiesener Anfragen zurück
+        """
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_concurrent': self.max_concurrent,
+                'rejected': self.rejected
+            }
@@ -391,6 +391,27 @@ class DeviceRegistry:
         logger.info(f"Added custom device type: {device_type_id}")
         return True
     
+    def get_message_priority(self, message_data: Dict[str, Any]) -> str:
+        """
+        Determine the processing priority of a message
+        
+        The message code is the most specific signal (e.g. 2030 panic alarm is
+        critical), the detected device type is used as fallback.
+        
+        Args:
+            message_data: Message data containing device information
+            
+        Returns:
+            Priority: critical, high, normal or low
+        """
+        code = message_data.get("code") if isinstance(message_data, dict) else None
+        if code in self.message_codes:
+            return self.message_codes[code].get("priority", "normal")
+        
+        device_type = self.detect_device_type(message_data)
+        config = self.device_types.get(device_type) or self._custom_devices.get(device_type) or {}
+        return config.get("priority", "normal")
+    
     def get_message_code_info(self, code: int) -> Optional[Dict[str, Any]]:
         """Get information about a message code"""
         return self.message_codes.get(code)
@@ -412,6 +433,10 @@ def detect_device_type(message_data: Dict[str, Any]) -> str:
     """Global function for device type detection"""
     return device_registry.detect_device_type(message_data)
 
+def get_message_priority(message_data: Dict[str, Any]) -> str:
+    """Global function to determine the processing priority of a message"""
+    return device_registry.get_message_priority(message_data)
+
 def get_device_capabilities(device_type: str) -> Optional[Dict[str, Any]]:
     """Global function to get device capabilities"""
     return device_registry.get_device_capabilities(device_type)
@@ -18,6 +18,7 @@ from typing import Dict, List, Any, Optional, Union, Tuple
 
 # Importiere das Filter Rules System
 from utils.filter_rules import FilterRuleEngine, FilterRule, ValueComparisonRule, RangeRule, RegexRule, ListContainsRule, AndRule, OrRule
+from utils.template_compiler import compile_template, compile_value
 
 # Konfiguriere Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -54,6 +55,11 @@ class NormalizedTemplateEngine:
         self._register_jinja_filters()
         self._register_jinja_functions()
         
+        # Kompilierte Template-Strings (String -> Render-Funktion), einmal pro String
+        self.compiled_strings: Dict[str, Any] = {}
+        # Für die typisierte Ausgabe: String -> Funktion für den Wert des Ausdrucks (False = kein Einzelausdruck)
+        self.compiled_values: Dict[str, Any] = {}
+        
         # Templates und Filter Rules laden
         self.templates = {}
         self.filter_engine = FilterRuleEngine()
@@ -171,7 +177,8 @@ class NormalizedTemplateEngine:
                     self.templates[template_name] = {
                         'data': template_data,
                         'path': template_path,
-                        'filter_rules': template_data.get('filter_rules', [])
+                        'filter_rules': template_data.get('filter_rules', []),
+                        'native_types': bool(template_data.get('native_types', False))
                     }
                     logger.info(f"Template '{template_name}' geladen")
                     
@@ -272,6 +279,8 @@ class NormalizedTemplateEngine:
         Lädt alle Templates und Filterregeln neu
         """
         self.templates = {}
+        self.compiled_strings = {}
+        self.compiled_values = {}
         self.filter_engine = FilterRuleEngine()
         self.load_templates()
         self.load_filter_rules()
@@ -409,7 +418,8 @@ class NormalizedTemplateEngine:
             }
             
             # Transformation durchführen
-            result = self._transform_recursive(template_data.get('transform', {}), context)
+            result = self._transform_recursive(template_data.get('transform', {}), context,
+                                               native_types=template.get('native_types', False))
             
             # Metadaten hinzufügen
             result['_uuid'] = message_uuid
@@ -426,13 +436,14 @@ class NormalizedTemplateEngine:
             logger.error(f"Stacktrace: {traceback.format_exc()}")
             return None
     
-    def _transform_recursive(self, transform: Any, context: Dict[str, Any]) -> Any:
+    def _transform_recursive(self, transform: Any, context: Dict[str, Any], native_types: bool = False) -> Any:
         """
         Hilfsfunktion zur rekursiven Transformation von Nachrichten
         
         Args:
             transform: Transformations-Daten (kann ein Dictionary, eine Liste oder ein String sein)
             context: Transformationskontext mit allen Variablen
+            native_types: Typisierte Ausgabe (siehe _transform_value)
             
         Returns:
             Transformierte Daten
@@ -442,17 +453,22 @@ class NormalizedTemplateEngine:
             result = {}
             for key, value in transform.items():
                 # Schlüssel können auch Templates sein
-                transformed_key = self._transform_string(key, context)
-                transformed_value = self._transform_recursive(value, context)
+                if native_types:
+                    transformed_key = self._render_string(key, context)
+                else:
+                    transformed_key = self._transform_string(key, context)
+                transformed_value = self._transform_recursive(value, context, native_types)
                 result[transformed_key] = transformed_value
             return result
             
         elif isinstance(transform, list):
             # Liste rekursiv transformieren
-            return [self._transform_recursive(item, context) for item in transform]
+            return [self._transform_recursive(item, context, native_types) for item in transform]
             
         elif isinstance(transform, str):
             # String als Jinja2-Template transformieren
+            if native_types:
+                return self._transform_value(transform, context)
             return self._transform_string(transform, context)
             
         else:
@@ -474,9 +490,8 @@ class NormalizedTemplateEngine:
         if '{{' not in template_str and '{%' not in template_str:
             return template_str
         
-        # Template erstellen und rendern
-        template = self.jinja_env.from_string(template_str)
-        result_str = template.render(**context)
+        # Template rendern (einmal kompiliert, einfache Ausdrücke nativ ohne Jinja2)
+        result_str = self._render_string(template_str, context)
         
         # Versuche, den String in einen nativen Typ zu konvertieren
         try:
@@ -496,6 +511,55 @@ class NormalizedTemplateEngine:
                 # Sonst als String belassen
                 return result_str
     
+    def _transform_value(self, template_str: str, context: Dict[str, Any]) -> Any:
+        """
+        Typisierte Ausgabe (Template-Option "native_types": true)
+        
+        Besteht der String nur aus einem Ausdruck ("{{ devices[0].id }}"), wird dessen
+        Python-Wert unverändert übernommen (Zahlen, Listen, Objekte, None für undefinierte
+        Werte). Alle anderen Templates ergeben den gerenderten String, ohne dass aus dem
+        Text ein Typ geraten wird.
+        
+        Args:
+            template_str: Der Template-String
+            context: Transformationskontext
+            
+        Returns:
+            Wert des Ausdrucks oder gerenderter String
+        """
+        if '{{' not in template_str and '{%' not in template_str:
+            return template_str
+        
+        evaluate = self.compiled_values.get(template_str)
+        if evaluate is None:
+            evaluate = compile_value(self.jinja_env, template_str) or False
+            self.compiled_values[template_str] = evaluate
+        
+        if evaluate:
+            return evaluate(context)
+        return self._render_string(template_str, context)
+    
+    def _render_string(self, template_str: str, context: Dict[str, Any]) -> str:
+        """
+        Rendert einen Template-String zu Text
+        """
+        if '{{' not in template_str and '{%' not in template_str:
+            return template_str
+        return self._compile_string(template_str)(context)
+    
+    def _compile_string(self, template_str: str):
+        """
+        Gibt die Render-Funktion für einen Template-String zurück und kompiliert ihn beim ersten Aufruf
+        """
+        render = self.compiled_strings.get(template_str)
+        if render is None:
+            render = compile_template(self.jinja_env, template_str)
+            if render is None:
+                template = self.jinja_env.from_string(template_str)
+                render = lambda context: template.render(**context)
+            self.compiled_strings[template_str] = render
+        return render
+    
     def generate_template(self, normalized_message: Dict[str, Any], 
                           template_name: str, description: str = None) -> Dict[str, Any]:
         """
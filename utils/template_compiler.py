@@ -0,0 +1,211 @@
+"""
+Übersetzt einfache Jinja2-Templates in native Python-Funktionen
+
+Die meisten Templates sind JSON-Gerüste, deren Blätter nur Variablen ausgeben,
+z.B. "{{ message.subdeviceid }}", "{{ timestamp }}_{{ uuid }}" oder
+"{{ customer_config.namespace | default('default') }}". Für solche Strings baut
+compile_template() aus dem Jinja2-AST eine Closure, die Variablen direkt im
+Kontext nachschlägt, statt die generierte Render-Funktion von Jinja2 zu durchlaufen.
+
+Unterstützt werden Text, Variablen, Attribut- und Index-Zugriffe mit Konstanten
+(a.b, a['b'], a[0]), Konstanten, Inline-if (x if y else z) und Filter mit
+konstanten Argumenten. Alles andere ({% if %}, {% for %}, Funktionsaufrufe,
+Tests, Operatoren, ...) liefert None; der Aufrufer verwendet dann Jinja2.
+
+Die Semantik entspricht der von Jinja2 erzeugten Funktion: Zugriffe laufen über
+Environment.getattr/getitem, fehlende Variablen werden zu Undefined, Filter
+kommen aus Environment.filters, und die Ausgabe wird wie bei Jinja2 escaped.
+Das Ergebnis ist daher zeichengleich mit Template.render().
+
+compile_value() liefert für Strings, die nur aus einem Ausdruck bestehen
+("{{ message.subdeviceid }}"), den Python-Wert des Ausdrucks statt seiner
+Textausgabe (typisierte Ausgabe der NormalizedTemplateEngine).
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+import jinja2
+from jinja2 import nodes
+from markupsafe import escape
+
+RenderFunction = Callable[[Dict[str, Any]], str]
+ExpressionFunction = Callable[[Dict[str, Any]], Any]
+
+
+class _Unsupported(Exception):
+    """
+    Der Ausdruck enthält Konstrukte, die nicht nativ übersetzt werden
+    """
+
+
+def compile_template(env: jinja2.Environment, source: str) -> Optional[RenderFunction]:
+    """
+    Übersetzt ein Template in eine native Render-Funktion
+
+    Args:
+        env: Jinja2-Umgebung, deren Filter, Globals und Autoescape-Einstellung gelten
+        source: Template-String
+
+    Returns:
+        Funktion render(context) -> str oder None, wenn das Template Jinja2 benötigt
+
+    Raises:
+        jinja2.TemplateSyntaxError: Das Template ist fehlerhaft (wie bei Environment.from_string)
+    """
+    if env.finalize is not None:
+        return None
+    autoescape = env.autoescape(None) if callable(env.autoescape) else env.autoescape
+    convert = escape if autoescape else str
+
+    template = env.parse(source)
+    parts: List[Any] = []
+    for node in template.body:
+        if not isinstance(node, nodes.Output):
+            return None
+        for child in node.nodes:
+            if isinstance(child, nodes.TemplateData):
+                parts.append(child.data)
+                continue
+            try:
+                parts.append(_compile_expression(env, child))
+            except _Unsupported:
+                return None
+
+    if not parts:
+        return lambda context: ''
+
+    if len(parts) == 1:
+        part = parts[0]
+        if isinstance(part, str):
+            return lambda context: part
+        return lambda context: str(convert(part(context)))
+
+    def render(context: Dict[str, Any]) -> str:
+        return ''.join([part if isinstance(part, str) else convert(part(context)) for part in parts])
+
+    return render
+
+
+def compile_value(env: jinja2.Environment, source: str) -> Optional[ExpressionFunction]:
+    """
+    Übersetzt einen String, der nur aus einem Ausdruck besteht, in eine Funktion, die dessen Wert liefert
+
+    Einfache Ausdrücke werden nativ übersetzt, alle anderen mit Environment.compile_expression().
+    Undefinierte Werte werden zu None.
+
+    Args:
+        env: Jinja2-Umgebung, deren Filter und Globals gelten
+        source: Template-String, z.B. "{{ devices[0].id }}"
+
+    Returns:
+        Funktion evaluate(context) -> Wert oder None, wenn der String mehr als einen Ausdruck oder Text enthält
+
+    Raises:
+        jinja2.TemplateSyntaxError: Das Template ist fehlerhaft
+    """
+    template = env.parse(source)
+    if len(template.body) != 1 or not isinstance(template.body[0], nodes.Output):
+        return None
+    children = template.body[0].nodes
+    if len(children) != 1 or isinstance(children[0], nodes.TemplateData):
+        return None
+
+    try:
+        evaluate = _compile_expression(env, children[0])
+    except _Unsupported:
+        expression = env.compile_expression(_expression_source(env, source), undefined_to_none=False)
+        evaluate = lambda context: expression(**context)
+
+    def value(context: Dict[str, Any]) -> Any:
+        result = evaluate(context)
+        return None if isinstance(result, jinja2.Undefined) else result
+
+    return value
+
+
+def _expression_source(env: jinja2.Environment, source: str) -> str:
+    """
+    Entfernt die Begrenzer ({{ }} inklusive Whitespace-Steuerung) um einen einzelnen Ausdruck
+    """
+    inner = source.strip()[len(env.variable_start_string):-len(env.variable_end_string)]
+    inner = inner.strip()
+    if inner[:1] in ('-', '+'):
+        inner = inner[1:]
+    if inner[-1:] in ('-', '+'):
+        inner = inner[:-1]
+    return inner
+
+
+def _compile_expression(env: jinja2.Environment, node: nodes.Expr) -> ExpressionFunction:
+    """
+    Übersetzt einen Ausdruck in eine Funktion evaluate(context) -> Wert
+
+    Raises:
+        _Unsupported: Der Ausdruck wird nicht nativ übersetzt
+    """
+    if isinstance(node, nodes.Name) and node.ctx == 'load':
+        name = node.name
+        globals_ = env.globals
+        undefined = env.undefined
+
+        def lookup(context):
+            if name in context:
+                return context[name]
+            if name in globals_:
+                return globals_[name]
+            return undefined(name=name)
+        return lookup
+
+    if isinstance(node, nodes.Const):
+        value = node.value
+        return lambda context: value
+
+    if isinstance(node, nodes.Getattr) and node.ctx == 'load':
+        target = _compile_expression(env, node.node)
+        attribute = node.attr
+        getattr_ = env.getattr
+        return lambda context: getattr_(target(context), attribute)
+
+    if isinstance(node, nodes.Getitem) and node.ctx == 'load' and isinstance(node.arg, nodes.Const):
+        target = _compile_expression(env, node.node)
+        key = node.arg.value
+        getitem = env.getitem
+        return lambda context: getitem(target(context), key)
+
+    if isinstance(node, nodes.CondExpr):
+        test = _compile_expression(env, node.test)
+        if_true = _compile_expression(env, node.expr1)
+        if node.expr2 is not None:
+            if_false = _compile_expression(env, node.expr2)
+        else:
+            undefined = env.undefined
+            if_false = lambda context: undefined()
+        return lambda context: if_true(context) if test(context) else if_false(context)
+
+    if isinstance(node, nodes.Filter) and node.node is not None:
+        return _compile_filter(env, node)
+
+    raise _Unsupported(type(node).__name__)
+
+
+def _compile_filter(env: jinja2.Environment, node: nodes.Filter) -> ExpressionFunction:
+    """
+    Übersetzt einen Filter mit konstanten Argumenten
+    """
+    function = env.filters.get(node.name)
+    # Unbekannte Filter meldet Jinja2 beim Kompilieren; Filter mit Kontext-Zugriff bleiben bei Jinja2
+    if function is None or getattr(function, 'jinja_pass_arg', None) is not None:
+        raise _Unsupported(node.name)
+    if node.dyn_args is not None or node.dyn_kwargs is not None:
+        raise _Unsupported(node.name)
+    if not all(isinstance(arg, nodes.Const) for arg in node.args):
+        raise _Unsupported(node.name)
+    if not all(isinstance(pair.value, nodes.Const) for pair in node.kwargs):
+        raise _Unsupported(node.name)
+
+    target = _compile_expression(env, node.node)
+    args = tuple(arg.value for arg in node.args)
+    kwargs = {pair.key: pair.value.value for pair in node.kwargs}
+    if kwargs:
+        return lambda context: function(target(context), *args, **kwargs)
+    return lambda context: function(target(context), *args)
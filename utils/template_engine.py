@@ -7,6 +7,10 @@ from datetime import datetime
 import uuid
 import requests
 import time
+import threading
+
+from utils.circuit_breaker import CircuitBreaker, Bulkhead, EndpointUnavailableError
+from utils.template_compiler import compile_template
 
 # Konfiguriere Logging
 logging.basicConfig(
@@ -20,12 +24,13 @@ class TemplateEngine:
     Template-Engine zur Transformation von MQTT-Nachrichten basierend auf konfigurierbaren Templates
     """
     
-    def __init__(self, templates_dir):
+    def __init__(self, templates_dir, preload=True):
         """
         Initialisiert die Template-Engine
         
         Args:
             templates_dir: Verzeichnis, in dem die Templates gespeichert sind
+            preload: Templates sofort laden? (False: später über load_templates(), z.B. beim Aufwärmen)
         """
         self.templates_dir = templates_dir
         self.jinja_env = jinja2.Environment(
@@ -36,8 +41,29 @@ class TemplateEngine:
         # Filter zum sicheren JSON-Serialisieren hinzufügen
         self.jinja_env.filters['tojson'] = lambda obj, **kwargs: json.dumps(obj, **kwargs)
         
+        # Umgebung für die transform-Bäume der Templates
+        self.render_env = jinja2.Environment(autoescape=True)
+        
+        # Templates und Pläne werden nie verändert, sondern als Kopie ersetzt (copy-on-write),
+        # damit Worker-Threads während eines Reloads immer einen vollständigen Stand sehen
         self.templates = {}
-        self.load_templates()
+        # Vorkompilierte transform-Bäume (Template-Name -> (Template-Daten, Plan))
+        self.plans = {}
+        # Stand der geladenen Dateien (Pfad -> (mtime_ns, Größe)) für die Dateiüberwachung
+        self.file_stats = {}
+        # Wird bei jeder Änderung der Templates erhöht, z.B. zum Invalidieren von Caches
+        self.version = 0
+        self.reload_listeners = []
+        self.swap_lock = threading.Lock()
+        
+        self.watch_thread = None
+        self.watch_stop = threading.Event()
+        # Gemeinsamer Template-Store (attach_store); None = Templates aus dem Verzeichnis
+        self.store = None
+        # Serialisiert Abgleich und Änderungsbenachrichtigungen des Stores
+        self.store_lock = threading.Lock()
+        if preload:
+            self.load_templates()
     
     def load_templates(self):
         """
@@ -49,32 +75,298 @@ class TemplateEngine:
             logger.warning(f"Templates-Verzeichnis {self.templates_dir} existiert nicht")
             return
         
-        for filename in os.listdir(self.templates_dir):
-            if filename.endswith('.json') or filename.endswith('.yaml') or filename.endswith('.yml'):
-                template_path = os.path.join(self.templates_dir, filename)
-                template_name = os.path.splitext(filename)[0]
-                
-                try:
-                    with open(template_path, 'r') as f:
-                        if filename.endswith('.json'):
-                            template_data = json.load(f)
-                        else:
-                            template_data = yaml.safe_load(f)
-                    
-                    self.templates[template_name] = {
-                        'data': template_data,
-                        'path': template_path
-                    }
-                    logger.info(f"Template '{template_name}' geladen")
-                except Exception as e:
-                    logger.error(f"Fehler beim Laden des Templates '{template_name}': {str(e)}")
+        files = self._scan_files()
+        self._swap(self._load_files(files), files)
     
     def reload_templates(self):
         """
         Lädt alle Templates neu
+        
+        Die neuen Templates ersetzen die alten erst, wenn alle geladen und kompiliert
+        sind; bis dahin transformieren die Worker mit dem bisherigen Stand.
+        Mit angebundenem Store wird dessen Stand übernommen.
         """
-        self.templates = {}
-        self.load_templates()
+        if self.store is not None:
+            self.sync_from_store()
+            return
+        files = self._scan_files() if os.path.exists(self.templates_dir) else {}
+        self._swap(self._load_files(files), files, replace=True)
+    
+    def check_for_changes(self):
+        """
+        Lädt geänderte, neue und gelöschte Template-Dateien nach (Vergleich von mtime und Größe)
+        
+        Dateien, die sich nicht laden lassen (z.B. weil sie gerade geschrieben werden),
+        behalten ihren bisherigen Stand und werden bei der nächsten Prüfung erneut geladen.
+        
+        Returns:
+            Namen der geänderten Templates
+        """
+        if self.store is not None:
+            return []
+        files = self._scan_files() if os.path.exists(self.templates_dir) else {}
+        changed = {path: stat for path, stat in files.items() if self.file_stats.get(path) != stat}
+        removed = [path for path in self.file_stats if path not in files]
+        if not changed and not removed:
+            return []
+        
+        loaded = self._load_files(changed)
+        removed_names = [self._template_name(path) for path in removed]
+        if not loaded and not removed:
+            return []
+        
+        self._swap(loaded, {entry['path']: files[entry['path']] for entry, _ in loaded.values()},
+                   removed_paths=removed)
+        names = sorted(set(loaded) | set(removed_names))
+        logger.info(f"Templates geändert: {', '.join(names)} (Version {self.version})")
+        return names
+    
+    def start_watching(self, interval=None):
+        """
+        Startet einen Thread, der das Templates-Verzeichnis auf Änderungen prüft
+        
+        Args:
+            interval: Prüfintervall in Sekunden (None = TEMPLATE_WATCH_INTERVAL, Standard 5; 0 = aus)
+        
+        Returns:
+            True, wenn die Überwachung läuft
+        """
+        if interval is None:
+            interval = float(os.environ.get('TEMPLATE_WATCH_INTERVAL', 5))
+        if interval <= 0:
+            return False
+        if self.store is not None:
+            # Änderungen kommen über die Benachrichtigungen des Stores
+            return False
+        if self.watch_thread and self.watch_thread.is_alive():
+            return True
+        
+        self.watch_stop.clear()
+        self.watch_thread = threading.Thread(target=self._watch_loop, args=(interval,), name='template-watcher')
+        self.watch_thread.daemon = True
+        self.watch_thread.start()
+        logger.info(f"Überwache {self.templates_dir} alle {interval}s auf geänderte Templates")
+        return True
+    
+    def stop_watching(self):
+        """
+        Beendet die Dateiüberwachung bzw. das Abonnement des Template-Stores
+        """
+        self.watch_stop.set()
+        if self.watch_thread:
+            self.watch_thread.join()
+            self.watch_thread = None
+        if self.store is not None:
+            # Der Store kann von weiteren Engines genutzt werden: nur das eigene Abonnement beenden
+            self.store.unsubscribe(self._on_store_change)
+    
+    def _watch_loop(self, interval):
+        while not self.watch_stop.wait(interval):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                logger.error(f"Fehler beim Prüfen der Templates auf Änderungen: {str(e)}")
+    
+    def attach_store(self, store, seed=True):
+        """
+        Bezieht die Templates künftig aus einem gemeinsamen Template-Store (utils.template_store)
+        
+        Die lokalen Template-Dateien werden in den Store übernommen, sofern sie dort
+        noch nie existiert haben. Danach werden alle Templates aus dem Store geladen
+        und Änderungen anderer Prozesse über Benachrichtigungen nachgeladen; die
+        Dateiüberwachung wird beendet.
+        
+        Args:
+            store: RedisTemplateStore
+            seed: Lokale Template-Dateien in den Store übernehmen
+        """
+        if self.store is not store:
+            self.watch_stop.set()
+            if self.watch_thread:
+                self.watch_thread.join()
+                self.watch_thread = None
+            if seed and os.path.exists(self.templates_dir):
+                loaded = self._load_files(self._scan_files())
+                store.seed({name: entry['data'] for name, (entry, _) in loaded.items()})
+            self.store = store
+        # Erst abonnieren, dann abgleichen, damit keine Änderung dazwischen verloren geht
+        store.subscribe(self._on_store_change)
+        self.sync_from_store()
+    
+    def sync_from_store(self):
+        """
+        Ersetzt alle Templates durch den aktuellen Stand des Stores
+        """
+        with self.store_lock:
+            loaded = {name: self._prepare(name, {'data': data, 'path': None, 'version': version})
+                      for name, (data, version) in self.store.get_all().items()}
+            self._swap(loaded, {}, replace=True)
+        logger.info(f"{len(loaded)} Templates aus dem Store geladen (Version {self.version})")
+    
+    def _on_store_change(self, template_name, store_version):
+        """
+        Lädt ein im Store geändertes oder gelöschtes Template nach
+        
+        Benachrichtigungen, die älter als der geladene Stand sind, werden ignoriert.
+        template_name None (nach einem Verbindungsabbruch) gleicht alle Templates ab.
+        """
+        if template_name is None:
+            self.sync_from_store()
+            return
+        
+        with self.store_lock:
+            current = self.templates.get(template_name)
+            if current is not None and current.get('version', 0) >= store_version:
+                return
+            stored = self.store.get(template_name)
+            if stored is None:
+                if current is not None:
+                    self._swap({}, {}, removed_names=[template_name])
+                    logger.info(f"Template '{template_name}' im Store gelöscht (Version {self.version})")
+                return
+            data, version = stored
+            if current is not None and current.get('version', 0) >= version:
+                return
+            self._swap({template_name: self._prepare(template_name, {'data': data, 'path': None, 'version': version})}, {})
+        logger.info(f"Template '{template_name}' aus dem Store nachgeladen (Store-Version {version})")
+    
+    def save_template(self, template_name, template_data, expected_version=None):
+        """
+        Speichert ein Template im Store bzw. als JSON-Datei im Templates-Verzeichnis
+        
+        Args:
+            template_name: Name des Templates
+            template_data: Template-Daten (Dictionary mit 'transform')
+            expected_version: Nur speichern, wenn das Template im Store noch diese Version hat
+                (0 = neu anlegen; ohne Store ignoriert)
+        
+        Returns:
+            Version des gespeicherten Templates oder None bei einem Versionskonflikt
+        """
+        if self.store is not None:
+            version = self.store.put(template_name, template_data, expected_version)
+            if version is not None:
+                # Nicht auf die eigene Benachrichtigung warten: der Aufrufer sieht den neuen Stand sofort
+                self._on_store_change(template_name, version)
+            return version
+        
+        template_path = os.path.join(self.templates_dir, f"{template_name}.json")
+        with open(template_path, 'w') as f:
+            json.dump(template_data, f, indent=2, ensure_ascii=False)
+        files = self._scan_files()
+        self._swap(self._load_files([template_path]), {template_path: files[template_path]})
+        logger.info(f"Template '{template_name}' in {template_path} gespeichert")
+        return self.version
+    
+    def add_reload_listener(self, listener):
+        """
+        Registriert eine Funktion listener(version, namen), die nach jeder Änderung der Templates aufgerufen wird
+        """
+        self.reload_listeners.append(listener)
+    
+    @staticmethod
+    def _template_name(path):
+        return os.path.splitext(os.path.basename(path))[0]
+    
+    def _scan_files(self):
+        """
+        Gibt die Template-Dateien des Verzeichnisses mit (mtime_ns, Größe) zurück
+        """
+        files = {}
+        with os.scandir(self.templates_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(('.json', '.yaml', '.yml')):
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+    
+    def _load_files(self, paths):
+        """
+        Lädt und kompiliert Template-Dateien, ohne die aktiven Templates zu verändern
+        
+        Returns:
+            Dictionary Template-Name -> (Eintrag, Plan oder None bei Jinja2-Fehlern)
+        """
+        loaded = {}
+        for template_path in paths:
+            filename = os.path.basename(template_path)
+            template_name = self._template_name(template_path)
+            
+            try:
+                with open(template_path, 'r') as f:
+                    if filename.endswith('.json'):
+                        template_data = json.load(f)
+                    else:
+                        template_data = yaml.safe_load(f)
+            except Exception as e:
+                logger.error(f"Fehler beim Laden des Templates '{template_name}': {str(e)}")
+                continue
+            
+            loaded[template_name] = self._prepare(template_name, {'data': template_data, 'path': template_path})
+            logger.info(f"Template '{template_name}' geladen")
+        return loaded
+    
+    def _prepare(self, template_name, entry):
+        """
+        Kompiliert den transform-Baum eines Eintrags einmalig
+        
+        Returns:
+            (Eintrag, Plan oder None bei Jinja2-Fehlern; die Transformation scheitert dann erst beim Aufruf)
+        """
+        template_data = entry['data']
+        plan = None
+        try:
+            plan = self._compile_transform(template_data.get('transform', {}) if isinstance(template_data, dict) else {})
+        except jinja2.TemplateError as e:
+            logger.error(f"Fehler beim Kompilieren des Templates '{template_name}': {str(e)}")
+        return entry, plan
+    
+    def _swap(self, loaded, file_stats, removed_paths=(), removed_names=(), replace=False):
+        """
+        Ersetzt Templates, Pläne und Dateistände atomar durch neue Kopien und erhöht die Version
+        
+        Args:
+            loaded: Ergebnis von _load_files()
+            file_stats: Stand der geladenen Dateien (Pfad -> (mtime_ns, Größe))
+            removed_paths: Gelöschte Template-Dateien
+            removed_names: Gelöschte Templates ohne Datei (Store)
+            replace: Alle bisherigen Templates verwerfen (Reload)
+        """
+        with self.swap_lock:
+            templates = {} if replace else dict(self.templates)
+            plans = {} if replace else dict(self.plans)
+            stats = {} if replace else dict(self.file_stats)
+            
+            for path in removed_paths:
+                name = self._template_name(path)
+                stats.pop(path, None)
+                if name in templates and templates[name]['path'] == path:
+                    del templates[name]
+                    plans.pop(name, None)
+            for name in removed_names:
+                templates.pop(name, None)
+                plans.pop(name, None)
+            
+            for name, (entry, plan) in loaded.items():
+                templates[name] = entry
+                if plan is not None:
+                    plans[name] = (entry['data'], plan)
+                else:
+                    plans.pop(name, None)
+            stats.update(file_stats)
+            
+            self.plans = plans
+            self.templates = templates
+            self.file_stats = stats
+            self.version += 1
+            version = self.version
+        
+        names = sorted(set(loaded) | set(removed_names) | {self._template_name(path) for path in removed_paths})
+        for listener in list(self.reload_listeners):
+            try:
+                listener(version, names)
+            except Exception as e:
+                logger.error(f"Fehler beim Benachrichtigen über geänderte Templates: {str(e)}")
     
     def get_template_names(self):
         """
@@ -95,17 +387,17 @@ class TemplateEngine:
         Returns:
             Dictionary mit Template-Details oder None, wenn das Template nicht existiert
         """
-        if template_name not in self.templates:
+        template_data = self.templates.get(template_name)
+        if template_data is None:
             logger.warning(f"Template '{template_name}' nicht gefunden")
             return None
             
-        template_data = self.templates[template_name]
         
-        # Extrahiere Dateiinhalt
-        with open(template_data['path'], 'r') as f:
-            if template_data['path'].endswith('.json'):
-                template_code = f.read()
-            else:
+        # Extrahiere Dateiinhalt; Templates aus dem Store haben keine Datei
+        if template_data['path'] is None:
+            template_code = json.dumps(template_data['data'], indent=2, ensure_ascii=False)
+        else:
+            with open(template_data['path'], 'r') as f:
                 template_code = f.read()
         
         # Ermittle Provider-Typ anhand von Dateiname oder Inhalt
@@ -127,7 +419,8 @@ class TemplateEngine:
             'template_code': template_code,
             'provider_type': provider_type,
             'created_at': created_at,
-            'path': template_data['path']
+            'path': template_data['path'],
+            'version': template_data.get('version')
         }
     
     def delete_template(self, template_name):
@@ -140,24 +433,30 @@ class TemplateEngine:
         Returns:
             True bei Erfolg, False bei Fehler
         """
-        if template_name not in self.templates:
+        template = self.templates.get(template_name)
+        if template is None:
             logger.warning(f"Template '{template_name}' zum Löschen nicht gefunden")
             return False
             
         try:
+            if self.store is not None:
+                # Die Benachrichtigung entfernt das Template auch in allen anderen Prozessen
+                self.store.delete(template_name)
+                with self.store_lock:
+                    self._swap({}, {}, removed_names=[template_name])
+                logger.info(f"Template '{template_name}' aus dem Store gelöscht")
+                return True
+            
             # Pfad zur Template-Datei
-            template_path = self.templates[template_name]['path']
+            template_path = template['path']
             
             # Datei löschen, wenn sie existiert
             if os.path.exists(template_path):
                 os.remove(template_path)
                 logger.info(f"Template-Datei {template_path} gelöscht")
             
-            # Template aus dem templates-Dictionary entfernen
-            del self.templates[template_name]
-            
-            # Templates neu laden
-            self.reload_templates()
+            # Nur dieses Template entfernen, die übrigen bleiben unverändert
+            self._swap({}, {}, removed_paths=[template_path])
             
             logger.info(f"Template '{template_name}' erfolgreich gelöscht")
             return True
@@ -181,7 +480,9 @@ class TemplateEngine:
         Returns:
             Transformierte Nachricht
         """
-        if template_name not in self.templates:
+        # Ein gleichzeitiger Reload ersetzt self.templates, der Eintrag bleibt gültig
+        template = self.templates.get(template_name)
+        if template is None:
             logger.error(f"Template '{template_name}' nicht gefunden")
             return None
         
@@ -222,11 +523,8 @@ class TemplateEngine:
             # UUID für die Nachricht generieren
             uuid_str = str(uuid.uuid4())
             
-            # Template-Daten laden
-            template_data = self.templates[template_name]['data']
-            
-            # Jinja2-Umgebung für das Template vorbereiten
-            env = jinja2.Environment(autoescape=True)
+            # Vorkompilierten transform-Baum des Templates laden
+            plan = self._get_plan(template_name, template)
             
             # VERBESSERTE BEHANDLUNG FÜR VERSCHIEDENE NACHRICHTENFORMATE
             # Besondere Behandlung für Panic-Button-Nachrichten (Code 2030)
@@ -267,7 +565,7 @@ class TemplateEngine:
             }
             
             # Transformation durchführen
-            result = self._transform_recursive(template_data.get('transform', {}), env, context)
+            result = self._render_plan(plan, context)
             
             # Falls ein Gateway-Value in der Nachricht enthalten ist, übernehmen
             if 'gateway' in data and isinstance(data['gateway'], dict):
@@ -324,53 +622,118 @@ class TemplateEngine:
                 return device['values']['alarmstatus']
         return "unknown"
 
-    def _transform_recursive(self, transform, env, context):
+    def _get_plan(self, template_name, template=None):
+        """
+        Gibt den vorkompilierten transform-Baum eines Templates zurück
+        
+        Wurden die Template-Daten seit dem Kompilieren ersetzt, wird neu kompiliert.
+        
+        Args:
+            template_name: Name des Templates
+            template: Eintrag aus self.templates (None = aktueller Eintrag)
         """
-        Hilfsfunktion zur rekursiven Transformation von Nachrichten
+        template_data = (template or self.templates[template_name])['data']
+        cached = self.plans.get(template_name)
+        if cached is None or cached[0] is not template_data:
+            cached = (template_data, self._compile_transform(template_data.get('transform', {})))
+            with self.swap_lock:
+                if self.templates.get(template_name, {}).get('data') is template_data:
+                    plans = dict(self.plans)
+                    plans[template_name] = cached
+                    self.plans = plans
+        return cached[1]
+    
+    def _compile_transform(self, transform):
+        """
+        Kompiliert einen transform-Baum einmalig in einen Plan
+        
+        Einfache Strings werden zu nativen Render-Funktionen, alle übrigen zu kompilierten
+        Jinja2-Templates. Strings ohne Jinja2-Syntax und alle anderen Werte bleiben Literale.
         
         Args:
             transform: Transformations-Daten
-            env: Jinja2-Umgebung
-            context: Transformationskontext
             
         Returns:
-            Transformierte Nachricht
+            Plan aus ('dict', [(Schlüssel, Plan)]), ('list', [Plan]), ('native', Funktion),
+            ('template', Template) und ('literal', Wert)
         """
         if isinstance(transform, dict):
-            result = {}
-            for key, value in transform.items():
-                result[key] = self._transform_recursive(value, env, context)
-            return result
+            return ('dict', [(key, self._compile_transform(value)) for key, value in transform.items()])
         elif isinstance(transform, list):
-            return [self._transform_recursive(item, env, context) for item in transform]
+            return ('list', [self._compile_transform(item) for item in transform])
         elif isinstance(transform, str):
-            template = env.from_string(transform)
-            return template.render(**context)
+            # Ohne '{' und Zeilenumbrüche liefert Jinja2 den String unverändert zurück
+            if '{' not in transform and '\n' not in transform and '\r' not in transform:
+                return ('literal', transform)
+            return self._compile_string(transform)
         else:
-            return transform
+            return ('literal', transform)
+    
+    def _compile_string(self, source):
+        """
+        Kompiliert einen Template-String nativ (utils.template_compiler) oder mit Jinja2
+        """
+        render = compile_template(self.render_env, source)
+        if render is not None:
+            return ('native', render)
+        return ('template', self.render_env.from_string(source))
+    
+    def _render_plan(self, plan, context):
+        """
+        Erzeugt die transformierte Nachricht aus einem Plan von _compile_transform()
+        """
+        kind, value = plan
+        if kind == 'native':
+            return value(context)
+        elif kind == 'template':
+            return value.render(**context)
+        elif kind == 'dict':
+            return {key: self._render_plan(item, context) for key, item in value}
+        elif kind == 'list':
+            return [self._render_plan(item, context) for item in value]
+        return value
 
 class MessageForwarder:
     """
     Klasse zum Weiterleiten von transformierten Nachrichten an externe APIs
     """
     
-    def __init__(self):
+    def __init__(self, preload=True):
         """
         Initialisiert den Message Forwarder
+        
+        Args:
+            preload: Kunden-Endpunkte sofort aus der Datenbank laden? (False: später über load_endpoints())
         """
         self.endpoints = {}
+        
+        # Circuit Breaker und Bulkhead je Endpunkt (werden beim ersten Zugriff angelegt)
+        self.circuit_breakers = {}
+        self.bulkheads = {}
+        self._guard_lock = threading.Lock()
+        self.circuit_options = {
+            'failure_rate_threshold': float(os.environ.get('CIRCUIT_FAILURE_RATE', 0.5)),
+            'window_size': int(os.environ.get('CIRCUIT_WINDOW_SIZE', 20)),
+            'minimum_calls': int(os.environ.get('CIRCUIT_MINIMUM_CALLS', 5)),
+            'open_timeout': float(os.environ.get('CIRCUIT_OPEN_TIMEOUT', 30))
+        }
+        self.endpoint_max_concurrency = int(os.environ.get('ENDPOINT_MAX_CONCURRENCY', 4))
+        
         # MongoDB-Import muss hier durchgeführt werden, um zirkuläre Importe zu vermeiden
         import sys
-        import os
         sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         from api.models import Customer, Gateway
         self.Customer = Customer
         self.Gateway = Gateway
-        self.load_endpoints()
+        if preload:
+            self.load_endpoints()
     
     def load_endpoints(self):
         """
         Lädt die konfigurierten Endpunkte
+        
+        Returns:
+            True, wenn die Kunden aus der Datenbank geladen werden konnten
         """
         # Entferne den Standardendpunkt für evAlarm (Sicherheitsrisiko)
         self.endpoints = {}
@@ -391,8 +754,10 @@ class MessageForwarder:
                         'customer': customer
                     }
             logger.info(f"Endpunkte für {len(self.endpoints)} Kunden geladen")
+            return True
         except Exception as e:
             logger.error(f"Fehler beim Laden der Kundenendpunkte: {str(e)}")
+            return False
     
     def get_endpoint_names(self):
         """
@@ -492,6 +857,28 @@ class MessageForwarder:
         Returns:
             Response-Objekt oder None bei Fehler
         """
+        resolved = self.resolve_endpoint(message, endpoint_name, gateway_uuid)
+        if not resolved:
+            return None
+        
+        endpoint_name, endpoint = resolved
+        return self.send_to_endpoint(message, endpoint_name, endpoint)
+    
+    def resolve_endpoint(self, message, endpoint_name, gateway_uuid=None):
+        """
+        Ermittelt den Ziel-Endpunkt einer Nachricht und passt die Nachricht an den Kunden an
+        
+        Führt alle Sicherheitsprüfungen der Weiterleitung durch, sendet aber nichts.
+        Wird vom asynchronen Worker genutzt, der den eigentlichen Versand selbst übernimmt.
+        
+        Args:
+            message: Die weiterzuleitende Nachricht (wird ggf. angepasst)
+            endpoint_name: Name des Endpunkts oder 'auto' für automatische Auswahl basierend auf gateway_uuid
+            gateway_uuid: UUID des Gateways (optional, nur für endpoint_name='auto')
+            
+        Returns:
+            Tupel (Endpunkt-Name, Endpunkt-Konfiguration) oder None, wenn die Weiterleitung blockiert ist
+        """
         # Bei 'auto' den Endpunkt basierend auf dem Gateway-UUID ermitteln
         if endpoint_name == 'auto' and gateway_uuid:
             endpoint_name = self.get_endpoint_for_gateway(gateway_uuid)
@@ -522,6 +909,38 @@ class MessageForwarder:
                     if isinstance(event, dict) and 'namespace' in event:
                         event['namespace'] = customer.evalarm_namespace or event['namespace']
         
+        return endpoint_name, endpoint
+    
+    def send_to_endpoint(self, message, endpoint_name, endpoint):
+        """
+        Sendet eine Nachricht an einen bereits ermittelten Endpunkt
+        
+        Args:
+            message: Die weiterzuleitende Nachricht
+            endpoint_name: Name des Endpunkts (für Logs)
+            endpoint: Endpunkt-Konfiguration aus resolve_endpoint()
+            
+        Returns:
+            Response-Objekt oder None bei Fehler
+        
+        Raises:
+            EndpointUnavailableError: Circuit des Endpunkts offen oder zu viele laufende Anfragen
+        """
+        self.acquire_endpoint(endpoint_name)
+        response = None
+        try:
+            response = self._post(message, endpoint_name, endpoint)
+            return response
+        finally:
+            self.release_endpoint(endpoint_name, response)
+    
+    def _post(self, message, endpoint_name, endpoint):
+        """
+        Führt die HTTP-Anfrage an einen Endpunkt aus
+        
+        Returns:
+            Response-Objekt oder None bei Verbindungsfehler/Timeout
+        """
         try:
             # Log request and response
             logger.info(f"Sende Anfrage an {endpoint['url']}:")
@@ -547,6 +966,72 @@ class MessageForwarder:
         except Exception as e:
             logger.error(f"Fehler bei der Weiterleitung an '{endpoint_name}': {str(e)}")
             return None
+    
+    def _endpoint_guards(self, endpoint_name):
+        """
+        Gibt Circuit Breaker und Bulkhead eines Endpunkts zurück
+        """
+        with self._guard_lock:
+            if endpoint_name not in self.circuit_breakers:
+                self.circuit_breakers[endpoint_name] = CircuitBreaker(endpoint_name, **self.circuit_options)
+                self.bulkheads[endpoint_name] = Bulkhead(endpoint_name, self.endpoint_max_concurrency)
+            return self.circuit_breakers[endpoint_name], self.bulkheads[endpoint_name]
+    
+    def acquire_endpoint(self, endpoint_name):
+        """
+        Reserviert einen Platz für eine Anfrage an einen Endpunkt
+        
+        Nach erfolgreichem Aufruf muss release_endpoint() aufgerufen werden.
+        
+        Raises:
+            EndpointUnavailableError: Circuit offen oder Bulkhead voll
+        """
+        breaker, bulkhead = self._endpoint_guards(endpoint_name)
+        
+        if not bulkhead.try_acquire():
+            logger.warning(f"Bulkhead für '{endpoint_name}' voll ({bulkhead.max_concurrent} laufende Anfragen)")
+            raise EndpointUnavailableError(endpoint_name, 'bulkhead_full', 1.0)
+        
+        if not breaker.allow_request():
+            bulkhead.release()
+            raise EndpointUnavailableError(endpoint_name, 'circuit_open', breaker.retry_after())
+    
+    def release_endpoint(self, endpoint_name, response):
+        """
+        Gibt den Platz einer Anfrage frei und meldet ihr Ergebnis an den Circuit Breaker
+        
+        Verbindungsfehler, Timeouts, HTTP 429 und 5xx zählen als Fehler des Endpunkts,
+        andere 4xx-Antworten nicht (der Endpunkt ist erreichbar).
+        
+        Args:
+            endpoint_name: Name des Endpunkts
+            response: Antwort mit status_code oder None bei Verbindungsfehler/Timeout
+        """
+        breaker, bulkhead = self._endpoint_guards(endpoint_name)
+        bulkhead.release()
+        
+        if response is None or response.status_code >= 500 or response.status_code == 429:
+            previous_state = breaker.state
+            breaker.record_failure()
+            if breaker.state == CircuitBreaker.OPEN and previous_state != CircuitBreaker.OPEN:
+                logger.error(f"Circuit für '{endpoint_name}' geöffnet, Anfragen werden "
+                             f"{breaker.open_timeout:.0f}s lang zurückgestellt")
+        else:
+            breaker.record_success()
+    
+    def get_endpoint_health(self):
+        """
+        Gibt den Zustand von Circuit Breaker und Bulkhead je Endpunkt zurück
+        """
+        with self._guard_lock:
+            names = list(self.circuit_breakers)
+        return {
+            name: {
+                'circuit': self.circuit_breakers[name].get_status(),
+                'bulkhead': self.bulkheads[name].get_status()
+            }
+            for name in names
+        }
 
     def _save_blocked_message(self, message, gateway_uuid, reason):
         """
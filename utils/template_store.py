@@ -0,0 +1,331 @@
+"""
+Gemeinsamer Template-Store in Redis
+
+Processor und Worker laden ihre Templates sonst jeweils aus dem lokalen
+Verzeichnis templates/; bei mehreren Containern laufen die Stände auseinander.
+Mit TEMPLATE_STORE=redis liegen die Templates stattdessen versioniert in Redis:
+
+- {prefix}:templates            Hash Template-Name -> Template als JSON
+- {prefix}:templates:versions   Hash Template-Name -> Version der letzten Änderung
+                                (bleibt nach dem Löschen als Grabstein erhalten)
+- {prefix}:templates:version    Zähler, aus dem jede Änderung ihre Version erhält
+- {prefix}:templates:changes    Pub/Sub-Kanal, auf dem jede Änderung als "<version>:<name>" gemeldet wird
+
+Jeder Prozess hält die kompilierten Templates weiterhin im Speicher
+(TemplateEngine.attach_store) und lädt nach einer Benachrichtigung nur das
+geänderte Template nach.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import redis
+
+# Konfiguriere Logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('template-store')
+
+# Speichert ein Template, optional nur, wenn die erwartete Version noch aktuell ist
+# KEYS: Templates, Versionen, Zähler, Kanal; ARGV: Name, JSON, erwartete Version ('' = beliebig)
+# Rückgabe: neue Version oder -1 bei einem Versionskonflikt
+PUT_SCRIPT = """
+local current = 0
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    current = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+end
+if ARGV[3] ~= '' and tonumber(ARGV[3]) ~= current then
+    return -1
+end
+local version = redis.call('INCR', KEYS[3])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[1], version)
+redis.call('PUBLISH', KEYS[4], version .. ':' .. ARGV[1])
+return version
+"""
+
+# Löscht ein Template; die Version bleibt als Grabstein stehen, damit seed() es nicht wieder anlegt
+# Rückgabe: neue Version oder 0, wenn das Template nicht existiert
+DELETE_SCRIPT = """
+if redis.call('HDEL', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+local version = redis.call('INCR', KEYS[3])
+redis.call('HSET', KEYS[2], ARGV[1], version)
+redis.call('PUBLISH', KEYS[4], version .. ':' .. ARGV[1])
+return version
+"""
+
+# Legt Templates an, die im Store noch nie existiert haben; ARGV: Name, JSON, Name, JSON, ...
+# Rückgabe: Namen der angelegten Templates
+SEED_SCRIPT = """
+local added = {}
+for i = 1, #ARGV, 2 do
+    if redis.call('HEXISTS', KEYS[2], ARGV[i]) == 0 then
+        local version = redis.call('INCR', KEYS[3])
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+        redis.call('HSET', KEYS[2], ARGV[i], version)
+        redis.call('PUBLISH', KEYS[4], version .. ':' .. ARGV[i])
+        table.insert(added, ARGV[i])
+    end
+end
+return added
+"""
+
+
+class RedisTemplateStore:
+    """
+    Versionierte Templates in Redis mit Änderungsbenachrichtigungen über Pub/Sub
+    """
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None, prefix='iot_gateway',
+                 reconnect_delay=1.0):
+        """
+        Initialisiert den Template-Store
+
+        Args:
+            host, port, db, password: Redis-Verbindung
+            prefix: Präfix der Redis-Schlüssel (wie bei der Message Queue)
+            reconnect_delay: Wartezeit in Sekunden vor einem erneuten Abonnieren nach Verbindungsfehlern
+        """
+        self.redis_client = redis.Redis(
+            host=host,
+            port=port,
+            db=db,
+            password=password,
+            decode_responses=True
+        )
+        self.prefix = prefix
+        self.templates_key = f"{prefix}:templates"
+        self.versions_key = f"{prefix}:templates:versions"
+        self.counter_key = f"{prefix}:templates:version"
+        self.channel = f"{prefix}:templates:changes"
+        self.reconnect_delay = reconnect_delay
+
+        self._put_script = self.redis_client.register_script(PUT_SCRIPT)
+        self._delete_script = self.redis_client.register_script(DELETE_SCRIPT)
+        self._seed_script = self.redis_client.register_script(SEED_SCRIPT)
+
+        self.subscribe_thread = None
+        self.subscribe_stop = threading.Event()
+        # Mehrere TemplateEngines eines Prozesses (z.B. Processor und Worker) teilen sich ein Abonnement
+        self.callbacks: List[Callable[[Optional[str], Optional[int]], None]] = []
+        self.callbacks_lock = threading.Lock()
+
+    @property
+    def _keys(self):
+        return [self.templates_key, self.versions_key, self.counter_key, self.channel]
+
+    def put(self, name: str, data: Dict[str, Any], expected_version: Optional[int] = None) -> Optional[int]:
+        """
+        Speichert ein Template und benachrichtigt alle Prozesse
+
+        Args:
+            name: Template-Name
+            data: Template-Daten
+            expected_version: Nur speichern, wenn das Template noch diese Version hat (0 = existiert nicht)
+
+        Returns:
+            Neue Version oder None bei einem Versionskonflikt
+        """
+        expected = '' if expected_version is None else str(int(expected_version))
+        version = self._put_script(keys=self._keys, args=[name, json.dumps(data), expected])
+        if version == -1:
+            logger.warning(f"Versionskonflikt beim Speichern des Templates '{name}' (erwartet: {expected_version})")
+            return None
+        logger.info(f"Template '{name}' gespeichert (Version {version})")
+        return version
+
+    def delete(self, name: str) -> Optional[int]:
+        """
+        Löscht ein Template und benachrichtigt alle Prozesse
+
+        Returns:
+            Version der Löschung oder None, wenn das Template nicht existiert
+        """
+        version = self._delete_script(keys=self._keys, args=[name])
+        if not version:
+            return None
+        logger.info(f"Template '{name}' gelöscht (Version {version})")
+        return version
+
+    def seed(self, templates: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        Übernimmt Templates (z.B. aus dem lokalen Verzeichnis), die im Store noch nie existiert haben
+
+        Vorhandene und gelöschte Templates bleiben unverändert, so dass ein neu
+        gestarteter Container keine geänderten oder gelöschten Templates überschreibt.
+
+        Returns:
+            Namen der angelegten Templates
+        """
+        if not templates:
+            return []
+        args = []
+        for name, data in templates.items():
+            args.extend([name, json.dumps(data)])
+        added = self._seed_script(keys=self._keys, args=args)
+        if added:
+            logger.info(f"Templates in den Store übernommen: {', '.join(added)}")
+        return list(added)
+
+    def get(self, name: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """
+        Gibt ein Template mit seiner Version zurück
+
+        Returns:
+            (Template-Daten, Version) oder None, wenn das Template nicht existiert
+        """
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hget(self.templates_key, name)
+        pipe.hget(self.versions_key, name)
+        raw, version = pipe.execute()
+        if raw is None:
+            return None
+        return json.loads(raw), int(version or 0)
+
+    def get_all(self) -> Dict[str, Tuple[Dict[str, Any], int]]:
+        """
+        Gibt alle Templates mit ihren Versionen zurück (Template-Name -> (Daten, Version))
+        """
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hgetall(self.templates_key)
+        pipe.hgetall(self.versions_key)
+        templates, versions = pipe.execute()
+        return {name: (json.loads(raw), int(versions.get(name, 0))) for name, raw in templates.items()}
+
+    def get_versions(self) -> Dict[str, int]:
+        """
+        Gibt die Versionen aller vorhandenen Templates zurück, ohne deren Inhalt zu lesen
+        """
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hkeys(self.templates_key)
+        pipe.hgetall(self.versions_key)
+        names, versions = pipe.execute()
+        return {name: int(versions.get(name, 0)) for name in names}
+
+    def subscribe(self, callback: Callable[[Optional[str], Optional[int]], None]) -> None:
+        """
+        Meldet Änderungen künftig an callback(name, version)
+
+        Alle Callbacks teilen sich einen Thread, der beim ersten Abonnenten startet.
+        Nach einem Verbindungsabbruch wird neu abonniert und callback(None, None)
+        aufgerufen: Änderungen während der Unterbrechung sind dann unbekannt und
+        der Aufrufer muss alle Templates neu abgleichen.
+        """
+        with self.callbacks_lock:
+            if callback not in self.callbacks:
+                self.callbacks.append(callback)
+            if self.subscribe_thread and self.subscribe_thread.is_alive():
+                return
+            self.subscribe_stop.clear()
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            # Schon hier abonnieren, damit keine Änderung zwischen Abgleich und Thread-Start verloren geht
+            pubsub.subscribe(self.channel)
+            self.subscribe_thread = threading.Thread(target=self._subscribe_loop, args=(pubsub,),
+                                                     name='template-store-subscriber')
+            self.subscribe_thread.daemon = True
+            self.subscribe_thread.start()
+        logger.info(f"Abonniere Template-Änderungen auf {self.channel}")
+
+    def unsubscribe(self, callback: Callable[[Optional[str], Optional[int]], None]) -> None:
+        """
+        Meldet Änderungen nicht mehr an callback; ohne weitere Abonnenten endet der Thread
+        """
+        with self.callbacks_lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+            if self.callbacks:
+                return
+        self.close()
+
+    def _subscribe_loop(self, pubsub):
+        while not self.subscribe_stop.is_set():
+            try:
+                message = pubsub.get_message(timeout=1.0)
+            except redis.RedisError as e:
+                logger.error(f"Verbindung zum Template-Kanal unterbrochen: {str(e)}")
+                pubsub = self._resubscribe(pubsub)
+                if pubsub is not None:
+                    self._notify(None, None)
+                continue
+            if not message or message.get('type') != 'message':
+                continue
+            version, _, name = message['data'].partition(':')
+            try:
+                version = int(version)
+            except ValueError:
+                logger.warning(f"Ungültige Template-Benachrichtigung: {message['data']}")
+                continue
+            self._notify(name, version)
+        pubsub.close()
+
+    def _resubscribe(self, pubsub):
+        """
+        Abonniert den Kanal nach einem Verbindungsfehler neu
+
+        Returns:
+            Neues PubSub-Objekt oder None, wenn der Thread beendet werden soll
+        """
+        try:
+            pubsub.close()
+        except redis.RedisError:
+            pass
+        while not self.subscribe_stop.wait(self.reconnect_delay):
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                logger.info(f"Template-Kanal {self.channel} erneut abonniert")
+                return pubsub
+            except redis.RedisError as e:
+                logger.error(f"Template-Kanal kann nicht abonniert werden: {str(e)}")
+        return None
+
+    def _notify(self, name, version):
+        with self.callbacks_lock:
+            callbacks = list(self.callbacks)
+        for callback in callbacks:
+            try:
+                callback(name, version)
+            except Exception as e:
+                logger.error(f"Fehler beim Verarbeiten der Template-Änderung '{name}': {str(e)}")
+
+    def close(self):
+        """
+        Beendet das Abonnement für alle Abonnenten
+        """
+        with self.callbacks_lock:
+            self.callbacks.clear()
+        self.subscribe_stop.set()
+        thread = self.subscribe_thread
+        if thread and thread is not threading.current_thread():
+            thread.join()
+        self.subscribe_thread = None
+
+
+# Singleton-Instanz
+template_store = None
+
+
+def get_template_store() -> Optional[RedisTemplateStore]:
+    """
+    Hole den Template-Store
+
+    Returns:
+        RedisTemplateStore, wenn TEMPLATE_STORE=redis gesetzt ist, sonst None (Templates aus Dateien)
+    """
+    global template_store
+    if template_store is None and os.environ.get('TEMPLATE_STORE', 'files').lower() == 'redis':
+        template_store = RedisTemplateStore(
+            host=os.environ.get('REDIS_HOST', 'localhost'),
+            port=int(os.environ.get('REDIS_PORT', 6379)),
+            db=int(os.environ.get('REDIS_DB', 0)),
+            password=os.environ.get('REDIS_PASSWORD'),
+            prefix=os.environ.get('REDIS_PREFIX', 'iot_gateway')
+        )
+    return template_store